@@ -104,6 +104,15 @@ Start runtime, compile calvinscript and deploy application.
                            help='Any string for filtering your dht clients, use same for all nodes in the network.',
                            default=None)
 
+    argparser.add_argument('--checkpoint-interval', metavar='<sec>', type=float, dest='checkpoint_interval',
+                           help='Checkpoint the actors to disk every <sec> seconds, they are restored when the '
+                                'runtime is restarted with the same name and uri.',
+                           default=None)
+
+    argparser.add_argument('--checkpoint-dir', metavar='<dir>', type=str, dest='checkpoint_dir',
+                           help='Directory for actor checkpoints (default ~/.calvin/checkpoints)',
+                           default=None)
+
     argparser.add_argument('-s', '--storage-only', dest='storage', action='store_true', default=False,
                            help='Start storage only runtime')
 
@@ -27,7 +27,7 @@ from calvin.runtime.north.calvin_token import Token, ExceptionToken
 from calvin.runtime.north.replicationmanager import ReplicationId
 import calvin.requests.calvinresponse as response
 from calvin.runtime.south.async import async
-from calvin.runtime.north.plugins.authorization_checks import check_authorization_plugin_list
+from calvin.runtime.north.plugins.authorization_checks import authorization_plugin_list_decision
 from calvin.utilities.calvin_callback import CalvinCB
 from calvin.csparser.port_property_syntax import get_port_property_capabilities, get_port_property_runtime
 from calvin.runtime.north.calvinsys import get_calvinsys
@@ -77,11 +77,16 @@ def manage(include=None, exclude=None):
     return wrapper
 
 
-def condition(action_input=[], action_output=[]):
+def condition(action_input=[], action_output=[], batch=None):
     """
     Decorator condition specifies the required input data and output space.
     Both parameters are lists of port names
     Return value is a tuple (did_fire, output_available, exhaust_list)
+
+    With batch=N the action reads up to N tokens per input port at once, the same number n
+    from every input port, and requires space for n tokens on every output port.
+    The action is called with one list of values per input port and should return
+    one list of values (at most n) per output port.
     """
 
     tokens_produced = len(action_output)
@@ -89,6 +94,9 @@ def condition(action_input=[], action_output=[]):
 
     def wrap(action_method):
 
+        if batch:
+            return _batch_condition_wrapper(action_method, action_input, action_output, batch)
+
         @functools.wraps(action_method)
         def condition_wrapper(self):
             #
@@ -151,6 +159,88 @@ def condition(action_input=[], action_output=[]):
     return wrap
 
 
+def _batch_size(ports, batch):
+    """Largest n <= batch such that all ports have n tokens (or free slots) available"""
+    low, high = 0, batch
+    while low < high:
+        mid = (low + high + 1) // 2
+        if all(port.tokens_available(mid) for port in ports):
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def _invalid_production(actor, action_method, action_output, production):
+    action = "%s.%s" % (actor._type, action_method.__name__)
+    return Exception("%s invalid production %s, expected %s" % (action, str(production), str(tuple(action_output))))
+
+
+def _batch_condition_wrapper(action_method, action_input, action_output, batch):
+    """Batched version of the condition wrapper, see condition"""
+
+    tokens_produced = len(action_output)
+
+    @functools.wraps(action_method)
+    def batch_condition_wrapper(self):
+        inports = [self.inports[portname] for portname in action_input]
+        outports = [self.outports[portname] for portname in action_output]
+        output_ok = all(port.tokens_available(1) for port in outports)
+        if not output_ok:
+            return (False, False, ())
+        n = _batch_size(inports + outports, batch)
+        if not n:
+            return (False, True, ())
+        #
+        # Peek tokens, a batch ends before any exception token
+        #
+        args = [[] for _ in inports]
+        for i in range(n):
+            tokens = [port.peek_token() for port in inports]
+            if any(isinstance(token, ExceptionToken) for token in tokens):
+                for port in inports:
+                    port.peek_cancel()
+                if i == 0:
+                    # Exception tokens first in queues, handled one at a time by the exception handler
+                    return _batch_exception(self, action_method, action_output, inports, outports)
+                for port in inports:
+                    for _ in range(i):
+                        port.peek_token()
+                break
+            for values, token in zip(args, tokens):
+                values.append(token.value)
+        exhausted_ports = set(port for port in inports if port.peek_commit())
+        #
+        # Perform the action, returns a list of values for each output port
+        #
+        production = action_method(self, *args) or ()
+        if tokens_produced != len(production) or any(len(values) > n for values in production):
+            # At most one token per input token fits in the output queues
+            raise _invalid_production(self, action_method, action_output, production)
+        for port, values in zip(outports, production):
+            port.write_tokens([value if isinstance(value, Token) else Token(value) for value in values])
+
+        return (True, True, exhausted_ports)
+
+    return batch_condition_wrapper
+
+
+def _batch_exception(actor, action_method, action_output, inports, outports):
+    args = []
+    exhausted_ports = set()
+    for port in inports:
+        token, exhaust = port.read()
+        args.append(token if isinstance(token, ExceptionToken) else token.value)
+        if exhaust:
+            exhausted_ports.add(port)
+    production = actor.exception_handler(action_method, args) or ()
+    if len(action_output) != len(production):
+        raise _invalid_production(actor, action_method, action_output, production)
+    for port, value in zip(outports, production):
+        port.write_token(value if isinstance(value, Token) else Token(value))
+    return (True, True, exhausted_ports)
+
+
 def stateguard(action_guard):
     """
     Decorator guard refines the criteria for picking an action to run by stating a function
@@ -351,6 +441,8 @@ class Actor(object):
         self.sec = security
         self._subject_attributes = self.sec.get_subject_attributes() if self.sec is not None else None
         self.authorization_checks = None
+        # Time when the authorization decision needs to be checked again, see check_authorization_decision
+        self.authorization_valid_until = 0
         self._replication_id = ReplicationId()
         self._exhaust_cb = None
         self._pressure_event = 0  # Time of last pressure event time (not in state only local)
@@ -369,6 +461,7 @@ class Actor(object):
 
     def set_authorization_checks(self, authorization_checks):
         self.authorization_checks = authorization_checks
+        self.authorization_valid_until = 0
 
     @verify_status([STATUS.LOADED])
     def setup_complete(self):
@@ -515,6 +608,8 @@ class Actor(object):
     # FIXME: Responsibility of scheduler, not actor class
     #
     def _authorized(self):
+        if time.time() < self.authorization_valid_until:
+            return True
         authorized = self.check_authorization_decision()
         if not authorized:
             _log.info("Access denied for actor %s(%s)" % ( self._type, self._id))
@@ -795,16 +890,26 @@ class Actor(object):
             self._signature = signature
 
     def check_authorization_decision(self):
-        """Check if authorization decision is still valid"""
-        if self.authorization_checks:
-            if any(isinstance(elem, list) for elem in self.authorization_checks):
-                # If list of lists, True must be found in each list.
-                for plugin_list in self.authorization_checks:
-                    if not check_authorization_plugin_list(plugin_list):
-                        return False
-                return True
-            else:
-                return check_authorization_plugin_list(self.authorization_checks)
+        """
+        Check if authorization decision is still valid, and update
+        authorization_valid_until with when it needs to be checked again
+        """
+        self.authorization_valid_until = 0
+        if not self.authorization_checks:
+            self.authorization_valid_until = float('inf')
+            return True
+        if any(isinstance(elem, list) for elem in self.authorization_checks):
+            # If list of lists, True must be found in each list.
+            plugin_lists = self.authorization_checks
+        else:
+            plugin_lists = [self.authorization_checks]
+        valid_until = float('inf')
+        for plugin_list in plugin_lists:
+            authorized, plugin_valid_until = authorization_plugin_list_decision(plugin_list)
+            if not authorized:
+                return False
+            valid_until = min(valid_until, plugin_valid_until)
+        self.authorization_valid_until = valid_until
         return True
 
     @verify_status([STATUS.DENIED])
@@ -363,6 +363,15 @@ class OutPort(Port):
         """docstring for write_token"""
         self.queue.write(data, self.id)
 
+    def write_tokens(self, tokens):
+        """Write a list of tokens, the caller must make sure there are enough free slots"""
+        write_many = getattr(self.queue, 'write_many', None)
+        if write_many:
+            write_many(tokens, self.id)
+            return
+        for token in tokens:
+            self.queue.write(token, self.id)
+
     def tokens_available(self, length):
         """Used by actor (owner) to check number of token slots available on the port."""
         return self.queue.slots_available(length, self.id)
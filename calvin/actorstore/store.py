@@ -36,9 +36,20 @@ from calvin.requests import calvinresponse
 _log = get_logger(__name__)
 _conf = calvinconfig.get()
 
+# Loaded actor classes by qualified name, shared by all actor stores, see ActorStore.lookup
+_actor_class_cache = {}
+# Namespace index for each actor path, kept in memory and on disk, see Store.find_all_modules
+_module_index = {}
+# Metadata stores by actor paths, see get_metadata_store
+_metadata_stores = {}
+
 #
 # Helpers
 #
+def _index_dir():
+    """Directory for the namespace index and metadata files, the actorstore_index_dir option"""
+    return os.path.expanduser(_conf.get('global', 'actorstore_index_dir'))
+
 def _split_path(path):
     """Split a path into tuple: (dirname, basename, ext)"""
     dirname, filename = os.path.split(path)
@@ -168,16 +179,70 @@ class Store(object):
         return (pyclass, signer)
 
 
+    def _index_file(self, path):
+        return os.path.join(_index_dir(), hashlib.sha1(path).hexdigest() + ".json")
+
+
+    def _index_valid(self, path, index):
+        # Adding or removing files or directories changes the modification time of the parent directory
+        try:
+            return all(os.stat(os.path.join(path, d)).st_mtime == mtime for d, mtime in index['dirs'].iteritems())
+        except OSError:
+            return False
+
+
+    def _build_index(self, path):
+        """Walk path, return the modification time of each directory and the directories with files"""
+        dirs = {}
+        namespaces = []
+        for current, subdirs, _ in os.walk(path):
+            # Exclude special directories
+            subdirs[:] = [d for d in subdirs if d not in self._excluded_dirs]
+            rel_path = os.path.relpath(current, path)
+            dirs[rel_path] = os.stat(current).st_mtime
+            # Skip top directory and directories without any files
+            if rel_path != '.' and _files_in_dir(current, ('.py', '.comp')):
+                namespaces.append(rel_path)
+        return {'dirs': dirs, 'namespaces': namespaces}
+
+
+    def _path_index(self, path):
+        """Index of path, from memory or disk when still valid, otherwise rebuilt and saved"""
+        index = _module_index.get(path)
+        if index is not None and self._index_valid(path, index):
+            return index
+        try:
+            with open(self._index_file(path), 'r') as f:
+                index = json.load(f)
+            if self._index_valid(path, index):
+                _module_index[path] = index
+                return index
+        except (IOError, ValueError, KeyError, AttributeError):
+            pass
+        index = self._build_index(path)
+        _module_index[path] = index
+        try:
+            if not os.path.isdir(_index_dir()):
+                os.makedirs(_index_dir())
+            with open(self._index_file(path), 'w') as f:
+                json.dump(index, f)
+        except (IOError, OSError):
+            _log.debug("Could not save actor store index for %s" % path)
+        return index
+
+
     def find_all_modules(self):
         modules = {}
-        for abs_path, namespace, files in self.directories():
-            # Check that at least one file exists in dir
-            if not files:
+        for path in self._MODULE_PATHS:
+            if not os.path.exists(path):
                 continue
-            if not namespace in modules:
-                modules[namespace] = []
-            if abs_path not in modules[namespace]:
-                modules[namespace].append(abs_path)
+            for rel_path in self._path_index(path)['namespaces']:
+                namespace = _rel_path_to_namespace(rel_path)
+                abs_path = os.path.join(path, rel_path)
+                if not namespace in modules:
+                    modules[namespace] = []
+                if abs_path not in modules[namespace]:
+                    modules[namespace].append(abs_path)
         return modules
 
 
@@ -239,6 +304,9 @@ class ActorStore(Store):
             signer:         name of actor signer (string) if security is used, else None
         """
         _log.debug("ActorStore lookup SECURITY %s" % str(self.sec))
+        cached = self._cached_actor(qualified_name)
+        if cached:
+            return (True, True, cached['class'], cached['signer'])
         namespace, _, actor_type = qualified_name.rpartition('.')
         # Search in the order given by config
         for path in self.paths_for_module(namespace):
@@ -246,6 +314,7 @@ class ActorStore(Store):
             actor_path = os.path.join(path, actor_type + '.py')
             actor_class, signer = self.load_actor(actor_type, actor_path)
             if actor_class:
+                self._cache_actor(qualified_name, actor_path, actor_class, signer)
                 return (True, True, actor_class, signer)
         for path in self.paths_for_module(namespace):
             actor_path = os.path.join(path, actor_type + '.comp')
@@ -256,6 +325,36 @@ class ActorStore(Store):
         return (False, False, None, None)
 
 
+    def _cache_actor(self, qualified_name, actor_path, actor_class, signer):
+        stat = os.stat(actor_path)
+        _actor_class_cache[qualified_name] = {
+            'path': actor_path, 'mtime': stat.st_mtime, 'size': stat.st_size,
+            'class': actor_class, 'signer': signer,
+            # Signer is only known when loaded with security, and verified when also required
+            'secured': self.sec is not None, 'verified': self.sec is not None and self.verify}
+
+
+    def _cached_actor(self, qualified_name):
+        """Cached actor class entry for qualified_name if the file is unchanged and security is fulfilled"""
+        cached = _actor_class_cache.get(qualified_name)
+        if cached is None:
+            return None
+        try:
+            stat = os.stat(cached['path'])
+        except OSError:
+            stat = None
+        if stat is None or (stat.st_mtime, stat.st_size) != (cached['mtime'], cached['size']):
+            del _actor_class_cache[qualified_name]
+            return None
+        # Another store could have other actor paths
+        namespace = qualified_name.rpartition('.')[0]
+        if os.path.dirname(cached['path']) not in self.paths_for_module(namespace):
+            return None
+        if self.sec and not (cached['secured'] and (cached['verified'] or not self.verify)):
+            return None
+        return cached
+
+
     def _parse_docstring(self, class_):
         # Extract port names from docstring
         docstring = inspect.cleandoc(class_.__doc__)
@@ -575,31 +674,28 @@ class GlobalStore(ActorStore):
     def _global_lookup_cb(self, value, signature, org_cb):
         _log.debug("_global_lookup_cb %s" % value)
         if value:
-            nbr = [len(value)]
-            actors = []
-            for a in value:
-                self.node.storage.get('actor_type-', a,
-                            CalvinCB(self._global_lookup_collect, nbr=nbr, actors=actors, signature=signature, org_cb=org_cb))
+            self.node.storage.get_many('actor_type-', value,
+                        CalvinCB(self._global_lookup_collect, signature=signature, org_cb=org_cb))
         else:
             # Not found
             org_cb(signature=signature, description=[])
 
-    def _global_lookup_collect(self, key, value, nbr, actors, signature, org_cb):
-        _log.debug("_global_lookup_collect %s" % value)
-        actors.append(value)
-        nbr[0] -= 1
-        if nbr[0] == 0:
-            org_cb(signature=signature, description=actors)
+    def _global_lookup_collect(self, values, signature, org_cb):
+        _log.debug("_global_lookup_collect %s" % values)
+        org_cb(signature=signature, description=values.values())
 
     def global_lookup_actor(self, out_iter, kwargs, final, actor_type_id):
         _log.analyze(self.node.id, "+", {'actor_type_id': actor_type_id})
         if final[0]:
+            # The actor type ids are collected and fetched in one request
+            if kwargs['actor_type_ids']:
+                self.node.storage.get_many_iter('actor_type-', kwargs['actor_type_ids'], it=out_iter)
+                kwargs['actor_type_ids'] = []
             _log.analyze(self.node.id, "+ FINAL", {'actor_type_id': actor_type_id, 'counter': kwargs['counter']})
             out_iter.auto_final(kwargs['counter'])
         else:
             kwargs['counter'] += 1
-            self.node.storage.get_iter('actor_type-', actor_type_id, it=out_iter)
-            _log.analyze(self.node.id, "+ GET", {'actor_type_id': actor_type_id, 'counter': kwargs['counter']})
+            kwargs['actor_type_ids'].append(actor_type_id)
 
     def filter_actor_on_params(self, out_iter, kwargs, final, desc):
         param_names = kwargs.get('param_names', [])
@@ -627,7 +723,8 @@ class GlobalStore(ActorStore):
             sign_iter = self.node.storage.get_index_iter(['actor', 'signature', signature]).set_name("signature")
         else:
             sign_iter = self.node.storage.get_index_iter(['actor', 'signature', signature, node_id]).set_name("signature")
-        actor_type_iter = dynops.Map(self.global_lookup_actor, sign_iter, counter=0, eager=True)
+        actor_type_iter = dynops.Map(self.global_lookup_actor, sign_iter, counter=0, actor_type_ids=[],
+                                     eager=True)
         if param_names is None:
             actor_type_iter.set_name("global_lookup")
             return actor_type_iter
@@ -643,7 +740,14 @@ class DocumentationStore(ActorStore):
     """Interface to documentation"""
     def __init__(self):
         super(DocumentationStore, self).__init__()
-        self.docs = self.root_docs()
+        self._docs = None
+
+    @property
+    def docs(self):
+        # Loads every actor, only done when needed
+        if self._docs is None:
+            self._docs = self.root_docs()
+        return self._docs
 
 
     def module_docs(self, namespace):
@@ -751,6 +855,102 @@ class DocumentationStore(ActorStore):
 
 
 
+class MetadataStore(DocumentationStore):
+    """
+    Actor metadata by qualified name, as used by the compiler.
+
+    The metadata of all actors is computed once, kept in memory and on disk,
+    and refreshed incrementally for actor files that have been added,
+    removed or modified since.
+    """
+    def __init__(self):
+        super(MetadataStore, self).__init__()
+        # Qualified name => [path, mtime, size] of the actor file
+        self._files = {}
+        self._metadata = {}
+        self.content_hash = None
+        self._load()
+        self.refresh()
+
+
+    def _cache_file(self):
+        key = hashlib.sha1(json.dumps(self._MODULE_PATHS)).hexdigest()
+        return os.path.join(_index_dir(), "metadata-" + key + ".json")
+
+
+    def _actor_files(self):
+        """Return [path, mtime, size] of the file found by lookup for each qualified name"""
+        files = {}
+        for ext in ('.py', '.comp'):
+            # Primitives has precedence over components, first path in config order
+            for namespace, paths in self._MODULE_CACHE.iteritems():
+                for path in paths:
+                    for actor_path in _files_in_dir(path, (ext, )):
+                        actor_type = _basename(actor_path)
+                        qualified_name = namespace + '.' + actor_type
+                        if actor_type == '__init__' or qualified_name in files:
+                            continue
+                        try:
+                            stat = os.stat(actor_path)
+                        except OSError:
+                            continue
+                        files[qualified_name] = [actor_path, stat.st_mtime, stat.st_size]
+        return files
+
+
+    def refresh(self):
+        """Update metadata of actors added, removed or modified since last refresh"""
+        self.update()
+        files = self._actor_files()
+        for qualified_name in set(self._metadata) - set(files):
+            del self._metadata[qualified_name]
+        for qualified_name, info in files.iteritems():
+            if self._files.get(qualified_name) != info or qualified_name not in self._metadata:
+                self._metadata[qualified_name] = self.actor_docs(qualified_name).metadata()
+        self._files = files
+        content_hash = hashlib.sha1(json.dumps(sorted(files.items()))).hexdigest()
+        if content_hash != self.content_hash:
+            self.content_hash = content_hash
+            self._save()
+
+
+    def _load(self):
+        try:
+            with open(self._cache_file(), 'r') as f:
+                cache = json.load(f, object_hook=node_decoder)
+            self._files, self._metadata = cache['files'], cache['metadata']
+            self.content_hash = cache['content_hash']
+        except (IOError, ValueError, KeyError, TypeError):
+            self._files, self._metadata = {}, {}
+
+
+    def _save(self):
+        cache = {'content_hash': self.content_hash, 'files': self._files, 'metadata': self._metadata}
+        try:
+            if not os.path.isdir(_index_dir()):
+                os.makedirs(_index_dir())
+            data = json.dumps(cache, default=node_encoder)
+            with open(self._cache_file(), 'w') as f:
+                f.write(data)
+        except (IOError, OSError, TypeError, ValueError):
+            _log.debug("Could not save actor metadata cache")
+
+
+    def metadata(self, qualified_name):
+        metadata = self._metadata.get(qualified_name)
+        if metadata is None:
+            return {'is_known': False}
+        return dict(metadata)
+
+
+def get_metadata_store():
+    """Return the metadata store for the configured actor paths, shared by the whole process"""
+    paths = tuple(_conf.get('global', 'actor_paths'))
+    if paths not in _metadata_stores:
+        _metadata_stores[paths] = MetadataStore()
+    return _metadata_stores[paths]
+
+
 def install_component(namespace, definition, overwrite):
     astore = ActorStore()
     return astore.add_component(namespace, definition.name, definition, overwrite)
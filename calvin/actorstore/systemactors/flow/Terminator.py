@@ -33,8 +33,8 @@ class Terminator(Actor):
     def init(self):
         pass
 
-    @condition(['void'], [])
-    def null(self, input):
+    @condition(['void'], [], batch=64)
+    def null(self, tokens):
         pass
 
 
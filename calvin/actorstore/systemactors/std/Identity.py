@@ -33,12 +33,13 @@ class Identity(Actor):
     def log(self, data):
         print "%s<%s,%s>: %s" % (self.__class__.__name__, self.name, self.id, data)
 
-    @condition(['token'], ['token'])
-    def donothing(self, input):
+    @condition(['token'], ['token'], batch=64)
+    def donothing(self, tokens):
         if self.dump:
-            self.log(input)
-        self.last = input
-        return (input, )
+            for token in tokens:
+                self.log(token)
+        self.last = tokens[-1]
+        return (tokens, )
 
     def report(self):
         return self.last
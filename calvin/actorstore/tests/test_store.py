@@ -14,20 +14,26 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
 import pytest
 import timeit
 
+from calvin.actorstore import store
 from calvin.actorstore.store import ActorStore
 
 
+def _set_global(monkeypatch, option, value):
+    monkeypatch.setitem(store._conf.config['global'], option, value)
+
+
 class TestActorStore(object):
 
-    def setup_class(self):
+    @pytest.fixture(autouse=True)
+    def index_dir(self, tmpdir, monkeypatch):
+        # Keep the index out of the home directory
+        _set_global(monkeypatch, 'actorstore_index_dir', str(tmpdir))
+        monkeypatch.setattr(store, '_module_index', {})
         self.ms = ActorStore()
-        pass
-
-    def teardown_class(self):
-        pass
 
     def test_find_modules(self):
 
@@ -51,3 +57,96 @@ class TestActorStore(object):
     def test_perf(self):
         time = timeit.timeit(lambda: self.ms.lookup("std.Sum"), number=1000)
         assert time < .2
+
+
+ACTOR_SOURCE = """
+from calvin.actor.actor import Actor, condition
+
+
+class Thing(Actor):
+    \"\"\"
+    Test actor %d
+
+    Outputs:
+      out : Token
+    \"\"\"
+
+    def init(self):
+        pass
+
+    action_priority = ()
+"""
+
+
+class TestActorStoreCache(object):
+
+    @pytest.fixture(autouse=True)
+    def actor_path(self, tmpdir, monkeypatch):
+        self.path = tmpdir.mkdir("actors")
+        self.path.mkdir("test").join("Thing.py").write(ACTOR_SOURCE % 1)
+        _set_global(monkeypatch, 'actorstore_index_dir', str(tmpdir.join("index")))
+        monkeypatch.setattr(store, '_module_index', {})
+        monkeypatch.setattr(store, '_actor_class_cache', {})
+        _set_global(monkeypatch, 'actor_paths', [str(self.path)])
+
+    def test_class_cached(self):
+        first = ActorStore().lookup("test.Thing")
+        assert first[0] and first[1]
+        assert ActorStore().lookup("test.Thing")[2] is first[2]
+
+    def test_changed_file_reloaded(self):
+        first = ActorStore().lookup("test.Thing")[2]
+        self.path.join("test", "Thing.py").write(ACTOR_SOURCE % 1000)
+        second = ActorStore().lookup("test.Thing")[2]
+        assert second is not first
+        assert "1000" in second.__doc__
+
+    def test_index(self):
+        assert ActorStore().modules() == ["test"]
+        assert os.listdir(store._index_dir())
+        # Index read from disk
+        store._module_index.clear()
+        assert ActorStore().modules() == ["test"]
+        # New directory detected
+        self.path.mkdir("other").join("Thing.py").write(ACTOR_SOURCE % 2)
+        assert ActorStore().modules() == ["other", "test"]
+
+
+class TestMetadataStore(object):
+
+    @pytest.fixture(autouse=True)
+    def actor_path(self, tmpdir, monkeypatch):
+        self.path = tmpdir.mkdir("actors")
+        self.path.mkdir("test").join("Thing.py").write(ACTOR_SOURCE % 1)
+        _set_global(monkeypatch, 'actorstore_index_dir', str(tmpdir.join("index")))
+        monkeypatch.setattr(store, '_module_index', {})
+        monkeypatch.setattr(store, '_actor_class_cache', {})
+        monkeypatch.setattr(store, '_metadata_stores', {})
+        _set_global(monkeypatch, 'actor_paths', [str(self.path)])
+
+    def test_metadata(self):
+        metadata = store.get_metadata_store().metadata("test.Thing")
+        assert metadata['is_known']
+        assert metadata['outputs'] == ['out']
+        assert not store.get_metadata_store().metadata("test.Nothing")['is_known']
+        assert store.get_metadata_store() is store.get_metadata_store()
+
+    def test_refresh(self):
+        mstore = store.get_metadata_store()
+        content_hash = mstore.content_hash
+        self.path.mkdir("other").join("Thing.py").write(ACTOR_SOURCE % 2)
+        mstore.refresh()
+        assert mstore.metadata("other.Thing")['is_known']
+        assert mstore.content_hash != content_hash
+        self.path.join("test", "Thing.py").remove()
+        mstore.refresh()
+        assert not mstore.metadata("test.Thing")['is_known']
+
+    def test_loaded_from_disk(self, monkeypatch):
+        content_hash = store.MetadataStore().content_hash
+        def fail(*args):
+            raise AssertionError("Metadata not cached")
+        monkeypatch.setattr(store.MetadataStore, 'actor_docs', fail)
+        mstore = store.MetadataStore()
+        assert mstore.content_hash == content_hash
+        assert mstore.metadata("test.Thing")['is_known']
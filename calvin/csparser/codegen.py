@@ -3,7 +3,7 @@ import visitor
 import astprint
 import numbers
 from parser import calvin_parse
-from calvin.actorstore.store import DocumentationStore, GlobalStore
+from calvin.actorstore.store import get_metadata_store, GlobalStore
 from calvin.requests import calvinresponse
 from calvin.csparser.port_property_syntax import port_property_data
 
@@ -57,7 +57,7 @@ def _lookup(node, issue_tracker):
             'definition': comp.children[0]
         }
     else:
-        metadata = DocumentationStore().metadata(node.actor_type)
+        metadata = get_metadata_store().metadata(node.actor_type)
         if not metadata['is_known']:
             reason = "Not validating actor type: '{}'".format(node.actor_type)
             issue_tracker.add_warning(reason, node)
@@ -1267,6 +1267,8 @@ def query(root, kind=None, attributes=None, maxdepth=1024):
 
 def _calvin_cg(source_text, app_name):
     ast_root, issuetracker = calvin_parse(source_text)
+    # Pick up actors added or modified since last compile
+    get_metadata_store().refresh()
     cg = CodeGen(ast_root, app_name)
     return cg, issuetracker
 
@@ -39,6 +39,7 @@ NODE = '/node'
 NODES = '/nodes'
 NODE_ID = '/id'
 PEER_SETUP = '/peer_setup'
+SCHEDULER = '/scheduler'
 ACTOR = '/actor'
 ACTOR_PATH = '/actor/{}'
 ACTORS = '/actors'
@@ -57,11 +58,13 @@ DISCONNECT = '/disconnect'
 INDEX_PATH_RPL = '/index/{}?root_prefix_level={}'
 INDEX_PATH = '/index/{}'
 STORAGE_PATH = '/storage/{}'
+STORAGE_CACHE = '/storagecache'
 CSR_REQUEST = '/certificate_authority/certificate_signing_request'
 ENROLLMENT_PASSWORD = '/certificate_authority/certificate_enrollment_password/{}'
 AUTHENTICATION = '/authentication'
 AUTHENTICATION_USERS_DB = '/authentication/users_db'
 AUTHENTICATION_GROUPS_DB = '/authentication/groups_db'
+SECURITY_CACHE = '/security/cache'
 PROXY_PEER_ABOLISH = '/proxy/{}/migrate'
 
 
@@ -153,6 +156,10 @@ class RequestHandler(object):
         r = self._get(rt, timeout, async, NODE_PATH.format(node_id))
         return self.check_response(r)
 
+    def get_scheduler(self, rt, timeout=DEFAULT_TIMEOUT, async=False):
+        r = self._get(rt, timeout, async, SCHEDULER)
+        return self.check_response(r)
+
     def quit(self, rt, method=None, timeout=DEFAULT_TIMEOUT, async=False):
         if method is None:
             r = self._delete(rt, timeout, async, NODE)
@@ -241,8 +248,10 @@ class RequestHandler(object):
         r = self._post(rt, timeout, async, path)
         return self.check_response(r)
 
-    def migrate(self, rt, actor_id, dst_id, timeout=DEFAULT_TIMEOUT, async=False):
+    def migrate(self, rt, actor_id, dst_id, timeout=DEFAULT_TIMEOUT, async=False, live=None):
         data = {'peer_node_id': dst_id}
+        if live is not None:
+            data['live'] = live
         path = ACTOR_MIGRATE.format(actor_id)
         r = self._post(rt, timeout, async, path, data)
         return self.check_response(r)
@@ -381,6 +390,10 @@ class RequestHandler(object):
         r = self._get(rt, timeout, async, "/dumpstorage")
         return self.check_response(r)
 
+    def get_storage_cache(self, rt, timeout=DEFAULT_TIMEOUT, async=False):
+        r = self._get(rt, timeout, async, STORAGE_CACHE)
+        return self.check_response(r)
+
     def async_response(self, response):
         try:
             self.future_responses.remove(response)
@@ -443,6 +456,10 @@ class RequestHandler(object):
         r = self._put(rt, timeout, async, AUTHENTICATION_USERS_DB, data=data)
         return self.check_response(r)
 
+    def get_security_cache(self, rt, timeout=DEFAULT_TIMEOUT, async=False):
+        r = self._get(rt, timeout, async, SECURITY_CACHE)
+        return self.check_response(r)
+
     def abolish_proxy_peer(self, rt, peer_id, timeout=DEFAULT_TIMEOUT, async=False):
         r = self._delete(rt, timeout, async, PROXY_PEER_ABOLISH.format(peer_id))
         return self.check_response(r)
@@ -14,9 +14,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import copy
+import time
 import random
 from calvin.actorstore.store import ActorStore
 from calvin.utilities import dynops
+from calvin.utilities import calvinconfig
+from calvin.utilities import state_delta
+from calvin.utilities.ttlcache import TTLCache
 from calvin.utilities.requirement_matching import ReqMatch
 from calvin.runtime.south.async import async
 from calvin.utilities.calvinlogger import get_logger
@@ -30,6 +35,13 @@ from calvin.runtime.north.calvinlib import get_calvinlib
 
 
 _log = get_logger(__name__)
+_conf = calvinconfig.get()
+
+# Seconds a prepared live migration waits for the final state before it is discarded
+PREPARED_MIGRATION_TIMEOUT = 30.0
+# Number of base states kept for later states sent as deltas, e.g. replicas, and seconds each is kept
+STATE_BASES = 32
+STATE_BASE_TTL = 600.0
 
 
 def log_callback(reply, **kwargs):
@@ -45,6 +57,10 @@ class ActorManager(object):
         super(ActorManager, self).__init__()
         self.actors = {}
         self.node = node
+        # actor_id => {'actor': bare actor, 'state': state snapshot, 'time': prepared} for live migrations
+        self._prepared = {}
+        # base_id => state, see new_from_migration
+        self._state_bases = TTLCache(STATE_BASES)
 
     def _actor_not_found(self, actor_id):
         _log.exception("Actor '{}' not found".format(actor_id))
@@ -52,13 +68,13 @@ class ActorManager(object):
 
     def new(self, actor_type, args, state=None, prev_connections=None, connection_list=None, callback=None,
             signature=None, actor_def=None, security=None, access_decision=None, shadow_actor=False,
-            port_properties=None):
+            port_properties=None, prepared_actor=None):
         """
         Instantiate an actor of type 'actor_type'. Parameters are passed in 'args',
         'name' is an optional parameter in 'args', specifying a human readable name.
         Returns actor id on success and raises an exception if anything goes wrong.
         Optionally applies a serialized state to the actor, the supplied args are ignored and args from state
-        is used instead.
+        is used instead. The state is then applied to prepared_actor when supplied (see prepare_migration).
         Optionally reconnecting the ports, using either
           1) an unmodified connections structure obtained by the connections command supplied as
              prev_connections or,
@@ -71,7 +87,8 @@ class ActorManager(object):
 
         try:
             if state:
-                a = self._new_from_state(actor_type, state, actor_def, security, access_decision, shadow_actor)
+                a = self._new_from_state(actor_type, state, actor_def, security, access_decision, shadow_actor,
+                                         actor=prepared_actor)
             else:
                 a = self._new(actor_type, args, actor_def, security, access_decision, shadow_actor, port_properties)
         except Exception as e:
@@ -145,8 +162,24 @@ class ActorManager(object):
             raise(e)
         return a
 
-    def new_from_migration(self, actor_type, state, prev_connections=None, connection_list=None, callback=None):
-        """Instantiate an actor of type 'actor_type' and apply the 'state' to the actor."""
+    def new_from_migration(self, actor_type, state, prev_connections=None, connection_list=None, callback=None,
+                           prepared_actor_id=None, base_id=None, delta=False):
+        """
+        Instantiate an actor of type 'actor_type' and apply the 'state' to the actor.
+        When prepared_actor_id is supplied the state is a delta of the state given to prepare_migration.
+        When base_id is supplied the state is kept as base for the next state with the same base_id,
+        which can then be a delta of it (e.g. replicas of the same actor).
+        """
+        if base_id is not None:
+            state = self._state_from_base(base_id, state, delta)
+            if state is None:
+                # Base discarded, the peer will send the full state
+                if callback:
+                    callback(status=response.CalvinResponse(response.GONE))
+                return
+        if prepared_actor_id is not None:
+            self._new_from_prepared(prepared_actor_id, actor_type, state, prev_connections, connection_list, callback)
+            return
         try:
             _log.analyze(self.node.id, "+", state)
             subject_attributes = state['security'].pop('_subject_attributes', None)
@@ -176,12 +209,90 @@ class ActorManager(object):
             self.new(actor_type, None, state, prev_connections=prev_connections,
                     connection_list=connection_list, callback=callback, shadow_actor=True)
 
+    def _state_from_base(self, base_id, state, delta):
+        """Return the state, applying a delta to the base state, and keep it as new base"""
+        if delta:
+            try:
+                base = self._state_bases[base_id]
+            except KeyError:
+                return None
+            state = state_delta.apply_delta(copy.deepcopy(base), state)
+        self._state_bases.put(base_id, copy.deepcopy(state), STATE_BASE_TTL)
+        return state
+
+    def prepare_migration(self, actor_type, state, prev_connections, callback=None):
+        """
+        Prepare a live migration of an actor that keeps running on its current node:
+        verify and instantiate a bare actor of 'actor_type' and get tunnels to the nodes
+        of its peer ports. The final state arrives as a delta of 'state' in new_from_migration.
+        """
+        self._expire_prepared()
+        try:
+            subject_attributes = state['security'].get('_subject_attributes', None)
+            migration_info = state['private'].get('_migration_info', None)
+            if security_enabled():
+                security = Security(self.node)
+                security.set_subject_attributes(subject_attributes)
+            else:
+                security = None
+            actor_def, signer = self.lookup_and_verify(actor_type, security)
+            requirements = actor_def.requires if hasattr(actor_def, "requires") else []
+            self.check_requirements_and_sec_policy(requirements, security, state['private']['_id'],
+                                                   signer, migration_info,
+                                                   CalvinCB(self._migration_prepared, actor_type, state,
+                                                            prev_connections, actor_def, security, callback=callback))
+        except Exception as e:
+            # Let the actor migrate with its full state instead, e.g. to become a shadow actor
+            _log.info("Live migration of %s not prepared: %s" % (actor_type, e))
+            if callback:
+                callback(status=response.CalvinResponse(False))
+
+    def _migration_prepared(self, actor_type, state, prev_connections, actor_def, security, callback=None,
+                            access_decision=None):
+        try:
+            a = self._new_actor(actor_type, actor_def, actor_id=state['private']['_id'], security=security,
+                                access_decision=access_decision)
+        except Exception:
+            _log.exception("Live migration of %s not prepared" % actor_type)
+            if callback:
+                callback(status=response.CalvinResponse(False))
+            return
+        self._prepared[a.id] = {'actor': a, 'state': state, 'time': time.time()}
+        peer_node_ids = [peer[0] for ports in (prev_connections['inports'], prev_connections['outports'])
+                         for peers in ports.values() for peer in peers]
+        self.node.pm.prepare_tunnels(peer_node_ids)
+        if callback:
+            callback(status=response.CalvinResponse(True))
+
+    def _expire_prepared(self):
+        expired = time.time() - PREPARED_MIGRATION_TIMEOUT
+        for actor_id in [a for a, prepared in self._prepared.iteritems() if prepared['time'] < expired]:
+            del self._prepared[actor_id]
+
+    def _new_from_prepared(self, actor_id, actor_type, delta, prev_connections, connection_list, callback):
+        prepared = self._prepared.pop(actor_id, None)
+        if prepared is None:
+            # Never prepared or expired, the previous node will send the full state
+            if callback:
+                callback(status=response.CalvinResponse(response.GONE))
+            return
+        state = state_delta.apply_delta(prepared['state'], delta)
+        state['security'].pop('_subject_attributes', None)
+        state['private'].pop('_migration_info', None)
+        a = prepared['actor']
+        try:
+            self.new(actor_type, None, state, prev_connections=prev_connections, connection_list=connection_list,
+                     callback=callback, security=a.sec, prepared_actor=a)
+        except Exception:
+            self.new(actor_type, None, state, prev_connections=prev_connections,
+                     connection_list=connection_list, callback=callback, shadow_actor=True)
+
     def _new_from_state(self, actor_type, state, actor_def, security,
-                             access_decision=None, shadow_actor=False):
+                             access_decision=None, shadow_actor=False, actor=None):
         """Return a restored actor in PENDING state, raises an exception on failure."""
         try:
-            a = self._new_actor(actor_type, actor_def, actor_id=state['private']['_id'], security=security,
-                                access_decision=access_decision, shadow_actor=shadow_actor)
+            a = actor or self._new_actor(actor_type, actor_def, actor_id=state['private']['_id'], security=security,
+                                         access_decision=access_decision, shadow_actor=shadow_actor)
             if '_shadow_args' in state['managed']:
                 # We were a shadow, do a full init
                 args = state['managed'].pop('_shadow_args')
@@ -381,8 +492,12 @@ class ActorManager(object):
         kwargs['status'] = status
         self.robust_migrate(actor_id, node_ids, callback, **kwargs)
 
-    def migrate(self, actor_id, node_id, callback=None):
-        """ Migrate an actor actor_id to peer node node_id """
+    def migrate(self, actor_id, node_id, callback=None, live=None):
+        """
+        Migrate an actor actor_id to peer node node_id
+        With live migration the actor keeps running while the peer node prepares to take
+        over, see _live_migrate, defaults to the live_migration config option.
+        """
         if actor_id not in self.actors:
             # Can only migrate actors from our node
             if callback:
@@ -405,6 +520,16 @@ class ActorManager(object):
                 callback(status=response.CalvinResponse(True))
             return
         actor._migrating_to = node_id
+        if live is None:
+            live = _conf.get(None, 'live_migration') or False
+        if live:
+            self._live_migrate(actor, node_id, callback)
+        else:
+            self._migrate(actor, node_id, callback)
+        self.node.control.log_actor_migrate(actor_id, node_id)
+
+    def _migrate(self, actor, node_id, callback=None, base_state=None):
+        """ Stop the actor by disconnecting its ports, continue in _migrate_disconnected """
         actor.will_migrate()
         actor_type = actor._type
         ports = actor.connections(self.node.id)
@@ -415,23 +540,200 @@ class ActorManager(object):
                                                   actor_type=actor_type,
                                                   ports=ports,
                                                   node_id=node_id,
-                                                  callback=callback),
-                                actor_id=actor_id)
+                                                  callback=callback,
+                                                  base_state=base_state),
+                                actor_id=actor.id)
         _log.analyze(self.node.id, "+ POST DISCONNECT", {'actor_name': actor.name, 'actor_id': actor.id})
-        self.node.control.log_actor_migrate(actor_id, node_id)
 
-    def _migrate_disconnected(self, actor, actor_type, ports, node_id, status, callback = None, **state):
+    def _live_migrate(self, actor, node_id, callback=None):
+        """
+        Send a snapshot of the actor's state to the peer node, which verifies and instantiates
+        the actor and gets tunnels to its peers while the actor keeps running here. Then the
+        actor is stopped and only the changes since the snapshot, including the port queues,
+        are sent. The ports are only connected on the peer node after that, as in a stopped
+        migration, and no tokens are forwarded. Tokens sent to the actor meanwhile stay in the
+        peers' queues until acked and are resent when the ports are connected on the peer node.
+        """
+        # The serialized state refers to the actor's managed attributes, which change while it runs
+        base_state = copy.deepcopy(actor.serialize())
+        self.node.proto.actor_prepare(node_id,
+                                      CalvinCB(self._live_migrate_prepared, actor=actor, node_id=node_id,
+                                               base_state=base_state, callback=callback),
+                                      actor._type, base_state, actor.connections(self.node.id))
+
+    def _live_migrate_prepared(self, status, actor, node_id, base_state, callback=None):
+        if self.actors.get(actor.id) is not actor:
+            # Actor destroyed while preparing
+            if callback:
+                callback(status=response.CalvinResponse(response.NOT_FOUND))
+            return
+        if not status:
+            _log.info("Live migration of %s to %s not prepared, migrating stopped actor" % (actor.id, node_id))
+            base_state = None
+        self._migrate(actor, node_id, callback, base_state)
+
+    def _migrate_disconnected(self, actor, actor_type, ports, node_id, status, callback = None, base_state=None,
+                              **state):
         """ Actor disconnected, continue migration """
         _log.analyze(self.node.id, "+ DISCONNECTED", {'actor_name': actor.name, 'actor_id': actor.id, 'status': status})
         state = actor.serialize()
         self.destroy(actor.id, temporary=True)
         if status:
             callback = CalvinCB(callback, state=state, ports=ports, actor_type=actor_type)
-            self.node.proto.actor_new(node_id, callback, actor_type, state, ports)
+            if base_state is None:
+                self.node.proto.actor_new(node_id, callback, actor_type, state, ports)
+            else:
+                # Only send the changes since the peer node prepared the actor
+                self.node.proto.actor_new(node_id,
+                                          CalvinCB(self._live_migrated, node_id=node_id, actor_type=actor_type,
+                                                   state=state, ports=ports, callback=callback),
+                                          actor_type, state_delta.delta(base_state, state), ports,
+                                          prepared_actor_id=actor.id)
         else:
             if callback:
                 callback(status=status, state=state, ports=ports, actor_type=actor_type)
 
+    def _live_migrated(self, status, node_id, actor_type, state, ports, callback, **kwargs):
+        if status == response.GONE:
+            # Prepared actor discarded by peer, send the full state
+            self.node.proto.actor_new(node_id, callback, actor_type, state, ports)
+        else:
+            callback(status)
+
+    def migrate_group(self, actor_ids, node_id, callback=None):
+        """
+        Migrate the actors actor_ids to peer node node_id in one message, the connections
+        between them are reconnected as local connections on the peer node.
+        Actors that are not local or can't migrate now are left out, and actors that the
+        peer node fails to create are recreated here.
+        callback(status, actor_ids) with the ids of the migrated actors.
+        """
+        actors = [self.actors[actor_id] for actor_id in actor_ids if actor_id in self.actors]
+        actors = [a for a in actors if a._migrating_to is None and a._migration_connected]
+        if not actors or node_id == self.node.id:
+            if callback:
+                callback(status=response.CalvinResponse(True), actor_ids=[a.id for a in actors])
+            return
+        port_ids = set([p.id for a in actors for p in a.inports.values() + a.outports.values()])
+        ports = {}
+        for actor in actors:
+            actor._migrating_to = node_id
+            actor.will_migrate()
+            # Peers within the group will be on node_id
+            connections = actor.connections(self.node.id)
+            for peers in connections['inports'].values() + connections['outports'].values():
+                peers[:] = [(node_id, peer[1]) if peer[1] in port_ids else peer for peer in peers]
+            ports[actor.id] = connections
+        group = {'pending': len(actors)}
+        for actor in actors:
+            self.node.control.log_actor_migrate(actor.id, node_id)
+            if actor.inports or actor.outports:
+                self.node.pm.disconnect(callback=CalvinCB(self._group_disconnected, actors=actors, ports=ports,
+                                                          node_id=node_id, group=group, callback=callback),
+                                        actor_id=actor.id)
+            else:
+                self._group_disconnected(response.CalvinResponse(True), actors, ports, node_id, group, callback,
+                                         actor_id=actor.id)
+
+    def _group_disconnected(self, status, actors, ports, node_id, group, callback, actor_id=None, **kwargs):
+        """ Called for each actor in the group, when all are disconnected send them in one actors_new """
+        if not status:
+            _log.warning("Disconnect of %s failed, migrating it anyway: %s" % (actor_id, status))
+        group['pending'] -= 1
+        if group['pending'] > 0:
+            return
+        states = []
+        for actor in actors:
+            states.append({'actor_type': actor._type, 'actor_state': actor.serialize(),
+                           'prev_connections': ports[actor.id]})
+            self.destroy(actor.id, temporary=True)
+        self.node.proto.actors_new(node_id, CalvinCB(self._group_migrated, actors=states, callback=callback), states)
+
+    def _group_migrated(self, status, actors, callback, **kwargs):
+        if status:
+            failed = set((status.data or {}).get('failed', []))
+        else:
+            failed = set([a['prev_connections']['actor_id'] for a in actors])
+        for actor in actors:
+            actor_id = actor['prev_connections']['actor_id']
+            if actor_id not in failed:
+                continue
+            _log.warning("Migration of %s failed, recreating it" % actor_id)
+            try:
+                self.new_from_migration(actor['actor_type'], actor['actor_state'], actor['prev_connections'])
+            except Exception:
+                _log.exception("Could not recreate %s" % actor_id)
+        if callback:
+            callback(status=status, actor_ids=[a['prev_connections']['actor_id'] for a in actors
+                                               if a['prev_connections']['actor_id'] not in failed])
+
+    def new_group_from_migration(self, actors, callback=None):
+        """
+        Instantiate a group of migrated actors, each item in actors is a dict with actor_type,
+        actor_state and prev_connections as for new_from_migration. All the actors are created
+        before any port is connected, so connections within the group are local, and the
+        storage updates are batched.
+        callback(status) with data {'failed': actor ids} for actors that could not be created.
+        """
+        group = {'actors': actors, 'pending': len(actors), 'created': [], 'failed': []}
+        if not actors:
+            self._group_connect(group, callback)
+            return
+        self.node.storage.begin_batch()
+        try:
+            for actor in actors:
+                actor_id = actor['prev_connections']['actor_id']
+                try:
+                    self.new_from_migration(actor['actor_type'], actor['actor_state'],
+                                            callback=CalvinCB(self._group_actor_new, actor_id=actor_id, group=group,
+                                                              callback=callback))
+                except Exception:
+                    _log.exception("Migrated actor %s not created" % actor_id)
+                    self._group_actor_new(response.CalvinResponse(False), actor_id, group, callback)
+        finally:
+            self.node.storage.end_batch()
+
+    def _group_actor_new(self, status, actor_id, group, callback, **kwargs):
+        group['created' if status else 'failed'].append(actor_id)
+        group['pending'] -= 1
+        if group['pending'] == 0:
+            self._group_connect(group, callback)
+
+    def _group_connect(self, group, callback):
+        """ Connect the created actors, a connection within the group only from its inport """
+        actors = [a for a in group['actors'] if a['prev_connections']['actor_id'] in group['created']]
+        failed_port_ids = set([port_id for a in group['actors'] if a['prev_connections']['actor_id'] in group['failed']
+                               for port_id in a['prev_connections']['inports'].keys() +
+                                              a['prev_connections']['outports'].keys()])
+        inport_ids = set([port_id for a in actors for port_id in a['prev_connections']['inports']])
+        group['pending'] = len(actors)
+        if not actors:
+            self._group_actor_connected(response.CalvinResponse(True), None, group, callback)
+            return
+        self.node.storage.begin_batch()
+        try:
+            for actor in actors:
+                actor_id = actor['prev_connections']['actor_id']
+                # Actors that failed are recreated on the previous node and connect themselves
+                connection_list = [c for c in self._prev_connections_to_connection_list(actor['prev_connections'])
+                                   if c[3] not in failed_port_ids and
+                                   not (c[1] in actor['prev_connections']['outports'] and c[3] in inport_ids)]
+                if connection_list:
+                    self.actors[actor_id]._migration_connected = False
+                    self.connect(actor_id, connection_list,
+                                 callback=CalvinCB(self._group_actor_connected, group=group, callback=callback))
+                else:
+                    self._group_actor_connected(response.CalvinResponse(True), actor_id, group, callback)
+        finally:
+            self.node.storage.end_batch()
+
+    def _group_actor_connected(self, status, actor_id, group, callback, **kwargs):
+        if not status:
+            _log.warning("Migrated actor %s not connected: %s" % (actor_id, status))
+        group['pending'] -= 1
+        if group['pending'] <= 0 and callback:
+            callback(status=response.CalvinResponse(True, data={'failed': group['failed']}))
+
     def peernew_to_local_cb(self, reply, **kwargs):
         if kwargs['actor_id'] == reply:
             # Managed to setup since new returned same actor id
@@ -19,6 +19,8 @@ import copy
 from calvin.utilities.calvin_callback import CalvinCB
 from calvin.utilities import dynops
 from calvin.utilities import calvinlogger
+from calvin.utilities import calvinconfig
+from calvin.utilities import placement
 from calvin.runtime.north.plugins.requirements import req_operations
 import calvin.requests.calvinresponse as response
 from calvin.utilities import calvinuuid
@@ -28,6 +30,7 @@ from calvin.utilities.security import Security
 from calvin.utilities.requirement_matching import ReqMatch
 
 _log = calvinlogger.get_logger(__name__)
+_conf = calvinconfig.get()
 
 
 class Application(object):
@@ -210,6 +213,7 @@ class AppManager(object):
         application.replication_ids = []
         application._replicas_actor_final = {}
         application._replicas_node_final = {}
+        remote_actor_ids = []
         for actor_id in application.actors.keys():
             if actor_id in self._node.am.list_actors():
                 application.update_node_info(self._node.id, actor_id)
@@ -227,13 +231,22 @@ class AppManager(object):
                                     application=application))
             else:
                 _log.analyze(self._node.id, "+ REMOTE ACTOR", {'actor_id': actor_id})
-                self.storage.get_actor(actor_id, CalvinCB(func=self._destroy_actor_cb, application=application))
+                remote_actor_ids.append(actor_id)
+        if remote_actor_ids:
+            # Lookup all remote actors in one request
+            self.storage.get_many("actor-", remote_actor_ids,
+                                  CalvinCB(func=self._destroy_actors_cb, application=application))
 
         if application.complete_node_info() and not application.replication_ids:
             # All actors were local and no replicas
             _log.analyze(self._node.id, "+ DONE", {'actors': application.actors})
             self._destroy_final(application)
 
+    def _destroy_actors_cb(self, values, application, check_replica=True):
+        """ Get many actors callback """
+        for key, value in values.iteritems():
+            self._destroy_actor_cb(key, value, application, check_replica=check_replica)
+
     def _destroy_actor_cb(self, key, value, application, retries=0, check_replica=True):
         """ Get actor callback """
         _log.analyze(self._node.id, "+", {'actor_id': key, 'value': value, 'retries': retries,
@@ -274,6 +287,7 @@ class AppManager(object):
         application.replication_ids.remove(replication_id)
         application.actor_replicas.extend(value)
         application._replicas_actor_final.setdefault(replication_id, []).extend(value)
+        remote_actor_ids = []
         for actor_id in value:
             if actor_id == master_id:
                 application.actor_replicas.remove(actor_id)
@@ -285,8 +299,10 @@ class AppManager(object):
                 application.update_node_info(self._node.id, actor_id)
             else:
                 _log.debug("_replicas_cb actor %s REMOTE" % actor_id)
-                self.storage.get_actor(actor_id,
-                    CalvinCB(func=self._destroy_actor_cb, application=application, check_replica=False))
+                remote_actor_ids.append(actor_id)
+        if remote_actor_ids:
+            self.storage.get_many("actor-", remote_actor_ids,
+                CalvinCB(func=self._destroy_actors_cb, application=application, check_replica=False))
         if application.complete_node_info() and not application.replication_ids:
             _log.debug("_replicas_cb final")
             self._destroy_final(application)
@@ -453,79 +469,92 @@ class AppManager(object):
         if any([not n for n in app.actor_placement.values()]):
             # At least one actor have no required placement
             # Let them stay on this node
-            app.actor_placement = {actor_id: set([self._node.id]) if placement is None else placement
-                                     for actor_id, placement in app.actor_placement.items()}
+            app.actor_placement = {actor_id: set([self._node.id]) if possible is None else possible
+                                     for actor_id, possible in app.actor_placement.items()}
             # Status will indicate success, but be different than the normal OK code
             status = response.CalvinResponse(response.CREATED)
             _log.analyze(self._node.id, "+ MISS PLACEMENT", {'app_id': app.id, 'placement': app.actor_placement}, tb=True)
 
-        # Collect an actor by actor matrix stipulating a weighting 0.0 - 1.0 for their connectivity
-        actor_ids, actor_matrix = self._actor_connectivity(app)
+        # Collect the connections between the actors, then place them
+        self._actor_connectivity(app, cb=CalvinCB(self._place_actors, app=app, status=status))
 
+    def _place_actors(self, app, status, actor_ids, connections):
         # Get list of all possible nodes
         node_ids = set([])
         for possible_nodes in app.actor_placement.values():
             node_ids |= possible_nodes
-        node_ids = list(node_ids)
-        node_ids = [n for n in node_ids if not isinstance(n, dynops.InfiniteElement)]
+        node_ids = sorted([n for n in node_ids if not isinstance(n, dynops.InfiniteElement)])
         for actor_id, possible_nodes in app.actor_placement.iteritems():
             if any([isinstance(n, dynops.InfiniteElement) for n in possible_nodes]):
                 app.actor_placement[actor_id] = node_ids
-        _log.analyze(self._node.id, "+ ACTOR MATRIX", {'actor_ids': actor_ids, 'actor_matrix': actor_matrix,
+        _log.analyze(self._node.id, "+ ACTOR CONNECTIONS", {'actor_ids': actor_ids, 'connections': list(connections),
                                             'node_ids': node_ids, 'placement': app.actor_placement}, tb=True)
 
-        # Weight the actors possible placement with their connectivity matrix
-        weighted_actor_placement = {}
-        for actor_id in actor_ids:
-            # actor matrix is symmetric, so independent if read horizontal or vertical
-            actor_weights = actor_matrix[actor_ids.index(actor_id)]
-            # Sum the actor weights for each actors possible nodes, matrix mult AA * AN,
-            # AA actor weights, AN actor * node with 1 when possible
-            weights = [sum([actor_weights[actor_ids.index(_id)] if node_id in app.actor_placement[actor_id] else 0
-                             for _id in actor_ids])
-                             for node_id in node_ids]
-            # Get first node with highest weight
-            # FIXME should verify that the node actually exist also
-            # TODO should select from a resource sharing perspective also, instead of picking first max
-            # TODO: should also ask authorization server before selecting node to migrate to.
-            _log.analyze(self._node.id, "+ WEIGHTS", {'actor_id': actor_id, 'weights': weights})
-            #weighted_actor_placement[actor_id] = node_ids[weights.index(max(weights))]
-            # Get a list of nodes in sorted weighted order
-            weighted_actor_placement[actor_id] = [n for (w, n) in sorted(zip(weights, node_ids), reverse=True)]
+        # Score the actors possible placements with their connectivity, get lists of nodes in score order
+        # FIXME should verify that the node actually exist also
+        # TODO: should also ask authorization server before selecting node to migrate to.
+        weighted_actor_placement = placement.solve(actor_ids, connections, app.actor_placement, node_ids,
+                                                   balance=_conf.get(None, 'placement_balance') or 0.0)
+        # Move the local actors to their first choice of node with one group migration per node
+        groups = {}
         for actor_id, node_id in weighted_actor_placement.iteritems():
             _log.debug("Actor deployment %s \t-> %s" % (app.actors[actor_id], node_id))
-            # FIXME add callback that recreate the actor locally
-            self._node.am.robust_migrate(actor_id, node_id[:], None)
+            if actor_id in self._node.am.actors and node_id:
+                groups.setdefault(node_id[0], []).append(actor_id)
+            else:
+                # FIXME add callback that recreate the actor locally
+                self._node.am.robust_migrate(actor_id, node_id[:], None)
+        for node_id, actor_ids in groups.iteritems():
+            self._node.am.migrate_group(actor_ids, node_id,
+                                        callback=CalvinCB(self._group_placed, group=actor_ids,
+                                                          placement=weighted_actor_placement))
 
         app._org_cb(status=status, placement=weighted_actor_placement)
         del app._org_cb
         _log.analyze(self._node.id, "+ DONE", {'app_id': app.id}, tb=True)
 
-    def _actor_connectivity(self, app):
-        """ Matrix of weights between actors how close they want to be
-            0 = don't care
-            1 = same node
-
-            Currently any nodes that are connected gets 0.5, and
-            diagonal is 1:s
+    def _group_placed(self, status, group, placement, actor_ids=None, **kwargs):
+        """ Actors of the group that were not migrated with it are migrated one by one """
+        migrated = set(actor_ids or [])
+        for actor_id in group:
+            if actor_id not in migrated:
+                self._node.am.robust_migrate(actor_id, placement[actor_id][:], None)
+
+    def _actor_connectivity(self, app, cb):
+        """ Find the connections between the application's actors as a set of
+            actor id pairs, calls cb(actor_ids=actor_ids, connections=connections).
+            Connections are found from the actors on this node, peers that are
+            not local are looked up in storage.
         """
-        list_actors = app.get_actors()
-        l= len(list_actors)
-        actor_matrix = [[0 for x in range(l)] for x in range(l)]
-        for actor_id in list_actors:
-            connections = self._node.am.connections(actor_id)
-            for p in connections['inports'].values():
-                try:
-                    peer_actor_id = self._node.pm._get_local_port(port_id=p[1]).owner.id
-                except:
-                    # Only work while the peer still is local
-                    # TODO get it from storage
-                    continue
-                actor_matrix[list_actors.index(actor_id)][list_actors.index(peer_actor_id)] = 0.5
-                actor_matrix[list_actors.index(peer_actor_id)][list_actors.index(actor_id)] = 0.5
-        for i in range(l):
-            actor_matrix[i][i] = 1
-        return (list_actors, actor_matrix)
+        actor_ids = app.get_actors()
+        connections = set([])
+        remote_ports = {}
+        for actor_id in actor_ids:
+            if actor_id not in self._node.am.actors:
+                continue
+            ports = self._node.am.connections(actor_id)
+            for peers in ports['inports'].values() + ports['outports'].values():
+                for peer_port in peers:
+                    try:
+                        peer_actor_id = self._node.pm._get_local_port(port_id=peer_port[1]).owner.id
+                    except:
+                        remote_ports.setdefault(peer_port[1], []).append(actor_id)
+                        continue
+                    connections.add(tuple(sorted((actor_id, peer_actor_id))))
+        if not remote_ports:
+            cb(actor_ids=actor_ids, connections=connections)
+            return
+        self._node.storage.get_many("port-", remote_ports.keys(),
+                                    cb=CalvinCB(self._remote_connectivity, actor_ids=actor_ids,
+                                                connections=connections, remote_ports=remote_ports, cb=cb))
+
+    def _remote_connectivity(self, values, actor_ids, connections, remote_ports, cb):
+        for port_id, value in values.iteritems():
+            if response.isfailresponse(value) or not value or value.get('actor_id') not in actor_ids:
+                # Not part of the application or gone
+                continue
+            connections.update([tuple(sorted((a, value['actor_id']))) for a in remote_ports[port_id]])
+        cb(actor_ids=actor_ids, connections=connections)
 
     # Remigration
 
@@ -546,6 +575,7 @@ class AppManager(object):
                                               self._node.am, actors=value['actors_name_map'], deploy_info=deploy_info)
         app.group_components()
         app._migrated_actors = {a: None for a in app.actors}
+        remote_reqs = {}
         for actor_id, actor_name in app.actors.iteritems():
             req = app.get_req(actor_name)
             if not req:
@@ -560,9 +590,15 @@ class AppManager(object):
                                                                    actor_id=actor_id, cb=cb))
             else:
                 _log.analyze(self._node.id, "+ OTHER NODE", {'actor_id': actor_id, 'actor_name': actor_name})
-                self.storage.get_actor(actor_id, cb=CalvinCB(self._migrate_from_rt, app=app,
-                                                                  actor_id=actor_id, req=req,
-                                                                  move=move, cb=cb))
+                remote_reqs[actor_id] = req
+        if remote_reqs:
+            # Lookup all actors on other nodes in one request
+            self.storage.get_many("actor-", remote_reqs.keys(),
+                                  cb=CalvinCB(self._migrate_from_rts, app=app, reqs=remote_reqs, move=move, cb=cb))
+
+    def _migrate_from_rts(self, values, app, reqs, move, cb):
+        for actor_id, value in values.iteritems():
+            self._migrate_from_rt(actor_id, value, app, actor_id, reqs[actor_id], move, cb)
 
     def _migrate_from_rt(self, key, value, app, actor_id, req, move, cb):
         if response.isfailresponse(value):
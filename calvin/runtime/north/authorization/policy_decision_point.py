@@ -14,12 +14,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import re
 import os
+import json
 from calvin.runtime.north.authorization.policy_information_point import PolicyInformationPoint
+from calvin.runtime.north.authorization.policy_store import PolicyStore, CompiledPolicy, CompiledTarget, compile_pattern
 from calvin.runtime.north.plugins.authorization_checks import check_authorization_plugin_list
 from calvin.utilities.calvin_callback import CalvinCB
 from calvin.utilities.calvinlogger import get_logger
+from calvin.utilities.ttlcache import TTLCache
 
 _log = get_logger(__name__)
 
@@ -31,13 +33,20 @@ class PolicyDecisionPoint(object):
             "policy_combining": "permit_overrides",
             "policy_storage": "files",
             "policy_storage_path": os.path.join(os.path.expanduser("~"), ".calvin", "security", "policies"),
-            "policy_name_pattern": "*"
+            "policy_name_pattern": "*",
+            # Seconds between checks for policy files changed outside of the PRP
+            "policy_check_interval": 1.0,
+            # Decisions are reused for identical requests during this many seconds, 0 disables
+            "decision_cache_ttl": 10.0,
+            "decision_cache_size": 1000
         }
         if config is not None:
             # Change some of the default values of the config.
             self.config.update(config)
         self.node = node
         self.registered_nodes = {}
+        self.policy_store = None
+        self.decision_cache = TTLCache(self.config["decision_cache_size"])
 
     def register_node(self, node_id, node_attributes):
         """
@@ -53,6 +62,8 @@ class PolicyDecisionPoint(object):
         """
         _log.debug("Register node:\n\tnode_id={}\n\tnode_attributes={}".format(node_id, node_attributes))
         self.registered_nodes[node_id] = node_attributes
+        # Resource attributes of cached decisions might have changed
+        self.decision_cache.clear()
 
     def authorize(self, request, callback):
         """
@@ -222,29 +233,64 @@ class PolicyDecisionPoint(object):
         """
         _log.debug("\n********************************************************\n"
                    "combined_policy_decision: \n\trequest={}".format(request))
+        try:
+            # Get policies from PRP (Policy Retrieval Point), unless unchanged.
+            policies = self.get_policy_store().candidates(request)
+        except Exception as err:
+            _log.error("Failed to get policies from PRP, exc={}".format(err))
+            return ("indeterminate", [])
+        key = self._decision_key(request)
+        if key is not None:
+            try:
+                decision, obligations = self.decision_cache[key]
+                return (decision, list(obligations))
+            except KeyError:
+                pass
+        version = self.decision_cache.version
+        decision, obligations = self._combined_policy_decision(policies, request, pip)
+        if key is not None and decision != "indeterminate" and not self._uses_environment(pip):
+            self.decision_cache.put(key, (decision, list(obligations)), self.config["decision_cache_ttl"], version)
+        return (decision, obligations)
+
+    def get_policy_store(self):
+        """Return the compiled policies, reloaded if changed in the PRP (Policy Retrieval Point)"""
+        if self.policy_store is None:
+            self.policy_store = PolicyStore(self.node.authorization.prp, self.config["policy_name_pattern"],
+                                            self.config["policy_check_interval"])
+        if self.policy_store.refresh():
+            self.decision_cache.clear()
+        return self.policy_store
+
+    def _decision_key(self, request):
+        """Return normalized request, or None if it can't be used for caching the decision"""
+        try:
+            return json.dumps(request, sort_keys=True)
+        except (TypeError, ValueError):
+            return None
+
+    def _uses_environment(self, pip):
+        # Environment attributes, e.g. current time, are replaced by their values when used
+        environment = getattr(pip, "attributes", {}).get("environment", {})
+        return any(not callable(value) for value in environment.values())
+
+    def _combined_policy_decision(self, policies, request, pip):
         policy_decisions = []
         policy_obligations = []
         try:
-            try:
-                # Get policies from PRP (Policy Retrieval Point).
-                policies = self.node.authorization.prp.get_policies(self.config["policy_name_pattern"])
-            except Exception as err:
-                _log.error("Failed to get policies from PRP, exc={}".format(err))
-                raise
             _log.debug("For each policy, check result")
-            for policy_id in policies:
-                policy = policies[policy_id]
-                _log.debug("\n\n\nLet's check a policy:\n\tpolicy_id={}\n\tpolicy={}".format(policy_id, policy))
+            for compiled in policies:
+                policy = compiled.policy
+                _log.debug("\n\n\nLet's check a policy:\n\tpolicy_id={}\n\tpolicy={}".format(compiled.policy_id, policy))
                 # Check if policy target matches (policy without target matches everything).
                 _log.debug("Check if policy target matches (policy without target matches everything)")
-                if "target" not in policy or self.target_matches(policy["target"], request, pip):
+                if compiled.target is None or compiled.target.matches(request, pip):
                     if 'id' in policy:
                         _log.debug("Policy target matches for policy_id={}".format(policy['id']))
                     else:
                         _log.debug("Policy target matches for policy={}".format(policy))
                     # Get a policy decision if target matches.
                     try:
-                        decision, obligations = self.policy_decision(policy, request, pip)
+                        decision, obligations = self.policy_decision(compiled, request, pip)
                     except Exception as err:
                         _log.error("Failed to get policy decision, err={}".format(err))
                         raise
@@ -287,69 +333,23 @@ class PolicyDecisionPoint(object):
 
     def target_matches(self, target, request, pip):
         """Return True if policy target matches request, else False."""
-#        _log.debug("target_matches: \n\ttarget={}\n\trequest={}".format(target,request))
-        for attribute_type in target:
-#            _log.debug("target_matches::attribute_type\n\tattribute_type={}".format(attribute_type))
-            for attribute in target[attribute_type]:
-                try:
-                    request_value = request[attribute_type][attribute]
-#                    _log.debug("target_matches::request_value={}".format(request_value))
-                except KeyError:
-#                    _log.debug("target_matches: attribute not in request, let's also try PIP")
-                    try:
-                        # Try to fetch missing attribute from Policy Information Point (PIP).
-                        request_value = pip.get_attribute_value(attribute_type, attribute)
-                    except Exception as err:
-#                        _log.debug("target_matches: Attribute not in request and not found at PIP, return False:"
-#                                   "\n\tattribute_type={}"
-#                                   "\n\tattribute={}"
-#                                   "\n\terr={}".format(attribute_type, attribute, err))
-                        return False  # Or 'indeterminate' (if MustBePresent is True and none of the other targets return False)?
-                # Accept both single object and lists by turning single objects into a list.
-#                _log.info("target_matches, we have a request_value \n\trequest_value={}".format(request_value))
-                if not isinstance(request_value, list):
-                    request_value = [request_value]
-                try:
-                    policy_value = target[attribute_type][attribute]
-                except Exception as err:
-#                    _log.error("Failed to parse policy_value"
-#                               "\n\ttarget={}"
-#                               "\n\tattribute_type={}"
-#                               "\n\tattribute={}".format(target, attribute_type, attribute))
-                    pass
-                if not isinstance(policy_value, list):
-                    policy_value = [policy_value]
-                try:
-                    # If the lists contain many values, only one of the values need to match.
-                    # Regular expressions are allowed for strings in policies
-                    # (re.match checks for a match at the beginning of the string, $ marks the end of the string).
-                    if not any([re.match(r+'$', x) for r in policy_value for x in request_value]):
-                        _log.debug("No attributes are matching: %s %s %s" % (attribute_type, attribute, policy_value))
-                        return False
-                except TypeError:  # If the value is not a string
-                    if set(request_value).isdisjoint(policy_value):
-                        _log.debug("No attributes values are matching: %s %s %s" % (attribute_type, attribute, policy_value))
-                        return False
-        # True is returned if every attribute in the policy target matches the corresponding request attribute.
-#        _log.debug("target_matches: will return True")
-        return True
+        return CompiledTarget(target).matches(request, pip)
 
     def policy_decision(self, policy, request, pip):
-        """Use policy to return (access decision, obligations) for the request."""
+        """Use policy (dictionary or CompiledPolicy) to return (access decision, obligations) for the request."""
         rule_decisions = []
         rule_obligations = []
+        if not isinstance(policy, CompiledPolicy):
+            policy = CompiledPolicy(None, policy)
+        rules, policy = policy.rules, policy.policy
         if not 'rules' in policy:
             _log.error("No rules in policy")
             raise Exception("No rules in policy")
-        for rule in policy["rules"]:
+        for rule, target in rules:
             _log.debug("\n-----------\n"
                        "Check if rule target matches (rule without target matches everything)\n\trule={}".format(rule))
             # Check if rule target matches (rule without target matches everything).
-            try:
-                self.target_matches(rule["target"], request, pip)
-            except Exception as err:
-                _log.error("Target matches failed, err={}".format(err))
-            if ("target" not in rule) or (self.target_matches(rule["target"], request, pip)):
+            if target is None or target.matches(request, pip):
                 # Get a rule decision if target matches.
                 _log.debug("Rule target matched, let's get a rule decision")
                 decision, obligations = self.rule_decision(rule, request, pip)
@@ -451,12 +451,12 @@ class PolicyDecisionPoint(object):
             # If the lists contain many values, only one of the values need to match.
             # Regular expressions (has to be args[1]) are allowed for strings in policies
             # (re.match checks for a match at the beginning of the string, $ marks the end of the string).
-            return any([re.match(r+'$', x) for r in args[1] for x in args[0]])
+            return any([compile_pattern(r).match(x) for r in args[1] for x in args[0]])
         elif func == "not_equal":
             # If the lists contain many values, only one of the values need to match.
             # Regular expressions (has to be args[1]) are allowed for strings in policies
             # (re.match checks for a match at the beginning of the string, $ marks the end of the string).
-            return not any([re.match(r+'$', x) for r in args[1] for x in args[0]])
+            return not any([compile_pattern(r).match(x) for r in args[1] for x in args[0]])
         elif func == "and":
             return all(args)  # True if all elements of the list are True
         elif func == "or":
@@ -16,6 +16,7 @@
 
 from abc import ABCMeta, abstractmethod
 import os
+import errno
 import glob
 import json
 from calvin.utilities import calvinuuid
@@ -27,6 +28,9 @@ _log = get_logger(__name__)
 class PolicyRetrievalPoint(object):
     __metaclass__ = ABCMeta  # Metaclass for defining Abstract Base Classes
 
+    # Number of policies created, updated or deleted using this PRP
+    changes = 0
+
     @abstractmethod
     def get_policy(self, id):
         """Return a JSON representation of the policy identified by id"""
@@ -37,6 +41,13 @@ class PolicyRetrievalPoint(object):
         """Return a JSON representation of all policies found by using filter"""
         return
 
+    def get_policies_version(self, filter):
+        """
+        Return a value that changes when the policies found by using filter change,
+        or None if unknown (policies should then always be retrieved)
+        """
+        return None
+
     @abstractmethod
     def create_policy(self, data):
         """Create policy based on the JSON representation in data"""
@@ -64,6 +75,8 @@ class FilePolicyRetrievalPoint(PolicyRetrievalPoint):
             except OSError as exc:  # Guard against race condition
                 if exc.errno != errno.EEXIST:
                     raise
+        # Policy files by name pattern, valid while the directory is unchanged
+        self._listing = {}
 
     def get_policy(self, policy_id):
         """Return the policy identified by policy_id"""
@@ -90,11 +103,29 @@ class FilePolicyRetrievalPoint(PolicyRetrievalPoint):
                 raise
         return policies
 
+    def get_policies_version(self, name_pattern='*'):
+        """Return the modification time and size of the policy files found using the name_pattern"""
+        # Adding or removing files changes the modification time of the directory
+        dir_mtime = os.stat(self.path).st_mtime
+        listing = self._listing.get(name_pattern)
+        if listing is None or listing[0] != dir_mtime:
+            listing = (dir_mtime, sorted(glob.glob(os.path.join(self.path, name_pattern + ".json"))))
+            self._listing[name_pattern] = listing
+        version = []
+        for filename in listing[1]:
+            try:
+                stat = os.stat(filename)
+            except OSError:
+                continue
+            version.append((filename, stat.st_mtime, stat.st_size))
+        return version
+
     def create_policy(self, data):
         """Create policy based on the JSON representation in data"""
         policy_id = calvinuuid.uuid("POLICY")
         with open(os.path.join(self.path, policy_id + ".json"), "w") as file:
             json.dump(data, file)
+        self.changes += 1
         return policy_id
 
     def update_policy(self, data, policy_id):
@@ -103,9 +134,11 @@ class FilePolicyRetrievalPoint(PolicyRetrievalPoint):
         if os.path.isfile(file_path):
             with open(file_path, "w") as file:
                 json.dump(data, file)
+            self.changes += 1
         else:
             raise IOError  # Raise exception if policy named filename doesn't exist
 
     def delete_policy(self, policy_id):
         """Delete the policy named policy_id"""
         os.remove(os.path.join(self.path, policy_id + ".json"))
+        self.changes += 1
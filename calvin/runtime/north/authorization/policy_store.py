@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+import time
+from calvin.utilities.calvinlogger import get_logger
+
+_log = get_logger(__name__)
+
+# Target attributes preferred for indexing policies, most selective first
+INDEXED_ATTRIBUTES = [("action", "requires"), ("subject", "actor_signer")]
+
+_REGEX_SPECIAL = set(".^$*+?{}[]\\|()")
+_patterns = {}
+
+
+def compile_pattern(value):
+    """
+    Return compiled regular expression for a policy value.
+    A policy value must match the whole attribute value ($ marks the end of the string).
+    """
+    pattern = _patterns.get(value)
+    if pattern is None:
+        pattern = _patterns[value] = re.compile(value + '$')
+    return pattern
+
+
+def _is_literal(value):
+    return isinstance(value, basestring) and not _REGEX_SPECIAL.intersection(value)
+
+
+def _as_list(value):
+    # Accept both single object and lists by turning single objects into a list.
+    return value if isinstance(value, list) else [value]
+
+
+class CompiledTarget(object):
+    """Policy or rule target with the regular expressions of its values precompiled"""
+
+    def __init__(self, target):
+        super(CompiledTarget, self).__init__()
+        self.attributes = []
+        for attribute_type in target:
+            for attribute, value in target[attribute_type].iteritems():
+                values = _as_list(value)
+                if all(isinstance(v, basestring) for v in values):
+                    patterns = [compile_pattern(v) for v in values]
+                else:
+                    patterns = None
+                self.attributes.append((attribute_type, attribute, values, patterns))
+
+    def literal_values(self, attribute_type, attribute):
+        """Return values for attribute if they are all plain strings, i.e. no regular expressions, else None"""
+        for a_type, a, values, _ in self.attributes:
+            if (a_type, a) == (attribute_type, attribute):
+                return values if all(_is_literal(v) for v in values) else None
+        return None
+
+    def matches(self, request, pip):
+        """Return True if every attribute in the target matches the corresponding request attribute."""
+        for attribute_type, attribute, policy_value, patterns in self.attributes:
+            try:
+                request_value = request[attribute_type][attribute]
+            except KeyError:
+                try:
+                    # Try to fetch missing attribute from Policy Information Point (PIP).
+                    request_value = pip.get_attribute_value(attribute_type, attribute)
+                except Exception:
+                    return False
+            request_value = _as_list(request_value)
+            # If the lists contain many values, only one of the values need to match.
+            # Regular expressions are allowed for strings in policies.
+            if patterns is not None and all(isinstance(x, basestring) for x in request_value):
+                if not any(p.match(x) for p in patterns for x in request_value):
+                    _log.debug("No attributes are matching: %s %s %s" % (attribute_type, attribute, policy_value))
+                    return False
+            elif set(request_value).isdisjoint(policy_value):
+                _log.debug("No attributes values are matching: %s %s %s" % (attribute_type, attribute, policy_value))
+                return False
+        return True
+
+
+class CompiledPolicy(object):
+    """Policy with compiled policy and rule targets"""
+
+    def __init__(self, policy_id, policy):
+        super(CompiledPolicy, self).__init__()
+        self.policy_id = policy_id
+        self.policy = policy
+        self.target = CompiledTarget(policy["target"]) if "target" in policy else None
+        self.rules = [(rule, CompiledTarget(rule["target"]) if "target" in rule else None)
+                      for rule in policy.get("rules", [])]
+
+
+class PolicyStore(object):
+    """
+    Compiled policies from a Policy Retrieval Point (PRP), reloaded when
+    the PRP reports that the policies have changed. Changes made outside
+    of the PRP are checked for at most every check_interval seconds.
+
+    Policies are indexed by the values of one target attribute, when they are
+    plain strings, so that only candidate policies for a request are evaluated.
+    """
+
+    def __init__(self, prp, name_pattern="*", check_interval=0):
+        super(PolicyStore, self).__init__()
+        self.prp = prp
+        self.name_pattern = name_pattern
+        self.check_interval = check_interval
+        self.version = None
+        self.changes = None
+        self.next_check = 0
+        self.policies = []
+        # (attribute_type, attribute) => {value: [policy position]}
+        self.index = {}
+        # Positions of policies without indexed target attribute
+        self.unindexed = []
+
+    def refresh(self):
+        """Reload policies if changed, return True if reloaded"""
+        now = time.time()
+        if self.changes == self.prp.changes and now < self.next_check:
+            return False
+        changes = self.prp.changes
+        version = self.prp.get_policies_version(self.name_pattern)
+        self.next_check = now + self.check_interval
+        if version is not None and version == self.version and changes == self.changes:
+            return False
+        policies = self.prp.get_policies(self.name_pattern)
+        self.policies = [CompiledPolicy(policy_id, policies[policy_id]) for policy_id in sorted(policies)]
+        self._build_index()
+        self.version = version
+        self.changes = changes
+        return True
+
+    def _index_attribute(self, target):
+        attributes = [(t, a) for t, a, _, _ in sorted(target.attributes)]
+        for key in INDEXED_ATTRIBUTES + attributes:
+            if target.literal_values(*key) is not None:
+                return key
+        return None
+
+    def _build_index(self):
+        self.index = {}
+        self.unindexed = []
+        for position, policy in enumerate(self.policies):
+            key = self._index_attribute(policy.target) if policy.target else None
+            if key is None:
+                self.unindexed.append(position)
+                continue
+            by_value = self.index.setdefault(key, {})
+            for value in policy.target.literal_values(*key):
+                by_value.setdefault(value, []).append(position)
+            # All policies indexed by this attribute
+            by_value.setdefault(None, []).append(position)
+
+    def candidates(self, request):
+        """Return the policies whose target can match request, in policy id order"""
+        positions = set(self.unindexed)
+        for (attribute_type, attribute), by_value in self.index.iteritems():
+            try:
+                request_value = request[attribute_type][attribute]
+            except (KeyError, TypeError):
+                # Might be found by the PIP, all policies are candidates
+                positions.update(by_value[None])
+                continue
+            for value in _as_list(request_value):
+                if isinstance(value, basestring):
+                    positions.update(by_value.get(value, ()))
+        return [self.policies[position] for position in sorted(positions)]
@@ -27,6 +27,7 @@ from calvin.runtime.north.calvinlib import get_calvinlib
 from calvin.runtime.north import actormanager
 from calvin.runtime.north import replicationmanager
 from calvin.runtime.north import appmanager
+from calvin.runtime.north import checkpointmanager
 from calvin.runtime.north import scheduler
 from calvin.runtime.north import storage
 from calvin.runtime.north import calvincontrol
@@ -113,9 +114,7 @@ class Node(object):
         self.control = calvincontrol.get_calvincontrol()
 
         # _scheduler = scheduler.DebugScheduler if _log.getEffectiveLevel() <= logging.DEBUG else scheduler.Scheduler
-        # _scheduler = scheduler.NonPreemptiveScheduler
-        # _scheduler = scheduler.RoundRobinScheduler
-        _scheduler = scheduler.SimpleScheduler
+        _scheduler = scheduler.SCHEDULERS.get(_conf.get(None, 'scheduler'), scheduler.SimpleScheduler)
         # _scheduler = scheduler.BaselineScheduler
         self.sched = _scheduler(self, self.am)
         self.async_msg_ids = {}
@@ -133,6 +132,7 @@ class Node(object):
         self.proto = CalvinProto(self, self.network)
         self.pm = PortManager(self, self.proto)
         self.app_manager = appmanager.AppManager(self)
+        self.checkpoint = checkpointmanager.CheckpointManager(self)
 
         self.cpu_monitor = CpuMonitor(self.id, self.storage)
         self.mem_monitor = MemMonitor(self.id, self.storage)
@@ -257,6 +257,7 @@ class Node(object):
             self.storage.stop(stopped)
 
         _log.analyze(self.id, "+", {})
+        self.checkpoint.stop()
         self.storage.delete_node(self, cb=deleted_node)
         self.cpu_monitor.stop()
         self.mem_monitor.stop()
@@ -356,6 +357,8 @@ class Node(object):
     def _storage_started_cb(self, *args, **kwargs):
         self.authentication.find_authentication_server()
         self.authorization.register_node()
+        # Actors from before a restart, when checkpoints are enabled
+        self.checkpoint.start()
 
 def setup_logging(filename):
 
@@ -20,6 +20,7 @@ from calvin.utilities.utils import enum
 from calvin.utilities.calvin_callback import CalvinCB, CalvinCBClass
 from calvin.utilities import calvinlogger
 from calvin.utilities import calvinconfig
+from calvin.utilities import compact_state
 import calvin.requests.calvinresponse as response
 
 _log = calvinlogger.get_logger(__name__)
@@ -51,6 +52,26 @@ def send_message(peer_id, link, msg, callback=None, status=None, **kwargs):
         if callback:
             callback(status=status)
 
+def encode_actor_states(states):
+    """ The list of actor states as is, or compacted when configured, see compact_state """
+    if not _conf.get(None, 'compact_actor_state'):
+        return states
+    return compact_state.encode(states, compress=_conf.get(None, 'compact_actor_state_compression'))
+
+
+def decode_actor_states(states):
+    return compact_state.decode(states) if compact_state.is_encoded(states) else states
+
+
+def encode_actor_state(state):
+    states = encode_actor_states([state])
+    return state if isinstance(states, list) else states
+
+
+def decode_actor_state(state):
+    return decode_actor_states(state)[0] if compact_state.is_encoded(state) else state
+
+
 def forward_message(peer_id, link, payload, status=None):
     if status or status is None:
         try:
@@ -185,6 +206,8 @@ class CalvinProto(CalvinCBClass):
             # functions that should be called. Either permanent here
             # or using the callback_register method.
             'ACTOR_NEW': [CalvinCB(self.actor_new_handler)],
+            'ACTOR_PREPARE': [CalvinCB(self.actor_prepare_handler)],
+            'ACTORS_NEW': [CalvinCB(self.actors_new_handler)],
             'ACTOR_MIGRATE': [CalvinCB(self.actor_migrate_handler)],
             'APP_DESTROY': [CalvinCB(self.app_destroy_handler)],
             'PORT_CONNECT': [CalvinCB(self.port_connect_handler)],
@@ -235,6 +258,8 @@ class CalvinProto(CalvinCBClass):
         # is accepted during quitting it is left out from dict.
         resp = {
             'ACTOR_NEW': response.INTERNAL_ERROR,
+            'ACTOR_PREPARE': response.INTERNAL_ERROR,
+            'ACTORS_NEW': response.INTERNAL_ERROR,
             'ACTOR_MIGRATE': response.NOT_FOUND,
             'APP_DESTROY': response.NOT_FOUND,
             'PORT_CONNECT': response.NOT_FOUND,
@@ -273,30 +298,85 @@ class CalvinProto(CalvinCBClass):
 
     #### ACTORS ####
 
-    def actor_new(self, to_rt_uuid, callback, actor_type, state, prev_connections, connection_list=None):
+    def actor_new(self, to_rt_uuid, callback, actor_type, state, prev_connections, connection_list=None,
+                  prepared_actor_id=None, base_id=None, delta=False):
         """ Creates a new actor on to_rt_uuid node, but is only intended for migrating actors
             callback: called when finished with the peers respons as argument
             actor_type: see actor manager
             state: see actor manager
             prev_connections: see actor manager
+            prepared_actor_id: when state is a delta of the state sent with actor_prepare
+            base_id: the peer keeps the state as base for later states with the same base_id
+            delta: when state is a delta of the base state
         """
+        msg_state = {'actor_type': actor_type,
+                     'actor_state': encode_actor_state(state),
+                     'prev_connections': prev_connections,
+                     'connection_list': connection_list}
+        if prepared_actor_id is not None:
+            msg_state['prepared_actor_id'] = prepared_actor_id
+        if base_id is not None:
+            msg_state['base_id'] = base_id
+            msg_state['delta'] = delta
         self.node.network.link_request(to_rt_uuid, CalvinCB(send_message,
-                                                            msg = {'cmd': 'ACTOR_NEW',
-                                                                   'state': {'actor_type': actor_type,
-                                                                             'actor_state': state,
-                                                                             'prev_connections': prev_connections,
-                                                                             'connection_list': connection_list}},
+                                                            msg = {'cmd': 'ACTOR_NEW', 'state': msg_state},
                                                             callback=callback))
 
     def actor_new_handler(self, payload):
         """ Peer request new actor with state and connections """
         _log.analyze(self.rt_id, "+", payload, tb=True)
         self.node.am.new_from_migration(payload['state']['actor_type'],
-                                        payload['state']['actor_state'],
+                                        decode_actor_state(payload['state']['actor_state']),
                                         payload['state']['prev_connections'],
                                         connection_list=payload['state'].get('connection_list', None),
                                         callback=CalvinCB(self.node.network.link_request, payload['from_rt_uuid'], callback=CalvinCB(send_message,
-                                            msg = {'cmd': 'REPLY', 'msg_uuid': payload['msg_uuid']})))
+                                            msg = {'cmd': 'REPLY', 'msg_uuid': payload['msg_uuid']})),
+                                        prepared_actor_id=payload['state'].get('prepared_actor_id', None),
+                                        base_id=payload['state'].get('base_id', None),
+                                        delta=payload['state'].get('delta', False))
+
+    def actor_prepare(self, to_rt_uuid, callback, actor_type, state, prev_connections):
+        """ Prepares a live migration to to_rt_uuid node of an actor that keeps running until actor_new
+            callback: called when finished with the peers respons as argument
+            actor_type: see actor manager
+            state: snapshot of the actor's state
+            prev_connections: see actor manager
+        """
+        self.node.network.link_request(to_rt_uuid, CalvinCB(send_message,
+                                                            msg = {'cmd': 'ACTOR_PREPARE',
+                                                                   'state': {'actor_type': actor_type,
+                                                                             'actor_state': encode_actor_state(state),
+                                                                             'prev_connections': prev_connections}},
+                                                            callback=callback))
+
+    def actor_prepare_handler(self, payload):
+        """ Peer request to prepare a live migration of an actor """
+        self.node.am.prepare_migration(payload['state']['actor_type'],
+                                       decode_actor_state(payload['state']['actor_state']),
+                                       payload['state']['prev_connections'],
+                                       callback=CalvinCB(self.node.network.link_request, payload['from_rt_uuid'], callback=CalvinCB(send_message,
+                                           msg = {'cmd': 'REPLY', 'msg_uuid': payload['msg_uuid']})))
+
+    def actors_new(self, to_rt_uuid, callback, actors):
+        """ Creates a group of new actors on to_rt_uuid node, but is only intended for migrating actors
+            callback: called when finished with the peers respons as argument
+            actors: list of dicts with actor_type, actor_state and prev_connections, see actor manager
+        """
+        # The states are sent together, to be compacted together
+        msg_state = {'actors': [dict(a, actor_state=None) for a in actors],
+                     'actor_states': encode_actor_states([a['actor_state'] for a in actors])}
+        self.node.network.link_request(to_rt_uuid, CalvinCB(send_message,
+                                                            msg = {'cmd': 'ACTORS_NEW', 'state': msg_state},
+                                                            callback=callback))
+
+    def actors_new_handler(self, payload):
+        """ Peer request new group of actors with states and connections """
+        actors = payload['state']['actors']
+        for actor, state in zip(actors, decode_actor_states(payload['state']['actor_states'])):
+            actor['actor_state'] = state
+        self.node.am.new_group_from_migration(actors,
+                                              callback=CalvinCB(self.node.network.link_request, payload['from_rt_uuid'], callback=CalvinCB(send_message,
+                                                  msg = {'cmd': 'REPLY', 'msg_uuid': payload['msg_uuid']})))
 
     def actor_migrate(self, to_rt_uuid, callback, actor_id, requirements, extend=False, move=False):
         """ Request actor on to_rt_uuid node to migrate accoring to new deployment requirements
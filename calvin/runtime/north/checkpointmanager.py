@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Periodic checkpoints of the actors on a runtime to a local file, the actors
+are restored when the runtime is restarted (see the checkpoint_interval and
+checkpoint_dir options).
+
+An actor is checkpointed as when it is migrated, i.e. its type, serialized
+state (with the port queues) and connections. A checkpoint has the actors
+that changed since the previous checkpoint and the ids of the actors that
+are gone, appended to a log. When the log has grown to several times the
+size of the actors it is replaced by a full checkpoint. The actors are
+serialized a batch at a time in the reactor, and the log written in a thread.
+
+Each actor is consistent by itself, tokens on their way between actors
+(e.g. in a tunnel to another runtime) are not part of a checkpoint.
+"""
+
+import hashlib
+import os
+import re
+import struct
+import threading
+import zlib
+
+from calvin.runtime.north.plugins.coders.messages import msgpack_coder
+from calvin.runtime.south.async import async
+from calvin.runtime.south.async import threads
+from calvin.utilities.calvin_callback import CalvinCB
+from calvin.utilities.calvinlogger import get_logger
+from calvin.utilities import calvinconfig
+
+_log = get_logger(__name__)
+_conf = calvinconfig.get()
+
+# Actors serialized per call from the reactor
+CHECKPOINT_BATCH = 50
+# The log is replaced by a full checkpoint when larger than this many times the actors (and the min size)
+COMPACT_FACTOR = 4
+COMPACT_MIN_SIZE = 1 << 20
+
+# Record header: length and crc32 of the data
+_HEADER = struct.Struct(">II")
+
+
+class CheckpointLog(object):
+    """Append-only file of records, an incomplete record at the end (e.g. after a crash) is dropped"""
+
+    def __init__(self, path):
+        super(CheckpointLog, self).__init__()
+        self.path = path
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def size(self):
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def _write(self, f, data):
+        f.write(_HEADER.pack(len(data), zlib.crc32(data) & 0xffffffff) + data)
+        f.flush()
+        os.fsync(f.fileno())
+
+    def append(self, data):
+        with self._lock:
+            if self.closed:
+                return
+            with open(self.path, "ab") as f:
+                self._write(f, data)
+
+    def replace(self, data, close=False):
+        """Replace all records with data, with close nothing is written after it"""
+        with self._lock:
+            if self.closed:
+                return
+            try:
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    self._write(f, data)
+                os.rename(tmp_path, self.path)
+            finally:
+                self.closed = close
+
+    def read(self):
+        """Return the records, the file is truncated after the last complete record"""
+        records = []
+        with self._lock:
+            if not os.path.exists(self.path):
+                return records
+            with open(self.path, "r+b") as f:
+                content = f.read()
+                pos = 0
+                while pos + _HEADER.size <= len(content):
+                    length, crc = _HEADER.unpack_from(content, pos)
+                    data = content[pos + _HEADER.size:pos + _HEADER.size + length]
+                    if len(data) != length or zlib.crc32(data) & 0xffffffff != crc:
+                        break
+                    records.append(data)
+                    pos += _HEADER.size + length
+                if pos != len(content):
+                    _log.warning("Dropped incomplete checkpoint at end of %s" % self.path)
+                    f.truncate(pos)
+        return records
+
+    def close(self):
+        """No more records are written, e.g. by a thread still running"""
+        with self._lock:
+            self.closed = True
+
+
+def _moved_connections(connections, node_id, new_node_id):
+    """Connections (as from Actor.connections) with the peers on node_id moved to new_node_id"""
+    for ports in (connections['inports'], connections['outports']):
+        for port_id, peers in ports.items():
+            ports[port_id] = [(new_node_id if peer_node_id == node_id else peer_node_id, peer_port_id)
+                              for peer_node_id, peer_port_id in peers]
+    return connections
+
+
+class CheckpointManager(object):
+    """
+    Checkpoints the actors of node every interval seconds, 0 disables checkpoints.
+    The log is path, or a file in the checkpoint_dir named after the node name and uri,
+    which are the same when the runtime is restarted.
+    """
+
+    def __init__(self, node, interval=None, path=None):
+        super(CheckpointManager, self).__init__()
+        self.node = node
+        self.interval = _conf.get_in_order('checkpoint_interval', 0) if interval is None else interval
+        self.path = path
+        self.log = None
+        # actor_id => digest of the checkpointed actor
+        self._saved = {}
+        # actor_id => size of the checkpointed actor
+        self._sizes = {}
+        self._full = True
+        self._timer = None
+        self._in_progress = False
+
+    def _default_path(self):
+        directory = os.path.expanduser(_conf.get_in_order('checkpoint_dir', '~/.calvin/checkpoints'))
+        name = re.sub(r'[^\w.-]', '_', "%s_%s" % (self.node.node_name, self.node.uris[0] if self.node.uris else ""))
+        return os.path.join(directory, name + ".log")
+
+    def start(self, callback=None):
+        """ Restore the actors from the checkpoints and start checkpointing, when enabled """
+        if not self.interval:
+            return
+        if self.path is None:
+            self.path = self._default_path()
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.log = CheckpointLog(self.path)
+        self.restore(callback=callback)
+        self._timer = async.DelayedCall(self.interval, self._checkpoint_timeout)
+
+    def stop(self):
+        """ Stop checkpointing, with a last (full) checkpoint of the remaining actors """
+        if self.log is None or self.log.closed:
+            return
+        if self._timer and self._timer.active():
+            self._timer.cancel()
+        self._full = True
+        record = self._record()
+        self._collect(self.node.am.actors.keys(), record)
+        try:
+            # Closed as it is written, a checkpoint still being written in a thread is dropped
+            self._write(record, close=True)
+        except Exception:
+            _log.exception("Last checkpoint failed")
+        self.log.close()
+
+    def _checkpoint_timeout(self):
+        if not self._in_progress:
+            self.checkpoint()
+        self._timer = async.DelayedCall(self.interval, self._checkpoint_timeout)
+
+    def _record(self):
+        if self._full:
+            self._saved = {}
+            self._sizes = {}
+        return {'node_id': self.node.id, 'full': self._full, 'actors': [], 'deleted': []}
+
+    def checkpoint(self, callback=None):
+        """
+        Checkpoint the actors that changed, serialized CHECKPOINT_BATCH actors per call
+        from the reactor, the log is written in a thread.
+        callback(status) when written.
+        """
+        self._in_progress = True
+        if not self._full:
+            self._full = self.log.size() > max(COMPACT_MIN_SIZE, COMPACT_FACTOR * sum(self._sizes.values()))
+        self._checkpoint_batch(self.node.am.actors.keys(), self._record(), callback)
+
+    def _checkpoint_batch(self, actor_ids, record, callback):
+        if self.log.closed:
+            return
+        self._collect(actor_ids[:CHECKPOINT_BATCH], record)
+        if len(actor_ids) > CHECKPOINT_BATCH:
+            async.DelayedCall(0, self._checkpoint_batch, actor_ids[CHECKPOINT_BATCH:], record, callback)
+            return
+        self._full = False
+        d = threads.defer_to_thread(self._write, record)
+        d.addCallback(lambda _: self._checkpointed(True, callback))
+        d.addErrback(lambda failure: self._checkpointed(False, callback, failure))
+
+    def _checkpointed(self, status, callback, failure=None):
+        self._in_progress = False
+        if not status:
+            _log.error("Checkpoint failed: %s" % failure)
+            # The actors in the failed checkpoint are not in the log, write them all next time
+            self._full = True
+        if callback:
+            callback(status=status)
+
+    def _collect(self, actor_ids, record):
+        """ Add the actors that changed since they were checkpointed to record, and the ones that are gone """
+        coder = msgpack_coder.get()
+        actors = self.node.am.actors
+        for actor_id in actor_ids:
+            actor = actors.get(actor_id)
+            if actor is None:
+                continue
+            try:
+                data = coder.encode({'actor_type': actor._type, 'actor_state': actor.serialize(),
+                                     'prev_connections': actor.connections(self.node.id)})
+            except Exception:
+                _log.exception("Actor %s not checkpointed" % actor_id)
+                continue
+            digest = hashlib.sha1(data).digest()
+            if self._saved.get(actor_id) != digest:
+                record['actors'].append(data)
+                self._saved[actor_id] = digest
+                self._sizes[actor_id] = len(data)
+        record['deleted'].extend([actor_id for actor_id in self._saved if actor_id not in actors])
+        for actor_id in record['deleted']:
+            del self._saved[actor_id]
+            del self._sizes[actor_id]
+
+    def _write(self, record, close=False):
+        data = msgpack_coder.get().encode(record)
+        if record['full']:
+            self.log.replace(data, close)
+        else:
+            self.log.append(data)
+
+    def load(self):
+        """
+        Return the actors in the checkpoints, as {actor_id: actor} with actor_type, actor_state and
+        prev_connections, where the peers on the node that made a checkpoint are on this node.
+        """
+        coder = msgpack_coder.get()
+        actors = {}
+        for data in self.log.read():
+            try:
+                record = coder.decode(data)
+            except Exception:
+                _log.exception("Bad checkpoint in %s" % self.path)
+                break
+            if record['full']:
+                actors = {}
+            for actor_id in record['deleted']:
+                actors.pop(actor_id, None)
+            for entry in record['actors']:
+                actor = coder.decode(entry)
+                _moved_connections(actor['prev_connections'], record['node_id'], self.node.id)
+                actors[actor['prev_connections']['actor_id']] = actor
+        return actors
+
+    def restore(self, callback=None):
+        """
+        Create the actors from the checkpoints (that are not on the node), all actors before
+        connecting them and with batched storage updates as for a migrated group of actors.
+        callback(status) with data {'failed': actor ids} for actors that could not be created.
+        """
+        actors = [actor for actor_id, actor in self.load().iteritems() if actor_id not in self.node.am.actors]
+        _log.info("Restoring %d actors from %s" % (len(actors), self.path))
+        self.node.am.new_group_from_migration(actors, callback=CalvinCB(self._restored, callback=callback))
+
+    def _restored(self, status, callback):
+        failed = status.data.get('failed', []) if isinstance(status.data, dict) else []
+        if failed:
+            _log.error("Actors not restored from checkpoint: %s" % failed)
+        if callback:
+            callback(status=status)
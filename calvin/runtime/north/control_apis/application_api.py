@@ -184,7 +184,7 @@ def handle_actor_migrate(self, handle, connection, match, data, hdr):
     """
     POST /actor/{actor-id}/migrate
     Migrate actor to (other) node, either explicit node_id or by updated requirements
-    Body: {"peer_node_id": <node-id>}
+    Body: {"peer_node_id": <node-id>, "live": True or False}  # live defaults to the live_migration config
     Alternative body:
     Body:
     {
@@ -207,7 +207,8 @@ def handle_actor_migrate(self, handle, connection, match, data, hdr):
         if actor_id in self.node.am.list_actors():
             try:
                 self.node.am.migrate(actor_id, data['peer_node_id'],
-                                 callback=CalvinCB(self.actor_migrate_cb, handle, connection))
+                                 callback=CalvinCB(self.actor_migrate_cb, handle, connection),
+                                 live=data.get('live', None))
             except:
                 _log.exception("Migration failed")
                 status = calvinresponse.INTERNAL_ERROR
@@ -151,6 +151,19 @@ def handle_dump_storage(self, handle, connection, match, data, hdr):
     self.send_response(handle, connection, json.dumps(name), status=calvinresponse.OK)
 
 
+@handler(method="GET", path="/storagecache")
+@authentication_decorator
+def handle_get_storage_cache(self, handle, connection, match, data, hdr):
+    """
+    GET /storagecache
+    Statistics for the storage read-through cache
+    Response status code: OK
+    Response: {"size": <max entries>, "entries": <cached entries>, "hits": <count>, "misses": <count>,
+               "expired": <count>, "evicted": <count>, "hit_rate": <hits/lookups>, "saved_ms": <0, not measured for storage>}
+    """
+    self.send_response(handle, connection, json.dumps(self.node.storage.cache_statistics()), status=calvinresponse.OK)
+
+
 #
 # FIXME: These probably belongs in this API but I'm not completely sure
 #
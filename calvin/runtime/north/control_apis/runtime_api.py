@@ -84,6 +84,18 @@ def handle_get_nodes(self, handle, connection, match, data, hdr):
     self.send_response(handle, connection, json.dumps(self.node.network.list_links()))
 
 
+@handler(method="GET", path="/scheduler")
+@authentication_decorator
+def handle_get_scheduler(self, handle, connection, match, data, hdr):
+    """
+    GET /scheduler
+    Get scheduler information for this calvin node, e.g. per actor counters
+    Response status code: OK
+    Response: {"scheduler": <scheduler class>, ...}
+    """
+    self.send_response(handle, connection, json.dumps(self.node.sched.statistics()))
+
+
 @handler(method="DELETE", path="/node", optional=["/now", "/migrate", "/clean"])
 @authentication_decorator
 def handle_quit(self, handle, connection, match, data, hdr):
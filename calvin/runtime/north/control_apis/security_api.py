@@ -16,6 +16,8 @@
 
 import json
 from calvin.requests import calvinresponse
+from calvin.utilities import security
+from calvin.utilities import certificate
 from calvin.utilities.calvinlogger import get_logger
 from calvin.runtime.north.control_apis.routes import handler
 from calvin.runtime.north.control_apis.authentication import authentication_decorator
@@ -287,3 +289,19 @@ def handle_del_authorization_policy(self, handle, connection, match, data, hdr):
         _log.exception("handle_del_authorization_policy")
         status = calvinresponse.INTERNAL_ERROR
     self.send_response(handle, connection, None, status=status)
+
+@handler(method="GET", path="/security/cache")
+@authentication_decorator
+def handle_get_security_cache(self, handle, connection, match, data, hdr):
+    """
+    GET /security/cache
+    Statistics for the signature verification and certificate caches
+    Response status code: OK
+    Response: {"signatures": <statistics>, "certificates": <statistics>, "verified": <statistics>}
+    where <statistics> is {"size": <max entries>, "entries": <cached entries>, "hits": <count>,
+    "misses": <count>, "expired": <count>, "evicted": <count>, "hit_rate": <hits/lookups>,
+    "saved_ms": <time saved by hits>}
+    """
+    statistics = certificate.cache_statistics()
+    statistics['signatures'] = security.signature_cache_statistics()
+    self.send_response(handle, connection, json.dumps(statistics), status=calvinresponse.OK)
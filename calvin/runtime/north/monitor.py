@@ -72,6 +72,11 @@ class Event_Monitor(object):
 
         return did_comm
 
+    def communicate_endpoints(self, endpoints):
+        """Communicate over all endpoints, return list of endpoints that did send something."""
+        self._check_backoff()
+        return [endp for endp in endpoints if endp not in self._backoff and endp.communicate()]
+
 class VisualizingMonitor(Event_Monitor):
     
     def communicate(self, endpoints):
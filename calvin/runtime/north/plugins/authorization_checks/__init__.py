@@ -40,11 +40,29 @@ for m in modules:
     _log.debug("Imported condition check plugin %s" % (m,))
 
 def check_authorization_plugin_list(plugin_list):
+    return authorization_plugin_list_decision(plugin_list)[0]
+
+def authorization_plugin_list_decision(plugin_list):
+    """
+    Return (authorized, valid_until) where valid_until is the time (in seconds since
+    the epoch) when the result might change, 0 if unknown, i.e. it must always be checked.
+
+    Plugins can report when their result changes with a function next_change taking the
+    same attributes as authorization_check, returning None if it never changes.
+    """
     authorization_results = []
+    valid_until = float('inf')
     for plugin in plugin_list:
         try:
-            authorization_results.append(authz_plugins[plugin["id"]].authorization_check(**plugin["attributes"]))
+            plugin_module = authz_plugins[plugin["id"]]
+            authorization_results.append(plugin_module.authorization_check(**plugin["attributes"]))
+            if hasattr(plugin_module, 'next_change'):
+                next_change = plugin_module.next_change(**plugin["attributes"])
+                if next_change is not None:
+                    valid_until = min(valid_until, next_change)
+            else:
+                valid_until = 0
         except Exception:
-            return False
+            return (False, 0)
     # At least one of the authorization checks for the plugins must return True.
-    return True in authorization_results
\ No newline at end of file
+    return (True in authorization_results, valid_until)
\ No newline at end of file
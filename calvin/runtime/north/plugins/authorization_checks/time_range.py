@@ -14,7 +14,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
 
 def authorization_check(start_time, end_time):
 	"""Return True if current time is in the range [start_time, end_time]."""
@@ -23,3 +24,15 @@ def authorization_check(start_time, end_time):
 		return start_time <= time < end_time
 	else:
 		return start_time <= time or time < end_time
+
+def next_change(start_time, end_time):
+	"""Return the time (in seconds since the epoch) of the next start_time or end_time."""
+	now = datetime.now()
+	boundaries = []
+	for boundary in (start_time, end_time):
+		hour, minute = boundary.split(':')
+		t = now.replace(hour=int(hour), minute=int(minute), second=0, microsecond=0)
+		if t <= now:
+			t += timedelta(days=1)
+		boundaries.append(t)
+	return time.mktime(min(boundaries).timetuple())
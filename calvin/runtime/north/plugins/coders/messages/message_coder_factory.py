@@ -46,6 +46,6 @@ def get(t):
         return json_coder.MessageCoder()
 
     if t == "msgpack":
-        return msgpack_coder.MessageCoder()
+        return msgpack_coder.get()
 
     raise Exception("Coder {} requested is not supported".format(t))
@@ -19,6 +19,15 @@ from message_coder import MessageCoderBase
 
 umsgpack.compatibility = True
 
+# Use the C implementation of msgpack when installed, with the same (old spec) wire format as umsgpack
+try:
+    import msgpack
+    if msgpack.version < (0, 5, 2):
+        msgpack = None
+except ImportError:
+    msgpack = None
+
+
 # set of functions to encode/decode data tokens to/from a json description
 class MessageCoder(MessageCoderBase):
 
@@ -28,3 +37,16 @@ class MessageCoder(MessageCoderBase):
     def decode(self, data):
         data = umsgpack.unpackb(data)
         return data
+
+
+class CMessageCoder(MessageCoderBase):
+
+    def encode(self, data):
+        return msgpack.packb(data, use_bin_type=False)
+
+    def decode(self, data):
+        return msgpack.unpackb(data, raw=True)
+
+
+def get():
+    return CMessageCoder() if msgpack else MessageCoder()
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+
+from calvin.runtime.north.plugins.coders.messages import message_coder_factory
+from calvin.utilities.calvinlogger import get_logger
+import negotiator_base
+
+_log = get_logger(__name__)
+
+# Cost in seconds of sending one byte, i.e. roughly a 100 Mbit/s link
+BYTE_COST = 8e-8
+# Number of encode/decode rounds per sample message when measuring a coder
+ROUNDS = 20
+
+# Measured (seconds, bytes) per coder, shared by all transports
+_costs = {}
+
+
+def _port_state(port_id, name, direction, length=16):
+    pos = {port_id: 0}
+    return {'id': port_id, 'name': name,
+            'properties': {'direction': direction, 'nbr_peers': 1, 'routing': 'fanout'},
+            'queue': {'queuetype': 'fanout_fifo', 'N': length + 1, 'write_pos': length / 2,
+                      'fifo': [{'type': 'Token', 'data': i} for i in range(length + 1)],
+                      'readers': [port_id], 'read_pos': pos, 'tentative_read_pos': pos, 'reader_offset': pos}}
+
+
+def sample_messages():
+    """
+    Messages representative of runtime to runtime traffic: a token stream,
+    storage proxy requests and an actor migration.
+    """
+    port_id = "0a3b1e7c-2f7d-4a5e-9c1b-6d8e5f4a3b2c"
+    token = {'cmd': 'TUNNEL_DATA', 'tunnel_id': "5c2d3e4f-1a2b-4c3d-8e9f-0a1b2c3d4e5f",
+             'value': {'cmd': 'TOKEN', 'sequencenbr': 4711, 'port_id': port_id, 'peer_port_id': port_id,
+                       'token': {'type': 'Token', 'data': 42}}}
+    storage = {'cmd': 'TUNNEL_DATA', 'tunnel_id': "6d3e4f5a-2b3c-4d5e-9f0a-1b2c3d4e5f6a",
+               'value': {'cmd': 'SET', 'key': "actor-" + port_id, 'msg_uuid': "7e4f5a6b-3c4d-4e5f-8a1b-2c3d4e5f6a7b",
+                         'value': {'name': "app:src", 'type': "std.Counter", 'node_id': port_id,
+                                   'inports': [], 'outports': [{'id': port_id, 'name': "integer"}]}}}
+    actor_state = {'private': {'_id': port_id, '_name': "app:identity", '_requires': [], '_has_started': True,
+                               '_calvinsys': {}, '_replication_id': {}, '_signature': None,
+                               '_component_members': [port_id], '_migration_info': None,
+                               '_port_property_capabilities': None, '_deployment_requirements': [],
+                               'inports': {'token': _port_state(port_id, "token", "in")},
+                               'outports': {'token': _port_state(port_id, "token", "out")}},
+                   'managed': {'dump': False, 'last': None},
+                   'security': {'_subject_attributes': None},
+                   'custom': {}}
+    migration = {'cmd': 'ACTOR_NEW', 'msg_uuid': "8f5a6b7c-4d5e-4f6a-9b2c-3d4e5f6a7b8c",
+                 'state': {'actor_type': "std.Identity", 'actor_state': actor_state,
+                           'prev_connections': {'inports': {port_id: [[port_id, port_id]]}, 'outports': {}},
+                           'connection_list': [[port_id, port_id, port_id, port_id]]}}
+    return [token] * 10 + [storage, migration]
+
+
+def measure(coder, messages, rounds=ROUNDS):
+    """Returns (seconds, bytes) to encode and decode messages once"""
+    size = sum(len(coder.encode(msg)) for msg in messages)
+    start = time.time()
+    for _ in range(rounds):
+        for msg in messages:
+            coder.decode(coder.encode(msg))
+    return (time.time() - start) / rounds, size
+
+
+def cost(name):
+    if name not in _costs:
+        try:
+            _costs[name] = measure(message_coder_factory.get(name), sample_messages())
+        except Exception:
+            _log.exception("Failed to measure coder %s" % name)
+            _costs[name] = None
+    if _costs[name] is None:
+        return None
+    seconds, size = _costs[name]
+    return seconds + size * BYTE_COST
+
+
+class AdaptiveNegotiator(negotiator_base.NegotiatorBase):
+    """
+        Selects the coder, supported by both runtimes, with the lowest
+        combined cost for coding time and size of representative messages.
+    """
+
+    def get_coder(self, prio_list):
+        return message_coder_factory.get(self.select(message_coder_factory.get_prio_list(), prio_list) or "json")
+
+    def get_list(self):
+        return message_coder_factory.get_prio_list()
+
+    def select(self, local_coders, peer_coders):
+        costs = [(cost(c), c) for c in local_coders if c in peer_coders]
+        costs = [(c, name) for c, name in costs if c is not None]
+        if not costs:
+            return super(AdaptiveNegotiator, self).select(local_coders, peer_coders)
+        return min(costs)[1]
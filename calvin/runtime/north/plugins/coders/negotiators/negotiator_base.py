@@ -33,3 +33,14 @@ class NegotiatorBase(object):
             Get a list of avalible coders.
         """
         raise NotImplemented("Negotiator not implemented.")
+
+    def select(self, local_coders, peer_coders):
+        """
+            Select the coder to use towards a peer, given the local priority
+            list and the coders supported by the peer. Returns the name of
+            the first local coder supported by the peer, or None.
+        """
+        for coder in local_coders:
+            if coder in peer_coders:
+                return coder
+        return None
@@ -18,6 +18,7 @@
 
 import static
 import dynamic
+import adaptive
 
 
 def get(type_):
@@ -25,5 +26,7 @@ def get(type_):
         return static.StaticNegotiator()
     if type_ == "dynamic":
         return dynamic.DynamicNegotiator()
+    if type_ == "adaptive":
+        return adaptive.AdaptiveNegotiator()
 
     raise Exception("Negotiator of type {} is not supported".format(type_))
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from calvin.runtime.north.plugins.coders.messages import message_coder_factory, msgpack_coder
+from calvin.runtime.north.plugins.coders.negotiators import negotiator_factory, adaptive
+
+pytestmark = pytest.mark.unittest
+
+
+def test_static_select():
+    negotiator = negotiator_factory.get("static")
+    assert negotiator.select(['json', 'msgpack'], ['msgpack', 'json']) == 'json'
+    assert negotiator.select(['json', 'msgpack'], ['msgpack']) == 'msgpack'
+    assert negotiator.select(['json'], ['cbor']) is None
+
+
+def test_adaptive_select():
+    negotiator = negotiator_factory.get("adaptive")
+    # msgpack is more compact than json, but the pure python implementation is much slower
+    expected = 'msgpack' if msgpack_coder.msgpack else 'json'
+    assert negotiator.select(['json', 'msgpack'], ['json', 'msgpack']) == expected
+    assert negotiator.select(['json', 'msgpack'], ['json']) == 'json'
+    # Coders that can't be used locally are never selected
+    assert negotiator.select(['json', 'no_such_coder'], ['json', 'no_such_coder']) == 'json'
+    assert adaptive.cost('no_such_coder') is None
+
+
+@pytest.mark.parametrize("name", ['json', 'msgpack'])
+def test_sample_messages(name):
+    coder = message_coder_factory.get(name)
+    for msg in adaptive.sample_messages():
+        assert coder.decode(coder.encode(msg)) == msg
+
+
+def test_msgpack_wire_compatible():
+    if msgpack_coder.msgpack is None:
+        pytest.skip("C msgpack not installed")
+    c_coder, py_coder = msgpack_coder.CMessageCoder(), msgpack_coder.MessageCoder()
+    for msg in adaptive.sample_messages():
+        assert c_coder.encode(msg) == py_coder.encode(msg)
+        assert c_coder.decode(py_coder.encode(msg)) == msg
@@ -16,12 +16,15 @@
 
 from calvin.runtime.north.plugins.port import endpoint
 from calvin.runtime.north.plugins.port import queue
+from calvin.runtime.north.plugins.port.queue.shared_fifo import can_share
 import calvin.requests.calvinresponse as response
 from calvin.utilities import calvinlogger
+from calvin.utilities import calvinconfig
 from calvin.runtime.north.plugins.port.connection.common import BaseConnection
 from calvin.runtime.north.plugins.port import DISCONNECT
 
 _log = calvinlogger.get_logger(__name__)
+_conf = calvinconfig.get()
 
 
 class LocalConnection(BaseConnection):
@@ -60,8 +63,12 @@ class LocalConnection(BaseConnection):
         _log.analyze(self.node.id, "+", {})
         inport.set_queue(queue.get(inport, peer_port=outport))
         outport.set_queue(queue.get(outport, peer_port=inport))
-        ein = endpoint.LocalInEndpoint(inport, outport, self.node.sched)
-        eout = endpoint.LocalOutEndpoint(outport, inport, self.node.sched)
+        if self._share_queue(inport, outport):
+            ein = endpoint.SharedLocalInEndpoint(inport, outport, self.node.sched)
+            eout = endpoint.SharedLocalOutEndpoint(outport, inport, self.node.sched)
+        else:
+            ein = endpoint.LocalInEndpoint(inport, outport, self.node.sched)
+            eout = endpoint.LocalOutEndpoint(outport, inport, self.node.sched)
 
         invalid_endpoint = outport.attach_endpoint(eout)
         invalid_endpoint.unregister(self.node.sched)
@@ -76,6 +83,17 @@ class LocalConnection(BaseConnection):
         self.node.storage.add_port(inport, self.node.id, inport.owner.id)
         self.node.storage.add_port(outport, self.node.id, outport.owner.id)
 
+    def _share_queue(self, inport, outport):
+        """ Let the inport read directly from the outport's queue """
+        if not _conf.get(None, 'shared_local_queues'):
+            return False
+        if inport.properties.get('nbr_peers', 1) != 1:
+            return False
+        # Queue pressure is measured when communicating tokens
+        if inport.owner._replication_id.measure_pressure():
+            return False
+        return can_share(inport.queue, outport.queue, inport.id)
+
     def disconnect(self, terminate=DISCONNECT.TEMPORARY):
         """ Obtain any missing information to enable disconnecting one peer port and make the disconnect"""
 
@@ -21,10 +21,12 @@ from calvin.runtime.north.calvin_proto import CalvinTunnel
 from calvin.runtime.north.plugins.port import queue
 import calvin.requests.calvinresponse as response
 from calvin.utilities import calvinlogger
+from calvin.utilities import calvinconfig
 from calvin.runtime.north.plugins.port.connection.common import BaseConnection, PURPOSE
 from calvin.runtime.north.plugins.port import DISCONNECT
 
 _log = calvinlogger.get_logger(__name__)
+_conf = calvinconfig.get()
 
 
 class TunnelConnection(BaseConnection):
@@ -49,18 +51,8 @@ class TunnelConnection(BaseConnection):
             _log.analyze(self.node.id, "+ TUNNELED-TO-LOCAL", {'factory': self.factory})
             self.factory.get(self.port, self.peer_port_meta, self.callback).connect()
             return
-        tunnel = None
         self.peer_port_meta.retries = 0
-        if self.peer_port_meta.node_id not in self.token_tunnel.tunnels.iterkeys():
-            # No tunnel to peer, get one first
-            _log.analyze(self.node.id, "+ GET TUNNEL", self.peer_port_meta, peer_node_id=self.peer_port_meta.node_id)
-            tunnel = self.node.proto.tunnel_new(self.peer_port_meta.node_id, 'token', {})
-            tunnel.register_tunnel_down(CalvinCB(self.token_tunnel.tunnel_down, tunnel))
-            tunnel.register_tunnel_up(CalvinCB(self.token_tunnel.tunnel_up, tunnel))
-            tunnel.register_recv(CalvinCB(self.token_tunnel.tunnel_recv_handler, tunnel))
-            self.token_tunnel.tunnels[self.peer_port_meta.node_id] = tunnel
-        else:
-            tunnel = self.token_tunnel.tunnels[self.peer_port_meta.node_id]
+        tunnel = self.token_tunnel.get_tunnel(self.peer_port_meta.node_id)
 
         if tunnel.status == CalvinTunnel.STATUS.PENDING:
             if self.peer_port_meta.node_id not in self.token_tunnel.pending_tunnels:
@@ -144,13 +136,7 @@ class TunnelConnection(BaseConnection):
         # Set up the port's endpoint
         tunnel = self.token_tunnel.tunnels[self.peer_port_meta.node_id]
         self.port.set_queue(queue.get(self.port, peer_port_meta=self.peer_port_meta))
-        cls = endpoint.TunnelInEndpoint if self.port.direction == 'in' else endpoint.TunnelOutEndpoint
-        endp = cls(self.port,
-                   tunnel,
-                   self.peer_port_meta.node_id,
-                   reply.data['port_id'],
-                   self.peer_port_meta.properties,
-                   self.node.sched)
+        endp = self._create_endpoint(tunnel, reply.data['port_id'])
 
         invalid_endpoint = self.port.attach_endpoint(endp)
         invalid_endpoint.unregister(self.node.sched)
@@ -163,6 +149,14 @@ class TunnelConnection(BaseConnection):
         # Update storage
         self.node.storage.add_port(self.port, self.node.id, self.port.owner.id)
 
+    def _create_endpoint(self, tunnel, peer_port_id):
+        if self.port.direction == 'in':
+            return endpoint.TunnelInEndpoint(self.port, tunnel, self.peer_port_meta.node_id, peer_port_id,
+                                             self.peer_port_meta.properties, self.node.sched)
+        return endpoint.TunnelOutEndpoint(self.port, tunnel, self.peer_port_meta.node_id, peer_port_id,
+                                          self.peer_port_meta.properties, self.node.sched,
+                                          window=self.token_tunnel.token_window(tunnel))
+
     def connection_request(self):
         """ A request from a peer to connect a port"""
         _log.analyze(self.node.id, "+", self.kwargs, peer_node_id=self.peer_port_meta.node_id)
@@ -181,13 +175,7 @@ class TunnelConnection(BaseConnection):
             return response.CalvinResponse(response.GONE)
 
         self.port.set_queue(queue.get(self.port, peer_port_meta=self.peer_port_meta))
-        cls = endpoint.TunnelInEndpoint if self.port.direction == 'in' else endpoint.TunnelOutEndpoint
-        endp = cls(self.port,
-                   tunnel,
-                   self.peer_port_meta.node_id,
-                   self.peer_port_meta.port_id,
-                   self.peer_port_meta.properties,
-                   self.node.sched)
+        endp = self._create_endpoint(tunnel, self.peer_port_meta.port_id)
 
         invalid_endpoint = self.port.attach_endpoint(endp)
         invalid_endpoint.unregister(self.node.sched)
@@ -294,6 +282,9 @@ class TunnelConnection(BaseConnection):
             self.proto.register_tunnel_handler('token', CalvinCB(self.tunnel_request_handles))
             self.tunnels = {}  # key: peer_node_id, value: tunnel instances
             self.pending_tunnels = {}  # key: peer_node_id, value: list of CalvinCB instances
+            # Max number of unacked tokens in TOKENS messages, 0 disables batching
+            self.window = _conf.get(None, 'token_window') or 0
+            self.peer_windows = {}  # key: tunnel, value: window announced by peer
             # Alias to port manager's port lookup
             self._get_local_port = self.pm._get_local_port
 
@@ -304,9 +295,30 @@ class TunnelConnection(BaseConnection):
             tunnel.register_tunnel_down(CalvinCB(self.tunnel_down, tunnel))
             tunnel.register_tunnel_up(CalvinCB(self.tunnel_up, tunnel))
             tunnel.register_recv(CalvinCB(self.tunnel_recv_handler, tunnel))
+            self.send_token_options(tunnel)
             # We accept it by returning True
             return True
 
+        def get_tunnel(self, peer_node_id):
+            """ Return the token tunnel to peer_node_id, a new tunnel is requested when there is none """
+            if peer_node_id in self.tunnels:
+                return self.tunnels[peer_node_id]
+            _log.analyze(self.node.id, "+ GET TUNNEL", {}, peer_node_id=peer_node_id)
+            tunnel = self.node.proto.tunnel_new(peer_node_id, 'token', {})
+            tunnel.register_tunnel_down(CalvinCB(self.tunnel_down, tunnel))
+            tunnel.register_tunnel_up(CalvinCB(self.tunnel_up, tunnel))
+            tunnel.register_recv(CalvinCB(self.tunnel_recv_handler, tunnel))
+            self.tunnels[peer_node_id] = tunnel
+            return tunnel
+
+        def send_token_options(self, tunnel):
+            """ Announce that we accept TOKENS messages, peers not knowing TOKEN_OPTIONS ignore it """
+            tunnel.send({'cmd': 'TOKEN_OPTIONS', 'window': self.window})
+
+        def token_window(self, tunnel):
+            """ Window to use for TOKENS messages on tunnel, 0 when peer only handles TOKEN messages """
+            return min(self.window, self.peer_windows.get(tunnel, 0))
+
         def tunnel_down(self, tunnel):
             """ Callback that the tunnel is not accepted or is going down """
             tunnel_peer_id = tunnel.peer_node_id
@@ -314,6 +326,7 @@ class TunnelConnection(BaseConnection):
                 self.tunnels.pop(tunnel_peer_id)
             except:
                 pass
+            self.peer_windows.pop(tunnel, None)
 
             # If a port connect have ordered a tunnel then it have a callback in pending
             # which want information on the failure
@@ -330,6 +343,7 @@ class TunnelConnection(BaseConnection):
         def tunnel_up(self, tunnel):
             """ Callback that the tunnel is working """
             tunnel_peer_id = tunnel.peer_node_id
+            self.send_token_options(tunnel)
             # If a port connect have ordered a tunnel then it have a callback in pending
             # which want to continue with the connection
             if tunnel_peer_id in self.pending_tunnels:
@@ -349,7 +363,10 @@ class TunnelConnection(BaseConnection):
                     # it is sorted out if we connect again
                     try:
                         if e.peer_id == payload['port_id']:
-                            e.recv_token(payload)
+                            if payload['cmd'] == 'TOKENS':
+                                e.recv_tokens(payload)
+                            else:
+                                e.recv_token(payload)
                             break
                     except:
                         pass
@@ -363,6 +380,8 @@ class TunnelConnection(BaseConnection):
                          'peer_port_id': payload['peer_port_id'],
                          'sequencenbr': payload['sequencenbr'],
                          'value': 'ABORT'}
+                if payload['cmd'] == 'TOKENS':
+                    reply.update({'cmd': 'TOKENS_REPLY', 'length': len(payload['tokens']), 'acked': 0})
                 tunnel.send(reply)
 
         def recv_token_reply_handler(self, tunnel, payload):
@@ -378,7 +397,11 @@ class TunnelConnection(BaseConnection):
                     # it is sorted out if we connect again
                     try:
                         if e.get_peer()[1] == payload['peer_port_id']:
-                            e.reply(payload['sequencenbr'], payload['value'])
+                            if payload['cmd'] == 'TOKENS_REPLY':
+                                e.reply_batch(payload['sequencenbr'], payload['length'], payload['acked'],
+                                              payload['value'])
+                            else:
+                                e.reply(payload['sequencenbr'], payload['value'])
                             break
                     except:
                         pass
@@ -386,10 +409,12 @@ class TunnelConnection(BaseConnection):
         def tunnel_recv_handler(self, tunnel, payload):
             """ Gets called when we receive a message over a tunnel """
             if 'cmd' in payload:
-                if 'TOKEN' == payload['cmd']:
+                if payload['cmd'] in ('TOKEN', 'TOKENS'):
                     self.recv_token_handler(tunnel, payload)
-                elif 'TOKEN_REPLY' == payload['cmd']:
+                elif payload['cmd'] in ('TOKEN_REPLY', 'TOKENS_REPLY'):
                     self.recv_token_reply_handler(tunnel, payload)
+                elif 'TOKEN_OPTIONS' == payload['cmd']:
+                    self.peer_windows[tunnel] = payload.get('window', 0)
 
     def init(self):
         return TunnelConnection.TokenTunnel(self.node, self.kwargs['portmanager'])
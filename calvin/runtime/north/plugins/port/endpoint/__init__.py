@@ -17,7 +17,7 @@
 from calvin.runtime.north.plugins.port.endpoint.common import Endpoint
 
 # Endpoint methods
-_MODULES = {'local': ['LocalInEndpoint', 'LocalOutEndpoint'],
+_MODULES = {'local': ['LocalInEndpoint', 'LocalOutEndpoint', 'SharedLocalInEndpoint', 'SharedLocalOutEndpoint'],
             'tunnel':  ['TunnelInEndpoint', 'TunnelOutEndpoint']}
 from calvin.utilities.calvinlogger import get_logger
 _log = get_logger(__name__)
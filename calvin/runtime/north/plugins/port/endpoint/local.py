@@ -17,7 +17,9 @@
 import time
 
 from calvin.runtime.north.plugins.port.endpoint.common import Endpoint
+from calvin.runtime.north.plugins.port import queue
 from calvin.runtime.north.plugins.port.queue.common import QueueEmpty, QueueFull
+from calvin.runtime.north.plugins.port.queue.shared_fifo import SharedFIFOReader
 from calvin.runtime.north.plugins.port import DISCONNECT
 from calvin.utilities.calvinlogger import get_logger
 
@@ -133,3 +135,57 @@ class LocalOutEndpoint(Endpoint):
         if self.peer_endpoint and nbr is not None:
             self.peer_endpoint.pressure_last = nbr
         return sent
+
+
+#
+# Local endpoints sharing the outport's queue
+#
+
+def _unshare(inport, outport):
+    """Give the inport a queue of its own again, holding the tokens it has not read"""
+    if isinstance(inport.queue, SharedFIFOReader):
+        inport.queue = inport.queue.unshare(queue.get(inport, peer_port=outport))
+
+
+class SharedLocalInEndpoint(LocalInEndpoint):
+
+    """
+    Inport endpoint reading directly from the outport's queue, there is
+    nothing to communicate. The scheduler is told that the actors are linked,
+    i.e. that firing one of them can make the other one able to fire.
+    """
+
+    def attached(self):
+        self.peer_port.queue.add_reader(self.port.id, self.port.properties)
+        self.port.queue = SharedFIFOReader(self.peer_port.queue, self.port.id, self.peer_id)
+
+    def detached(self, terminate=DISCONNECT.TEMPORARY):
+        _unshare(self.port, self.peer_port)
+        super(SharedLocalInEndpoint, self).detached(terminate)
+
+    def register(self, registry):
+        registry.link_actors(self.port.owner.id, self.peer_port.owner.id)
+
+    def unregister(self, registry):
+        registry.unlink_actors(self.port.owner.id, self.peer_port.owner.id)
+
+
+class SharedLocalOutEndpoint(LocalOutEndpoint):
+
+    """Outport endpoint whose queue is read directly by the inport"""
+
+    def detached(self, terminate=DISCONNECT.TEMPORARY):
+        _unshare(self.peer_port, self.port)
+        super(SharedLocalOutEndpoint, self).detached(terminate)
+
+    def use_monitor(self):
+        return False
+
+    def communicate(self, *args, **kwargs):
+        return False
+
+    def register(self, registry):
+        registry.link_actors(self.port.owner.id, self.peer_port.owner.id)
+
+    def unregister(self, registry):
+        registry.unlink_actors(self.port.owner.id, self.peer_port.owner.id)
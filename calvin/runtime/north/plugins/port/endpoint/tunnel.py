@@ -15,6 +15,7 @@
 # limitations under the License.
 
 import time
+import bisect
 
 from calvin.runtime.north.calvin_token import Token
 from calvin.runtime.north.plugins.port.endpoint.common import Endpoint
@@ -29,6 +30,8 @@ _log = get_logger(__name__)
 #
 
 PRESSURE_LENGTH = 3
+# Max number of tokens in one TOKENS message
+BATCH_LENGTH = 16
 
 class TunnelInEndpoint(Endpoint):
 
@@ -81,14 +84,8 @@ class TunnelInEndpoint(Endpoint):
             _log.debug("recv_token %s %s: %d %s => %s %d" % (self.port.id, self.port.name, payload['sequencenbr'], payload['token'], "True" if ok else "False", r))
         except QueueFull:
             # Queue full just send NACK
-            _log.debug("REMOTE QUEUE FULL %d %s" % (self.pressure_count, self.port.id))
             ok = False
-            if self.pressure[(self.pressure_count - 1) % PRESSURE_LENGTH][0] != payload['sequencenbr']:
-                # Log a QueueFull event
-                self.pressure[self.pressure_count % PRESSURE_LENGTH] = (payload['sequencenbr'], time.time())
-                self.pressure_count += 1
-                # Inform scheduler about potential pressure event
-                self.scheduler.trigger_pressure_event(self.port.owner.id)
+            self._queue_full(payload['sequencenbr'])
         self.pressure_last = payload['sequencenbr']
         reply = {
             'cmd': 'TOKEN_REPLY',
@@ -99,6 +96,49 @@ class TunnelInEndpoint(Endpoint):
         }
         self.tunnel.send(reply)
 
+    def recv_tokens(self, payload):
+        """
+        Receive a batch of tokens with consecutive sequence numbers, the reply
+        acks the number of tokens (from the first) that are in the queue.
+        """
+        sequencenbr = payload['sequencenbr']
+        tokens = payload['tokens']
+        acked = 0
+        new_token = False
+        for data in tokens:
+            try:
+                r = self.port.queue.com_write(Token.decode(data), self.peer_id, sequencenbr + acked)
+            except QueueFull:
+                self._queue_full(sequencenbr + acked)
+                break
+            if r == COMMIT_RESPONSE.invalid:
+                break
+            new_token = new_token or r == COMMIT_RESPONSE.handled
+            acked += 1
+        if new_token:
+            self.scheduler.tunnel_rx(self)
+        _log.debug("recv_tokens %s %s: %d + %d => %d" % (self.port.id, self.port.name, sequencenbr, len(tokens), acked))
+        self.pressure_last = sequencenbr + acked
+        reply = {
+            'cmd': 'TOKENS_REPLY',
+            'port_id': payload['port_id'],
+            'peer_port_id': payload['peer_port_id'],
+            'sequencenbr': sequencenbr,
+            'length': len(tokens),
+            'acked': acked,
+            'value': 'ACK' if acked == len(tokens) else 'NACK'
+        }
+        self.tunnel.send(reply)
+
+    def _queue_full(self, sequencenbr):
+        _log.debug("REMOTE QUEUE FULL %d %s" % (self.pressure_count, self.port.id))
+        if self.pressure[(self.pressure_count - 1) % PRESSURE_LENGTH][0] != sequencenbr:
+            # Log a QueueFull event
+            self.pressure[self.pressure_count % PRESSURE_LENGTH] = (sequencenbr, time.time())
+            self.pressure_count += 1
+            # Inform scheduler about potential pressure event
+            self.scheduler.trigger_pressure_event(self.port.owner.id)
+
     def set_peer_port_id(self, id):
         if self.peer_id is None:
             # If not set previously set it now
@@ -111,9 +151,12 @@ class TunnelInEndpoint(Endpoint):
 
 class TunnelOutEndpoint(Endpoint):
 
-    """docstring for TunnelOutEndpoint"""
+    """
+    Sends tokens over a tunnel, either one TOKEN message per token or, when the
+    peer supports it (window > 0), TOKENS messages with up to window tokens unacked.
+    """
 
-    def __init__(self, port, tunnel, peer_node_id, peer_port_id, peer_port_properties, scheduler):
+    def __init__(self, port, tunnel, peer_node_id, peer_port_id, peer_port_properties, scheduler, window=0):
         super(TunnelOutEndpoint, self).__init__(port)
         self.tunnel = tunnel
         self.peer_id = peer_port_id
@@ -123,6 +166,9 @@ class TunnelOutEndpoint(Endpoint):
         # Keep track of acked tokens, only contains something post call if acks comes out of order
         self.sequencenbrs_acked = []
         self.bulk = True
+        self.window = window
+        # Number of tokens sent in TOKENS messages and not yet replied to
+        self.in_flight = 0
 
     def __str__(self):
         str = super(TunnelOutEndpoint, self).__str__()
@@ -161,16 +207,36 @@ class TunnelOutEndpoint(Endpoint):
             # FIXME implement ABORT
             pass
 
+    def reply_batch(self, sequencenbr, length, acked, status):
+        """Reply on a TOKENS message, the first acked tokens are acked and the rest NACKed"""
+        _log.debug("Reply on port %s/%s/%s [%i+%i] %i %s" % (self.port.owner.name, self.peer_id, self.port.name,
+                                                             sequencenbr, length, acked, status))
+        self.in_flight = max(0, self.in_flight - length)
+        if status == 'ABORT':
+            # FIXME implement ABORT
+            return
+        if acked:
+            self.bulk = True
+            self.scheduler.tunnel_tx_ack(self)
+            for n in range(sequencenbr, sequencenbr + acked):
+                self._commit(n)
+        if acked < length:
+            self._reply_nack(sequencenbr + acked, status)
+
     def _reply_ack(self, sequencenbr, status):
         # Back to full send speed directly
         self.bulk = True
         # Maybe someone can fill the queue again
         self.scheduler.tunnel_tx_ack(self)
+        self._commit(sequencenbr)
+
+    def _commit(self, sequencenbr):
         r = self.port.queue.com_commit(self.peer_id, sequencenbr)
         if r == COMMIT_RESPONSE.handled or r == COMMIT_RESPONSE.invalid:
-            return
-        self.sequencenbrs_acked.append(sequencenbr)
-        self.sequencenbrs_acked.sort()
+            if not self.sequencenbrs_acked:
+                return
+        else:
+            bisect.insort(self.sequencenbrs_acked, sequencenbr)
         for n in self.sequencenbrs_acked[:]:
             r = self.port.queue.com_commit(self.peer_id, n)
             if r == COMMIT_RESPONSE.handled or r == COMMIT_RESPONSE.invalid:
@@ -202,13 +268,41 @@ class TunnelOutEndpoint(Endpoint):
             'port_id': self.port.id
         })
 
+    def _send_tokens(self, max_length):
+        tokens = []
+        while len(tokens) < max_length and self.port.queue.tokens_available(1, self.peer_id):
+            sequencenbr, token = self.port.queue.com_peek(self.peer_id)
+            tokens.append(token.encode())
+        length = len(tokens)
+        first = sequencenbr - length + 1
+        _log.debug("Send on port  %s/%s/%s [%i+%i] BATCH" % (self.port.owner.name,
+                                                            self.peer_id,
+                                                            self.port.name,
+                                                            first,
+                                                            length))
+        self.in_flight += length
+        self.tunnel.send({
+            'cmd': 'TOKENS',
+            'tokens': tokens,
+            'peer_port_id': self.peer_id,
+            'sequencenbr': first,
+            'port_id': self.port.id
+        })
+
     def use_monitor(self):
         return True
 
     def communicate(self, *args, **kwargs):
         # FIXME uses internal queue attributes
         sent = False
-        if self.bulk:
+        if self.bulk and self.window:
+            if self.port.queue.com_is_committed(self.peer_id):
+                # Nothing outstanding, e.g. tokens were NACKed or replies lost
+                self.in_flight = 0
+            while self.in_flight < self.window and self.port.queue.tokens_available(1, self.peer_id):
+                self._send_tokens(min(BATCH_LENGTH, self.window - self.in_flight))
+                sent = True
+        elif self.bulk:
             # Send all we have, since other side seems to keep up
             while self.port.queue.tokens_available(1, self.peer_id):
                 sent = True
@@ -221,8 +315,6 @@ class TunnelOutEndpoint(Endpoint):
             # Make sure that resend will be tried in backoff seconds
             self.scheduler.tunnel_tx_throttle(self)
         return sent
-        
-        
 
     def get_peer(self):
         return (self.peer_node_id, self.peer_id)
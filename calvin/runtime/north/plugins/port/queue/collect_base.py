@@ -15,7 +15,8 @@
 # limitations under the License.
 
 from calvin.runtime.north.calvin_token import Token
-from calvin.runtime.north.plugins.port.queue.common import QueueFull, COMMIT_RESPONSE
+from calvin.runtime.north.plugins.port.queue.common import QueueFull, COMMIT_RESPONSE, encode_tokens, decode_tokens,\
+                                                           compact_queue_state
 from calvin.runtime.north.plugins.port import DISCONNECT
 from calvin.utilities import calvinlogger
 
@@ -60,7 +61,6 @@ class CollectBase(object):
     def _state(self):
         state = {
             'queuetype': self._type,
-            'fifo': {p: [t.encode() for t in tokens] for p, tokens in self.fifo.items()},
             'N': self.N,
             'writers': self.writers,
             'write_pos': self.write_pos,
@@ -69,12 +69,23 @@ class CollectBase(object):
             'tags': self.tags,
             'tags-are-ordering': self.tags_are_ordering
         }
+        if compact_queue_state():
+            # Only the occupied slots of each peer's FIFO
+            state['tokens'] = {p: encode_tokens(tokens, self.N, self.read_pos.get(p, 0), self.write_pos.get(p, 0))
+                               for p, tokens in self.fifo.items()}
+        else:
+            state['fifo'] = {p: [t.encode() for t in tokens] for p, tokens in self.fifo.items()}
         return state
 
     def _set_state(self, state):
         self._type = state.get('queuetype')
-        self.fifo = {p: [Token.decode(t) for t in tokens] for p, tokens in state['fifo'].items()}
         self.N = state['N']
+        if 'fifo' in state:
+            # All slots, from runtimes before the compact state
+            self.fifo = {p: [Token.decode(t) for t in tokens] for p, tokens in state['fifo'].items()}
+        else:
+            self.fifo = {p: decode_tokens(tokens, self.N, state['read_pos'].get(p, 0))
+                         for p, tokens in state['tokens'].items()}
         self.writers = state['writers']
         self.write_pos = state['write_pos']
         self.read_pos = state['read_pos']
@@ -15,9 +15,40 @@
 # limitations under the License.
 
 from calvin.utilities.utils import enum
+from calvin.utilities import calvinconfig
+from calvin.runtime.north.calvin_token import Token
+
+_conf = calvinconfig.get()
 
 COMMIT_RESPONSE = enum('handled', 'unhandled', 'invalid')
 
+
+def compact_queue_state():
+    """Queue states with only the occupied slots ('tokens'), otherwise all slots ('fifo') as older runtimes expect"""
+    return _conf.get(None, 'compact_queue_state')
+
+
+def encode_tokens(fifo, N, first_pos, write_pos):
+    """Encode the occupied slots, positions first_pos to write_pos, of the ring buffer fifo"""
+    return [fifo[pos % N].encode() for pos in range(first_pos, write_pos)]
+
+
+def slots(tokens, N, first_pos):
+    """All N slots of a ring buffer with the encoded tokens placed from position first_pos"""
+    fifo = [Token(0).encode()] * N
+    for pos, data in enumerate(tokens, first_pos):
+        fifo[pos % N] = data
+    return fifo
+
+
+def decode_tokens(tokens, N, first_pos):
+    """Ring buffer of N slots with the encoded tokens placed from position first_pos"""
+    fifo = [Token(0)] * N
+    for pos, data in enumerate(tokens, first_pos):
+        fifo[pos % N] = Token.decode(data)
+    return fifo
+
+
 class QueueNone(object):
     def __init__(self):
         super(QueueNone, self).__init__()
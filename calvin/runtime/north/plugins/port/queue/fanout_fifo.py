@@ -15,7 +15,8 @@
 # limitations under the License.
 
 from calvin.runtime.north.calvin_token import Token
-from calvin.runtime.north.plugins.port.queue.common import QueueFull, QueueEmpty, COMMIT_RESPONSE
+from calvin.runtime.north.plugins.port.queue.common import QueueFull, QueueEmpty, COMMIT_RESPONSE, decode_tokens,\
+                                                           compact_queue_state
 from calvin.runtime.north.plugins.port import DISCONNECT
 from calvin.utilities import calvinlogger
 
@@ -25,15 +26,25 @@ class FanoutFIFO(object):
 
     """
     Default FIFO, all tokens to all peers
+
+    The FIFO is a ring buffer holding plain values with a separate array of
+    token classes (None for data that was not written as a token), tokens
+    are recreated when read.
     """
 
+    # __dict__ is only created when other attributes are set, e.g. methods mocked in tests
+    __slots__ = ('_values', '_types', 'N', 'direction', 'nbr_peers', 'readers',
+                 'write_pos', 'read_pos', 'tentative_read_pos', 'reader_offset',
+                 '_slowest', '_at_slowest', '_type', 'writer', 'exhausted_tokens', 'termination', '__dict__')
+
     def __init__(self, port_properties, peer_port_properties):
         super(FanoutFIFO, self).__init__()
         # Set default queue length to 4 if not specified
         length = port_properties.get('queue_length', 4)
         # Compensate length for FIFO having an unused slot
         length += 1
-        self.fifo = [Token(0)] * length
+        self._values = [0] * length
+        self._types = [Token] * length
         self.N = length
         self.direction = port_properties.get('direction', None)
         self.nbr_peers = port_properties.get('nbr_peers', 1)
@@ -44,6 +55,9 @@ class FanoutFIFO(object):
         self.read_pos = {}
         self.tentative_read_pos = {}
         self.reader_offset = {}
+        # Read position of the slowest reader and number of readers at that position
+        self._slowest = 0
+        self._at_slowest = 0
         self._type = "fanout_fifo"
         self.writer = None  # Not part of state, assumed not needed in migrated information
         self.exhausted_tokens = {}
@@ -52,10 +66,44 @@ class FanoutFIFO(object):
     def __str__(self):
         return "Tokens: %s, w:%i, r:%s, tr:%s" % (self.fifo, self.write_pos, self.read_pos, self.tentative_read_pos)
 
+    @property
+    def fifo(self):
+        """The slots of the ring buffer as tokens (or data)"""
+        return [self._get(i) for i in range(self.N)]
+
+    def _get(self, index):
+        token_class = self._types[index]
+        value = self._values[index]
+        return value if token_class is None else token_class(value)
+
+    def _put(self, index, data):
+        if isinstance(data, Token):
+            self._values[index] = data.value
+            self._types[index] = data.__class__
+        else:
+            self._values[index] = data
+            self._types[index] = None
+
+    def _update_slowest(self):
+        positions = self.read_pos.values()
+        self._slowest = min(positions) if positions else 0
+        self._at_slowest = positions.count(self._slowest)
+
+    def _set_read_pos(self, reader, pos):
+        old_pos = self.read_pos[reader]
+        if pos == old_pos:
+            return
+        self.read_pos[reader] = pos
+        if pos < self._slowest:
+            self._update_slowest()
+        elif old_pos == self._slowest:
+            self._at_slowest -= 1
+            if not self._at_slowest:
+                self._update_slowest()
+
     def _state(self):
         state = {
             'queuetype': self._type,
-            'fifo': [t.encode() for t in self.fifo],
             'N': self.N,
             'readers': list(self.readers),
             'write_pos': self.write_pos,
@@ -63,17 +111,32 @@ class FanoutFIFO(object):
             'tentative_read_pos': self.tentative_read_pos,
             'reader_offset': self.reader_offset
         }
+        if compact_queue_state():
+            # Only the occupied slots, from the slowest reader's position
+            first_pos = self._slowest if self.read_pos else self.write_pos
+            state['tokens'] = [self._get(pos % self.N).encode() for pos in range(first_pos, self.write_pos)]
+        else:
+            state['fifo'] = [self._get(i).encode() for i in range(self.N)]
         return state
 
     def _set_state(self, state):
         self._type = state.get('queuetype',"fanout_fifo")
-        self.fifo = [Token.decode(d) for d in state['fifo']]
         self.N = state['N']
+        self._values = [0] * self.N
+        self._types = [Token] * self.N
         self.readers = set(state['readers'])
         self.write_pos = state['write_pos']
         self.read_pos = state['read_pos']
         self.tentative_read_pos = state['tentative_read_pos']
         self.reader_offset = state.get('reader_offset', {pid: 0 for pid in self.readers})
+        self._update_slowest()
+        if 'fifo' in state:
+            # All slots, from runtimes before the compact state
+            fifo = [Token.decode(d) for d in state['fifo']]
+        else:
+            fifo = decode_tokens(state['tokens'], self.N, self._slowest if self.read_pos else self.write_pos)
+        for i, token in enumerate(fifo):
+            self._put(i, token)
 
     @property
     def queue_type(self):
@@ -94,7 +157,7 @@ class FanoutFIFO(object):
         if len(self.readers) > self.nbr_peers:
             self.nbr_peers = len(self.readers)
             # Replicated actor connect for first time, start from oldest possible
-            oldest = min(self.read_pos.values())
+            oldest = self._slowest
             #_log.info("ADD_READER %s %s %d" % (reader, str(id(self)), oldest))
             self.reader_offset[reader] = oldest
             self.read_pos[reader] = oldest
@@ -103,6 +166,7 @@ class FanoutFIFO(object):
             self.reader_offset[reader] = 0
             self.read_pos[reader] = 0
             self.tentative_read_pos[reader] = 0
+        self._update_slowest()
 
     def remove_reader(self, reader):
         if reader not in self.readers:
@@ -112,6 +176,7 @@ class FanoutFIFO(object):
         del self.reader_offset[reader]
         self.readers.discard(reader)
         self.nbr_peers -= 1
+        self._update_slowest()
 
     def is_exhausting(self, peer_id=None):
         if peer_id is None:
@@ -128,7 +193,7 @@ class FanoutFIFO(object):
             # Retrive remaining tokens to be returned
             tokens = []
             for read_pos in range(self.read_pos[peer_id], self.write_pos):
-                tokens.append([read_pos, self.fifo[read_pos % self.N]])
+                tokens.append([read_pos, self._get(read_pos % self.N)])
             # Remove the peer, so no more waiting for this peer to read
             self.remove_reader(peer_id)
             _log.debug("Send exhaust tokens %s" % tokens)
@@ -160,7 +225,7 @@ class FanoutFIFO(object):
         # If fully consumed remove peer_ids in tokens
         for peer_id in tokens.keys():
             if (self.termination.get(peer_id, (-1,))[0] in [DISCONNECT.EXHAUST_PEER_RECV, DISCONNECT.EXHAUST_INPORT] and
-                min(self.read_pos.values() or [0]) == self.write_pos):
+                self._slowest == self.write_pos):
                 del self.termination[peer_id]
                 # Acting as inport then only one reader, remove it if still around
                 try:
@@ -194,37 +259,66 @@ class FanoutFIFO(object):
         if not self.slots_available(1, metadata):
             raise QueueFull()
         write_pos = self.write_pos
-        self.fifo[write_pos % self.N] = data
+        self._put(write_pos % self.N, data)
         self.write_pos = write_pos + 1
         return True
 
+    def write_many(self, tokens, metadata):
+        """Write all tokens or none of them"""
+        if not self.slots_available(len(tokens), metadata):
+            raise QueueFull()
+        N = self.N
+        write_pos = self.write_pos
+        for data in tokens:
+            self._put(write_pos % N, data)
+            write_pos += 1
+        self.write_pos = write_pos
+        return True
+
     def slots_available(self, length, metadata):
-        last_readpos = min(self.read_pos.values() or [0])
-        return (self.N - ((self.write_pos - last_readpos) % self.N) - 1) >= length
+        return (self.N - ((self.write_pos - self._slowest) % self.N) - 1) >= length
 
     def tokens_available(self, length, metadata):
         if not self.readers:
             return False
-        if metadata not in self.readers:
+        try:
+            return (self.write_pos - self.tentative_read_pos[metadata]) >= length
+        except KeyError:
             raise Exception("No reader %s in %s" % (metadata, self.readers))
-        return (self.write_pos - self.tentative_read_pos[metadata]) >= length
 
     #
     # Reading is done tentatively until committed
     #
     def peek(self, metadata):
-        if metadata not in self.readers:
+        try:
+            read_pos = self.tentative_read_pos[metadata]
+        except KeyError:
             raise Exception("Unknown reader: '%s'" % metadata)
-        if not self.tokens_available(1, metadata):
+        if read_pos >= self.write_pos:
             raise QueueEmpty(reader=metadata)
-        read_pos = self.tentative_read_pos[metadata]
-        data = self.fifo[read_pos % self.N]
         self.tentative_read_pos[metadata] = read_pos + 1
-        return data
+        index = read_pos % self.N
+        token_class = self._types[index]
+        if token_class is None:
+            return self._values[index]
+        return token_class(self._values[index])
+
+    def peek_many(self, metadata, length):
+        """Tentatively read length tokens, all or none of them"""
+        try:
+            read_pos = self.tentative_read_pos[metadata]
+        except KeyError:
+            raise Exception("Unknown reader: '%s'" % metadata)
+        if self.write_pos - read_pos < length:
+            raise QueueEmpty(reader=metadata)
+        self.tentative_read_pos[metadata] = read_pos + length
+        N = self.N
+        get = self._get
+        return [get(pos % N) for pos in range(read_pos, read_pos + length)]
 
     def commit(self, metadata):
         _log.debug("COMMIT EXHAUSTING???")
-        self.read_pos[metadata] = self.tentative_read_pos[metadata]
+        self._set_read_pos(metadata, self.tentative_read_pos[metadata])
         remove = []
         for peer_id, exhausted_tokens in self.exhausted_tokens.items():
             if self._transfer_exhaust_tokens(peer_id, self.exhausted_tokens[peer_id]):
@@ -237,7 +331,7 @@ class FanoutFIFO(object):
         if self.termination:
             _log.debug("COMMIT %s %s" % (metadata, {k:DISCONNECT.reverse_mapping[v[0]] for k, v in self.termination.items()}))
         if (self.termination.get(metadata, (-1,))[0] in [DISCONNECT.EXHAUST_PEER_RECV, DISCONNECT.EXHAUST_INPORT] and
-            min(self.read_pos.values() or [0]) == self.write_pos and
+            self._slowest == self.write_pos and
             self.termination.get(metadata, (-1, False))[1]):
             del self.termination[metadata]
             terminated = True
@@ -281,7 +375,7 @@ class FanoutFIFO(object):
             return COMMIT_RESPONSE.invalid
         if self.read_pos[reader] < self.tentative_read_pos[reader]:
             if sequence_nbr == self.read_pos[reader]:
-                self.read_pos[reader] += 1
+                self._set_read_pos(reader, sequence_nbr + 1)
                 return COMMIT_RESPONSE.handled
             else:
                 return COMMIT_RESPONSE.unhandled
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from calvin.runtime.north.plugins.port.queue.common import slots, compact_queue_state
+
+
+def can_share(in_queue, out_queue, reader):
+    """
+    True if an inport (reader) with queue in_queue can read directly from
+    out_queue, i.e. both are plain FIFOs and the inport has no unread tokens
+    or pending exhaustion, and has received exactly the tokens the outport
+    has committed for it.
+    """
+    if in_queue.queue_type != "fanout_fifo" or out_queue.queue_type != "fanout_fifo":
+        return False
+    if isinstance(in_queue, SharedFIFOReader):
+        return in_queue.shared is out_queue
+    if in_queue.exhausted_tokens or in_queue.termination:
+        return False
+    if any(pos != in_queue.write_pos for pos in in_queue.read_pos.values()):
+        return False
+    if reader in out_queue.readers:
+        sequence_nbr = out_queue.read_pos[reader] - out_queue.reader_offset[reader]
+    else:
+        sequence_nbr = 0
+    return in_queue.write_pos == sequence_nbr
+
+
+class SharedFIFOReader(object):
+
+    """
+    Inport view of an outport's FanoutFIFO, used when both ports are local.
+    Tokens written to the outport are directly readable by the inport, no
+    endpoint needs to communicate them.
+    """
+
+    def __init__(self, shared, reader, writer):
+        super(SharedFIFOReader, self).__init__()
+        self.shared = shared
+        self.reader = reader
+        self.writer = writer
+        # Reading is done directly in the shared queue
+        self.tokens_available = shared.tokens_available
+        self.peek = shared.peek
+        self.peek_many = shared.peek_many
+        self.commit = shared.commit
+        self.cancel = shared.cancel
+
+    def __str__(self):
+        return "Shared %s" % str(self.shared)
+
+    @property
+    def queue_type(self):
+        return self.shared.queue_type
+
+    def get_peers(self):
+        return set([self.writer])
+
+    def is_exhausting(self, peer_id=None):
+        # Exhaustion is done after the queue is unshared
+        return False
+
+    def any_outstanding_exhaustion_tokens(self):
+        return False
+
+    def _state(self):
+        """State of an inport FIFO holding the unread tokens"""
+        shared = self.shared
+        reader = self.reader
+        read_pos = shared.read_pos[reader]
+        sequence_nbr = read_pos - shared.reader_offset[reader]
+        tokens = [shared._get(pos % shared.N).encode() for pos in range(read_pos, shared.write_pos)]
+        write_pos = sequence_nbr + shared.write_pos - read_pos
+        state = {
+            'queuetype': shared.queue_type,
+            'N': shared.N,
+            'readers': [reader],
+            'write_pos': write_pos,
+            'read_pos': {reader: sequence_nbr},
+            'tentative_read_pos': {reader: sequence_nbr},
+            'reader_offset': {reader: 0}
+        }
+        if compact_queue_state():
+            state['tokens'] = tokens
+        else:
+            state['fifo'] = slots(tokens, shared.N, sequence_nbr)
+        return state
+
+    def unshare(self, queue):
+        """
+        Move the unread tokens to queue, which becomes the inport's own queue,
+        as if they were communicated. Returns queue.
+        """
+        queue._set_state(self._state())
+        queue.add_writer(self.writer, {})
+        self.shared.tentative_read_pos[self.reader] = self.shared.write_pos
+        self.shared.commit(self.reader)
+        return queue
@@ -1,9 +1,10 @@
 import unittest
 import pytest
+from mock import patch
 
 pytest_unittest = pytest.mark.unittest
 
-from calvin.runtime.north.calvin_token import Token
+from calvin.runtime.north.calvin_token import Token, ExceptionToken, EOSToken
 from calvin.runtime.north.plugins.port import queue, DISCONNECT
 from calvin.runtime.north.plugins.port.queue.common import QueueFull, QueueEmpty
 
@@ -174,6 +175,39 @@ class TestFanoutFIFO(unittest.TestCase):
         for i in [1,2,3]:
             self.assertEqual(port.peek("reader-%d" % i).value, "data-%d" % 2)
 
+    @patch('calvin.runtime.north.plugins.port.queue.fanout_fifo.compact_queue_state', return_value=True)
+    def testSerializeOccupiedSlots(self, compact):
+        for i in [1,2,3]:
+            self.outport.add_reader("reader-%d" % i, {})
+        # wrap around the ring buffer
+        for i in range(6):
+            self.outport.write(Token("data-%d" % i), None)
+            for j in [1,2,3]:
+                self.outport.peek("reader-%d" % j)
+                self.outport.commit("reader-%d" % j)
+        self.outport.write(Token("data-6"), None)
+        self.outport.write(Token("data-7"), None)
+        self.outport.peek("reader-1")
+        self.outport.commit("reader-1")
+        state = self.outport._state()
+        self.assertEqual(len(state['tokens']), 2)
+        port = self.create_port()
+        port._set_state(state)
+        self.assertEqual(port.peek("reader-1").value, "data-7")
+        for i in [2,3]:
+            self.assertEqual(port.peek("reader-%d" % i).value, "data-6")
+
+    def testSetStateAllSlots(self):
+        # Default, as older runtimes expect
+        self.outport.add_reader("reader-1", {})
+        self.outport.write(Token("data-1"), None)
+        state = self.outport._state()
+        self.assertEqual(len(state['fifo']), state['N'])
+        assert 'tokens' not in state
+        port = self.create_port()
+        port._set_state(state)
+        self.assertEqual(port.peek("reader-1").value, "data-1")
+
     def testExhaust_Normal(self):
         for i in [1,2,3]:
             self.outport.add_reader("reader-%d" % i, {})
@@ -219,4 +253,59 @@ class TestFanoutFIFO(unittest.TestCase):
         # terminate reason not applicable
         exhausted_tokens = self.outport.exhaust("reader-1", DISCONNECT.EXHAUST_INPORT)
         self.assertEqual(exhausted_tokens, [])
-                
\ No newline at end of file
+                
+    def testWriteMany(self):
+        self.outport.add_reader("reader", {})
+        self.outport.write_many([Token(1), Token(2), "data"], None)
+        self.assertEqual(self.outport.write_pos, 3)
+        self.assertEqual(self.outport.peek("reader").value, 1)
+        self.assertEqual(self.outport.peek("reader").value, 2)
+        self.assertEqual(self.outport.peek("reader"), "data")
+        # All or nothing
+        with self.assertRaises(QueueFull):
+            self.outport.write_many(["data"] * (self.outport.N - 3), None)
+        self.assertEqual(self.outport.write_pos, 3)
+
+    def testPeekMany(self):
+        self.outport.add_reader("reader-1", {})
+        self.outport.add_reader("reader-2", {})
+        for i in [1,2,3]:
+            self.outport.write(Token(i), None)
+        tokens = self.outport.peek_many("reader-1", 2)
+        self.assertEqual([t.value for t in tokens], [1, 2])
+        with self.assertRaises(QueueEmpty):
+            self.outport.peek_many("reader-1", 2)
+        self.assertEqual(self.outport.peek("reader-1").value, 3)
+        self.outport.cancel("reader-1")
+        tokens = self.outport.peek_many("reader-2", 3)
+        self.assertEqual([t.value for t in tokens], [1, 2, 3])
+        with self.assertRaises(Exception):
+            self.outport.peek_many("unknown reader", 1)
+
+    def testTokenTypes(self):
+        self.outport.add_reader("reader", {})
+        self.outport.write(ExceptionToken("error"), None)
+        self.outport.write(EOSToken(), None)
+        self.outport.write(Token(1), None)
+        tokens = [self.outport.peek("reader") for i in [1,2,3]]
+        self.assertEqual([type(t) for t in tokens], [ExceptionToken, EOSToken, Token])
+        self.assertEqual(tokens[0].value, "error")
+
+    def testSlowestReader(self):
+        self.outport.add_reader("reader-1", {})
+        self.outport.add_reader("reader-2", {})
+        length = self.outport.N - 1
+        for i in range(length):
+            self.outport.write("data", None)
+        self.assertFalse(self.outport.slots_available(1, None))
+        self.outport.peek_many("reader-1", length)
+        self.outport.commit("reader-1")
+        # reader-2 still holds all slots
+        self.assertFalse(self.outport.slots_available(1, None))
+        self.outport.peek_many("reader-2", 2)
+        self.outport.commit("reader-2")
+        self.assertTrue(self.outport.slots_available(2, None))
+        self.assertFalse(self.outport.slots_available(3, None))
+        # Removing the slowest reader frees its slots
+        self.outport.remove_reader("reader-2")
+        self.assertTrue(self.outport.slots_available(length, None))
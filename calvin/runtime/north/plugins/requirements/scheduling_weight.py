@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from calvin.utilities import dynops
+
+req_type = "placement"
+
+def req_op(node, weight=1.0, actor_id=None, component=None):
+    """
+    Scheduling weight of actor, used by the fair_share scheduler.
+    Does not restrict placement, i.e. returns an infinite set
+    """
+    it = dynops.Infinite()
+    return it
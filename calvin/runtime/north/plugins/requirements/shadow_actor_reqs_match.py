@@ -24,12 +24,16 @@ req_type = "placement"
 def get_description(out_iter, kwargs, final, signature):
     _log.debug("shadow_match:get_description BEGIN")
     if final[0]:
+        # The descriptions are collected and fetched in one request
         _log.debug("shadow_match:get_description FINAL")
+        if kwargs['signatures']:
+            kwargs['node'].storage.get_many_iter('actor_type-', kwargs['signatures'], it=out_iter)
+            kwargs['signatures'] = []
         out_iter.auto_final(kwargs['counter'])
     else:
         _log.debug("shadow_match:get_description ACT")
         kwargs['counter'] += 1
-        kwargs['node'].storage.get_iter('actor_type-', signature, it=out_iter)
+        kwargs['signatures'].append(signature)
     _log.debug("shadow_match:get_description END")
 
 def extract_capabilities(out_iter, kwargs, final, value):
@@ -116,7 +120,8 @@ def req_op(node, signature, shadow_params, actor_id=None, component=None):
     signature_iter = node.storage.get_index_iter(['actor', 'signature', signature])
     signature_iter.set_name("shadow_match:sign")
     # Lookup description for all matching actor types
-    description_iter = dynops.Map(get_description, signature_iter, eager=True, counter=0, node=node)
+    description_iter = dynops.Map(get_description, signature_iter, eager=True, counter=0, signatures=[],
+                                  node=node)
     description_iter.set_name("shadow_match:desc")
     # Filter with matching parameters and return set of needed capabilities
     extract_caps_iter = dynops.Map(extract_capabilities, description_iter, eager=True, 
@@ -123,6 +123,11 @@ class StorageProxy(StorageBase):
                 kwargs['value'] = payload['value']
             if 'response' in payload:
                 kwargs['value'] = calvinresponse.CalvinResponse(encoded=payload['response'])
+            if 'values' in payload:
+                # Reply to a *_MANY request, CalvinResponse values are sent separately in 'responses'
+                kwargs['values'] = dict(payload['values'])
+                kwargs['values'].update({k: calvinresponse.CalvinResponse(encoded=r)
+                                         for k, r in payload.get('responses', {}).iteritems()})
             self.replies.pop(payload['msg_uuid'])(**kwargs)
 
     def send(self, cmd, msg, cb):
@@ -150,6 +155,18 @@ class StorageProxy(StorageBase):
         _log.analyze(self.node.id, "+ CLIENT", {'key': key})
         self.send(cmd='DELETE',msg={'key':key}, cb=cb)
 
+    def get_many(self, keys, cb=None):
+        _log.analyze(self.node.id, "+ CLIENT", {'keys': keys})
+        self.send(cmd='GET_MANY',msg={'keys': list(keys)}, cb=cb)
+
+    def set_many(self, items, cb=None):
+        _log.analyze(self.node.id, "+ CLIENT", {'items': items})
+        self.send(cmd='SET_MANY',msg={'items': items}, cb=cb)
+
+    def append_many(self, items, cb=None):
+        _log.analyze(self.node.id, "+ CLIENT", {'items': items})
+        self.send(cmd='APPEND_MANY',msg={'items': items}, cb=cb)
+
     def get_concat(self, key, cb=None):
         """
             Gets a value from the storage
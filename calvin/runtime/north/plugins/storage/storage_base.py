@@ -36,9 +36,13 @@ class StorageBase(object):
             append:
                 key: The key
                 status: True or False
+            get_many/set_many/append_many:
+                values: Dictionary with the value or status for each key
             bootstrap:
                 status: List of True and/or false:s
 
+        The *_many functions have default implementations doing one request per key,
+        plugins that can handle several keys in one request should override them.
     """
     def __init__(self, node=None):
         pass
@@ -77,6 +81,39 @@ class StorageBase(object):
     def append(self, key, value, cb=None):
         raise NotImplementedError()
 
+    def _many(self, func, requests, cb):
+        values = {}
+        if not requests:
+            if cb:
+                cb(values={})
+            return
+
+        def _collect(key, value):
+            values[key] = value
+            if len(values) == len(requests) and cb:
+                cb(values=values)
+
+        for key, args in requests.iteritems():
+            func(key, *args, cb=_collect)
+
+    def get_many(self, keys, cb=None):
+        """
+            Gets the values for all keys from the storage
+        """
+        self._many(self.get, {key: () for key in keys}, cb)
+
+    def set_many(self, items, cb=None):
+        """
+            Set all key, value pairs in dictionary items in the storage
+        """
+        self._many(self.set, {key: (value,) for key, value in items.iteritems()}, cb)
+
+    def append_many(self, items, cb=None):
+        """
+            Append the list of values to the set for each key in dictionary items
+        """
+        self._many(self.append, {key: (value,) for key, value in items.iteritems()}, cb)
+
     def remove(self, key, value, cb=None):
         raise NotImplementedError()
 
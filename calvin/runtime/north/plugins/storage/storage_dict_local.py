@@ -16,6 +16,7 @@
 
 from calvin.runtime.south.async import async
 from calvin.requests import calvinresponse
+from calvin.utilities.indexdict import IndexDict
 import itertools
 
 class StorageLocal(object):
@@ -45,7 +46,7 @@ class StorageLocal(object):
 
     """
     def __init__(self, node=None):
-        self._data = {}
+        self._data = IndexDict()
 
     def _dummy_cb(self, *args, **kwargs):
         pass
@@ -76,6 +77,26 @@ class StorageLocal(object):
         else:
             async.DelayedCall(0, cb, key, calvinresponse.CalvinResponse(calvinresponse.NOT_FOUND))
 
+    def get_many(self, keys, cb=None):
+        cb = cb or self._dummy_cb
+        values = {key: self._data[key] if key in self._data else
+                       calvinresponse.CalvinResponse(calvinresponse.NOT_FOUND) for key in keys}
+        async.DelayedCall(0, cb, values=values)
+
+    def set_many(self, items, cb=None):
+        cb = cb or self._dummy_cb
+        self._data.update(items)
+        async.DelayedCall(0, cb, values={key: calvinresponse.CalvinResponse(True) for key in items})
+
+    def append_many(self, items, cb=None):
+        cb = cb or self._dummy_cb
+        for key, value in items.iteritems():
+            if key in self._data and isinstance(self._data[key], set):
+                self._data[key] |= set(value)
+            else:
+                self._data[key] = set(value)
+        async.DelayedCall(0, cb, values={key: calvinresponse.CalvinResponse(True) for key in items})
+
     def delete(self, key, cb=None):
         cb = cb or self._dummy_cb
         del self._data[key]
@@ -135,9 +156,7 @@ class StorageLocal(object):
         cb = cb or self._dummy_cb
         index = [prefix] + index
         # Collect a value set from all key-indexes that include the indexes, always compairing full index levels
-        values = set(itertools.chain(
-            *(v for k, v in self._data.items()
-                if all(map(lambda x, y: False if x is None else True if y is None else x==y, k, index)))))
+        values = set(itertools.chain(*(v for k, v in self._data.index_items(index))))
         async.DelayedCall(0, cb, list(values))
 
     def bootstrap(self, addrs, cb=None):
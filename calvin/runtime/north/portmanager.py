@@ -166,6 +166,12 @@ class PortManager(object):
             else:
                 raise e.response
 
+    def prepare_tunnels(self, peer_node_ids):
+        """ Request token tunnels to the peer nodes ahead of connecting ports, e.g. for a live migration """
+        token_tunnel = self.connections_data['TunnelConnection']
+        for peer_node_id in set(peer_node_ids) - set([self.node.id, None]):
+            token_tunnel.get_tunnel(peer_node_id)
+
     def _connect(self, local_port=None, callback=None, status=None, port_meta=None):
         """ Do the connection of ports, all neccessary information supplied but
             maybe not all pre-requisites for remote connections.
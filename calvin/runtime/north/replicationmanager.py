@@ -22,6 +22,8 @@ from calvin.utilities.calvin_callback import CalvinCB
 from calvin.utilities.calvinuuid import uuid
 from calvin.utilities.calvinlogger import get_logger
 from calvin.utilities import dynops
+from calvin.utilities import state_delta
+from calvin.utilities import calvinconfig
 from calvin.utilities.requirement_matching import ReqMatch
 from calvin.utilities.replication_defs import REPLICATION_STATUS, PRE_CHECK
 from calvin.actorstore.store import GlobalStore
@@ -32,6 +34,7 @@ from calvin.runtime.north.plugins.port import DISCONNECT
 from calvin.utilities.utils import enum
 
 _log = get_logger(__name__)
+_conf = calvinconfig.get()
 
 
 class ReplicationId(object):
@@ -103,6 +106,8 @@ class ReplicationData(object):
         self.queued_lock_replication_ids = set([])  # We attempt to get lock against these
         self.queued_lock_callback = None
         self._missing_replica_time = 0
+        # {<node_id>: <replica state last sent to node>} used as base for the next replica's state
+        self.replica_bases = {}
 
     def state(self):
         state = {}
@@ -679,10 +684,15 @@ class ReplicationManager(object):
                 # Got all responses
                 self._replicate_cont(replication_data, state, connection_list, dst_node_id, callback=callback)
 
-        for port in rep_state['inports'].values():
-            self.node.storage.get_port(port['id'], cb=CalvinCB(_got_port, port=port, dir="in"))
-        for port in rep_state['outports'].values():
-            self.node.storage.get_port(port['id'], cb=CalvinCB(_got_port, port=port, dir="out"))
+        port_dirs = {p['id']: (p, "in") for p in rep_state['inports'].values()}
+        port_dirs.update({p['id']: (p, "out") for p in rep_state['outports'].values()})
+
+        def _got_ports(values):
+            for port_id, value in values.iteritems():
+                _got_port(port_id, value, *port_dirs[port_id])
+
+        # Lookup all ports in one request
+        self.node.storage.get_many("port-", port_dirs.keys(), cb=_got_ports)
 
     def _replicate_cont(self, replication_data, state, connection_list, dst_node_id, callback):
         cb_status = CalvinCB(self._replication_status_cb, replication_data=replication_data, cb=callback)
@@ -695,11 +705,42 @@ class ReplicationManager(object):
                     replication_id=replication_data.id,
                     actor_id=new_id, callback=cb_status, master_id=replication_data.original_actor_id, dst_node_id=dst_node_id))
         else:
-            self.node.proto.actor_new(
-                dst_node_id, CalvinCB(self._replicated, replication_id=replication_data.id,
-                                         actor_id=new_id, callback=cb_status, master_id=replication_data.original_actor_id,
-                                         dst_node_id=dst_node_id),
-                actor_type, state, None, connection_list=connection_list)
+            replicated_cb = CalvinCB(self._replicated, replication_id=replication_data.id,
+                                     actor_id=new_id, callback=cb_status, master_id=replication_data.original_actor_id,
+                                     dst_node_id=dst_node_id)
+            if not _conf.get(None, 'replica_state_delta'):
+                self.node.proto.actor_new(dst_node_id, replicated_cb, actor_type, state, None,
+                                          connection_list=connection_list)
+                return
+            # Replicas differ mostly in ids and names, send only the changes since the last replica to the node
+            # The base is only kept when the node has acked it, and is dropped while a replica is sent
+            base = replication_data.replica_bases.pop(dst_node_id, None)
+            sent_cb = CalvinCB(self._replica_sent, replication_data=replication_data, dst_node_id=dst_node_id,
+                               actor_type=actor_type, state=state, connection_list=connection_list,
+                               sent_state=copy.deepcopy(state), delta=base is not None, callback=replicated_cb)
+            if base is None:
+                self.node.proto.actor_new(dst_node_id, sent_cb, actor_type, state, None,
+                                          connection_list=connection_list, base_id=replication_data.id)
+            else:
+                self.node.proto.actor_new(dst_node_id, sent_cb, actor_type, state_delta.delta(base, state), None,
+                                          connection_list=connection_list, base_id=replication_data.id, delta=True)
+
+    def _replica_sent(self, status, replication_data, dst_node_id, actor_type, state, connection_list, sent_state,
+                      delta, callback):
+        if delta and status == calvinresponse.GONE:
+            # Base discarded by peer, send the full state
+            self.node.proto.actor_new(dst_node_id,
+                                      CalvinCB(self._replica_sent, replication_data=replication_data,
+                                               dst_node_id=dst_node_id, actor_type=actor_type, state=state,
+                                               connection_list=connection_list, sent_state=sent_state, delta=False,
+                                               callback=callback),
+                                      actor_type, state, None, connection_list=connection_list,
+                                      base_id=replication_data.id)
+            return
+        if status:
+            # The node keeps this state as the base of the next replica
+            replication_data.replica_bases[dst_node_id] = sent_state
+        callback(status)
 
     def _replicated(self, status, replication_id=None, actor_id=None, callback=None, master_id=None, dst_node_id=None):
         _log.analyze(self.node.id, "+", {'status': status, 'replication_id': replication_id, 'actor_id': actor_id})
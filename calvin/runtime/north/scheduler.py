@@ -16,6 +16,8 @@
 
 import sys
 import time
+import heapq
+import collections
 import random
 import logging
 
@@ -43,11 +45,17 @@ class BaseScheduler(object):
         self.node = node
         self.actor_mgr = actor_mgr
         self.done = False
+        # Heap of pending tasks, each task is [time, seq, func]
         self._tasks = []
+        # Pending due times per func (each a heap), for cheap "is X pending before T" checks
+        self._pending = {}
+        self._task_seq = 0
         self._scheduled = None
         # FIXME: later
         self._replication_interval = 2
         self._maintenance_delay = _conf.get(None, "maintenance_delay") or 300
+        # Max time given to an actor per round of firing
+        self._time_slice = _conf.get(None, "time_slice") or 0.020
         self._pressure_event_actor_ids = set([])
 
     # System entry point
@@ -99,6 +107,13 @@ class BaseScheduler(object):
     def unregister_endpoint(self, endpoint):
         pass
 
+    def link_actors(self, actor_id, peer_actor_id):
+        """Firing actor_id can make peer_actor_id able to fire, e.g. when sharing a queue"""
+        pass
+
+    def unlink_actors(self, actor_id, peer_actor_id):
+        pass
+
     def replication_direct(self, replication_id=None, delay=0):
         """ Schedule an (early) replication management for at least replication_id.
             Delay can be used for scaling that know when in future e.g. scaling-in
@@ -125,6 +140,10 @@ class BaseScheduler(object):
         """If nothing else is scheduled, this will be called after 60s"""
         pass
 
+    def statistics(self):
+        """Scheduler specific information, e.g. per actor counters"""
+        return {'scheduler': self.__class__.__name__}
+
     ######################################################################
     # Semi-private stuff, should be cleaned up later
     ######################################################################
@@ -137,17 +156,17 @@ class BaseScheduler(object):
         self.node.rm.replication_loop()
         # Need to only insert task if none before replication interval, otherwise build up more and more tasks
         tt = time.time() + self._replication_interval
-        if not any([t[0] < tt for t in self._tasks if t[1] == self._check_replication]):
+        if not self._pending_before(self._check_replication, tt):
             self.insert_task(self._check_replication, self._replication_interval)
-        _log.debug("Next replication loop in %s %d %d" % (str([t[0] - time.time() for t in self._tasks if t[1] == self._check_replication]),
-                    [t[1] == self._check_replication for t in self._tasks].index(True), len(self._tasks)))
+        _log.debug("Next replication loop in %s, %d tasks" % (str(self._pending_before(self._check_replication) - time.time()),
+                    len(self._tasks)))
         self.insert_task(self.strategy, 0)
 
     def _check_pressure(self):
         _log.debug("_check_pressure %s" % self._pressure_event_actor_ids)
         self.node.rm.check_pressure(self._pressure_event_actor_ids)
         self._pressure_event_actor_ids = set([])
-        if not [True for t in self._tasks if t[1] == self._check_pressure]:
+        if not self._pending_before(self._check_pressure):
             self.insert_task(self._check_pressure, 30)
 
     #
@@ -161,6 +180,7 @@ class BaseScheduler(object):
         # Enable denied actors again if access is permitted. Will try to migrate if access still denied.
         for actor in self.actor_mgr.denied_actors():
             actor.enable_or_migrate()
+            self._schedule_authorization_check(actor.authorization_valid_until)
         # TODO: try to migrate shadow actors as well.
         # Since we may have moved stuff around, schedule strategy
         self.insert_task(self.strategy, 0)
@@ -174,6 +194,31 @@ class BaseScheduler(object):
             return
         self.insert_task(self._maintenance_loop, 0)
 
+    #
+    # Authorization
+    #
+    def _authorized(self, actor):
+        """Return True if actor is allowed to fire, the decision is only re-evaluated when it might have changed"""
+        if time.time() < actor.authorization_valid_until:
+            return True
+        authorized = actor._authorized()
+        if authorized:
+            self._schedule_authorization_check(actor.authorization_valid_until)
+        return authorized
+
+    def _schedule_authorization_check(self, valid_until):
+        # Re-evaluate when the first authorization decision might change, e.g. actors not firing are denied in time
+        now = time.time()
+        if now < valid_until < float('inf') and not self._pending_before(self._check_authorizations, valid_until):
+            self.insert_task(self._check_authorizations, valid_until - now)
+
+    def _check_authorizations(self):
+        for actor in self.actor_mgr.enabled_actors():
+            if self._authorized(actor):
+                self._schedule_authorization_check(actor.authorization_valid_until)
+        # Denied actors might now be migrated
+        self.insert_task(self.strategy, 0)
+
     ######################################################################
     # Quite-private stuff, fairly generic
     ######################################################################
@@ -181,30 +226,39 @@ class BaseScheduler(object):
     def insert_task(self, what, delay):
         """Call to insert a task"""
         # Insert a task in time order,
-        # if it ends up first in list, re-schedule _process_next
+        # if it ends up first in queue, re-schedule _process_next
         t = time.time() + delay
-        # task is (time, func)
-        task = (t, what)
-        index = len(self._tasks)
-        if index:
-            for i, ti in enumerate(self._tasks):
-                if ti[0] > t:
-                    index = i
-                    break
-        # If list was empty => index = 0
-        # If slot found => index is insertion point
-        # If slot not found => index is length of list <=> append
-        # coalesce => don't add a task b/c we already will do that
-        coalesce = (index > 0 and delay == 0 and self._tasks[index-1][1] == what)
-        if coalesce:
+        # coalesce => don't add a task b/c we already will do that, i.e. the same
+        # func is already due and has not run yet
+        if delay == 0 and self._pending_before(what, t):
             return
-        self._tasks.insert(index, task)
-        # print "INSERTING TASK AT SLOT", index
-        # print "TASKS:", [(t, f.__name__) for t, f in self._tasks]
+        # task is [time, seq, func], seq keeps tasks with equal time in insertion order
+        self._task_seq += 1
+        task = [t, self._task_seq, what]
+        heapq.heappush(self._tasks, task)
+        heapq.heappush(self._pending.setdefault(what, []), t)
         # If we're first, reschedule
-        if index == 0:
+        if self._tasks[0] is task:
             self._schedule_next(delay, self._process_next)
 
+    def _pending_before(self, what, t=None):
+        """
+        Return the time of the earliest pending task for func 'what' if it is at or before time t
+        (any time if t is None), otherwise None.
+        """
+        times = self._pending.get(what)
+        if not times or (t is not None and times[0] > t):
+            return None
+        return times[0]
+
+    def _pop_task(self):
+        t, _, what = heapq.heappop(self._tasks)
+        times = self._pending[what]
+        heapq.heappop(times)
+        if not times:
+            del self._pending[what]
+        return t, what
+
     # Don't call directly
     def _schedule_next(self, delay, what):
         if self._scheduled:
@@ -215,10 +269,10 @@ class BaseScheduler(object):
     def _process_next(self):
         # Get next task from queue and do it unless next task is in the future,
         # in that case, schedule _process_next (this method) at that time
-        _, todo = self._tasks.pop(0)
+        _, todo = self._pop_task()
         todo()
         if self._tasks:
-            t, _ = self._tasks[0]
+            t = self._tasks[0][0]
             delay = max(0, t - time.time())
             self._schedule_next(delay, self._process_next)
         else:
@@ -250,7 +304,7 @@ class BaseScheduler(object):
 
         return did_fire_actor_ids
 
-    def _fire_actor(self, actor):
+    def _fire_actor(self, actor, time_slice=None):
         """
         Try to fire actions on actor on this runtime.
         Returns boolean that is True if actor fired
@@ -258,24 +312,25 @@ class BaseScheduler(object):
         #
         # First make sure we are allowed to run
         #
-        if not actor._authorized():
+        if not self._authorized(actor):
             return False
 
+        time_slice = time_slice or self._time_slice
         start_time = time.time()
-        actor_did_fire = False
+        firings = 0
         #
         # Repeatedly go over the action priority list
         #
         done = False
         while not done:
             did_fire, output_ok, exhausted = actor.fire()
-            actor_did_fire |= did_fire
             if did_fire:
+                firings += 1
                 #
                 # Limit time given to actors even if it could continue a new round of firing
                 #
                 time_spent = time.time() - start_time
-                done = time_spent > 0.020
+                done = time_spent > time_slice
             else:
                 #
                 # We reached the end of the list without ANY firing during this round
@@ -285,7 +340,16 @@ class BaseScheduler(object):
                 actor._handle_exhaustion(exhausted, output_ok)
                 done = True
 
-        return actor_did_fire
+        time_spent = time.time() - start_time
+        if time_spent > 2 * time_slice:
+            # A single firing overran the time slice
+            actor._warn_slow_actor(time_spent, start_time)
+        self._actor_fired(actor, firings, time_spent)
+        return firings > 0
+
+    def _actor_fired(self, actor, firings, time_spent):
+        """Called after each call to _fire_actor, override to keep track of actor execution"""
+        pass
 
     def _fire_actor_non_preemptive(self, actor):
         """
@@ -295,7 +359,7 @@ class BaseScheduler(object):
         #
         # First make sure we are allowed to run
         #
-        if not actor._authorized():
+        if not self._authorized(actor):
             return False
 
         #
@@ -326,7 +390,7 @@ class BaseScheduler(object):
         #
         # First make sure we are allowed to run
         #
-        if not actor._authorized():
+        if not self._authorized(actor):
             return False
 
         did_fire, output_ok, exhausted = actor.fire()
@@ -391,6 +455,10 @@ class SimpleScheduler(BaseScheduler):
     def unregister_endpoint(self, endpoint):
         self.monitor.unregister_endpoint(endpoint)
 
+    def link_actors(self, actor_id, peer_actor_id):
+        # All actors are visited on every pass, just make sure there is one
+        self.insert_task(self.strategy, 0)
+
     # There are at least five things that needs to be done:
     # 1. Call fire() on actors
     # 2. Call communicate on endpoints
@@ -449,3 +517,253 @@ class NonPreemptiveScheduler(SimpleScheduler):
         if activity:
             self.insert_task(self.strategy, 0)
 
+
+
+######################################################################
+# READINESS SCHEDULER
+######################################################################
+class ReadinessScheduler(SimpleScheduler):
+
+    """
+    Only fire actors that might be able to fire, i.e. actors that got tokens
+    or free token slots, a calvinsys event, or that fired during last pass.
+    Actors that tried to fire but could not are left alone until an event
+    changes the state of their ports.
+    """
+
+    def __init__(self, node, actor_mgr):
+        super(ReadinessScheduler, self).__init__(node, actor_mgr)
+        self._ready = set()
+        # Visit every enabled actor on next pass
+        self._ready_all = True
+        # Actors made ready when an actor fires, {actor_id: {peer_actor_id: nbr of links}}
+        self._links = {}
+
+    def _set_ready(self, actor_id):
+        self._ready.add(actor_id)
+        self.insert_task(self.strategy, 0)
+
+    def _set_all_ready(self):
+        self._ready_all = True
+        self.insert_task(self.strategy, 0)
+
+    def tunnel_rx(self, endpoint):
+        """Token recieved on endpoint"""
+        self._set_ready(endpoint.port.owner.id)
+
+    def tunnel_tx_ack(self, endpoint):
+        """Token successfully sent on endpoint"""
+        self.monitor.clear_backoff(endpoint)
+        self._set_ready(endpoint.port.owner.id)
+
+    def schedule_calvinsys(self, actor_id=None):
+        """Incoming platform event"""
+        if actor_id is None:
+            self._set_all_ready()
+        else:
+            self._set_ready(actor_id)
+
+    def register_endpoint(self, endpoint):
+        self.monitor.register_endpoint(endpoint)
+        # Possibly after reconnect
+        if endpoint.port.owner.enabled():
+            self._set_ready(endpoint.port.owner.id)
+
+    def link_actors(self, actor_id, peer_actor_id):
+        peers = self._links.setdefault(actor_id, {})
+        peers[peer_actor_id] = peers.get(peer_actor_id, 0) + 1
+        self._set_ready(actor_id)
+
+    def unlink_actors(self, actor_id, peer_actor_id):
+        peers = self._links.get(actor_id, {})
+        if peers.get(peer_actor_id, 0) > 1:
+            peers[peer_actor_id] -= 1
+            return
+        peers.pop(peer_actor_id, None)
+        if not peers:
+            self._links.pop(actor_id, None)
+
+    def _maintenance_loop(self):
+        # Actors might have been enabled again
+        self._ready_all = True
+        super(ReadinessScheduler, self)._maintenance_loop()
+
+    def _check_replication(self):
+        # Safety net, actors changing state without any port or calvinsys event are picked up here
+        self._ready_all = True
+        super(ReadinessScheduler, self)._check_replication()
+
+    def watchdog(self):
+        self._set_all_ready()
+
+    def _ready_actors(self):
+        if self._ready_all:
+            self._ready_all = False
+            self._ready = set()
+            return self.actor_mgr.enabled_actors()
+        ready, self._ready = self._ready, set()
+        actors = self.actor_mgr.actors
+        return [actors[actor_id] for actor_id in ready if actor_id in actors and actors[actor_id].enabled()]
+
+    def strategy(self):
+        # Communicate, actors on both sides of a transfer might now be able to fire
+        did_transfer = self.monitor.communicate_endpoints(self.monitor.endpoints)
+        for endpoint in did_transfer:
+            self._ready.add(endpoint.port.owner.id)
+            peer_port = getattr(endpoint, 'peer_port', None)
+            if peer_port is not None:
+                self._ready.add(peer_port.owner.id)
+        # Fire ready actors, those that fired stay ready
+        did_fire_actor_ids = self._fire_actors(self._ready_actors())
+        self._ready.update(did_fire_actor_ids)
+        # Linked actors see written tokens and freed slots without any communication
+        for actor_id in did_fire_actor_ids:
+            self._ready.update(self._links.get(actor_id, ()))
+        if did_transfer or did_fire_actor_ids:
+            self.insert_task(self.strategy, 0)
+
+
+######################################################################
+# FAIR-SHARE SCHEDULER
+######################################################################
+class SlidingWindowCounter(object):
+
+    """
+    Sum of CPU time and firings over the last 'window' seconds,
+    kept in buckets of 'resolution' seconds.
+    """
+
+    def __init__(self, window=10.0, resolution=1.0):
+        super(SlidingWindowCounter, self).__init__()
+        self.window = window
+        self.resolution = resolution
+        self._size = max(1, int(window / resolution))
+        # [bucket index, cpu time, firings]
+        self._buckets = collections.deque()
+        self.cpu_time = 0.0
+        self.firings = 0
+        self.total_cpu_time = 0.0
+        self.total_firings = 0
+
+    def _expire(self, index):
+        while self._buckets and self._buckets[0][0] <= index - self._size:
+            _, cpu_time, firings = self._buckets.popleft()
+            self.cpu_time -= cpu_time
+            self.firings -= firings
+        if not self._buckets:
+            # Avoid accumulating rounding errors
+            self.cpu_time = 0.0
+
+    def add(self, cpu_time, firings, now=None):
+        index = int((now or time.time()) / self.resolution)
+        self._expire(index)
+        if self._buckets and self._buckets[-1][0] == index:
+            bucket = self._buckets[-1]
+            bucket[1] += cpu_time
+            bucket[2] += firings
+        else:
+            self._buckets.append([index, cpu_time, firings])
+        self.cpu_time += cpu_time
+        self.firings += firings
+        self.total_cpu_time += cpu_time
+        self.total_firings += firings
+
+    def update(self, now=None):
+        """Drop samples older than window"""
+        self._expire(int((now or time.time()) / self.resolution))
+
+    def as_dict(self):
+        return {
+            'window': self.window,
+            'cpu_time': self.cpu_time,
+            'firings': self.firings,
+            'total_cpu_time': self.total_cpu_time,
+            'total_firings': self.total_firings
+        }
+
+
+class FairShareScheduler(SimpleScheduler):
+
+    """
+    Weighted fair-share scheduler.
+    CPU time used by each actor is tracked over a sliding window. On every pass
+    the actors that have used the least CPU time relative to their weight fire
+    first, and each actor's time slice is proportional to its weight.
+    The weight is given in deploy info with the requirement
+    scheduling_weight(weight=<weight>), default weight is 1.0.
+    """
+
+    def __init__(self, node, actor_mgr):
+        super(FairShareScheduler, self).__init__(node, actor_mgr)
+        self._window = _conf.get(None, "fair_share_window") or 10.0
+        self._counters = {}
+
+    def _counter(self, actor_id):
+        counter = self._counters.get(actor_id)
+        if counter is None:
+            counter = SlidingWindowCounter(self._window)
+            self._counters[actor_id] = counter
+        return counter
+
+    def _actor_fired(self, actor, firings, time_spent):
+        self._counter(actor.id).add(time_spent, firings)
+
+    def weight(self, actor):
+        for req in actor._deployment_requirements:
+            if req.get('op') == 'scheduling_weight':
+                try:
+                    return max(0.01, float(req['kwargs']['weight']))
+                except Exception:
+                    _log.warning("Bad scheduling weight for actor %s: %s" % (actor.id, req))
+        return 1.0
+
+    def _cleanup(self):
+        for actor_id in set(self._counters) - set(self.actor_mgr.actors):
+            del self._counters[actor_id]
+
+    def strategy(self):
+        list_of_endpoints = self.monitor.endpoints
+        did_transfer_tokens = self.monitor.communicate(list_of_endpoints)
+        if len(self._counters) > len(self.actor_mgr.actors):
+            self._cleanup()
+        now = time.time()
+        weighted = []
+        for actor in self.actor_mgr.enabled_actors():
+            weight = self.weight(actor)
+            counter = self._counter(actor.id)
+            counter.update(now)
+            weighted.append((counter.cpu_time / weight, weight, actor))
+        # Least served relative to weight first
+        weighted.sort(key=lambda x: x[0])
+        did_fire_actor_ids = set()
+        for _, weight, actor in weighted:
+            try:
+                if self._fire_actor(actor, time_slice=self._time_slice * weight):
+                    did_fire_actor_ids.add(actor.id)
+            except Exception as e:
+                _log.exception(e)
+        activity = did_transfer_tokens or bool(did_fire_actor_ids)
+        if activity:
+            self.insert_task(self.strategy, 0)
+
+    def statistics(self):
+        stats = super(FairShareScheduler, self).statistics()
+        actors = {}
+        for actor_id, counter in self._counters.items():
+            actor = self.actor_mgr.actors.get(actor_id)
+            if actor is None:
+                continue
+            counter.update()
+            actors[actor_id] = dict(counter.as_dict(), weight=self.weight(actor))
+        stats['actors'] = actors
+        return stats
+
+
+# Schedulers selectable with the 'scheduler' option in the global config section
+SCHEDULERS = {
+    'simple': SimpleScheduler,
+    'round_robin': RoundRobinScheduler,
+    'non_preemptive': NonPreemptiveScheduler,
+    'readiness': ReadinessScheduler,
+    'fair_share': FairShareScheduler,
+}
@@ -25,10 +25,13 @@ from calvin.utilities import calvinconfig
 from calvin.actorstore.store import GlobalStore
 from calvin.utilities.security import Security, security_enabled
 from calvin.utilities import dynops
+from calvin.utilities.indexdict import IndexDict
+from calvin.utilities.ttlcache import TTLCache
 from calvin.requests import calvinresponse
 from calvin.runtime.north.calvinsys import get_calvinsys
 from calvin.runtime.north.calvinlib import get_calvinlib
 import re
+import copy
 import itertools
 
 _log = calvinlogger.get_logger(__name__)
@@ -43,7 +46,10 @@ class Storage(object):
 
     def __init__(self, node, override_storage=None):
         self.localstore = {}
-        self.localstore_sets = {}
+        self.localstore_sets = IndexDict()
+        # Read-through cache of values from storage, {prefix: time to live} with 'default' for other prefixes
+        self.cache = TTLCache(_conf.get(None, 'storage_cache_size') or 0)
+        self.cache_ttl = _conf.get(None, 'storage_cache_ttl') or {}
         self.started = False
         self.node = node
         storage_type = _conf.get('global', 'storage_type')
@@ -57,6 +63,9 @@ class Storage(object):
         else:
             self.storage = storage_factory.get(storage_type, node)
         self.flush_delayedcall = None
+        # {prefix: {key: [value, [cb, ...]]}} of set requests collected between begin_batch and end_batch
+        self._batch = None
+        self._batch_depth = 0
         self.reset_flush_timeout()
 
     ### Storage life cycle management ###
@@ -82,26 +91,24 @@ class Storage(object):
         if self.flush_timeout < 600:
             self.flush_timeout = self.flush_timeout * 2
         self.flush_delayedcall = None
-        for key in self.localstore:
-            _log.debug("Flush key %s: %s" % (key, self.localstore[key]))
-            self.storage.set(key=key, value=self.localstore[key],
-                             cb=CalvinCB(func=self.set_cb, org_key=None, org_value=None, org_cb=None, silent=True))
+        if self.localstore:
+            _log.debug("Flush keys %s" % self.localstore.keys())
+            self.storage.set_many(items=dict(self.localstore),
+                                  cb=CalvinCB(func=self.set_many_cb, org_prefix="", org_cb=None, silent=True))
 
+        appends = {}
         for key, value in self.localstore_sets.iteritems():
             if isinstance(key, tuple):
                 self._flush_add_index(key, value['+'])
                 self._flush_remove_index(key, value['-'])
             else:
-                self._flush_append(key, value['+'])
+                if value['+']:
+                    appends[key] = list(value['+'])
                 self._flush_remove(key, value['-'])
-
-    def _flush_append(self, key, value):
-        if not value:
-            return
-
-        _log.debug("Flush append on key %s: %s" % (key, list(value)))
-        self.storage.append(key=key, value=list(value),
-                            cb=CalvinCB(func=self.append_cb, org_key=None, org_value=None, org_cb=None, silent=True))
+        if appends:
+            _log.debug("Flush append on keys %s" % appends.keys())
+            self.storage.append_many(items=appends,
+                                     cb=CalvinCB(func=self.append_many_cb, org_prefix="", org_cb=None, silent=True))
 
     def _flush_remove(self, key, value):
         if not value:
@@ -177,6 +184,9 @@ class Storage(object):
                             'APPEND': self.append,
                             'REMOVE': self.remove,
                             'DELETE': self.delete,
+                            'GET_MANY': self.get_many,
+                            'SET_MANY': self.set_many,
+                            'APPEND_MANY': self.append_many,
                             'REPLY': self._proxy_reply,
                             'ADD_INDEX': self.add_index,
                             'REMOVE_INDEX': self.remove_index,
@@ -229,20 +239,91 @@ class Storage(object):
             value indicate success.
         """
         _log.debug("Set key %s, value %s" % (prefix + key, value))
+        self.cache.invalidate(prefix + key)
 
         if prefix + key in self.localstore_sets:
             del self.localstore_sets[prefix + key]
 
         # Always save locally
         self.localstore[prefix + key] = value
-        if self.started:
+        if self._batch is not None:
+            item = self._batch.setdefault(prefix, {}).setdefault(key, [None, []])
+            item[0] = value
+            if cb:
+                item[1].append(cb)
+        elif self.started:
             self.storage.set(key=prefix + key, value=value, cb=CalvinCB(func=self.set_cb, org_key=key, org_value=value, org_cb=cb))
         elif cb:
             async.DelayedCall(0, cb, key=key, value=calvinresponse.CalvinResponse(True))
 
-    def get_cb(self, key, value, org_cb, org_key):
+    def begin_batch(self):
+        """ Collect the following set requests until end_batch, e.g. when adding many actors
+            and ports, batches can be nested and are only sent by the outermost end_batch.
+        """
+        self._batch_depth += 1
+        if self._batch is None:
+            self._batch = {}
+
+    def end_batch(self):
+        """ Send the collected set requests with one set_many per prefix,
+            the callbacks of each set are called as for a single set.
+        """
+        self._batch_depth -= 1
+        if self._batch_depth > 0:
+            return
+        batch, self._batch = self._batch, None
+        for prefix, items in batch.iteritems():
+            self.set_many(prefix, {key: item[0] for key, item in items.iteritems()},
+                          cb=CalvinCB(self._batch_set_cb, callbacks={key: item[1] for key, item in items.iteritems()}))
+
+    def _batch_set_cb(self, values, callbacks):
+        for key, value in values.iteritems():
+            for cb in callbacks.get(key, []):
+                cb(key=key, value=value)
+
+    def set_many_cb(self, values, org_prefix, org_cb, silent=False):
+        """ set_many callback, handles each key as set_cb
+        """
+        for key, value in values.iteritems():
+            self.set_cb(key, value, org_key=None, org_value=None, org_cb=None, silent=silent)
+        if org_cb:
+            org_cb(values={key[len(org_prefix):]: value for key, value in values.iteritems()})
+
+    def set_many(self, prefix, items, cb):
+        """ Set registry keys: prefix+key to be single value: value
+            for each key, value pair in dictionary items, in one storage request.
+            Callback cb with signature cb(values=values) where values is a dictionary
+            with True/False for each key, note that the keys here are without the prefix.
+        """
+        _log.debug("Set keys %s" % [prefix + key for key in items])
+        for key, value in items.iteritems():
+            self.cache.invalidate(prefix + key)
+            if prefix + key in self.localstore_sets:
+                del self.localstore_sets[prefix + key]
+            # Always save locally
+            self.localstore[prefix + key] = value
+        if self.started:
+            self.storage.set_many(items={prefix + key: value for key, value in items.iteritems()},
+                                  cb=CalvinCB(func=self.set_many_cb, org_prefix=prefix, org_cb=cb))
+        elif cb:
+            async.DelayedCall(0, cb, values={key: calvinresponse.CalvinResponse(True) for key in items})
+
+    def _cache_put(self, prefix, key, value, version):
+        """ Cache value for key (including prefix) unless it is a failure or a deleted value """
+        if value is None or value is False or calvinresponse.isfailresponse(value):
+            return
+        ttl = self.cache_ttl.get(prefix, self.cache_ttl.get('default', 0))
+        self.cache.put(key, copy.deepcopy(value), ttl, version)
+
+    def cache_statistics(self):
+        """ Counters for the read-through cache """
+        return self.cache.statistics()
+
+    def get_cb(self, key, value, org_cb, org_key, org_prefix=None, version=None):
         """ get callback
         """
+        if org_prefix is not None:
+            self._cache_put(org_prefix, key, value, version)
         org_cb(org_key, value)
 
     def get(self, prefix, key, cb):
@@ -260,18 +341,77 @@ class Storage(object):
         if prefix + key in self.localstore:
             value = self.localstore[prefix + key]
             async.DelayedCall(0, cb, key=key, value=value)
-        else:
+            return
+        try:
+            value = self.cache[prefix + key]
+        except KeyError:
             try:
-                self.storage.get(key=prefix + key, cb=CalvinCB(func=self.get_cb, org_cb=cb, org_key=key))
+                self.storage.get(key=prefix + key, cb=CalvinCB(func=self.get_cb, org_cb=cb, org_key=key,
+                                                               org_prefix=prefix, version=self.cache.version))
             except:
                 if self.started:
                     _log.error("Failed to get: %s" % key)
                 async.DelayedCall(0, cb, key=key, value=calvinresponse.CalvinResponse(calvinresponse.NOT_FOUND))
+        else:
+            async.DelayedCall(0, cb, key=key, value=copy.deepcopy(value))
 
-    def get_iter_cb(self, key, value, it, org_key, include_key=False):
+    def get_many_cb(self, values, org_cb, org_prefix, local_values, version):
+        """ get_many callback
+        """
+        for key, value in values.iteritems():
+            self._cache_put(org_prefix, key, value, version)
+            local_values[key[len(org_prefix):]] = value
+        org_cb(values=local_values)
+
+    def get_many(self, prefix, keys, cb):
+        """ Get single values for registry keys: prefix+key for each key in keys,
+            first look in locally set but not yet distributed registry and the
+            cache, the remaining keys are requested in one storage request.
+            Callback cb with signature cb(values=values) where values is a
+            dictionary with the value for each key, as in get,
+            note that the keys here are without the prefix.
+        """
+        values = {}
+        missing = []
+        for key in keys:
+            if prefix + key in self.localstore:
+                values[key] = self.localstore[prefix + key]
+            elif prefix + key in self.cache:
+                values[key] = copy.deepcopy(self.cache[prefix + key])
+            else:
+                missing.append(key)
+        if not missing:
+            async.DelayedCall(0, cb, values=values)
+            return
+        try:
+            self.storage.get_many(keys=[prefix + key for key in missing],
+                                  cb=CalvinCB(func=self.get_many_cb, org_cb=cb, org_prefix=prefix,
+                                              local_values=values, version=self.cache.version))
+        except:
+            if self.started:
+                _log.error("Failed to get: %s" % missing)
+            values.update({key: calvinresponse.CalvinResponse(calvinresponse.NOT_FOUND) for key in missing})
+            async.DelayedCall(0, cb, values=values)
+
+    def _get_many_iter_cb(self, values, it, include_key):
+        for key, value in values.iteritems():
+            if calvinresponse.isfailresponse(value):
+                value = dynops.FailedElement
+            it.append((key, value) if include_key else value)
+
+    def get_many_iter(self, prefix, keys, it, include_key=False):
+        """ Get single values for registry keys: prefix+key for each key in keys
+            using get_many, values are placed in the dynamic iterable it as for get_iter.
+        """
+        if it:
+            self.get_many(prefix, keys, cb=CalvinCB(self._get_many_iter_cb, it=it, include_key=include_key))
+
+    def get_iter_cb(self, key, value, it, org_key, include_key=False, org_prefix=None, version=None):
         """ get callback
         """
         _log.analyze(self.node.id, "+ BEGIN", {'value': value, 'key': org_key})
+        if org_prefix is not None:
+            self._cache_put(org_prefix, key, value, version)
         if calvinresponse.isnotfailresponse(value):
             it.append((key, value) if include_key else value)
             _log.analyze(self.node.id, "+", {'value': value, 'key': org_key})
@@ -301,10 +441,14 @@ class Storage(object):
                 value = self.localstore[prefix + key]
                 _log.analyze(self.node.id, "+", {'value': value, 'key': key})
                 it.append((key, value) if include_key else value)
+            elif prefix + key in self.cache:
+                value = copy.deepcopy(self.cache[prefix + key])
+                it.append((key, value) if include_key else value)
             else:
                 try:
                     self.storage.get(key=prefix + key,
-                                     cb=CalvinCB(func=self.get_iter_cb, it=it, org_key=key, include_key=include_key))
+                                     cb=CalvinCB(func=self.get_iter_cb, it=it, org_key=key, include_key=include_key,
+                                                 org_prefix=prefix, version=self.cache.version))
                 except:
                     if self.started:
                         _log.analyze(self.node.id, "+", {'value': 'FailedElement', 'key': key})
@@ -385,6 +529,7 @@ class Storage(object):
             value indicate success.
         """
         _log.debug("Append key %s, value %s" % (prefix + key, value))
+        self.cache.invalidate(prefix + key)
         # Keep local storage for sets updated until confirmed
         if (prefix + key) in self.localstore_sets:
             # Append value items
@@ -401,6 +546,35 @@ class Storage(object):
             if cb:
                 cb(key=key, value=calvinresponse.CalvinResponse(True))
 
+    def append_many_cb(self, values, org_prefix, org_cb, silent=False):
+        """ append_many callback, handles each key as append_cb
+        """
+        for key, value in values.iteritems():
+            self.append_cb(key, value, org_key=None, org_value=None, org_cb=None, silent=silent)
+        if org_cb:
+            org_cb(values={key[len(org_prefix):]: value for key, value in values.iteritems()})
+
+    def append_many(self, prefix, items, cb):
+        """ Add multiple values to registry keys: prefix+key for each key, value
+            pair in dictionary items, in one storage request. See append.
+            Callback cb with signature cb(values=values) where values is a dictionary
+            with True/False for each key, note that the keys here are without the prefix.
+        """
+        _log.debug("Append keys %s" % [prefix + key for key in items])
+        for key, value in items.iteritems():
+            self.cache.invalidate(prefix + key)
+            if (prefix + key) in self.localstore_sets:
+                self.localstore_sets[prefix + key]['+'] |= set(value)
+                self.localstore_sets[prefix + key]['-'] -= set(value)
+            else:
+                self.localstore_sets[prefix + key] = {'+': set(value), '-': set([])}
+
+        if self.started:
+            self.storage.append_many(items={prefix + key: list(self.localstore_sets[prefix + key]['+']) for key in items},
+                                     cb=CalvinCB(func=self.append_many_cb, org_prefix=prefix, org_cb=cb))
+        elif cb:
+            cb(values={key: calvinresponse.CalvinResponse(True) for key in items})
+
     def remove_cb(self, key, value, org_key, org_value, org_cb, silent=False):
         """ remove callback, on error retry after flush_timeout
         """
@@ -430,6 +604,7 @@ class Storage(object):
             value indicate success.
         """
         _log.debug("Remove key %s, value %s" % (prefix + key, value))
+        self.cache.invalidate(prefix + key)
         # Keep local storage for sets updated until confirmed
         if (prefix + key) in self.localstore_sets:
             # Don't append value items any more
@@ -456,6 +631,9 @@ class Storage(object):
             value indicate success.
         """
         _log.debug("Deleting key %s" % prefix + key)
+        if self._batch is not None:
+            self._batch.get(prefix, {}).pop(key, None)
+        self.cache.invalidate(prefix + key)
         if prefix + key in self.localstore:
             del self.localstore[prefix + key]
         if (prefix + key) in self.localstore_sets:
@@ -650,9 +828,7 @@ class Storage(object):
         _log.debug("get index %s" % (index))
         indexes = self._index_strings(index, root_prefix_level)
         # Collect a value set from all key-indexes that include the indexes, always compairing full index levels
-        local_values = set(itertools.chain(
-            *(v['+'] for k, v in self.localstore_sets.items()
-                if all(map(lambda x, y: False if x is None else True if y is None else x==y, k, indexes)))))
+        local_values = set(itertools.chain(*(v['+'] for k, v in self.localstore_sets.index_items(indexes))))
         if self.started:
             self.storage.get_index(prefix="index-", index=indexes,
                 cb=CalvinCB(self.get_index_cb, org_cb=cb, index_items=indexes, local_values=local_values))
@@ -1102,7 +1278,7 @@ class Storage(object):
         if 'cmd' in payload and payload['cmd'] in self._proxy_cmds:
             # Call this nodes storage methods, which could be local or DHT,
             # prefix is empty since that is already in the key (due to these calls come from the storage plugin level).
-            kwargs = {k: v for k, v in payload.iteritems() if k in ('key', 'value', 'prefix', 'index')}
+            kwargs = {k: v for k, v in payload.iteritems() if k in ('key', 'value', 'prefix', 'index', 'keys', 'items')}
             kwargs.setdefault('prefix', "")
             if payload['cmd'].endswith("_INDEX"):
                 kwargs.pop('prefix')
@@ -1110,7 +1286,11 @@ class Storage(object):
                 dummykey = {'key': None}
             else:
                 dummykey = {}
-            self._proxy_cmds[payload['cmd']](cb=CalvinCB(self._proxy_send_reply, tunnel=tunnel,
+            if payload['cmd'].endswith("_MANY"):
+                reply = self._proxy_send_many_reply
+            else:
+                reply = self._proxy_send_reply
+            self._proxy_cmds[payload['cmd']](cb=CalvinCB(reply, tunnel=tunnel,
                                                          msgid=payload['msg_uuid'], **dummykey), **kwargs)
         else:
             _log.error("Unknown storage proxy request %s" % payload['cmd'] if 'cmd' in payload else "")
@@ -1125,3 +1305,10 @@ class Storage(object):
         if key is not None:
             kwargs['key'] = key
         tunnel.send(kwargs)
+
+    def _proxy_send_many_reply(self, values, tunnel, msgid):
+        _log.analyze(self.node.id, "+ SERVER", {'msgid': msgid, 'values': values})
+        # CalvinResponses are sent in 'responses' and other values in 'values'
+        responses = {k: v.encode() for k, v in values.iteritems() if isinstance(v, calvinresponse.CalvinResponse)}
+        values = {k: v for k, v in values.iteritems() if k not in responses}
+        tunnel.send({'cmd': 'REPLY', 'msg_uuid': msgid, 'values': values, 'responses': responses})
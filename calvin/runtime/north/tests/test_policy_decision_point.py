@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import json
+import shutil
+import pytest
+from mock import Mock
+
+from calvin.runtime.north.authorization.policy_decision_point import PolicyDecisionPoint
+from calvin.runtime.north.authorization.policy_retrieval_point import FilePolicyRetrievalPoint
+
+pytestmark = pytest.mark.unittest
+
+policies_dir = os.path.join(os.path.dirname(__file__), "..", "..", "..", "tests", "security_test", "policies")
+
+
+class NoPIP(object):
+    """Policy Information Point without any attributes"""
+
+    attributes = {}
+
+    def get_attribute_value(self, attribute_type, attribute):
+        raise KeyError(attribute)
+
+
+def request(first_name, requires, node_name="testNode1"):
+    return {"subject": {"first_name": first_name, "actor_signer": "signer"},
+            "action": {"requires": requires},
+            "resource": {"node_id": "node1", "node_name.name": node_name}}
+
+
+class TestPolicyDecisionPoint(object):
+
+    @pytest.fixture(autouse=True)
+    def pdp(self, tmpdir):
+        self.path = str(tmpdir.join("policies"))
+        shutil.copytree(policies_dir, self.path)
+        node = Mock()
+        node.authorization.prp = FilePolicyRetrievalPoint(self.path)
+        self.pdp = PolicyDecisionPoint(node, {"policy_check_interval": 0})
+
+    def decision(self, req):
+        return self.pdp.combined_policy_decision(req, NoPIP())[0]
+
+    def test_decisions(self):
+        assert self.decision(request("Anders", ["runtime"])) == "permit"
+        assert self.decision(request("Anders", ["sys.timer.repeating"])) == "permit"
+        assert self.decision(request("Anders", ["sys.timer.repeating"], "testNode2")) == "not_applicable"
+        assert self.decision(request("Carl", ["anything"], "otherNode")) == "permit"
+        assert self.decision(request("Unknown", ["runtime"])) == "not_applicable"
+
+    def test_candidates(self):
+        store = self.pdp.get_policy_store()
+        assert [p.policy_id for p in store.candidates(request("Anders", ["runtime"]))] == ["policy0", "policy1"]
+        # Without first_name in request the PIP could provide it
+        assert len(store.candidates({"action": {"requires": ["runtime"]}})) == len(store.policies)
+
+    def test_decision_cached(self):
+        req = request("Anders", ["runtime"])
+        assert self.decision(req) == "permit"
+        assert self.decision(req) == "permit"
+        assert self.pdp.decision_cache.hits == 1
+
+    def test_reload_on_change(self):
+        req = request("Gustav", ["runtime"])
+        assert self.decision(req) == "not_applicable"
+        with open(os.path.join(self.path, "policy1.json")) as f:
+            policy = json.load(f)
+        policy["target"]["subject"]["first_name"] = ["Anders", "Gustav"]
+        with open(os.path.join(self.path, "policy1.json"), "w") as f:
+            json.dump(policy, f)
+        assert self.decision(req) == "permit"
+        os.remove(os.path.join(self.path, "policy1.json"))
+        assert self.decision(req) == "not_applicable"
+
+    def test_changes_through_prp(self):
+        self.pdp.config["policy_check_interval"] = 3600
+        self.pdp.policy_store = None
+        req = request("Gustav", ["runtime"])
+        assert self.decision(req) == "not_applicable"
+        prp = self.pdp.node.authorization.prp
+        prp.create_policy({"rule_combining": "permit_overrides", "target": {"subject": {"first_name": "Gustav"}},
+                           "rules": [{"id": "rule", "effect": "permit"}]})
+        assert self.decision(req) == "permit"
+
+    def test_target_matches(self):
+        target = {"subject": {"actor_signer": "sig.*", "level": [1, 2]}}
+        assert self.pdp.target_matches(target, {"subject": {"actor_signer": "signer", "level": 2}}, NoPIP())
+        assert not self.pdp.target_matches(target, {"subject": {"actor_signer": "signer", "level": 3}}, NoPIP())
+        assert not self.pdp.target_matches(target, {"subject": {"actor_signer": "other", "level": 2}}, NoPIP())
+        assert not self.pdp.target_matches(target, {"subject": {"level": 2}}, NoPIP())
@@ -41,15 +41,86 @@ _log = calvinlogger.get_logger(__name__)
 # Make twisted (rpcudp) logs go to null
 log.startLogging(log.NullFile(), setStdout=0)
 
+# Max size of the JSON coded items of a set sent in one append or remove, RPC messages are limited to 8K
+SET_CHUNK_SIZE = 7000
+
+
+# Set values (see append and remove) are stored as set objects on the nodes and
+# sent as JSON coded lists, in chunks when they are large.
+def _set_items(value):
+    """The items of a set value, a list or JSON coded list, raises an exception for other values"""
+    if isinstance(value, basestring):
+        value = json.loads(value)
+    if not isinstance(value, (list, tuple, set)):
+        raise TypeError("Not a list: %r" % (value, ))
+    return value
+
+
+def _stored_set(stored):
+    """The stored value as a set, a JSON coded list (e.g. from older nodes) is decoded, else an empty set"""
+    if isinstance(stored, set):
+        return stored
+    if isinstance(stored, basestring):
+        try:
+            return set(_set_items(stored))
+        except (ValueError, TypeError):
+            pass
+    return set()
+
+
+def _set_value(value):
+    """The value as sent and returned, i.e. a set as a JSON coded list"""
+    return json.dumps(list(value)) if isinstance(value, set) else value
+
+
+def _json_chunks(items):
+    """The items as JSON coded lists of at most SET_CHUNK_SIZE (unless a single item is larger)"""
+    chunks = []
+    chunk = []
+    size = 2
+    for item in items:
+        item = json.dumps(item)
+        if chunk and size + len(item) + 2 > SET_CHUNK_SIZE:
+            chunks.append("[" + ", ".join(chunk) + "]")
+            chunk = []
+            size = 2
+        chunk.append(item)
+        size += len(item) + 2
+    chunks.append("[" + ", ".join(chunk) + "]")
+    return chunks
+
 
 # Fix for None types in storage
 class ForgetfulStorageFix(ForgetfulStorage):
+    def __init__(self, *args, **kwargs):
+        ForgetfulStorage.__init__(self, *args, **kwargs)
+        # key => JSON coded set, until the key is stored again or forgotten
+        self._set_json = {}
+
+    def __setitem__(self, key, value):
+        self._set_json.pop(key, None)
+        ForgetfulStorage.__setitem__(self, key, value)
+
+    def cull(self):
+        for key, _ in list(self.iteritemsOlderThan(self.ttl)):
+            self.data.popitem(last=False)
+            self._set_json.pop(key, None)
+
     def get(self, key, default=None):
         self.cull()
         if key in self.data:
             return (True, self[key])
         return (False, default)
 
+    def sent_value(self, key):
+        """Return (exists, value) with the value as sent, a set is JSON coded once until it is stored again"""
+        exists, value = self.get(key)
+        if isinstance(value, set):
+            if key not in self._set_json:
+                self._set_json[key] = _set_value(value)
+            value = self._set_json[key]
+        return (exists, value)
+
 
 class KademliaProtocolAppend(KademliaProtocol):
 
@@ -130,9 +201,9 @@ class KademliaProtocolAppend(KademliaProtocol):
                 newNodeClose = node.distanceTo(keynode) < neighbors[-1].distanceTo(keynode)
                 thisNodeClosest = self.sourceNode.distanceTo(keynode) < neighbors[0].distanceTo(keynode)
             if len(neighbors) == 0 or (newNodeClose and thisNodeClosest):
-                if key in self.set_keys:
+                if isinstance(value, set):
                     _log.debug("transfer append key value key=%s, value=%s" % (base64.b64encode(key), str(value)))
-                    ds.append(self.callAppend(node, key, value))
+                    ds.append(self.callAppendChunks(node, key, _json_chunks(value)))
                 else:
                     _log.debug("transfer store key value key=%s, value=%s" % (base64.b64encode(key), str(value)))
                     ds.append(self.callStore(node, key, value))
@@ -144,11 +215,42 @@ class KademliaProtocolAppend(KademliaProtocol):
         _log.debug("rpc_find_value sender=%s, source=%s, key=%s" % (sender, source, base64.b64encode(key)))
         self.maybeTransferKeyValues(source)
         self.router.addContact(source)
-        exists, value = self.storage.get(key, None)
+        exists, value = self.stored_value(key)
         if not exists:
             return self.rpc_find_node(sender, nodeid, key)
         return { 'value': value }
 
+    def stored_value(self, key):
+        """Return (exists, value) with the value as sent, see ForgetfulStorageFix.sent_value"""
+        return self.storage.sent_value(key)
+
+    def add_to_set(self, key, value):
+        """Add the items in value (see _set_items) to the set stored at key"""
+        items = _set_items(value)
+        self.set_keys.add(key)
+        exists, stored = self.storage.get(key)
+        if not isinstance(stored, set):
+            # A JSON coded list is merged, when the key have been used for single values or deleted (None), replace it
+            _log.debug("%s add to key: %s old: %s" % (base64.b64encode(self.sourceNode.id), base64.b64encode(key), stored))
+            stored = _stored_set(stored)
+        stored.update(items)
+        # Stored again to keep it as long as the other values (and to drop its JSON coding)
+        self.storage[key] = stored
+
+    def remove_from_set(self, key, value):
+        """Remove the items in value (see _set_items) from the set stored at key"""
+        items = _set_items(value)
+        self.set_keys.add(key)
+        exists, stored = self.storage.get(key)
+        if not exists:
+            return
+        if not isinstance(stored, set):
+            # A JSON coded list is kept, when the key have been used for single values or deleted, empty it
+            _log.debug("%s remove from key: %s old: %s" % (base64.b64encode(self.sourceNode.id), base64.b64encode(key), stored))
+            stored = _stored_set(stored)
+        stored.difference_update(items)
+        self.storage[key] = stored
+
     def rpc_append(self, sender, nodeid, key, value):
         source = Node(nodeid, sender[0], sender[1])
         _log.debug("rpc_append sender=%s, source=%s, key=%s, value=%s" % (sender, source, base64.b64encode(key), str(value)))
@@ -156,24 +258,7 @@ class KademliaProtocolAppend(KademliaProtocol):
         self.router.addContact(source)
 
         try:
-            pvalue = json.loads(value)
-            self.set_keys.add(key)
-            if key not in self.storage:
-                _log.debug("%s append key: %s not in storage set value: %s" % (base64.b64encode(nodeid), base64.b64encode(key), pvalue))
-                self.storage[key] = value
-            else:
-                old_value_ = self.storage[key]
-                try:
-                    old_value = json.loads(old_value_)
-                    new_value = list(set(old_value + pvalue))
-                except:
-                    # When the key have been used for single values it does not contain a list
-                    # When have been deleted contains None
-                    # Just replace old value
-                    old_value = old_value_
-                    new_value = pvalue
-                _log.debug("%s append key: %s old: %s add: %s new: %s" % (base64.b64encode(nodeid), base64.b64encode(key), old_value, pvalue, new_value))
-                self.storage[key] = json.dumps(new_value)
+            self.add_to_set(key, value)
             return True
 
         except:
@@ -185,6 +270,19 @@ class KademliaProtocolAppend(KademliaProtocol):
         d = self.append(address, self.sourceNode.id, key, value)
         return d.addCallback(self.handleCallResponse, nodeToAsk)
 
+    def _callChunks(self, call, nodeToAsk, key, chunks):
+        """Call with each chunk, the result is as for one call: (all reached, all responded True)"""
+        def combined(results):
+            return (all([r[0] for r in results]), all([r[1] for r in results]))
+        ds = [call(nodeToAsk, key, chunk) for chunk in chunks]
+        return defer.gatherResults(ds).addCallback(combined)
+
+    def callAppendChunks(self, nodeToAsk, key, chunks):
+        return self._callChunks(self.callAppend, nodeToAsk, key, chunks)
+
+    def callRemoveChunks(self, nodeToAsk, key, chunks):
+        return self._callChunks(self.callRemove, nodeToAsk, key, chunks)
+
     def rpc_remove(self, sender, nodeid, key, value):
         source = Node(nodeid, sender[0], sender[1])
         _log.debug("rpc_remove sender=%s, source=%s, key=%s, value=%s" % (sender, source, base64.b64encode(key), str(value)))
@@ -192,20 +290,7 @@ class KademliaProtocolAppend(KademliaProtocol):
         self.router.addContact(source)
 
         try:
-            pvalue = json.loads(value)
-            self.set_keys.add(key)
-            if key in self.storage:
-                try:
-                    old_value = json.loads(self.storage[key])
-                    new_value = list(set(old_value) - set(pvalue))
-                except:
-                    # When the key have been used for single values or deleted it does not contain a list
-                    # Just empty it
-                    old_value = self.storage[key]
-                    new_value = []
-                self.storage[key] = json.dumps(new_value)
-                _log.debug("%s remove key: %s old: %s remove: %s new: %s" % (base64.b64encode(nodeid), base64.b64encode(key), old_value, pvalue, new_value))
-
+            self.remove_from_set(key, value)
             return True
 
         except:
@@ -247,36 +332,22 @@ class AppendServer(Server):
 
     def append(self, key, value):
         """
-        For the given key append the given list values to the set in the network.
+        For the given key append the given list values (a list or JSON coded list) to the set in the network.
         """
         dkey = digest(key)
         node = Node(dkey)
+        try:
+            items = _set_items(value)
+        except:
+            _log.debug("Trying to append something not a list %s" % value, exc_info=True)
+            return defer.succeed(False)
 
         def append_(nodes):
             # if this node is close too, then store here as well
             if not nodes or self.node.distanceTo(node) < max([n.distanceTo(node) for n in nodes]):
-                try:
-                    pvalue = json.loads(value)
-                    self.set_keys.add(dkey)
-                    if dkey not in self.storage:
-                        _log.debug("%s local append key: %s not in storage set value: %s" % (base64.b64encode(node.id), base64.b64encode(dkey), pvalue))
-                        self.storage[dkey] = value
-                    else:
-                        old_value_ = self.storage[dkey]
-                        try:
-                            old_value = json.loads(old_value_)
-                            new_value = list(set(old_value + pvalue))
-                        except:
-                            # When the key have been used for single values it does not contain a list
-                            # When have been deleted contains None
-                            # Just replace old value
-                            new_value = pvalue
-                            old_value = old_value_
-                        _log.debug("%s local append key: %s old: %s add: %s new: %s" % (base64.b64encode(node.id), base64.b64encode(dkey), old_value, pvalue, new_value))
-                        self.storage[dkey] = json.dumps(new_value)
-                except:
-                    _log.debug("Trying to append something not a JSON coded list %s" % value, exc_info=True)
-            ds = [self.protocol.callAppend(n, dkey, value) for n in nodes]
+                self.protocol.add_to_set(dkey, items)
+            chunks = _json_chunks(items)
+            ds = [self.protocol.callAppendChunks(n, dkey, chunks) for n in nodes]
             return defer.DeferredList(ds).addCallback(self._anyRespondSuccess)
 
         nearest = self.protocol.router.findNeighbors(node)
@@ -323,7 +394,7 @@ class AppendServer(Server):
         dkey = digest(key)
         _log.debug("Server:get %s" % base64.b64encode(dkey))
         # if this node has it, return it
-        exists, value = self.storage.get(dkey)
+        exists, value = self.protocol.stored_value(dkey)
         if exists:
             return defer.succeed(value)
         node = Node(dkey)
@@ -336,32 +407,23 @@ class AppendServer(Server):
 
     def remove(self, key, value):
         """
-        For the given key remove the given list values from the set in the network.
+        For the given key remove the given list values (a list or JSON coded list) from the set in the network.
         """
         dkey = digest(key)
         node = Node(dkey)
         _log.debug("Server:remove %s" % base64.b64encode(dkey))
+        try:
+            items = _set_items(value)
+        except:
+            _log.debug("Trying to remove something not a list %s" % value, exc_info=True)
+            return defer.succeed(False)
 
         def remove_(nodes):
             # if this node is close too, then store here as well
             if not nodes or self.node.distanceTo(node) < max([n.distanceTo(node) for n in nodes]):
-                try:
-                    pvalue = json.loads(value)
-                    self.set_keys.add(dkey)
-                    if dkey in self.storage:
-                        try:
-                            old_value = json.loads(self.storage[dkey])
-                            new_value = list(set(old_value) - set(pvalue))
-                        except:
-                            # When the key have been used for single values or deleted it does not contain a list
-                            # Just empty it
-                            old_value = self.storage[dkey]
-                            new_value = []
-                        self.storage[dkey] = json.dumps(new_value)
-                        _log.debug("%s local remove key: %s old: %s remove: %s new: %s" % (base64.b64encode(node.id), base64.b64encode(dkey), old_value, pvalue, new_value))
-                except:
-                    _log.debug("Trying to remove somthing not a JSON coded list %s" % value, exc_info=True)
-            ds = [self.protocol.callRemove(n, dkey, value) for n in nodes]
+                self.protocol.remove_from_set(dkey, items)
+            chunks = _json_chunks(items)
+            ds = [self.protocol.callRemoveChunks(n, dkey, chunks) for n in nodes]
             return defer.DeferredList(ds).addCallback(self._anyRespondSuccess)
 
         nearest = self.protocol.router.findNeighbors(node)
@@ -388,7 +450,7 @@ class AppendServer(Server):
         if len(nearest) == 0:
             # No neighbors but we had it, return that value
             if exists:
-                return defer.succeed(value)
+                return defer.succeed(self.protocol.stored_value(dkey)[1])
             self.log.warning("There are no known neighbors to get key %s" % key)
             return defer.succeed(None)
         spider = ValueListSpiderCrawl(self.protocol, node, nearest, self.ksize, self.alpha,
@@ -425,9 +487,9 @@ class ValueListSpiderCrawl(ValueSpiderCrawl):
             return self._handleFoundValues(foundValues)
         if self.nearest.allBeenContacted():
             # not found at neighbours!
-            if self.local_value:
+            if self.local_value is not None:
                 # but we had it
-                return self.local_value
+                return _set_value(self.local_value)
             else:
                 return None
         return self.find()
@@ -440,41 +502,56 @@ class ValueListSpiderCrawl(ValueSpiderCrawl):
         """
         # TODO figure out if we could be more cleaver in what values are combined
         value = None
-        _set_op = True
-        if self.local_value:
-            jvalues.append((None, self.local_value))
+        items = None
         _log.debug("_handleFoundValues %s" % str(jvalues))
+        if self.local_value is not None:
+            jvalues.append((None, self.local_value))
         # Filter out deleted values
         jvalues = [v for v in jvalues if v[1] is not None]
         if len(jvalues) > 1:
-            args = (self.node.long_id, str(jvalues))
-            _log.debug("Got multiple values for key %i: %s" % args)
+            _log.debug("Got %d values for key %i" % (len(jvalues), self.node.long_id))
             try:
-                values = [(v[0], json.loads(v[1])) for v in jvalues]
-                value_all = []
-                for v in values:
-                    value_all = value_all + v[1]
-                value = json.dumps(list(set(value_all)))
+                items = self._merged([v[1] for v in jvalues])
+                value = _set_value(items)
             except:
                 # Not JSON coded or list, probably trying to do a get_concat on none set-op data
                 # Do the normal thing
                 _log.debug("_handleFoundValues ********", exc_info=True)
-                valueCounts = Counter([v[1] for v in jvalues])
+                valueCounts = Counter([_set_value(v[1]) for v in jvalues])
                 value = valueCounts.most_common(1)[0][0]
-                _set_op = False
         else:
             try:
                 key, value = jvalues[0]
             except:
                 value = "[]"  # JSON empty list
+            try:
+                items = _set_items(value)
+            except:
+                # Not a set, a peer would not append it
+                pass
+            value = _set_value(value)
 
         peerToSaveTo = self.nearestWithoutValue.popleft()
         if peerToSaveTo is not None:
             _log.debug("nearestWithoutValue %d" % (len(self.nearestWithoutValue)+1))
-            if _set_op:
-                d = self.protocol.callAppend(peerToSaveTo, self.node.id, value)
-            else:
+            if items is not None:
+                d = self.protocol.callAppendChunks(peerToSaveTo, self.node.id, _json_chunks(items))
+            elif len(jvalues) > 1:
                 d = self.protocol.callStore(peerToSaveTo, self.node.id, value)
+            else:
+                return value
             return d.addCallback(lambda _: value)
         # TODO if nearest does not contain the proper set push to it
         return value
+
+    def _merged(self, values):
+        """
+        The union of the set values, i.e. the local set or JSON coded lists, where the items
+        missing in the largest value are added to a copy of it. Raises an exception for other values.
+        """
+        values = [v if isinstance(v, set) else _set_items(v) for v in values]
+        values.sort(key=len, reverse=True)
+        merged = set(values[0])
+        for items in values[1:]:
+            merged.update(items)
+        return merged
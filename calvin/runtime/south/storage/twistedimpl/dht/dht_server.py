@@ -228,13 +228,9 @@ class AutoDHTServer(StorageBase):
         return TwistedWaitObject(self.dht_server.get_concat, key=key, cb=cb, _include_key=include_key)
 
     def append(self, key, value, cb=None):
-        # TODO: handle this deeper inside DHT to remove unneccessary serializations
-        value = json.dumps(value)
         return TwistedWaitObject(self.dht_server.append, key=key, value=value, cb=cb)
 
     def remove(self, key, value, cb=None):
-        # TODO: handle this deeper inside DHT to remove unneccessary serializations
-        value = json.dumps(value)
         return TwistedWaitObject(self.dht_server.remove, key=key, value=value, cb=cb)
 
     def _change_index_cb(self, key, value, org_cb, index_items):
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import unittest
+import pytest
+from mock import Mock
+from twisted.internet import defer
+from kademlia.node import Node
+from kademlia.utils import digest
+
+from calvin.runtime.south.storage.twistedimpl.dht import append_server
+from calvin.runtime.south.storage.twistedimpl.dht.append_server import KademliaProtocolAppend, ForgetfulStorageFix,\
+                                                                        ValueListSpiderCrawl
+
+pytestmark = pytest.mark.unittest
+
+SENDER = ("127.0.0.1", 5000)
+PEER_ID = digest("peer")
+
+
+class TestSetValues(unittest.TestCase):
+
+    def setUp(self):
+        self.protocol = KademliaProtocolAppend(Node(digest("node")), ForgetfulStorageFix(), 20)
+        self.protocol.transferKeyValues = Mock()
+        self.key = digest("index-/node/attribute")
+
+    def value(self):
+        response = self.protocol.rpc_find_value(SENDER, PEER_ID, self.key)
+        return set(json.loads(response['value']))
+
+    def test_append_and_remove(self):
+        self.assertTrue(self.protocol.rpc_append(SENDER, PEER_ID, self.key, json.dumps(["a", "b"])))
+        self.assertEqual(self.value(), set(["a", "b"]))
+        self.assertTrue(self.protocol.rpc_append(SENDER, PEER_ID, self.key, json.dumps(["b", "c"])))
+        self.assertEqual(self.protocol.storage[self.key], set(["a", "b", "c"]))
+        self.assertTrue(self.protocol.rpc_remove(SENDER, PEER_ID, self.key, json.dumps(["a", "x"])))
+        self.assertEqual(self.value(), set(["b", "c"]))
+        self.assertFalse(self.protocol.rpc_append(SENDER, PEER_ID, self.key, "apa"))
+        self.assertEqual(self.value(), set(["b", "c"]))
+
+    def test_append_replaces_plain_value(self):
+        self.protocol.rpc_store(SENDER, PEER_ID, self.key, None)
+        self.protocol.rpc_append(SENDER, PEER_ID, self.key, json.dumps(["a"]))
+        self.assertEqual(self.value(), set(["a"]))
+
+    def test_cached_json_dropped(self):
+        self.protocol.rpc_append(SENDER, PEER_ID, self.key, json.dumps(["a"]))
+        self.assertEqual(self.value(), set(["a"]))
+        assert self.key in self.protocol.storage._set_json
+        self.protocol.rpc_store(SENDER, PEER_ID, self.key, json.dumps(["b"]))
+        self.assertEqual(self.value(), set(["b"]))
+        # A JSON coded list, e.g. stored by an older node, is merged
+        self.protocol.rpc_append(SENDER, PEER_ID, self.key, json.dumps(["c"]))
+        self.assertEqual(self.value(), set(["b", "c"]))
+        self.protocol.rpc_store(SENDER, PEER_ID, self.key, json.dumps(["b", "d"]))
+        self.protocol.rpc_remove(SENDER, PEER_ID, self.key, json.dumps(["b"]))
+        self.assertEqual(self.value(), set(["d"]))
+        # Forgotten when older than the storage ttl
+        self.protocol.storage.ttl = 0
+        exists, _ = self.protocol.stored_value(self.key)
+        assert not exists
+        self.assertEqual(self.protocol.storage._set_json, {})
+
+    def test_transfer_in_chunks(self):
+        del self.protocol.transferKeyValues
+        self.protocol.callAppend = Mock(return_value=defer.succeed((True, True)))
+        members = ["member-%04d" % i for i in range(5000)]
+        self.protocol.add_to_set(self.key, members)
+        self.protocol.transferKeyValues(Node(PEER_ID, *SENDER))
+        chunks = [args[2] for args, _ in self.protocol.callAppend.call_args_list]
+        assert len(chunks) > 1
+        assert max([len(chunk) for chunk in chunks]) <= append_server.SET_CHUNK_SIZE
+        self.assertEqual(sorted(sum([json.loads(chunk) for chunk in chunks], [])), members)
+
+    def test_merged_values(self):
+        self.protocol.callAppend = Mock(return_value=defer.succeed((True, True)))
+        crawl = ValueListSpiderCrawl(self.protocol, Node(self.key), [], 20, 3, local_value=set(["a"]))
+        crawl.nearestWithoutValue.push(Node(PEER_ID, *SENDER))
+        results = []
+        crawl._handleFoundValues([(digest("p1"), json.dumps(["b"])),
+                                  (digest("p2"), json.dumps(["a", "c"]))]).addCallback(results.append)
+        self.assertEqual(set(json.loads(results[0])), set(["a", "b", "c"]))
+        self.assertEqual(set(json.loads(self.protocol.callAppend.call_args[0][2])), set(["a", "b", "c"]))
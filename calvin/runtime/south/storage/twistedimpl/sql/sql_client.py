@@ -78,6 +78,26 @@ INSERT INTO {db}.cvalues (id, valuestr)
     ON DUPLICATE KEY UPDATE valuestr='{{valuestr}}';
 """]]
 
+# Multi-row versions of set, get and append, i.e. one roundtrip per statement independent of number of keys
+QUERY_SET_MANY = [q.format(db=config_kwargs['db']) for q in ["""
+INSERT IGNORE INTO {db}.ckeys (keystr) VALUES {{keys}};
+""", """
+INSERT INTO {db}.cvalues (id, valuestr)
+    (SELECT k.id, v.valuestr FROM {db}.ckeys k JOIN ({{values}}) v ON k.keystr=v.keystr)
+    ON DUPLICATE KEY UPDATE valuestr=VALUES(valuestr);
+"""]]
+
+QUERY_GET_MANY = """
+SELECT k.keystr, v.valuestr FROM {db}.ckeys k JOIN {db}.cvalues v ON k.id=v.id WHERE k.keystr IN ({{keys}});
+""".format(db=config_kwargs['db'])
+
+QUERY_APPEND_MANY = [q.format(db=config_kwargs['db']) for q in ["""
+INSERT IGNORE INTO {db}.ckeys (keystr) VALUES {{keys}};
+""", """
+INSERT IGNORE INTO {db}.csetvalues (id, valuestr)
+    (SELECT k.id, v.valuestr FROM {db}.ckeys k JOIN ({{values}}) v ON k.keystr=v.keystr);
+"""]]
+
 QUERY_GET = """
 SELECT valuestr FROM {db}.cvalues WHERE id IN (SELECT id FROM {db}.ckeys WHERE keystr='{{keystr}}');
 """.format(db=config_kwargs['db'])
@@ -232,6 +252,84 @@ class SqlClient(StorageBase):
         if cb is not None:
             async.DelayedCall(0, CalvinCB(cb, key, calvinresponse.CalvinResponse(status=calvinresponse.NOT_FOUND)))
 
+    def _many_rows(self, items):
+        """ Returns the keys and (key, value) rows parts of the *_MANY queries """
+        keys = ", ".join(["('%s')" % key.replace("'", r"\'") for key in items])
+        values = " UNION ALL ".join(["SELECT '%s' AS keystr, '%s' AS valuestr" % (key.replace("'", r"\'"), value)
+                                     for key, values in items.iteritems() for value in values])
+        return keys, values
+
+    def set_many(self, items, cb=None):
+        """
+            Set all key, value pairs in dictionary items in the storage
+        """
+        _log.debug("SQL set_many %s" % (items,))
+        if not items:
+            if cb is not None:
+                async.DelayedCall(0, CalvinCB(cb, values={}))
+            return
+        keys, values = self._many_rows({key: [json.dumps(value)] for key, value in items.iteritems()})
+        def _set_values(*args, **kwargs):
+            d2 = self.dbpool.runQuery(QUERY_SET_MANY[1].format(values=values))
+            d2.addCallbacks(CalvinCB(self._many_status_cb, cb=cb, keys=items.keys(), ok=True),
+                            CalvinCB(self._many_status_cb, cb=cb, keys=items.keys(), ok=False))
+        d1 = self.dbpool.runQuery(QUERY_SET_MANY[0].format(keys=keys))
+        d1.addCallbacks(_set_values, CalvinCB(self._many_status_cb, cb=cb, keys=items.keys(), ok=False))
+
+    def append_many(self, items, cb=None):
+        """
+            Append the list of values to the set for each key in dictionary items
+        """
+        _log.debug("SQL append_many %s" % (items,))
+        items = {key: value for key, value in items.iteritems() if value}
+        if not items:
+            if cb is not None:
+                async.DelayedCall(0, CalvinCB(cb, values={}))
+            return
+        keys, values = self._many_rows({key: [json.dumps(v) for v in value] for key, value in items.iteritems()})
+        def _append_values(*args, **kwargs):
+            d2 = self.dbpool.runQuery(QUERY_APPEND_MANY[1].format(values=values))
+            d2.addCallbacks(CalvinCB(self._many_status_cb, cb=cb, keys=items.keys(), ok=True),
+                            CalvinCB(self._many_status_cb, cb=cb, keys=items.keys(), ok=False))
+        d1 = self.dbpool.runQuery(QUERY_APPEND_MANY[0].format(keys=keys))
+        d1.addCallbacks(_append_values, CalvinCB(self._many_status_cb, cb=cb, keys=items.keys(), ok=False))
+
+    def _many_status_cb(self, result, **kwargs):
+        cb = kwargs.pop('cb', None)
+        ok = kwargs.pop('ok', False)
+        _log.debug("SQL set/append many %s %s" % ("OK" if ok else "FAIL", str(result)))
+        if cb is not None:
+            values = {key: calvinresponse.CalvinResponse(status=ok) for key in kwargs.pop('keys', [])}
+            async.DelayedCall(0, CalvinCB(cb, values=values))
+
+    def get_many(self, keys, cb=None):
+        """
+            Gets the values for all keys from the storage
+        """
+        _log.debug("SQL get_many %s" % (keys,))
+        if not keys:
+            if cb is not None:
+                async.DelayedCall(0, CalvinCB(cb, values={}))
+            return
+        keys_sql = ", ".join(["'%s'" % key.replace("'", r"\'") for key in keys])
+        d = self.dbpool.runQuery(QUERY_GET_MANY.format(keys=keys_sql))
+        d.addCallbacks(CalvinCB(self._get_many_cb, cb=cb, keys=keys), CalvinCB(self._get_many_cb, None, cb=cb, keys=keys))
+
+    def _get_many_cb(self, result, *args, **kwargs):
+        # On failure result is None and all keys are reported not found
+        cb = kwargs.pop('cb', None)
+        values = {}
+        for key, valuestr in result or []:
+            try:
+                values[key] = json.loads(valuestr)
+            except:
+                pass
+        _log.debug("SQL get_many OK %s" % values)
+        if cb is not None:
+            for key in kwargs.pop('keys', []):
+                values.setdefault(key, calvinresponse.CalvinResponse(status=calvinresponse.NOT_FOUND))
+            async.DelayedCall(0, CalvinCB(cb, values=values))
+
     def delete(self, key, cb=None):
         _log.debug("SQL delete %s" % (key,))
         key_sql = key.replace("'", r"\'")
@@ -16,11 +16,24 @@
 
 from calvin.utilities.calvin_callback import CalvinCBClass
 from calvin.runtime.north.plugins.coders.messages import message_coder_factory
+from calvin.runtime.north.plugins.coders.negotiators import negotiator_factory
+from calvin.utilities import calvinconfig
 
 from calvin.utilities import calvinlogger
 from urlparse import urlparse
 
 _log = calvinlogger.get_logger(__name__)
+_conf = calvinconfig.get()
+
+_negotiator = None
+
+
+def get_negotiator():
+    global _negotiator
+    if _negotiator is None:
+        _negotiator = negotiator_factory.get(_conf.get(None, 'remote_coder_negotiator') or "static")
+    return _negotiator
+
 
 class URI(object):
     def __init__(self, uri):
@@ -107,6 +120,12 @@ class BaseTransport(CalvinCBClass):
         """
         return message_coder_factory.get_prio_list()
 
+    def select_coder(self, peer_coders):
+        """
+            Return name of the coder to use with a peer supporting peer_coders
+        """
+        return get_negotiator().select(self.get_coders_prio(), peer_coders)
+
     def get_coders(self):
         """
             Return the filtered coders on this transport
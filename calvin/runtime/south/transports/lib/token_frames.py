@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compact binary frames for token messages on a runtime to runtime link.
+
+TUNNEL_DATA messages carrying TOKEN, TOKEN_REPLY, TOKENS or TOKENS_REPLY are
+sent as a fixed binary header followed by the token values encoded with the
+link's message coder. Tunnel and port ids are mapped to small integers, an id
+is sent once in a DEFINE frame before its first use on the link. The from and
+to runtime ids are given by the link.
+
+Frames start with a zero byte, which no message coder produces for a dict.
+"""
+
+import struct
+
+MARKER = '\x00'
+# Version exchanged in the join messages
+VERSION = 1
+
+DEFINE, TOKEN, TOKEN_REPLY, TOKENS, TOKENS_REPLY = range(5)
+_KINDS = {'TOKEN': TOKEN, 'TOKEN_REPLY': TOKEN_REPLY, 'TOKENS': TOKENS, 'TOKENS_REPLY': TOKENS_REPLY}
+_CMDS = {v: k for k, v in _KINDS.items()}
+
+_TOKEN_TYPES = ('Token', 'ExceptionToken', 'EOSToken')
+_TOKEN_TYPE_INDEX = {t: i for i, t in enumerate(_TOKEN_TYPES)}
+_STATUS = ('ACK', 'NACK', 'ABORT')
+_STATUS_INDEX = {s: i for i, s in enumerate(_STATUS)}
+
+# Expected keys, other messages use the coder
+_MSG_KEYS = set(['cmd', 'value', 'tunnel_id', 'from_rt_uuid', 'to_rt_uuid', 'msg_uuid'])
+_VALUE_KEYS = {
+    TOKEN: set(['cmd', 'token', 'port_id', 'peer_port_id', 'sequencenbr']),
+    TOKEN_REPLY: set(['cmd', 'value', 'port_id', 'peer_port_id', 'sequencenbr']),
+    TOKENS: set(['cmd', 'tokens', 'port_id', 'peer_port_id', 'sequencenbr']),
+    TOKENS_REPLY: set(['cmd', 'value', 'port_id', 'peer_port_id', 'sequencenbr', 'length', 'acked'])
+}
+
+# marker, kind, tunnel, port, peer port, sequence number
+_HEADER = struct.Struct('!cBHHHQ')
+_DEFINE = struct.Struct('!cBH')
+_UINT8 = struct.Struct('!B')
+_UINT16 = struct.Struct('!H')
+_REPLY_COUNTS = struct.Struct('!HH')
+_MAX_IDS = 0xffff
+
+
+class TokenFrames(object):
+
+    """Encoder/decoder for one link, the id mapping is only valid for the link"""
+
+    def __init__(self, coder):
+        super(TokenFrames, self).__init__()
+        self._coder = coder
+        self._send_ids = {}
+        self._recv_ids = {}
+
+    def encode(self, msg, rt_id, peer_id):
+        """
+        Returns a list of frames for msg, or None when msg has to be encoded
+        by the message coder.
+        """
+        try:
+            value = msg['value']
+            kind = _KINDS[value['cmd']]
+        except (KeyError, TypeError):
+            return None
+        if (msg['cmd'] != 'TUNNEL_DATA' or msg.get('from_rt_uuid') != rt_id or msg.get('to_rt_uuid') != peer_id or
+                not _MSG_KEYS.issuperset(msg) or set(value) != _VALUE_KEYS[kind]):
+            return None
+        try:
+            if kind == TOKEN:
+                body = self._encode_tokens([value['token']])
+            elif kind == TOKENS:
+                body = _UINT16.pack(len(value['tokens'])) + self._encode_tokens(value['tokens'])
+            elif kind == TOKEN_REPLY:
+                body = _UINT8.pack(_STATUS_INDEX[value['value']])
+            else:
+                body = _UINT8.pack(_STATUS_INDEX[value['value']]) + _REPLY_COUNTS.pack(value['length'], value['acked'])
+        except (KeyError, TypeError, struct.error):
+            return None
+        ids = (msg['tunnel_id'], value['port_id'], value['peer_port_id'])
+        if (not all(isinstance(i, basestring) for i in ids) or len(self._send_ids) + len(ids) > _MAX_IDS or
+                not isinstance(value['sequencenbr'], (int, long)) or not 0 <= value['sequencenbr'] < 1 << 64):
+            return None
+        frames = []
+        tunnel, port, peer_port = [self._id(frames, i) for i in ids]
+        frames.append(_HEADER.pack(MARKER, kind, tunnel, port, peer_port, value['sequencenbr']) + body)
+        return frames
+
+    def decode(self, data, rt_id, peer_id):
+        """Returns the message in data, or None for frames only used by the link"""
+        kind = ord(data[1])
+        if kind == DEFINE:
+            _, _, index = _DEFINE.unpack_from(data)
+            self._recv_ids[index] = data[_DEFINE.size:]
+            return None
+        _, _, tunnel, port, peer_port, sequencenbr = _HEADER.unpack_from(data)
+        value = {
+            'cmd': _CMDS[kind],
+            'port_id': self._recv_ids[port],
+            'peer_port_id': self._recv_ids[peer_port],
+            'sequencenbr': sequencenbr
+        }
+        offset = _HEADER.size
+        if kind == TOKEN:
+            value['token'] = self._decode_tokens(data, offset, 1)[0]
+        elif kind == TOKENS:
+            count, = _UINT16.unpack_from(data, offset)
+            value['tokens'] = self._decode_tokens(data, offset + _UINT16.size, count)
+        else:
+            value['value'] = _STATUS[ord(data[offset])]
+            if kind == TOKENS_REPLY:
+                value['length'], value['acked'] = _REPLY_COUNTS.unpack_from(data, offset + 1)
+        return {'cmd': 'TUNNEL_DATA', 'tunnel_id': self._recv_ids[tunnel], 'value': value,
+                'from_rt_uuid': peer_id, 'to_rt_uuid': rt_id}
+
+    def _id(self, frames, id_):
+        index = self._send_ids.get(id_)
+        if index is None:
+            index = len(self._send_ids)
+            self._send_ids[id_] = index
+            frames.append(_DEFINE.pack(MARKER, DEFINE, index) + id_.encode('utf-8'))
+        return index
+
+    def _encode_tokens(self, tokens):
+        types = ''.join(chr(_TOKEN_TYPE_INDEX[t['type']]) for t in tokens)
+        return types + self._coder.encode([t['data'] for t in tokens])
+
+    def _decode_tokens(self, data, offset, count):
+        types = data[offset:offset + count]
+        values = self._coder.decode(data[offset + count:])
+        return [{'type': _TOKEN_TYPES[ord(t)], 'data': v} for t, v in zip(types, values)]
@@ -20,11 +20,12 @@ from calvin.utilities.calvin_callback import CalvinCB
 from calvin.utilities import calvinlogger
 from calvin.utilities import calvinuuid
 from calvin.runtime.south.transports import base_transport
+from calvin.runtime.south.transports.lib import token_frames
 
 _log = calvinlogger.get_logger(__name__)
 
-_join_request_reply = {'cmd': 'JOIN_REPLY', 'id': None, 'sid': None, 'serializer': None}
-_join_request = {'cmd': 'JOIN_REQUEST', 'id': None, 'sid': None, 'serializers': []}
+_join_request_reply = {'cmd': 'JOIN_REPLY', 'id': None, 'sid': None, 'serializer': None, 'token_frames': None}
+_join_request = {'cmd': 'JOIN_REQUEST', 'id': None, 'sid': None, 'serializers': [], 'token_frames': None}
 
 
 class CalvinTransport(base_transport.BaseTransport):
@@ -48,6 +49,8 @@ class CalvinTransport(base_transport.BaseTransport):
         self._node_name = node_name
         self._remote_rt_id = None
         self._coder = None
+        # Binary frames for token messages, when supported by peer
+        self._token_frames = None
         self._transport = transport(self._uri.hostname, self._uri.port, callbacks, proto=proto, node_name=self._node_name, server_node_name=server_node_name)
         self._rtt = None  # Init rtt in s
 
@@ -87,6 +90,13 @@ class CalvinTransport(base_transport.BaseTransport):
         try:
             _log.debug('send_message %s => %s "%s"' % (self._rt_id, self._remote_rt_id, payload))
             self._callback_execute('send_message', self, payload)
+            if self._token_frames and coder is None:
+                frames = self._token_frames.encode(payload, self._rt_id, self._remote_rt_id)
+                if frames:
+                    for frame in frames:
+                        self._callback_execute('raw_send_message', self, frame)
+                        self._transport.send(frame)
+                    return True
             # Send
             raw_payload = tcoder.encode(payload)
 
@@ -112,6 +122,7 @@ class CalvinTransport(base_transport.BaseTransport):
         msg['id'] = self._rt_id
         msg['sid'] = self._get_msg_uuid()
         msg['serializers'] = self.get_coders().keys()
+        msg['token_frames'] = token_frames.VERSION
         self._join_start = time.time()
         self.send(msg, coder=self._get_join_coder())
 
@@ -120,6 +131,7 @@ class CalvinTransport(base_transport.BaseTransport):
         msg['id'] = self._rt_id
         msg['sid'] = sid
         msg['serializer'] = serializer
+        msg['token_frames'] = token_frames.VERSION if self._token_frames else None
         self.send(msg, coder=self._get_join_coder())
 
     def _handle_join(self, data):
@@ -137,11 +149,12 @@ class CalvinTransport(base_transport.BaseTransport):
 
             sid = data_obj['sid']
 
-            for coder in self.get_coders_prio():
-                if coder in data_obj['serializers']:
-                    self._coder = self.get_coders()[coder]
-                    coder_name = coder
-                    break
+            coder_name = self.select_coder(data_obj['serializers'])
+            if coder_name:
+                self._coder = self.get_coders()[coder_name]
+
+            if data_obj.get('token_frames') == token_frames.VERSION and self._coder:
+                self._token_frames = token_frames.TokenFrames(self._coder)
 
             # Verify remote
             valid = self._verify_client(data_obj)
@@ -181,6 +194,9 @@ class CalvinTransport(base_transport.BaseTransport):
             if data_obj['serializer'] in self.get_coders():
                 self._coder = self.get_coders()[data_obj['serializer']]
 
+            if data_obj.get('token_frames') == token_frames.VERSION and self._coder:
+                self._token_frames = token_frames.TokenFrames(self._coder)
+
             if data_obj['id'] is not None:
                 # Request denied
                 self._remote_rt_id = data_obj['id']
@@ -231,7 +247,13 @@ class CalvinTransport(base_transport.BaseTransport):
         data_obj = None
         # decode
         try:
-            data_obj = self._coder.decode(data)
+            if self._token_frames and data[:1] == token_frames.MARKER:
+                data_obj = self._token_frames.decode(data, self._rt_id, self._remote_rt_id)
+                if data_obj is None:
+                    # Frame only used by the link
+                    return
+            else:
+                data_obj = self._coder.decode(data)
         except:
             _log.exception("Message decode failed")
         self._callback_execute('data_received', self, data_obj)
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import pytest
+
+from calvin.utilities.calvin_callback import CalvinCB
+from calvin.runtime.north.plugins.coders.messages import message_coder_factory
+from calvin.runtime.south.transports.lib.token_frames import TokenFrames, MARKER
+
+pytestmark = pytest.mark.unittest
+
+RT_ID = "RT-1"
+PEER_ID = "RT-2"
+
+
+def tunnel_data(value, **kwargs):
+    msg = {'cmd': 'TUNNEL_DATA', 'value': value, 'tunnel_id': "TUNNEL-1",
+           'from_rt_uuid': RT_ID, 'to_rt_uuid': PEER_ID}
+    msg.update(kwargs)
+    return msg
+
+
+def roundtrip(sender, receiver, msg):
+    frames = sender.encode(msg, RT_ID, PEER_ID)
+    assert frames
+    decoded = [receiver.decode(frame, PEER_ID, RT_ID) for frame in frames]
+    assert all(frame[0] == MARKER for frame in frames)
+    assert all(d is None for d in decoded[:-1])
+    return frames, decoded[-1]
+
+
+@pytest.fixture(params=['json', 'msgpack'])
+def frames(request):
+    coder = message_coder_factory.get(request.param)
+    return TokenFrames(coder), TokenFrames(coder)
+
+
+def test_token(frames):
+    sender, receiver = frames
+    value = {'cmd': 'TOKEN', 'port_id': "PORT-1", 'peer_port_id': "PORT-2", 'sequencenbr': 7,
+             'token': {'type': 'Token', 'data': {'a': [1, 2]}}}
+    first, decoded = roundtrip(sender, receiver, tunnel_data(value, msg_uuid="MSGID-1"))
+    assert decoded == tunnel_data(value)
+    # Ids are only defined on first use
+    value['sequencenbr'] = 8
+    second, decoded = roundtrip(sender, receiver, tunnel_data(value))
+    assert len(first) == 4
+    assert len(second) == 1
+    assert decoded == tunnel_data(value)
+
+
+def test_tokens_and_replies(frames):
+    sender, receiver = frames
+    tokens = [{'type': 'Token', 'data': 1}, {'type': 'ExceptionToken', 'data': "error"},
+              {'type': 'EOSToken', 'data': "End of stream"}]
+    value = {'cmd': 'TOKENS', 'port_id': "PORT-1", 'peer_port_id': "PORT-2", 'sequencenbr': 0, 'tokens': tokens}
+    _, decoded = roundtrip(sender, receiver, tunnel_data(value))
+    assert decoded == tunnel_data(value)
+    value = {'cmd': 'TOKEN_REPLY', 'port_id': "PORT-1", 'peer_port_id': "PORT-2", 'sequencenbr': 3,
+             'value': 'NACK'}
+    _, decoded = roundtrip(sender, receiver, tunnel_data(value))
+    assert decoded == tunnel_data(value)
+    value = {'cmd': 'TOKENS_REPLY', 'port_id': "PORT-1", 'peer_port_id': "PORT-2", 'sequencenbr': 3,
+             'length': 16, 'acked': 5, 'value': 'NACK'}
+    _, decoded = roundtrip(sender, receiver, tunnel_data(value))
+    assert decoded == tunnel_data(value)
+
+
+def test_not_framed(frames):
+    sender, _ = frames
+    value = {'cmd': 'TOKEN', 'port_id': "PORT-1", 'peer_port_id': "PORT-2", 'sequencenbr': 7,
+             'token': {'type': 'Token', 'data': 1}}
+    # Other messages
+    assert sender.encode({'cmd': 'TUNNEL_NEW', 'tunnel_id': "TUNNEL-1"}, RT_ID, PEER_ID) is None
+    assert sender.encode(tunnel_data({'cmd': 'TOKEN_OPTIONS', 'window': 64}), RT_ID, PEER_ID) is None
+    # Routed messages
+    assert sender.encode(tunnel_data(value, to_rt_uuid="RT-3"), RT_ID, PEER_ID) is None
+    # Unknown token types and extra keys
+    value['token'] = {'type': 'OtherToken', 'data': 1}
+    assert sender.encode(tunnel_data(value), RT_ID, PEER_ID) is None
+    value['token'] = {'type': 'Token', 'data': 1}
+    value['extra'] = True
+    assert sender.encode(tunnel_data(value), RT_ID, PEER_ID) is None
+    # No ids were defined
+    del value['extra']
+    assert len(sender.encode(tunnel_data(value), RT_ID, PEER_ID)) == 4
+
+
+
+def connected_transports(strip_join=False):
+    from mock import Mock
+    from calvin.runtime.south.transports.lib.twisted.twisted_transport import CalvinTransport
+
+    def old_peer(data):
+        # Peers not knowing token frames leave the key out of their join message
+        msg = json.loads(data)
+        msg.pop('token_frames', None)
+        return json.dumps(msg)
+
+    transport = lambda *args, **kwargs: Mock()
+    client = CalvinTransport(RT_ID, "calvinip://127.0.0.1:5000", {}, transport)
+    server = CalvinTransport(PEER_ID, "calvinip://127.0.0.1:5001", {}, transport, proto=Mock())
+    client._transport.send.side_effect = lambda data: server._data_received(old_peer(data) if strip_join else data)
+    server._transport.send.side_effect = client._data_received
+    client._send_join()
+    assert client._remote_rt_id == PEER_ID
+    assert server._remote_rt_id == RT_ID
+    return client, server
+
+
+def test_transport_negotiation():
+    client, server = connected_transports()
+    assert client._token_frames and server._token_frames
+    received = []
+    server.callback_register('data_received', CalvinCB(lambda tp, data: received.append(data)))
+    sent = []
+    client.callback_register('raw_send_message', CalvinCB(lambda tp, data: sent.append(data)))
+    value = {'cmd': 'TOKEN', 'port_id': "PORT-1", 'peer_port_id': "PORT-2", 'sequencenbr': 0,
+             'token': {'type': 'Token', 'data': 1}}
+    client.send(tunnel_data(value))
+    assert received == [tunnel_data(value)]
+    assert sent[-1][0] == MARKER
+    # Other messages still use the coder
+    client.send({'cmd': 'TUNNEL_NEW', 'from_rt_uuid': RT_ID, 'to_rt_uuid': PEER_ID})
+    assert received[-1]['cmd'] == 'TUNNEL_NEW'
+    assert sent[-1][0] != MARKER
+
+
+def test_transport_old_peer():
+    client, server = connected_transports(strip_join=True)
+    assert client._token_frames is None
+    assert server._token_frames is None
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Micro-benchmarks for runtime internals.
+
+These are not collected by py.test, run them as scripts, e.g.
+    python -m calvin.tests.benchmarks.bench_scheduler
+"""
+
+import time
+
+
+def measure(func, *args, **kwargs):
+    """Call func(*args, **kwargs), return (result, elapsed seconds)"""
+    start = time.time()
+    result = func(*args, **kwargs)
+    return result, time.time() - start
+
+
+def report(title, rows, columns):
+    """Print rows (list of tuples) as a table with the given column names"""
+    print title
+    lines = [[str(c) for c in columns]]
+    lines += [[("%.3f" % v) if isinstance(v, float) else str(v) for v in row] for row in rows]
+    widths = [max(len(cell) for cell in column) for column in zip(*lines)]
+    for line in lines:
+        print "  ".join(cell.rjust(w) for cell, w in zip(line, widths))
+    print
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Size and coding time of actor states sent at migration and replication.
+
+An actor with long port queues, partly filled, is serialized and coded as
+in an actor_new message: with all queue slots (the default, which older
+runtimes expect), with the occupied slots (compact_queue_state), and
+compacted with and without compression. Replicas are sent as the full state or as a delta
+of the previous replica's state.
+"""
+
+import copy
+import sys
+from mock import patch
+
+from calvin.utilities import calvinconfig
+from calvin.utilities import compact_state
+from calvin.utilities import state_delta
+from calvin.runtime.north.calvin_token import Token
+from calvin.runtime.north.plugins.coders.messages import message_coder_factory
+from calvin.tests.benchmarks import measure, report
+from calvin.tests.benchmarks.helpers import actor_manager, new_actor, fifo
+
+
+def _actor(queue_length, tokens):
+    actor = new_actor(actor_manager(), 'std.Identity')
+    for port, direction in ((actor.inports['token'], "in"), (actor.outports['token'], "out")):
+        port.set_queue(fifo(direction, queue_length))
+        port.queue.add_reader("reader", {})
+        port.queue.add_writer("writer", {})
+        for i in range(tokens):
+            port.queue.write(Token({'value': i, 'timestamp': 1514764800.0 + i}), "writer")
+    return actor
+
+
+def _serialize(actor, occupied_slots):
+    """The actor state with only the occupied queue slots, or all slots"""
+    with patch.dict(calvinconfig.get().config['global'], {'compact_queue_state': occupied_slots}):
+        return actor.serialize()
+
+
+def _coded(coder, state, compact=None):
+    """Coding on both nodes, returns the message size"""
+    if compact is not None:
+        state = compact_state.encode([state], compress=compact)
+    data = coder.encode({'cmd': 'ACTOR_NEW', 'state': {'actor_state': state}})
+    state = coder.decode(data)['state']['actor_state']
+    if compact is not None:
+        compact_state.decode(state)
+    return len(data)
+
+
+def _replicas(coder, state, replicas, use_delta):
+    size = 0
+    base = None
+    for i in range(replicas):
+        replica = copy.deepcopy(state)
+        replica['private']['_id'] = "replica-%d" % i
+        replica['private']['_name'] = "identity/%d" % i
+        size += _coded(coder, state_delta.delta(base, replica) if use_delta and base else replica)
+        base = replica
+    return size
+
+
+def run(queue_length=256, tokens=32, repeat=200, replicas=10):
+    coder = message_coder_factory.get('json')
+    actor = _actor(queue_length, tokens)
+    state = _serialize(actor, True)
+    rows = []
+    for name, sent, compact in (("all slots", _serialize(actor, False), None), ("occupied slots", state, None),
+                                ("compact", state, False), ("compact+zlib", state, True)):
+        sizes, elapsed = measure(lambda: [_coded(coder, sent, compact) for _ in range(repeat)])
+        rows.append((name, sizes[0], elapsed * 1e6 / repeat))
+    report("Actor state with queues of %d slots, %d tokens each (json messages)" % (queue_length, tokens), rows,
+           ["format", "bytes", "us coded"])
+
+    rows = []
+    for name, use_delta in (("full state", False), ("delta", True)):
+        size, elapsed = measure(_replicas, coder, state, replicas, use_delta)
+        rows.append((name, replicas, size, size / replicas, elapsed * 1e3))
+    report("Replicas sent to the same node", rows, ["replica state", "replicas", "bytes", "bytes/replica", "ms"])
+
+
+if __name__ == '__main__':
+    run(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Deployment-like actor store usage: a new ActorStore and a lookup for every
+actor created, as done by ActorManager, for an app with 200 actors of a
+few types. Compares walking the actor paths and importing the actor module
+each time (previous implementation) with the namespace index and actor
+class cache.
+"""
+
+from calvin.actorstore import store
+from calvin.tests.benchmarks import measure, report
+
+
+class _PreviousStore(store.ActorStore):
+
+    def find_all_modules(self):
+        modules = {}
+        for abs_path, namespace, files in self.directories():
+            if not files:
+                continue
+            modules.setdefault(namespace, [])
+            if abs_path not in modules[namespace]:
+                modules[namespace].append(abs_path)
+        return modules
+
+    def _cached_actor(self, qualified_name):
+        return None
+
+    def _cache_actor(self, *args):
+        pass
+
+
+def _deploy(store_class, actor_types, actors):
+    for i in range(actors):
+        found = store_class().lookup(actor_types[i % len(actor_types)])
+        assert found[0]
+    return actors
+
+
+def run(actors=200, actor_types=("std.Identity", "std.Counter", "io.Print", "std.Constantify", "flow.Alternate")):
+    rows = []
+    for name, store_class in (("previous", _PreviousStore), ("cached", store.ActorStore)):
+        store.ActorStore().lookup(actor_types[0])
+        n, elapsed = measure(_deploy, store_class, actor_types, actors)
+        rows.append((name, n, elapsed * 1000, elapsed * 1000 / n))
+    report("Actor store lookups during deployment", rows, ["store", "actors", "ms", "ms/actor"])
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Moving all actors of an application, a chain of actors, to another node.
+
+Migrating the actors one by one sends one actor_new per actor, and as the
+chain is split between the nodes each connection is made remote and then
+disconnected again. A group migration sends one actors_new and the
+connections within the group are made locally on the new node.
+
+The runtime work on both nodes is measured, the messages between the nodes
+(each a request and reply) and the storage requests of the new node counted.
+"""
+
+import json
+import sys
+from mock import Mock
+
+import calvin.requests.calvinresponse as response
+from calvin.runtime.north.storage import Storage
+from calvin.runtime.north.plugins.storage.storage_base import StorageBase
+from calvin.tests import DummyNode
+from calvin.tests.benchmarks import measure, report
+from calvin.tests.benchmarks.helpers import actor_manager, chain
+
+
+class _CountingStorage(StorageBase):
+    """Storage plugin with native set_many that counts requests"""
+
+    def __init__(self):
+        super(_CountingStorage, self).__init__()
+        self.requests = 0
+
+    def set(self, key, value, cb=None):
+        self.requests += 1
+        cb(key=key, value=response.CalvinResponse(True))
+
+    def set_many(self, items, cb=None):
+        self.requests += 1
+        cb(values={key: response.CalvinResponse(True) for key in items})
+
+
+class _Proto(object):
+    """Delivers actor_new and actors_new to the destination, counting the messages"""
+
+    def __init__(self, destination, counts):
+        super(_Proto, self).__init__()
+        self.destination = destination
+        self.counts = counts
+
+    def _deliver(self, data):
+        return json.loads(json.dumps(data))
+
+    def actor_new(self, to_rt_uuid, callback, actor_type, state, prev_connections, *args, **kwargs):
+        self.counts['messages'] += 1
+        self.destination.new_from_migration(actor_type, self._deliver(state), self._deliver(prev_connections),
+                                            callback=callback)
+
+    def actors_new(self, to_rt_uuid, callback, actors):
+        self.counts['messages'] += 1
+        self.destination.new_group_from_migration(self._deliver(actors), callback=callback)
+
+
+def _nodes(counts):
+    source, destination = actor_manager(), actor_manager()
+    destination.node.am = destination
+    destination.node.storage = Storage(DummyNode(), override_storage=_CountingStorage())
+    destination.node.storage.started = True
+    destination.node.storage.trigger_flush = Mock()
+    source.node.proto = _Proto(destination, counts)
+    moved = set()
+
+    def disconnect(callback, actor_id):
+        # Connections to actors already on the destination are remote
+        actor = source.actors[actor_id]
+        counts['messages'] += len(moved & set(p.id for p in actor.inports.values() + actor.outports.values()))
+        callback(status=response.CalvinResponse(True), actor_id=actor_id)
+    source.node.pm.disconnect = disconnect
+
+    def connect(port_id, peer_node_id, peer_port_id, callback):
+        if peer_node_id != destination.node.id:
+            counts['messages'] += 1
+            moved.add(peer_port_id)
+        callback(status=response.CalvinResponse(True), peer_port_id=peer_port_id)
+    destination.node.pm.connect = connect
+    return source, destination
+
+
+def _one_by_one(source, actors, node_id):
+    for actor in actors:
+        source.migrate(actor.id, node_id, Mock(), live=False)
+
+
+def _group(source, actors, node_id):
+    source.migrate_group([actor.id for actor in actors], node_id)
+
+
+def run(length=50, repeat=10):
+    rows = []
+    for name, migrate in (("one by one", _one_by_one), ("group", _group)):
+        work = 0.0
+        for _ in range(repeat):
+            counts = {'messages': 0}
+            source, destination = _nodes(counts)
+            actors, _, _ = chain(source, length)
+            _, elapsed = measure(migrate, source, actors, destination.node.id)
+            work += elapsed
+            assert len(destination.actors) == length
+        rows.append((name, length, counts['messages'], destination.node.storage.storage.requests,
+                     work * 1000 / repeat))
+    report("Migrating an application of %d actors in a chain" % length, rows,
+           ["migration", "actors", "messages", "storage requests", "work ms"])
+
+
+if __name__ == '__main__':
+    run(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Authorization decisions for deploying 200 actors with 3 requirements each,
+with 50 policies (one per user) in the policy directory. Compares reading
+all policy files for every decision (previous implementation), the
+compiled and indexed policies, and the compiled policies with the
+decision cache.
+"""
+
+import os
+import json
+import shutil
+import tempfile
+from mock import Mock
+
+from calvin.runtime.north.authorization.policy_decision_point import PolicyDecisionPoint
+from calvin.runtime.north.authorization.policy_retrieval_point import FilePolicyRetrievalPoint
+from calvin.tests.benchmarks import measure, report
+
+
+class _PreviousPRP(FilePolicyRetrievalPoint):
+
+    def get_policies_version(self, name_pattern='*'):
+        return None
+
+
+class _NoPIP(object):
+
+    attributes = {}
+
+    def get_attribute_value(self, attribute_type, attribute):
+        raise KeyError(attribute)
+
+
+def _policy(user):
+    return {"id": user, "rule_combining": "permit_overrides",
+            "target": {"subject": {"first_name": [user]}},
+            "rules": [{"id": user + "_rule0", "effect": "permit",
+                       "target": {"subject": {"actor_signer": ["signer"]},
+                                  "action": {"requires": ["runtime", "io.*", "sys.timer.*"]}}}]}
+
+
+def _deploy(pdp, actors, users):
+    for i in range(actors):
+        user = "user%d" % (i % users)
+        for requires in ("runtime", "io.led", "sys.timer.once"):
+            request = {"subject": {"first_name": user, "actor_signer": "signer"},
+                       "action": {"requires": [requires]}, "resource": {"node_id": "node"}}
+            decision, _ = pdp.combined_policy_decision(request, _NoPIP())
+            assert decision == "permit"
+    return actors * 3
+
+
+def run(actors=200, users=50):
+    path = tempfile.mkdtemp()
+    try:
+        for i in range(users):
+            with open(os.path.join(path, "user%d.json" % i), "w") as f:
+                json.dump(_policy("user%d" % i), f)
+        rows = []
+        for name, prp_class, interval, ttl in (("previous", _PreviousPRP, 0, 0),
+                                               ("compiled", FilePolicyRetrievalPoint, 1.0, 0),
+                                               ("compiled+cache", FilePolicyRetrievalPoint, 1.0, 10.0)):
+            node = Mock()
+            node.authorization.prp = prp_class(path)
+            pdp = PolicyDecisionPoint(node, {"policy_check_interval": interval, "decision_cache_ttl": ttl})
+            n, elapsed = measure(_deploy, pdp, actors, users)
+            rows.append((name, n, elapsed * 1000, elapsed * 1e6 / n))
+        report("Authorization decisions during deployment", rows, ["pdp", "decisions", "ms", "us/decision"])
+    finally:
+        shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    run()
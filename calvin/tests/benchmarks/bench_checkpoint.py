@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Overhead of checkpointing the actors of a runtime to disk, and the time to
+restore them after a restart.
+
+A chain of actors, with tokens in the queues, is checkpointed in full and
+then incrementally with a part of the actors changed. The work in the
+reactor (serializing the actors, longest for one batch) and in the writer
+thread (coding and writing the log, with fsync) is measured separately.
+Restoring reads the log and creates all actors as a migrated group.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+from mock import Mock
+
+from calvin.runtime.north import checkpointmanager
+from calvin.runtime.north.checkpointmanager import CheckpointManager, CheckpointLog
+from calvin.tests.benchmarks import measure, report
+from calvin.tests.benchmarks.helpers import actor_manager, chain
+
+
+def _checkpoint(cm, actor_ids):
+    """As CheckpointManager.checkpoint, without the reactor and thread"""
+    record = cm._record()
+    reactor = longest = 0.0
+    for i in range(0, len(actor_ids), checkpointmanager.CHECKPOINT_BATCH):
+        _, elapsed = measure(cm._collect, actor_ids[i:i + checkpointmanager.CHECKPOINT_BATCH], record)
+        reactor += elapsed
+        longest = max(longest, elapsed)
+    cm._full = False
+    size = 0 if record['full'] else cm.log.size()
+    _, writer = measure(cm._write, record)
+    return len(record['actors']), reactor, longest, writer, cm.log.size() - size
+
+
+def run(actors=1000, tokens=8, changed=10):
+    directory = tempfile.mkdtemp()
+    try:
+        source = actor_manager()
+        source.node.am = source
+        chain_actors, writer, _ = chain(source, actors)
+        for i in range(tokens):
+            writer({'value': i, 'timestamp': 1514764800.0 + i})
+        actor_ids = [actor.id for actor in chain_actors]
+        cm = CheckpointManager(source.node, interval=1, path=os.path.join(directory, "node.log"))
+        cm.log = CheckpointLog(cm.path)
+
+        rows = []
+        for name, change in (("full", False), ("no changes", False), ("%d%% changed" % changed, True)):
+            if change:
+                for actor in chain_actors[::100 / changed]:
+                    actor.dump = not actor.dump
+            written, reactor, longest, writer_time, size = _checkpoint(cm, actor_ids)
+            rows.append((name, written, reactor * 1000, longest * 1000, writer_time * 1000, size))
+        report("Checkpoint of %d actors in a chain, %d tokens queued" % (actors, tokens), rows,
+               ["checkpoint", "actors written", "reactor ms", "longest batch ms", "writer ms", "bytes"])
+
+        destination = actor_manager()
+        destination.node.am = destination
+        restorer = CheckpointManager(destination.node, interval=1, path=cm.path)
+        restorer.log = CheckpointLog(cm.path)
+        loaded, load_time = measure(restorer.load)
+        _, restore_time = measure(restorer.restore, callback=Mock())
+        assert len(destination.actors) == actors
+        report("Restoring %d actors" % actors,
+               [(len(loaded), load_time * 1000, restore_time * 1000, restore_time * 1e6 / actors)],
+               ["actors", "read log ms", "restore ms", "us/actor"])
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    run(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compare message coders on runtime to runtime traffic:
+  - token: a stream of TUNNEL_DATA TOKEN messages
+  - storage: storage proxy SET requests
+  - migration: ACTOR_NEW with the serialized state of real actors
+For each coder: encode and decode time per message, bytes per message and
+the cost used by the adaptive negotiator.
+"""
+
+from calvin.runtime.north.plugins.coders.messages import message_coder_factory, msgpack_coder
+from calvin.runtime.north.plugins.coders.negotiators import adaptive
+from calvin.tests.benchmarks import measure, report
+from calvin.tests.benchmarks.helpers import actor_manager, chain
+
+
+def _coders():
+    coders = [('json', message_coder_factory.get('json')), ('umsgpack', msgpack_coder.MessageCoder())]
+    if msgpack_coder.msgpack:
+        coders.append(('msgpack (C)', msgpack_coder.CMessageCoder()))
+    try:
+        coders.append(('cbor', message_coder_factory.get('cbor')))
+    except Exception:
+        pass
+    return coders
+
+
+def _migration_messages(actors, tokens):
+    actor_mgr = actor_manager()
+    chained, writer, _ = chain(actor_mgr, actors)
+    for i in range(tokens):
+        writer({'value': i, 'timestamp': 1514764800.0 + i})
+    return [{'cmd': 'ACTOR_NEW', 'msg_uuid': actor.id,
+             'state': {'actor_type': actor._type, 'actor_state': actor.serialize(),
+                       'prev_connections': actor.connections(actor_mgr.node.id), 'connection_list': None}}
+            for actor in chained]
+
+
+def _workloads():
+    samples = adaptive.sample_messages()
+    return [("token", [m for m in samples if m.get('value', {}).get('cmd') == 'TOKEN']),
+            ("storage", [m for m in samples if m.get('value', {}).get('cmd') == 'SET']),
+            ("migration", _migration_messages(4, 10))]
+
+
+def _encode(coder, messages, rounds):
+    for _ in range(rounds):
+        encoded = [coder.encode(msg) for msg in messages]
+    return encoded
+
+
+def _decode(coder, encoded, rounds):
+    for _ in range(rounds):
+        for data in encoded:
+            coder.decode(data)
+
+
+def run(rounds=500):
+    rows = []
+    for workload, messages in _workloads():
+        n = rounds * len(messages)
+        for name, coder in _coders():
+            encoded, encode_time = measure(_encode, coder, messages, rounds)
+            _, decode_time = measure(_decode, coder, encoded, rounds)
+            size = sum(len(data) for data in encoded) / len(encoded)
+            cost_us = (encode_time + decode_time) / n * 1e6 + size * adaptive.BYTE_COST * 1e6
+            rows.append((workload, name, encode_time / n * 1e6, decode_time / n * 1e6, size, cost_us))
+    report("Message coders", rows, ["messages", "coder", "encode us", "decode us", "bytes", "cost us"])
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compile the CalvinScript examples in calvin/examples. Compares building
+the documentation of the whole actor library for every actor lookup
+(previous implementation) with the shared metadata store.
+"""
+
+import os
+import glob
+
+from calvin.actorstore import store
+from calvin.csparser import codegen
+from calvin.tests.benchmarks import measure, report
+
+
+class _PreviousMetadataStore(object):
+
+    def refresh(self):
+        pass
+
+    def metadata(self, qualified_name):
+        return store.DocumentationStore().metadata(qualified_name)
+
+
+def _scripts(limit):
+    examples = os.path.join(os.path.dirname(codegen.__file__), "..", "examples")
+    paths = sorted(glob.glob(os.path.join(examples, "*", "*.calvin")))[:limit]
+    scripts = []
+    for path in paths:
+        with open(path, 'r') as f:
+            scripts.append((os.path.splitext(os.path.basename(path))[0], f.read()))
+    return scripts
+
+
+def _compile(scripts):
+    for name, source_text in scripts:
+        codegen.calvin_codegen(source_text, name, verify=False)
+    return len(scripts)
+
+
+def run(limit=10):
+    scripts = _scripts(limit)
+    rows = []
+    get_metadata_store = codegen.get_metadata_store
+    for name, metadata_store in (("previous", _PreviousMetadataStore()), ("metadata store", None)):
+        codegen.get_metadata_store = (lambda: metadata_store) if metadata_store else get_metadata_store
+        try:
+            # Warm up, i.e. the metadata store is built (or loaded) once per process
+            _compile(scripts[:1])
+            n, elapsed = measure(_compile, scripts)
+        finally:
+            codegen.get_metadata_store = get_metadata_store
+        rows.append((name, n, elapsed * 1000, elapsed * 1000 / n))
+    report("Compiling calvin/examples scripts", rows, ["metadata", "scripts", "ms", "ms/script"])
+
+
+if __name__ == '__main__':
+    run()
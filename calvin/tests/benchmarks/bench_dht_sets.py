@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Set valued keys in the DHT storage, e.g. index keys with thousands of members.
+
+The members are appended one by one to a key on a DHT node, as when the
+nodes register at bootstrap, with the set kept as a JSON coded list (how it
+was stored before) and as a set object. Then the set is read (after a change
+and again), transferred to a new node and merged from the values found on
+three nodes.
+"""
+
+import json
+import sys
+from mock import Mock
+from twisted.internet import defer
+from kademlia.node import Node
+from kademlia.utils import digest
+
+from calvin.runtime.south.storage.twistedimpl.dht import append_server
+from calvin.runtime.south.storage.twistedimpl.dht.append_server import KademliaProtocolAppend, ForgetfulStorageFix,\
+                                                                        ValueListSpiderCrawl
+from calvin.tests.benchmarks import measure, report
+
+SENDER = ("127.0.0.1", 5000)
+PEER_ID = digest("peer")
+KEY = digest("index-/node/attribute/owner/organization")
+
+
+def _json_append(storage, key, value):
+    """As rpc_append before the sets were stored as set objects"""
+    pvalue = json.loads(value)
+    if key not in storage:
+        storage[key] = value
+    else:
+        storage[key] = json.dumps(list(set(json.loads(storage[key]) + pvalue)))
+
+
+def _json_merged(values):
+    """As ValueListSpiderCrawl before the sets were stored as set objects"""
+    value_all = []
+    for value in values:
+        value_all = value_all + json.loads(value)
+    return json.dumps(list(set(value_all)))
+
+
+def _protocol():
+    protocol = KademliaProtocolAppend(Node(digest("node")), ForgetfulStorageFix(), 20)
+    protocol.callAppend = Mock(return_value=defer.succeed((True, True)))
+    protocol.callStore = Mock(return_value=defer.succeed((True, True)))
+    return protocol
+
+
+def _append_all(protocol, members, as_json):
+    for member in members:
+        if as_json:
+            _json_append(protocol.storage, KEY, json.dumps([member]))
+        else:
+            protocol.rpc_append(SENDER, PEER_ID, KEY, json.dumps([member]))
+
+
+def _last_appends(protocol, members, as_json, count):
+    _, elapsed = measure(_append_all, protocol, members[-count:], as_json)
+    return elapsed * 1e6 / count
+
+
+def _transfer(value):
+    """Transfer of the key from a node without neighbors to a new node"""
+    protocol = _protocol()
+    protocol.storage[KEY] = value
+    protocol.transferKeyValues(Node(PEER_ID, *SENDER))
+    calls = protocol.callAppend.call_args_list + protocol.callStore.call_args_list
+    return len(calls), max([len(args[2]) for args, _ in calls])
+
+
+def _merge(protocol, values, as_json):
+    if as_json:
+        return _json_merged(values + [protocol.storage[KEY]])
+    crawl = ValueListSpiderCrawl(protocol, Node(KEY), [], 20, 3, local_value=protocol.storage[KEY])
+    return crawl._handleFoundValues([(digest("peer-%d" % i), value) for i, value in enumerate(values)])
+
+
+def run(members=5000, last=100):
+    names = ["member-%s" % digest(str(i)).encode('hex') for i in range(members)]
+    rows = []
+    for name, as_json in (("json list", True), ("set", False)):
+        protocol = _protocol()
+        _, bootstrap = measure(_append_all, protocol, names[:-last], as_json)
+        per_append = _last_appends(protocol, names, as_json, last)
+        _, read = measure(protocol.rpc_find_value, SENDER, PEER_ID, KEY)
+        _, reread = measure(protocol.rpc_find_value, SENDER, PEER_ID, KEY)
+        (messages, largest), transfer = measure(_transfer, protocol.storage[KEY])
+        peer_values = [json.dumps(names[i::2]) for i in range(2)]
+        _, merge = measure(_merge, protocol, peer_values, as_json)
+        rows.append((name, bootstrap * 1000, per_append, read * 1000, reread * 1000, messages, largest, transfer * 1000,
+                     merge * 1000))
+    report("Index key with %d members, appended one by one" % members, rows,
+           ["stored as", "bootstrap ms", "us/append at %d" % members, "read ms", "read again ms", "transfer msgs",
+            "largest msg", "transfer ms", "merge 3 ms"])
+    print "RPC messages are limited to 8K, transfers use chunks of at most %d bytes" % append_server.SET_CHUNK_SIZE
+
+
+if __name__ == '__main__':
+    run(*[int(arg) for arg in sys.argv[1:]])
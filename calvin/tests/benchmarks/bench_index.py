@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Index lookups with 10k registered nodes, comparing a scan over every key
+(previous implementation) with the prefix trie of IndexDict, both for the
+local cache in Storage and for the StorageLocal backend.
+"""
+
+import itertools
+
+from mock import Mock, patch
+
+from calvin.runtime.north.storage import Storage
+from calvin.runtime.north.plugins.storage import storage_dict_local
+from calvin.utilities.attribute_resolver import AttributeResolver
+from calvin.utilities import calvinuuid
+from calvin.tests.benchmarks import measure, report
+
+
+def _attributes(i):
+    return AttributeResolver({"indexed_public": {
+        "owner": {"organization": "org%d.com" % (i % 10), "organizationalUnit": "unit%d" % (i % 100)},
+        "address": {"country": "SE", "locality": "city%d" % (i % 50), "street": "street%d" % (i % 500)},
+        "node_name": {"organization": "org%d.com" % (i % 10), "name": "node%d" % i}}})
+
+
+def _register(storage, nodes):
+    for i in range(nodes):
+        node_id = calvinuuid.uuid("NODE")
+        for index in _attributes(i).get_indexed_public():
+            storage.add_index(index, node_id)
+
+
+def _scan(data, index, key=lambda v: v):
+    # The previous get_index, visiting every key
+    return set(itertools.chain(
+        *(key(v) for k, v in data.items()
+            if all(map(lambda x, y: False if x is None else True if y is None else x==y, k, index)))))
+
+
+def _lookups(get, indexes, rounds):
+    for _ in range(rounds):
+        for index in indexes:
+            result = get(index)
+    return len(result)
+
+
+def _queries():
+    return [("name", "node/attribute/node_name/org1.com////node4711"),
+            ("street", "node/attribute/address/SE//city11/street211"),
+            ("locality", "node/attribute/address/SE//city11"),
+            ("organization", "node/attribute/owner/org1.com"),
+            ("all owners", "node/attribute/owner")]
+
+
+def _immediate(delay, func, *args, **kwargs):
+    func(*args, **kwargs)
+
+
+def _backend_get_index(backend, indexes):
+    result = []
+    backend.get_index(indexes[0], indexes[1:], cb=result.append)
+    return result[0]
+
+
+def run(nodes=10000, rounds=20):
+    rows = []
+    # Local cache in Storage, used before storage has started and as a write back cache
+    storage = Storage(Mock(id="NODE"), override_storage=Mock())
+    _register(storage, nodes)
+    for name, query in _queries():
+        indexes = storage._index_strings(query, 2)
+        n, scan = measure(_lookups, lambda i: _scan(storage.localstore_sets, i, key=lambda v: v['+']), [indexes], rounds)
+        _, trie = measure(_lookups, lambda i: set(itertools.chain(*(v['+'] for k, v in storage.localstore_sets.index_items(i)))),
+                          [indexes], rounds)
+        rows.append(("Storage cache", name, n, scan / rounds * 1000, trie / rounds * 1000))
+    # StorageLocal backend
+    with patch.object(storage_dict_local.async, 'DelayedCall', _immediate):
+        backend = storage_dict_local.StorageLocal()
+        storage = Storage(Mock(id="NODE"), override_storage=backend)
+        storage.started = True
+        _register(storage, nodes)
+        for name, query in _queries():
+            indexes = ["index-"] + storage._index_strings(query, 2)
+            n, scan = measure(_lookups, lambda i: _scan(backend._data, i), [indexes], rounds)
+            _, trie = measure(_lookups, lambda i: _backend_get_index(backend, i), [indexes], rounds)
+            rows.append(("StorageLocal", name, n, scan / rounds * 1000, trie / rounds * 1000))
+    report("Index lookup, %d nodes" % nodes, rows, ["storage", "query", "results", "scan ms", "trie ms"])
+
+
+if __name__ == '__main__':
+    run()
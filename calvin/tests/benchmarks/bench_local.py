@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compare local connections where tokens are communicated by endpoints with
+connections where the inport reads directly from the outport's queue:
+tokens/s through pipelines of increasing length.
+"""
+
+import time
+
+from calvin.runtime.north import scheduler
+from calvin.tests.benchmarks import report
+from calvin.tests.benchmarks.helpers import actor_manager, scheduler_class, chain
+
+
+def _tokens_per_second(sched, actors, writer, reader, tokens):
+    written = received = 0
+    start = time.time()
+    while received < tokens:
+        while written < tokens and writer(written):
+            written += 1
+        sched.schedule_calvinsys(actor_id=actors[0].id)
+        sched.strategy()
+        received += len(reader())
+        sched.schedule_calvinsys(actor_id=actors[-1].id)
+    return tokens / (time.time() - start)
+
+
+def run(lengths=(2, 10, 50), tokens=2000):
+    rows = []
+    for length in lengths:
+        for sched_cls in (scheduler.SimpleScheduler, scheduler.ReadinessScheduler):
+            for shared in (False, True):
+                actor_mgr = actor_manager()
+                sched = scheduler_class(sched_cls)(None, actor_mgr)
+                actors, writer, reader = chain(actor_mgr, length, sched, shared=shared)
+                tps = _tokens_per_second(sched, actors, writer, reader, tokens)
+                rows.append((sched_cls.__name__, length, "shared" if shared else "endpoint", tps))
+    report("Local connections", rows, ["scheduler", "actors", "connection", "tokens/s"])
+
+
+if __name__ == '__main__':
+    run()
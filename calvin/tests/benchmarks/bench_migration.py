@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Service gap when migrating an actor in a steady token stream, i.e. the time
+from when the actor stops on the previous node until it can fire on the new.
+
+Stop-and-copy migration disconnects, sends the full state, lets the new node
+verify and instantiate the actor, get tunnels to the peers and connect the
+ports. Live migration (a prepare phase plus a state delta) does the
+verification, instantiation and tunnels while the actor keeps running, and the
+gap only has disconnect, a state delta and the port connects. The ports are
+not connected in advance and no tokens are forwarded in either case.
+
+The runtime work on both nodes and the message coding is measured, the
+network is not: the gap is modelled as the measured work plus the round trips
+on the critical path times the latency.
+"""
+
+from mock import Mock
+
+import calvin.requests.calvinresponse as response
+from calvin.runtime.north.plugins.coders.messages import message_coder_factory
+from calvin.tests.benchmarks import measure, report
+from calvin.tests.benchmarks.helpers import actor_manager, chain
+
+# Round trips in the gap: disconnect peers, (one way) actor_new, tunnels to peers, connect ports
+ROUND_TRIPS = {'stop-and-copy': 1 + 0.5 + 1 + 1, 'live': 1 + 0.5 + 1}
+
+
+class _Proto(object):
+    """Keeps the last message of each kind sent to the peer node"""
+
+    def __init__(self):
+        super(_Proto, self).__init__()
+        self.sent = {}
+
+    def __getattr__(self, name):
+        def send(to_rt_uuid, callback, *args, **kwargs):
+            self.sent[name] = (callback, args, kwargs)
+        return send
+
+
+def _nodes():
+    source, destination = actor_manager(), actor_manager()
+    source.node.proto = _Proto()
+    source.node.pm.disconnect = lambda callback, actor_id: callback(status=response.CalvinResponse(True))
+    return source, destination
+
+
+def _stream(actor_mgr, tokens):
+    actors, writer, _ = chain(actor_mgr, 3)
+    for i in range(tokens):
+        writer({'value': i, 'timestamp': 1514764800.0 + i})
+    return actors[1], writer
+
+
+def _transfer(coder, args):
+    """Message coding on both nodes, returns the decoded args and the message size"""
+    data = coder.encode({'cmd': 'ACTOR_NEW', 'state': list(args)})
+    return coder.decode(data)['state'], len(data)
+
+
+def _stop_and_copy(coder, tokens):
+    source, destination = _nodes()
+    actor, _ = _stream(source, tokens)
+    _, source_time = measure(source.migrate, actor.id, destination.node.id, live=False)
+    callback, args, kwargs = source.node.proto.sent['actor_new']
+    ((actor_type, state, ports), size), transfer_time = measure(_transfer, coder, args)
+    _, destination_time = measure(destination.new_from_migration, actor_type, state, ports, callback=Mock())
+    return source_time + transfer_time + destination_time, size
+
+
+def _live(coder, tokens):
+    source, destination = _nodes()
+    actor, writer = _stream(source, tokens)
+    source.migrate(actor.id, destination.node.id, live=True)
+    prepared_callback, args, _ = source.node.proto.sent['actor_prepare']
+    (actor_type, state, ports), _ = _transfer(coder, args)
+    destination.prepare_migration(actor_type, state, ports, callback=Mock())
+    # The stream continues while the destination prepares
+    writer({'value': tokens, 'timestamp': 1514764800.0 + tokens})
+    _, source_time = measure(prepared_callback, response.CalvinResponse(True))
+    callback, args, kwargs = source.node.proto.sent['actor_new']
+    ((actor_type, delta, ports), size), transfer_time = measure(_transfer, coder, args)
+    _, destination_time = measure(destination.new_from_migration, actor_type, delta, ports, callback=Mock(),
+                                  prepared_actor_id=kwargs['prepared_actor_id'])
+    return source_time + transfer_time + destination_time, size
+
+
+def run(migrations=50, tokens=10, latencies=(1, 10, 50)):
+    coder = message_coder_factory.get('json')
+    rows = []
+    for name, migrate in (('stop-and-copy', _stop_and_copy), ('live', _live)):
+        results = [migrate(coder, tokens) for _ in range(migrations)]
+        work = sum(elapsed for elapsed, _ in results) * 1000 / migrations
+        size = sum(size for _, size in results) / migrations
+        for latency in latencies:
+            rows.append((name, latency, work, size, work + ROUND_TRIPS[name] * latency))
+    report("Migration service gap, actor in a stream with %d queued tokens" % tokens, rows,
+           ["migration", "latency ms", "work ms", "bytes in gap", "modelled gap ms"])
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Offline buffering of sensor samples: batches of samples are written to the
+persistent buffer while disconnected, then drained when connected again.
+
+The SQLite version is run with the statements and transactions of
+PersistentBuffer, but directly on sqlite3 since adbapi needs a running reactor.
+"""
+
+import os
+import sys
+import json
+import shutil
+import sqlite3
+import tempfile
+from mock import Mock
+
+from calvinextras.calvinsys.data.buffer.SegmentedBuffer import SegmentedBuffer
+from calvin.tests.benchmarks import measure, report
+
+
+class SQLiteBuffer(object):
+    """The database operations of PersistentBuffer"""
+
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute("CREATE TABLE IF NOT EXISTS queue (value BLOB)")
+        self.db.commit()
+        self.values = []
+
+    def write(self, value):
+        self.db.execute("INSERT INTO queue (value) VALUES (?)", (json.dumps(value), ))
+        self.db.commit()
+
+    def can_read(self):
+        if not self.values:
+            cursor = self.db.execute("SELECT value FROM queue ORDER BY rowid LIMIT (?)", (2,))
+            self.values = cursor.fetchall()
+            if self.values:
+                self.db.execute("DELETE FROM queue WHERE rowid in (SELECT rowid FROM queue ORDER BY rowid LIMIT (?))",
+                                (len(self.values),))
+            self.db.commit()
+        return bool(self.values)
+
+    def read(self):
+        value = []
+        while self.values:
+            value.extend(json.loads(self.values.pop(0)[0]))
+        return value
+
+    def close(self):
+        self.db.close()
+
+
+def _disk_usage(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def _fill(buf, batches, batch_size):
+    for i in xrange(batches):
+        buf.write([{"timestamp": 1500000000.0 + i, "id": "sensor", "value": 20.0 + (i + j) % 10}
+                   for j in range(batch_size)])
+    return batches * batch_size
+
+
+def _drain(buf):
+    n = 0
+    while buf.can_read():
+        n += len(buf.read())
+    return n
+
+
+def run(samples=200000, batch_size=10):
+    batches = samples / batch_size
+    directory = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        buffers = [("sqlite", lambda: SQLiteBuffer(os.path.join(directory, "buffer.sq3")), "buffer.sq3")]
+        for encoding in ("json", "msgpack"):
+            def segmented(encoding=encoding):
+                buf = SegmentedBuffer(Mock(), "buffer.persistent", Mock())
+                buf.init("buffer" + encoding, encoding=encoding)
+                return buf
+            buffers.append(("segmented " + encoding, segmented, "buffer%s.log" % encoding))
+        rows = []
+        for name, create, path in buffers:
+            buf = create()
+            written, write_time = measure(_fill, buf, batches, batch_size)
+            size = _disk_usage(path)
+            read, read_time = measure(_drain, buf)
+            assert read == written
+            remaining = _disk_usage(path)
+            buf.close()
+            rows.append((name, written, write_time * 1e6 / written, read_time * 1e6 / read,
+                         size / 1024, remaining / 1024))
+        report("Persistent buffer, %d samples in batches of %d" % (samples, batch_size), rows,
+               ["buffer", "samples", "us/write", "us/read", "filled kB", "drained kB"])
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    run(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Placement of synthetic applications, pipelines of actors with some fan-out,
+on nodes with random capabilities. Compares the previous list based
+weighting (actor_ids.index() in nested loops, limited to small apps) with
+calvin.utilities.placement using NumPy when installed and the pure Python
+fallback.
+"""
+
+import random
+
+from calvin.utilities import placement
+from calvin.tests.benchmarks import measure, report
+
+
+def synthetic_app(actors, nodes, seed=4711):
+    rnd = random.Random(seed)
+    actor_ids = ["actor%d" % i for i in range(actors)]
+    node_ids = ["node%d" % i for i in range(nodes)]
+    # Pipeline with every tenth actor also connected to a random earlier actor
+    connections = zip(actor_ids[:-1], actor_ids[1:])
+    connections += [(actor_ids[i], rnd.choice(actor_ids[:i])) for i in range(10, actors, 10)]
+    feasible = {a: set(rnd.sample(node_ids, rnd.randint(1, max(1, nodes / 4)))) for a in actor_ids}
+    return actor_ids, connections, feasible, node_ids
+
+
+def legacy(actor_ids, connections, feasible, node_ids):
+    """The weighting previously done in AppManager.collect_placement"""
+    l = len(actor_ids)
+    actor_matrix = [[0 for x in range(l)] for x in range(l)]
+    for a, b in connections:
+        actor_matrix[actor_ids.index(a)][actor_ids.index(b)] = 0.5
+        actor_matrix[actor_ids.index(b)][actor_ids.index(a)] = 0.5
+    for i in range(l):
+        actor_matrix[i][i] = 1
+    result = {}
+    for actor_id in actor_ids:
+        actor_weights = actor_matrix[actor_ids.index(actor_id)]
+        weights = [sum([actor_weights[actor_ids.index(_id)] if node_id in feasible[actor_id] else 0
+                        for _id in actor_ids])
+                   for node_id in node_ids]
+        result[actor_id] = [n for (w, n) in sorted(zip(weights, node_ids), reverse=True)]
+    return result
+
+
+def _python(actor_ids, connections, feasible, node_ids):
+    numpy, placement.numpy = placement.numpy, None
+    try:
+        return placement.solve(actor_ids, connections, feasible, node_ids)
+    finally:
+        placement.numpy = numpy
+
+
+def run(sizes=((100, 10), (300, 20), (1000, 50), (5000, 100)), legacy_max=300):
+    rows = []
+    for actors, nodes in sizes:
+        app = synthetic_app(actors, nodes)
+        legacy_s = measure(legacy, *app)[1] if actors <= legacy_max else None
+        python_s = measure(_python, *app)[1]
+        numpy_s = measure(placement.solve, *app)[1] if placement.numpy is not None else None
+        rows.append((actors, nodes, legacy_s if legacy_s is not None else "-", python_s,
+                     numpy_s if numpy_s is not None else "-"))
+    report("Placement of synthetic apps (seconds)", rows, ["actors", "nodes", "previous", "python", "numpy"])
+
+
+if __name__ == '__main__':
+    run()
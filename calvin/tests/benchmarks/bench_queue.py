@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Measure FanoutFIFO throughput with 1, 4 and 16 readers, writing and
+reading either one token at a time or in batches.
+"""
+
+from calvin.runtime.north.calvin_token import Token
+from calvin.tests.benchmarks import measure, report
+from calvin.tests.benchmarks.helpers import fifo
+
+
+def _setup(readers, length):
+    queue = fifo("out", length)
+    queue.add_writer("writer", {})
+    names = ["reader-%d" % i for i in range(readers)]
+    for name in names:
+        queue.add_reader(name, {})
+    return queue, names
+
+
+def _single(readers, length, tokens):
+    queue, names = _setup(readers, length)
+    written = 0
+    while written < tokens:
+        while written < tokens and queue.slots_available(1, "writer"):
+            queue.write(Token(written), "writer")
+            written += 1
+        for name in names:
+            while queue.tokens_available(1, name):
+                queue.peek(name)
+            queue.commit(name)
+    return tokens
+
+
+def _batched(readers, length, tokens):
+    queue, names = _setup(readers, length)
+    written = 0
+    while written < tokens:
+        n = min(length, tokens - written)
+        queue.write_many([Token(i) for i in range(written, written + n)], "writer")
+        written += n
+        for name in names:
+            queue.peek_many(name, n)
+            queue.commit(name)
+    return tokens
+
+
+def run(reader_counts=(1, 4, 16), length=16, tokens=100000):
+    rows = []
+    for readers in reader_counts:
+        for mode, func in (("single", _single), ("batched", _batched)):
+            n, elapsed = measure(func, readers, length, tokens)
+            rows.append((readers, mode, n, elapsed, n / elapsed))
+    report("FanoutFIFO", rows, ["readers", "mode", "tokens", "seconds", "tokens/s"])
+
+
+if __name__ == '__main__':
+    run()
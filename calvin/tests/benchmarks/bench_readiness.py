@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compare SimpleScheduler and ReadinessScheduler on a runtime with one active
+pipeline and many idle actors:
+  - idle: cost of a scheduler pass when one event arrives
+  - busy: tokens/s through the active pipeline
+"""
+
+import time
+
+from calvin.runtime.north import scheduler
+from calvin.tests.benchmarks import report
+from calvin.tests.benchmarks.helpers import actor_manager, scheduler_class, chain
+
+
+def _setup(sched_cls, idle_actors, pipeline_length):
+    actor_mgr = actor_manager()
+    sched = scheduler_class(sched_cls)(None, actor_mgr)
+    # Idle actors are connected in pairs
+    for _ in range(idle_actors / 2):
+        chain(actor_mgr, 2, sched)
+    actors, writer, reader = chain(actor_mgr, pipeline_length, sched)
+    # Settle, i.e. let every actor try to fire once
+    sched.strategy()
+    return sched, actors, writer, reader
+
+
+def _idle_pass(sched, passes):
+    start = time.time()
+    for _ in range(passes):
+        sched.schedule_calvinsys(actor_id="no_such_actor")
+        sched.strategy()
+    return (time.time() - start) / passes
+
+
+def _tokens_per_second(sched, actors, writer, reader, tokens):
+    written = received = 0
+    start = time.time()
+    while received < tokens:
+        while written < tokens and writer(written):
+            written += 1
+        # Source and sink are outside of the runtime, i.e. events as for tunnels
+        sched.schedule_calvinsys(actor_id=actors[0].id)
+        sched.strategy()
+        received += len(reader())
+        sched.schedule_calvinsys(actor_id=actors[-1].id)
+    return tokens / (time.time() - start)
+
+
+def run(idle_counts=(0, 100, 500, 1000), pipeline_length=5, tokens=2000, passes=100):
+    rows = []
+    for idle in idle_counts:
+        for sched_cls in (scheduler.SimpleScheduler, scheduler.ReadinessScheduler):
+            sched, actors, writer, reader = _setup(sched_cls, idle, pipeline_length)
+            idle_ms = _idle_pass(sched, passes) * 1000
+            tps = _tokens_per_second(sched, actors, writer, reader, tokens)
+            rows.append((sched_cls.__name__, idle, idle_ms, tps))
+    report("Readiness vs simple scheduler", rows, ["scheduler", "idle actors", "ms/idle pass", "tokens/s"])
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Measure scheduler task queue throughput (insert + process) as the number
+of pending timers grows, e.g. backoff, replication and calvinsys timers.
+"""
+
+import random
+
+from mock import Mock
+
+from calvin.runtime.north import scheduler
+from calvin.tests.benchmarks import measure, report
+
+
+class _Scheduled(object):
+    def active(self):
+        return True
+
+
+class _BenchScheduler(scheduler.BaseScheduler):
+    """Scheduler without reactor, tasks are processed by calling _process_next"""
+
+    def _schedule_next(self, delay, what):
+        self._scheduled = _Scheduled()
+
+
+def _noop():
+    pass
+
+
+def _events(sched, pending, events):
+    # Fill the queue with timers, each event inserts one timer and one
+    # zero delay task and then processes the two first tasks in the queue,
+    # which keeps the number of pending tasks constant
+    timers = [lambda: None for _ in range(pending)]
+    for timer in timers:
+        sched.insert_task(timer, random.random() * 100)
+    for i in range(events):
+        sched.insert_task(_noop, 0)
+        sched.insert_task(timers[i % pending], random.random() * 100)
+        sched._process_next()
+        sched._process_next()
+    return 2 * events
+
+
+def run(pending_counts=(10, 100, 1000, 10000), events=20000):
+    rows = []
+    for pending in pending_counts:
+        sched = _BenchScheduler(Mock(), Mock())
+        n, elapsed = measure(_events, sched, pending, events)
+        rows.append((pending, n, elapsed, n / elapsed))
+    report("Scheduler task queue", rows, ["pending", "events", "seconds", "events/s"])
+
+
+if __name__ == '__main__':
+    run()
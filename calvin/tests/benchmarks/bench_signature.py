@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Signature verification of 10 signed actors, each loaded 20 times as when
+deploying and migrating, with and without the verification caches.
+"""
+
+import shutil
+import tempfile
+from mock import Mock
+
+import OpenSSL
+
+from calvin.utilities import certificate
+from calvin.utilities import security
+from calvin.utilities.ttlcache import TTLCache
+from calvin.tests.benchmarks import measure, report
+
+
+def _security(truststore_dir):
+    key = OpenSSL.crypto.PKey()
+    key.generate_key(OpenSSL.crypto.TYPE_RSA, 2048)
+    cert = OpenSSL.crypto.X509()
+    cert.get_subject().CN = "signer"
+    cert.set_serial_number(1)
+    cert.gmtime_adj_notBefore(0)
+    cert.gmtime_adj_notAfter(3600)
+    cert.set_issuer(cert.get_subject())
+    cert.set_pubkey(key)
+    cert.sign(key, 'sha256')
+    cert_str = OpenSSL.crypto.dump_certificate(OpenSSL.crypto.FILETYPE_PEM, cert)
+    cert_hash = format(cert.subject_name_hash(), 'x')
+    for name in ("signer.pem", cert_hash + ".0"):
+        with open("%s/%s" % (truststore_dir, name), "w") as f:
+            f.write(cert_str)
+    node = Mock()
+    node.runtime_credentials.certificate.get_truststore_path.return_value = truststore_dir
+    node.runtime_credentials.certificate.truststore_sign = certificate.TrustStore(truststore_dir)
+    sec = security.Security(node)
+    sec.sec_conf = {'signature_trust_store': truststore_dir}
+    sign = lambda data: {'file': data, 'sign': {cert_hash: OpenSSL.crypto.sign(key, data, 'sha256')}}
+    return sec, sign
+
+
+def _verify(sec, contents, rounds):
+    for _ in range(rounds):
+        for content in contents:
+            assert sec.verify_signature_content(content, "actor")[0]
+    return rounds * len(contents)
+
+
+def run(actors=10, rounds=20):
+    truststore_dir = tempfile.mkdtemp()
+    try:
+        sec, sign = _security(truststore_dir)
+        contents = [sign("class Actor%d(Actor):\n    pass\n" % i * 50) for i in range(actors)]
+        rows = []
+        for name, size in (("no cache", 0), ("cache", 1000)):
+            security._signature_cache = TTLCache(size)
+            certificate._certificate_cache = TTLCache(size)
+            certificate._verified_cache = TTLCache(size)
+            n, elapsed = measure(_verify, sec, contents, rounds)
+            rows.append((name, n, elapsed * 1000, elapsed * 1000 / n))
+        report("Actor signature verifications", rows, ["verification", "loads", "ms", "ms/load"])
+        statistics = security.signature_cache_statistics()
+        print "Signature cache hit rate %.2f, saved %.1f ms" % (statistics['hit_rate'], statistics['saved_ms'])
+    finally:
+        shutil.rmtree(truststore_dir)
+
+
+if __name__ == '__main__':
+    run()
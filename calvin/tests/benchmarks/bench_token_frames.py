@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Bytes and encode + decode time per token message on a runtime to runtime link,
+message coder vs binary token frames.
+"""
+
+from calvin.runtime.north.plugins.coders.messages import message_coder_factory
+from calvin.runtime.south.transports.lib.token_frames import TokenFrames
+from calvin.tests.benchmarks import measure, report
+from calvin.utilities import calvinuuid
+
+RT_ID = calvinuuid.uuid("NODE")
+PEER_ID = calvinuuid.uuid("NODE")
+
+
+def _messages(count, value):
+    tunnel_id, port_id, peer_port_id = calvinuuid.uuid("TUNNEL"), calvinuuid.uuid("PORT"), calvinuuid.uuid("PORT")
+    token = {'cmd': 'TOKEN', 'port_id': port_id, 'peer_port_id': peer_port_id, 'token': {'type': 'Token', 'data': value}}
+    reply = {'cmd': 'TOKEN_REPLY', 'port_id': port_id, 'peer_port_id': peer_port_id, 'value': 'ACK'}
+    msgs = []
+    for i in range(count):
+        for payload in (token, reply):
+            payload = dict(payload, sequencenbr=i)
+            msgs.append({'cmd': 'TUNNEL_DATA', 'value': payload, 'tunnel_id': tunnel_id,
+                         'msg_uuid': calvinuuid.uuid("MSGID"), 'from_rt_uuid': RT_ID, 'to_rt_uuid': PEER_ID})
+    return msgs
+
+
+def _coder(coder, msgs):
+    size = 0
+    for msg in msgs:
+        data = coder.encode(msg)
+        size += len(data)
+        coder.decode(data)
+    return size
+
+
+def _frames(coder, msgs):
+    sender, receiver = TokenFrames(coder), TokenFrames(coder)
+    size = 0
+    for msg in msgs:
+        for data in sender.encode(msg, RT_ID, PEER_ID):
+            size += len(data)
+            receiver.decode(data, PEER_ID, RT_ID)
+    return size
+
+
+def run(coders=('json', 'msgpack'), values=(42, "a short string"), count=5000):
+    rows = []
+    for coder_name in coders:
+        coder = message_coder_factory.get(coder_name)
+        for value in values:
+            msgs = _messages(count, value)
+            for framing, func in (("coder", _coder), ("frames", _frames)):
+                size, elapsed = measure(func, coder, msgs)
+                rows.append((coder_name, repr(value), framing, float(size) / len(msgs), elapsed * 1e6 / len(msgs)))
+    report("Token message framing (TOKEN + TOKEN_REPLY)", rows, ["coder", "value", "framing", "bytes/msg", "us/msg"])
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Token transfer between two runtimes over a loopback tunnel, one TOKEN message
+per token (window 0, as for peers without batching) vs TOKENS messages with
+different windows. Messages are encoded as on the wire but the reactor and
+transport are bypassed. Reports tokens/s, replies per token and bytes per token.
+"""
+
+import collections
+
+from mock import Mock
+
+from calvin.actor.actorport import InPort, OutPort
+from calvin.runtime.north.calvin_token import Token
+from calvin.runtime.north.plugins.coders.messages import message_coder_factory
+from calvin.runtime.north.plugins.port.connection.tunnel import TunnelConnection
+from calvin.runtime.north.plugins.port.endpoint import TunnelInEndpoint, TunnelOutEndpoint
+from calvin.tests.benchmarks import measure, report
+from calvin.tests.benchmarks.helpers import fifo
+from calvin.utilities import calvinuuid
+
+
+class _Scheduler(object):
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+class _Runtime(object):
+    """The token tunnel part of a runtime"""
+
+    def __init__(self):
+        self.id = calvinuuid.uuid("NODE")
+        self.ports = {}
+        pm = Mock()
+        pm._get_local_port = lambda port_id: self.ports[port_id]
+        self.token_tunnel = TunnelConnection.TokenTunnel(Mock(), pm)
+
+
+class _LoopbackTunnel(object):
+    """Tunnel end delivering encoded messages to the peer's inbox"""
+
+    def __init__(self, tunnel_id, runtime, peer, inbox, coder, stats):
+        self.id = tunnel_id
+        self.runtime = runtime
+        self.peer = peer
+        self.inbox = inbox
+        self.coder = coder
+        self.stats = stats
+
+    def send(self, payload):
+        msg = {'cmd': 'TUNNEL_DATA', 'value': payload, 'tunnel_id': self.id,
+               'from_rt_uuid': self.runtime.id, 'to_rt_uuid': self.peer.id}
+        data = self.coder.encode(msg)
+        self.stats[payload['cmd']] += 1
+        self.stats['bytes'] += len(data)
+        self.inbox.append(data)
+
+
+def _deliver(inbox, runtime, tunnel, coder):
+    while inbox:
+        msg = coder.decode(inbox.popleft())
+        runtime.token_tunnel.tunnel_recv_handler(tunnel, msg['value'])
+
+
+def _setup(window, length, coder, stats):
+    sender, receiver = _Runtime(), _Runtime()
+    to_receiver, to_sender = collections.deque(), collections.deque()
+    tunnel_id = calvinuuid.uuid("TUNNEL")
+    tunnel_tx = _LoopbackTunnel(tunnel_id, sender, receiver, to_receiver, coder, stats)
+    tunnel_rx = _LoopbackTunnel(tunnel_id, receiver, sender, to_sender, coder, stats)
+    outport = OutPort("token", Mock(name="src"))
+    inport = InPort("token", Mock(name="snk"))
+    sender.ports[outport.id] = outport
+    receiver.ports[inport.id] = inport
+    outport.set_queue(fifo("out", length))
+    inport.set_queue(fifo("in", length))
+    out_endpoint = TunnelOutEndpoint(outport, tunnel_tx, receiver.id, inport.id, {}, _Scheduler(), window=window)
+    in_endpoint = TunnelInEndpoint(inport, tunnel_rx, sender.id, outport.id, {}, _Scheduler())
+    outport.attach_endpoint(out_endpoint)
+    inport.attach_endpoint(in_endpoint)
+
+    def transfer():
+        out_endpoint.communicate()
+        _deliver(to_receiver, receiver, tunnel_rx, coder)
+        _deliver(to_sender, sender, tunnel_tx, coder)
+
+    return outport, inport, transfer
+
+
+def _transfer(window, length, tokens, coder, stats):
+    outport, inport, transfer = _setup(window, length, coder, stats)
+    written = received = 0
+    while received < tokens:
+        while written < tokens and outport.tokens_available(1):
+            outport.write_token(Token(written))
+            written += 1
+        transfer()
+        while inport.tokens_available(1):
+            inport.peek_token()
+            received += 1
+        inport.peek_commit()
+    return tokens
+
+
+def run(windows=(0, 16, 64), length=64, tokens=20000, coder_name='msgpack'):
+    coder = message_coder_factory.get(coder_name)
+    rows = []
+    for window in windows:
+        stats = collections.Counter()
+        n, elapsed = measure(_transfer, window, length, tokens, coder, stats)
+        replies = stats['TOKEN_REPLY'] + stats['TOKENS_REPLY']
+        rows.append((window, n, elapsed, n / elapsed, float(replies) / n, float(stats['bytes']) / n))
+    report("Tunnel token transfer (%s)" % coder_name, rows,
+           ["window", "tokens", "seconds", "tokens/s", "replies/token", "bytes/token"])
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Helpers for setting up actors, local connections and schedulers
+without a running node.
+"""
+
+from mock import Mock
+
+from calvin.tests import DummyNode
+from calvin.actor.actor import Actor
+from calvin.runtime.north.actormanager import ActorManager
+from calvin.runtime.north.calvinsys import get_calvinsys
+from calvin.runtime.north.calvin_token import Token
+from calvin.runtime.north.plugins.port import queue
+from calvin.runtime.north.plugins.port.endpoint import LocalOutEndpoint, LocalInEndpoint
+from calvin.runtime.north.plugins.port.endpoint import SharedLocalOutEndpoint, SharedLocalInEndpoint
+
+
+class NoReactor(object):
+    """Mixin for schedulers driven by calling strategy() directly"""
+
+    def insert_task(self, what, delay):
+        pass
+
+
+def scheduler_class(cls):
+    return type("Bench" + cls.__name__, (NoReactor, cls), {})
+
+
+def actor_manager():
+    get_calvinsys()._node = Mock()
+    return ActorManager(DummyNode())
+
+
+def new_actor(actor_mgr, actor_type, args=None):
+    actor_id = actor_mgr.new(actor_type, args or {})
+    actor = actor_mgr.actors[actor_id]
+    actor.fsm.transition_to(Actor.STATUS.ENABLED)
+    return actor
+
+
+def fifo(direction, length=16):
+    return queue.fanout_fifo.FanoutFIFO({'queue_length': length, 'direction': direction}, {})
+
+
+def connect_local(outport, inport, sched=None, length=16, shared=False):
+    """Connect outport to inport, returns the out endpoint"""
+    outport.set_queue(fifo("out", length))
+    inport.set_queue(fifo("in", length))
+    if shared:
+        eout = SharedLocalOutEndpoint(outport, inport, sched)
+        ein = SharedLocalInEndpoint(inport, outport, sched)
+    else:
+        eout = LocalOutEndpoint(outport, inport, sched)
+        ein = LocalInEndpoint(inport, outport, sched)
+    outport.attach_endpoint(eout)
+    inport.attach_endpoint(ein)
+    if sched:
+        eout.register(sched)
+        ein.register(sched)
+    return eout
+
+
+def chain(actor_mgr, length, sched=None, actor_type='std.Identity', port='token', shared=False):
+    """
+    Create a chain of actors connected locally.
+    Returns (actors, writer, reader) where writer(value) feeds the first inport
+    and reader() returns the tokens available on the last outport.
+    """
+    actors = [new_actor(actor_mgr, actor_type) for _ in range(length)]
+    for src, dst in zip(actors[:-1], actors[1:]):
+        connect_local(src.outports[port], dst.inports[port], sched, shared=shared)
+    head = actors[0].inports[port]
+    head.set_queue(fifo("in"))
+    head.queue.add_reader(head.id, {})
+    head.queue.add_writer("source", {})
+    tail = actors[-1].outports[port]
+    tail.set_queue(fifo("out"))
+    tail.queue.add_writer(tail.id, {})
+    tail.queue.add_reader("sink", {})
+
+    def writer(value):
+        if not head.queue.slots_available(1, "source"):
+            return False
+        head.queue.write(Token(value), "source")
+        return True
+
+    def reader():
+        tokens = []
+        while tail.queue.tokens_available(1, "sink"):
+            tokens.append(tail.queue.peek("sink"))
+        tail.queue.commit("sink")
+        return tokens
+
+    return actors, writer, reader
@@ -14,15 +14,17 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import time
 import pytest
 
 from mock import Mock
 from calvin.tests import DummyNode, TestPort
 from calvin.runtime.north.actormanager import ActorManager
 from calvin.runtime.north.plugins.port.endpoint import LocalOutEndpoint, LocalInEndpoint
-from calvin.actor.actor import Actor
+from calvin.actor.actor import Actor, condition
 from calvin.runtime.north.plugins.port import queue
 from calvin.runtime.north.calvinsys import get_calvinsys
+from calvin.runtime.north.calvin_token import Token, ExceptionToken
 
 pytestmark = pytest.mark.unittest
 
@@ -215,3 +217,84 @@ def test_requirements(actor):
     actor.requirements_add([6, 7], extend=True)
     assert actor.requirements_get()[:-1] == [4, 5, 6, 7]
     assert actor.requirements_get()[-1]['op'] == 'port_property_match'
+
+
+def _write_inport(actor, values):
+    for value in values:
+        actor.inports['token'].queue.write(value if isinstance(value, Token) else Token(value), None)
+
+
+def _outport_values(actor):
+    queue = actor.outports['token'].queue
+    return [queue.fifo[i % queue.N].value for i in range(queue.write_pos)]
+
+
+def test_batch_fire(actor):
+    _write_inport(actor, [1, 2, 3])
+    did_fire, output_ok, exhausted = actor.fire()
+    assert did_fire
+    assert _outport_values(actor) == [1, 2, 3]
+    assert actor.last == 3
+    assert not actor.inports['token'].tokens_available(1)
+    did_fire, output_ok, exhausted = actor.fire()
+    assert not did_fire
+    assert output_ok
+
+
+def test_batch_fire_limited_by_output_space(actor):
+    outport = actor.outports['token']
+    outport.write_tokens([Token(0), Token(0)])
+    _write_inport(actor, [1, 2, 3, 4])
+    did_fire, _, _ = actor.fire()
+    assert did_fire
+    assert _outport_values(actor) == [0, 0, 1, 2]
+    assert actor.inports['token'].tokens_available(2)
+    did_fire, output_ok, _ = actor.fire()
+    assert not did_fire
+    assert not output_ok
+
+
+def test_batch_fire_exception_token(actor):
+    actor.exception_handler = Mock(return_value=('handled', ))
+    _write_inport(actor, [1, ExceptionToken(), 2])
+    assert actor.fire()[0]
+    assert _outport_values(actor) == [1]
+    assert actor.fire()[0]
+    assert actor.exception_handler.called
+    assert _outport_values(actor) == [1, 'handled']
+    assert actor.fire()[0]
+    assert _outport_values(actor) == [1, 'handled', 2]
+
+
+def test_batch_fire_invalid_production(actor):
+    def duplicate(self, tokens):
+        return (tokens + tokens, )
+    action = condition(['token'], ['token'], batch=4)(duplicate)
+    _write_inport(actor, [1, 2])
+    with pytest.raises(Exception) as exc:
+        action(actor)
+    assert "invalid production" in str(exc.value)
+    actor.exception_handler = Mock(return_value=('handled', 'extra'))
+    _write_inport(actor, [ExceptionToken()])
+    with pytest.raises(Exception) as exc:
+        actor.fire()
+    assert "invalid production" in str(exc.value)
+
+
+def test_authorization_valid_until(actor):
+    from datetime import datetime, timedelta
+    now = datetime.now().replace(second=0, microsecond=0)
+    start, end = now - timedelta(hours=1), now + timedelta(hours=1)
+    actor.set_authorization_checks([{"id": "time_range",
+                                     "attributes": {"start_time": start.strftime('%H:%M'),
+                                                    "end_time": end.strftime('%H:%M')}}])
+    assert actor.check_authorization_decision()
+    assert actor.authorization_valid_until == time.mktime(end.timetuple())
+    actor.set_authorization_checks([{"id": "time_range",
+                                     "attributes": {"start_time": end.strftime('%H:%M'),
+                                                    "end_time": end.strftime('%H:%M')}}])
+    assert not actor.check_authorization_decision()
+    assert actor.authorization_valid_until == 0
+    actor.set_authorization_checks(None)
+    assert actor.check_authorization_decision()
+    assert actor.authorization_valid_until == float('inf')
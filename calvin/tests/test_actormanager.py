@@ -14,6 +14,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import copy
+import json
 import unittest
 import pytest
 from mock import Mock, patch
@@ -21,6 +23,8 @@ from mock import Mock, patch
 from calvin.tests import DummyNode
 from calvin.runtime.north.actormanager import ActorManager
 from calvin.runtime.north.plugins.port import queue
+from calvin.utilities import state_delta
+import calvin.requests.calvinresponse as response
 
 pytestmark = pytest.mark.unittest
 
@@ -146,6 +150,158 @@ class ActorManagerTests(unittest.TestCase):
         self.assertEqual(cb.kwargs['ports'], actor.connections(self.am.node.id))
         self.am.node.control.log_actor_migrate.assert_called_once_with(actor_id, peer_node.id)
 
+    def test_live_migrate(self):
+        callback_mock = Mock()
+        actor, actor_id = self._new_actor('std.Constantify', {'constant': 42})
+        actor.outports['out'].set_queue(queue.fanout_fifo.FanoutFIFO({'queue_length': 4, 'direction': "out"}, {}))
+        actor.inports['in'].set_queue(queue.fanout_fifo.FanoutFIFO({'queue_length': 4, 'direction': "in"}, {}))
+        peer_node = DummyNode()
+        peer_am = ActorManager(node=peer_node)
+        peer_node.am = peer_am
+        self.am.node.proto = Mock()
+        wire = lambda data: json.loads(json.dumps(data))
+
+        self.am.migrate(actor_id, peer_node.id, callback_mock, live=True)
+        # Still running while the peer prepares
+        assert not self.am.node.pm.disconnect.called
+        args, kwargs = self.am.node.proto.actor_prepare.call_args
+        node_id, prepared_cb, actor_type, base_state, ports = args
+        self.assertEqual(node_id, peer_node.id)
+        peer_am.prepare_migration(actor_type, wire(base_state), wire(ports), callback=prepared_cb)
+        assert actor_id in peer_am._prepared
+        assert peer_node.pm.prepare_tunnels.called
+
+        actor.constant = 43
+        args, kwargs = self.am.node.pm.disconnect.call_args
+        kwargs['callback'](status=response.CalvinResponse(True))
+        assert actor_id not in self.am.actors
+        args, kwargs = self.am.node.proto.actor_new.call_args
+        node_id, new_cb, actor_type, delta, ports = args
+        self.assertEqual(kwargs['prepared_actor_id'], actor_id)
+        self.assertEqual(delta['set'], [[['managed', 'constant'], 43]])
+
+        peer_am.new_from_migration(actor_type, wire(delta), wire(ports), callback=new_cb,
+                                   prepared_actor_id=kwargs['prepared_actor_id'])
+        self.assertEqual(peer_am.actors[actor_id].constant, 43)
+        assert callback_mock.called
+        self.assertEqual(callback_mock.call_args[0][0].status, 200)
+
+    def test_live_migrate_mutated_attribute(self):
+        actor, actor_id = self._new_actor('text.LineJoin', {})
+        actor.outports['text'].set_queue(queue.fanout_fifo.FanoutFIFO({'queue_length': 4, 'direction': "out"}, {}))
+        actor.inports['line'].set_queue(queue.fanout_fifo.FanoutFIFO({'queue_length': 4, 'direction': "in"}, {}))
+        actor.lines.append("one")
+        peer_am = ActorManager(node=DummyNode())
+        self.am.node.proto = Mock()
+        wire = lambda data: json.loads(json.dumps(data))
+
+        self.am.migrate(actor_id, peer_am.node.id, Mock(), live=True)
+        args, kwargs = self.am.node.proto.actor_prepare.call_args
+        peer_am.prepare_migration(args[2], wire(args[3]), wire(args[4]), callback=args[1])
+        # Changed in place while the peer prepared, as by the append action
+        actor.lines.append("two")
+        args, kwargs = self.am.node.pm.disconnect.call_args
+        kwargs['callback'](status=response.CalvinResponse(True))
+        args, kwargs = self.am.node.proto.actor_new.call_args
+        peer_am.new_from_migration(args[2], wire(args[3]), wire(args[4]), callback=args[1],
+                                   prepared_actor_id=kwargs['prepared_actor_id'])
+        self.assertEqual(peer_am.actors[actor_id].lines, ["one", "two"])
+
+    def test_live_migrate_not_prepared_sends_state(self):
+        callback_mock = Mock()
+        actor, actor_id = self._new_actor('std.Constantify', {'constant': 42})
+        actor.outports['out'].set_queue(queue.fanout_fifo.FanoutFIFO({'queue_length': 4, 'direction': "out"}, {}))
+        actor.inports['in'].set_queue(queue.fanout_fifo.FanoutFIFO({'queue_length': 4, 'direction': "in"}, {}))
+        self.am.node.proto = Mock()
+        peer_am = ActorManager(node=DummyNode())
+
+        self.am.migrate(actor_id, peer_am.node.id, callback_mock, live=True)
+        args, kwargs = self.am.node.proto.actor_prepare.call_args
+        args[1](response.CalvinResponse(True))
+        args, kwargs = self.am.node.pm.disconnect.call_args
+        kwargs['callback'](status=response.CalvinResponse(True))
+        args, kwargs = self.am.node.proto.actor_new.call_args
+        # Peer has no prepared actor, e.g. restarted
+        peer_am.new_from_migration(args[2], args[3], args[4], callback=args[1], prepared_actor_id=actor_id)
+        args, kwargs = self.am.node.proto.actor_new.call_args
+        self.assertEqual(args[3]['managed']['constant'], 42)
+        assert 'prepared_actor_id' not in kwargs
+
+    def test_migrate_group(self):
+        callback_mock = Mock()
+        a, a_id = self._new_actor('std.Constantify', {'constant': 42})
+        b, b_id = self._new_actor('std.Constantify', {'constant': 43})
+        a.inports['in'].get_peers = Mock(return_value=[("other_node", "x")])
+        a.outports['out'].get_peers = Mock(return_value=[('local', b.inports['in'].id)])
+        b.inports['in'].get_peers = Mock(return_value=[('local', a.outports['out'].id)])
+        b.outports['out'].get_peers = Mock(return_value=[])
+        peer_node = DummyNode()
+        peer_am = ActorManager(node=peer_node)
+        peer_node.am = peer_am
+        self.am.node.proto = Mock()
+        wire = lambda data: json.loads(json.dumps(data))
+
+        self.am.migrate_group([a_id, b_id], peer_node.id, callback_mock)
+        for args, kwargs in self.am.node.pm.disconnect.call_args_list:
+            assert not self.am.node.proto.actors_new.called
+            kwargs['callback'](status=response.CalvinResponse(True), actor_id=kwargs['actor_id'])
+        self.assertEqual(self.am.actors, {})
+        # One message with all actors
+        self.assertEqual(self.am.node.proto.actors_new.call_count, 1)
+        node_id, group_cb, actors = self.am.node.proto.actors_new.call_args[0]
+        self.assertEqual(node_id, peer_node.id)
+        self.assertEqual(actors[0]['prev_connections']['outports'][a.outports['out'].id],
+                         [(peer_node.id, b.inports['in'].id)])
+
+        peer_am.new_group_from_migration(wire(actors), callback=group_cb)
+        self.assertEqual(set(peer_am.actors), set([a_id, b_id]))
+        self.assertEqual(peer_node.storage.begin_batch.call_count, peer_node.storage.end_batch.call_count)
+        # The connection within the group is made once, from the inport
+        connects = [(kwargs['port_id'], kwargs['peer_node_id'], kwargs['peer_port_id'])
+                    for args, kwargs in peer_node.pm.connect.call_args_list]
+        self.assertEqual(sorted(connects), sorted([(a.inports['in'].id, "other_node", "x"),
+                                                   (b.inports['in'].id, peer_node.id, a.outports['out'].id)]))
+        for args, kwargs in peer_node.pm.connect.call_args_list:
+            kwargs['callback'](status=response.CalvinResponse(True), peer_port_id=kwargs['peer_port_id'])
+        self.assertEqual(peer_am.actors[b_id].constant, 43)
+        self.assertTrue(peer_am.actors[a_id]._migration_connected)
+        self.assertEqual(sorted(callback_mock.call_args[1]['actor_ids']), sorted([a_id, b_id]))
+
+    def test_migrate_group_recreates_failed(self):
+        callback_mock = Mock()
+        a, a_id = self._new_actor('std.Constantify', {'constant': 42})
+        a.inports['in'].get_peers = Mock(return_value=[])
+        a.outports['out'].get_peers = Mock(return_value=[])
+        self.am.node.proto = Mock()
+
+        self.am.migrate_group([a_id, "unknown"], "peer_node", callback_mock)
+        args, kwargs = self.am.node.pm.disconnect.call_args
+        kwargs['callback'](status=response.CalvinResponse(True), actor_id=a_id)
+        assert a_id not in self.am.actors
+        args, kwargs = self.am.node.proto.actors_new.call_args
+        args[1](response.CalvinResponse(True, data={'failed': [a_id]}))
+        self.assertEqual(self.am.actors[a_id].constant, 42)
+        self.assertEqual(callback_mock.call_args[1]['actor_ids'], [])
+
+    def test_new_from_migration_with_base(self):
+        actor, actor_id = self._new_actor('std.Constantify', {'constant': 42})
+        state = actor.serialize()
+        self.am.destroy(actor_id)
+        self.am.new_from_migration('std.Constantify', copy.deepcopy(state), base_id="replication")
+        assert actor_id in self.am.actors
+
+        replica_state = copy.deepcopy(state)
+        replica_state['private']['_id'] = "replica"
+        replica_state['managed']['constant'] = 43
+        self.am.new_from_migration('std.Constantify', state_delta.delta(state, replica_state),
+                                   base_id="replication", delta=True)
+        self.assertEqual(self.am.actors["replica"].constant, 43)
+
+        callback_mock = Mock()
+        self.am.new_from_migration('std.Constantify', state_delta.delta(state, replica_state), callback=callback_mock,
+                                   base_id="unknown", delta=True)
+        self.assertEqual(callback_mock.call_args[1]['status'].status, response.GONE)
+
     def test_connect(self):
         actor, actor_id = self._new_actor('std.Constantify', {'constant': 42})
         connection_list = [['1', '2', '3', '4'], ['5', '6', '7', '8']]
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+import pytest
+from mock import Mock, patch
+from twisted.internet import defer
+
+from calvin.tests import DummyNode
+from calvin.runtime.north.actormanager import ActorManager
+from calvin.runtime.north.checkpointmanager import CheckpointLog, CheckpointManager, _moved_connections
+from calvin.runtime.north.plugins.coders.messages import msgpack_coder
+from calvin.runtime.north.plugins.port import queue
+
+pytestmark = pytest.mark.unittest
+
+
+def _node():
+    node = DummyNode()
+    node.am = ActorManager(node=node)
+    node.pm.remove_ports_of_actor = Mock(return_value=[])
+    return node
+
+
+def _new_actor(node):
+    actor_id = node.am.new('std.Identity', {})
+    actor = node.am.actors[actor_id]
+    for port, direction in ((actor.inports['token'], "in"), (actor.outports['token'], "out")):
+        port.set_queue(queue.fanout_fifo.FanoutFIFO({'queue_length': 4, 'direction': direction}, {}))
+    return actor_id
+
+
+@patch('calvin.runtime.north.checkpointmanager.threads.defer_to_thread', defer.maybeDeferred)
+class CheckpointTests(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "checkpoints", "node.log")
+        self.node = _node()
+        self.cm = CheckpointManager(self.node, interval=10, path=self.path)
+
+    def tearDown(self):
+        if self.cm._timer:
+            self.cm._timer.cancel()
+        shutil.rmtree(self.dir)
+
+    def records(self):
+        coder = msgpack_coder.get()
+        return [coder.decode(data) for data in CheckpointLog(self.path).read()]
+
+    def test_log_drops_incomplete_record(self):
+        log = CheckpointLog(os.path.join(self.dir, "test.log"))
+        log.append("first")
+        log.append("second")
+        size = log.size()
+        with open(log.path, "ab") as f:
+            f.write("\x00\x00\x01\x00torn")
+        self.assertEqual(log.read(), ["first", "second"])
+        self.assertEqual(log.size(), size)
+        log.replace("third")
+        self.assertEqual(log.read(), ["third"])
+        log.replace("last", close=True)
+        log.append("late")
+        self.assertEqual(log.read(), ["last"])
+
+    def test_incremental_checkpoints(self):
+        self.cm.start()
+        a_id = _new_actor(self.node)
+        b_id = _new_actor(self.node)
+        callback = Mock()
+        self.cm.checkpoint(callback=callback)
+        self.assertTrue(callback.call_args[1]['status'])
+        self.cm.checkpoint()
+        self.node.am.actors[b_id].dump = True
+        self.node.am.destroy(a_id)
+        self.cm.checkpoint()
+        records = self.records()
+        self.assertEqual([(r['full'], len(r['actors']), r['deleted']) for r in records],
+                         [(True, 2, []), (False, 0, []), (False, 1, [a_id])])
+        actors = self.cm.load()
+        self.assertEqual(actors.keys(), [b_id])
+        self.assertEqual(actors[b_id]['actor_state']['managed']['dump'], True)
+
+    def test_compacted_log(self):
+        self.cm.start()
+        _new_actor(self.node)
+        self.cm.checkpoint()
+        self.cm.log.append("x" * 4096)
+        with patch('calvin.runtime.north.checkpointmanager.COMPACT_MIN_SIZE', 1024):
+            self.cm.checkpoint()
+        self.assertEqual([(r['full'], len(r['actors'])) for r in self.records()], [(True, 1)])
+
+    def test_stop_drops_pending_write(self):
+        self.cm.start()
+        _new_actor(self.node)
+        self.cm.checkpoint()
+        self.node.am.actors.values()[0].dump = True
+        pending = []
+        with patch('calvin.runtime.north.checkpointmanager.threads.defer_to_thread',
+                   lambda f, *args: pending.append((f, args)) or defer.Deferred()):
+            self.cm.checkpoint()
+        self.node.am.actors.values()[0].dump = False
+        self.cm.stop()
+        # The thread writes the incremental checkpoint after the last full one
+        f, args = pending[0]
+        f(*args)
+        records = self.records()
+        self.assertEqual([(r['full'], len(r['actors'])) for r in records], [(True, 1)])
+        self.assertEqual(self.cm.load().values()[0]['actor_state']['managed']['dump'], False)
+
+    def test_restore(self):
+        self.cm.start()
+        a_id = _new_actor(self.node)
+        self.node.am.actors[a_id].dump = True
+        self.cm.stop()
+        # The runtime restarted, with a new node id
+        node = _node()
+        cm = CheckpointManager(node, interval=10, path=self.path)
+        callback = Mock()
+        cm.start(callback=callback)
+        cm._timer.cancel()
+        self.assertTrue(callback.call_args[1]['status'])
+        self.assertEqual(node.am.actors.keys(), [a_id])
+        self.assertEqual(node.am.actors[a_id].dump, True)
+
+    def test_moved_connections(self):
+        connections = {'actor_id': "actor", 'inports': {"in": [("old", "p1"), ("other", "p2")]},
+                       'outports': {"out": [("old", "p3")]}}
+        _moved_connections(connections, "old", "new")
+        self.assertEqual(connections['inports'], {"in": [("new", "p1"), ("other", "p2")]})
+        self.assertEqual(connections['outports'], {"out": [("new", "p3")]})
@@ -16,11 +16,13 @@
 
 import pytest
 import unittest
-from mock import Mock
+from mock import Mock, patch
 
 from calvin.actor.actorport import InPort, OutPort
 from calvin.runtime.north.calvin_token import Token
 from calvin.runtime.north.plugins.port.endpoint import LocalInEndpoint, LocalOutEndpoint, TunnelInEndpoint, TunnelOutEndpoint
+from calvin.runtime.north.plugins.port.endpoint import SharedLocalInEndpoint, SharedLocalOutEndpoint
+from calvin.runtime.north.plugins.port import DISCONNECT
 from calvin.runtime.north.plugins.port import queue
 
 pytestmark = pytest.mark.unittest
@@ -71,6 +73,59 @@ class TestLocalEndpoint(unittest.TestCase):
         assert self.local_out.get_peer() == ('local', self.port.id)
 
 
+class TestSharedLocalEndpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.port = InPort("port", Mock())
+        self.peer_port = OutPort("peer_port", Mock())
+        self.local_in = SharedLocalInEndpoint(self.port, self.peer_port)
+        self.local_out = SharedLocalOutEndpoint(self.peer_port, self.port)
+        self.port.set_queue(queue.fanout_fifo.FanoutFIFO({'queue_length': 4, 'direction': "in"}, {}))
+        self.peer_port.set_queue(queue.fanout_fifo.FanoutFIFO({'queue_length': 4, 'direction': "out"}, {}))
+        self.peer_port.attach_endpoint(self.local_out)
+        self.port.attach_endpoint(self.local_in)
+
+    def test_no_communicate(self):
+        assert not self.local_out.use_monitor()
+        self.peer_port.write_token(Token(0))
+        self.peer_port.write_token(Token(1))
+        assert self.port.tokens_available(2)
+        assert self.port.read()[0].value == 0
+        assert self.port.get_peers() == [('local', self.peer_port.id)]
+        # Reading frees slots in the outport
+        assert self.peer_port.tokens_available(3)
+
+    def test_register(self):
+        scheduler = Mock()
+        self.local_out.register(scheduler)
+        self.local_in.register(scheduler)
+        scheduler.link_actors.assert_any_call(self.peer_port.owner.id, self.port.owner.id)
+        scheduler.link_actors.assert_any_call(self.port.owner.id, self.peer_port.owner.id)
+        assert not scheduler.register_endpoint.called
+
+    def test_unshare(self):
+        assert 'fifo' in self._unshare()
+
+    def test_unshare_compact_state(self):
+        with patch.dict(queue.common._conf.config['global'], {'compact_queue_state': True}):
+            assert 'tokens' in self._unshare()
+
+    def _unshare(self):
+        for i in range(4):
+            self.peer_port.write_token(Token(i))
+        assert self.port.read()[0].value == 0
+        state = self.port.queue._state()
+        self.port.disconnect(terminate=DISCONNECT.TEMPORARY)
+        self.peer_port.disconnect(terminate=DISCONNECT.TEMPORARY)
+        # Unread tokens moved to the inport's own queue
+        assert isinstance(self.port.queue, queue.fanout_fifo.FanoutFIFO)
+        assert self.port.queue._state() == state
+        assert [self.port.read()[0].value for _ in range(3)] == [1, 2, 3]
+        assert self.peer_port.tokens_available(4)
+        assert self.peer_port.queue.com_is_committed(self.port.id)
+        return state
+
+
 class TestTunnelEndpoint(unittest.TestCase):
 
     def setUp(self):
@@ -193,3 +248,63 @@ class TestTunnelEndpoint(unittest.TestCase):
         self.tunnel_out.reply(1, 'ACK')
         assert self.tunnel_out.communicate() is True
         assert self.tunnel.send.call_count == 2
+
+    def test_recv_tokens(self):
+        payload = {
+            'cmd': 'TOKENS',
+            'port_id': self.port.id,
+            'peer_port_id': self.peer_port.id,
+            'sequencenbr': 0,
+            'tokens': [{'type': 'Token', 'data': i} for i in range(3)]
+        }
+        self.tunnel_in.recv_tokens(payload)
+        assert self.scheduler.tunnel_rx.call_count == 1
+        assert [self.port.queue.fifo[i].value for i in range(3)] == [0, 1, 2]
+        reply = self.tunnel.send.call_args[0][0]
+        assert reply['cmd'] == 'TOKENS_REPLY'
+        assert (reply['sequencenbr'], reply['length'], reply['acked'], reply['value']) == (0, 3, 3, 'ACK')
+
+        # Resent tokens are acked again, only one more fits in the queue
+        payload['tokens'] = [{'type': 'Token', 'data': i} for i in range(2, 5)]
+        payload['sequencenbr'] = 2
+        self.tunnel_in.recv_tokens(payload)
+        reply = self.tunnel.send.call_args[0][0]
+        assert (reply['sequencenbr'], reply['length'], reply['acked'], reply['value']) == (2, 3, 2, 'NACK')
+        assert self.scheduler.trigger_pressure_event.called
+
+    def test_batch_communicate(self):
+        self.tunnel_out.window = 3
+        for i in range(4):
+            self.tunnel_out.port.write_token(Token(i))
+        assert self.tunnel_out.communicate() is True
+        assert self.tunnel.send.call_count == 1
+        msg = self.tunnel.send.call_args[0][0]
+        assert msg['cmd'] == 'TOKENS'
+        assert msg['sequencenbr'] == 0
+        assert [t['data'] for t in msg['tokens']] == [0, 1, 2]
+        # Window full
+        assert self.tunnel_out.communicate() is False
+
+        self.tunnel_out.reply_batch(0, 3, 3, 'ACK')
+        assert self.scheduler.tunnel_tx_ack.call_count == 1
+        assert self.tunnel_out.port.queue.read_pos[self.port.id] == 3
+        assert self.tunnel_out.communicate() is True
+        msg = self.tunnel.send.call_args[0][0]
+        assert msg['sequencenbr'] == 3
+        assert [t['data'] for t in msg['tokens']] == [3]
+
+    def test_batch_nack(self):
+        self.tunnel_out.window = 4
+        for i in range(4):
+            self.tunnel_out.port.write_token(Token(i))
+        self.tunnel_out.communicate()
+        self.tunnel_out.reply_batch(0, 4, 1, 'NACK')
+        assert self.scheduler.tunnel_tx_nack.called
+        assert self.tunnel_out.in_flight == 0
+        assert self.tunnel_out.port.queue.read_pos[self.port.id] == 1
+        assert self.tunnel_out.port.queue.tentative_read_pos[self.port.id] == 1
+        # Throttled, one token at a time until acked
+        self.tunnel.send.reset_mock()
+        assert self.tunnel_out.communicate() is True
+        assert self.tunnel.send.call_args[0][0]['cmd'] == 'TOKEN'
+        assert self.tunnel_out.communicate() is False
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+import unittest
+from mock import Mock, patch
+
+from calvin.tests import DummyNode
+from calvin.requests import calvinresponse
+from calvin.runtime.north import replicationmanager
+from calvin.runtime.north.replicationmanager import ReplicationData, ReplicationManager
+
+pytestmark = pytest.mark.unittest
+
+
+class TestReplicaState(unittest.TestCase):
+
+    def setUp(self):
+        node = DummyNode()
+        node.proto = Mock()
+        self.rm = ReplicationManager(node)
+        self.data = ReplicationData()
+        self.data.actor_state = {'replication': {'_type': 'std.Identity'}}
+        conf = patch.dict(replicationmanager._conf.config['global'], {'replica_state_delta': True})
+        conf.start()
+        self.addCleanup(conf.stop)
+
+    def replicate(self, index, status=None):
+        state = {'private': {'_id': "replica-%d" % index, '_name': "actor/%d" % index},
+                 'managed': {'dump': False}}
+        self.rm._replicate_cont(self.data, state, [], "peer_node", callback=None)
+        call_args = self.rm.node.proto.actor_new.call_args
+        if status is not None:
+            call_args[0][1](calvinresponse.CalvinResponse(status))
+        return call_args
+
+    def test_full_state_by_default(self):
+        replicationmanager._conf.config['global']['replica_state_delta'] = False
+        self.replicate(1, status=True)
+        args, kwargs = self.replicate(2, status=True)
+        assert 'base_id' not in kwargs
+        self.assertEqual(args[3]['private']['_id'], "replica-2")
+        self.assertEqual(self.data.replica_bases, {})
+
+    def test_delta_after_first_replica(self):
+        args, kwargs = self.replicate(1, status=True)
+        self.assertEqual(kwargs['base_id'], self.data.id)
+        assert not kwargs.get('delta')
+        self.assertEqual(args[3]['managed'], {'dump': False})
+        args, kwargs = self.replicate(2)
+        assert kwargs['delta']
+        self.assertEqual(sorted(args[3]['set']), [[['private', '_id'], "replica-2"],
+                                                  [['private', '_name'], "actor/2"]])
+
+    def test_full_state_when_base_gone(self):
+        self.replicate(1, status=True)
+        args, kwargs = self.replicate(2)
+        args[1](calvinresponse.CalvinResponse(calvinresponse.GONE))
+        args, kwargs = self.rm.node.proto.actor_new.call_args
+        assert not kwargs.get('delta')
+        self.assertEqual(args[3]['private']['_id'], "replica-2")
+        args[1](calvinresponse.CalvinResponse(True))
+        args, kwargs = self.replicate(3)
+        assert kwargs['delta']
+
+    def test_base_kept_only_when_acked(self):
+        # Not acked yet
+        self.replicate(1)
+        args, kwargs = self.replicate(2)
+        assert not kwargs.get('delta')
+        args[1](calvinresponse.CalvinResponse(calvinresponse.INTERNAL_ERROR))
+        args, kwargs = self.replicate(3, status=True)
+        assert not kwargs.get('delta')
+        args, kwargs = self.replicate(4, status=calvinresponse.INTERNAL_ERROR)
+        assert kwargs['delta']
+        # Failed delta, the base is dropped
+        args, kwargs = self.replicate(5)
+        assert not kwargs.get('delta')
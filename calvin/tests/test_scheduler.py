@@ -1,6 +1,7 @@
 import pytest
 import unittest
-from mock import Mock
+import time
+from mock import Mock, patch
 from calvin.runtime.north import scheduler
 from calvin.runtime.north.plugins.port import queue
 from calvin.runtime.north.plugins.port.endpoint import LocalOutEndpoint, LocalInEndpoint
@@ -161,3 +162,202 @@ class SchedulerCheckStrategy(TestBase):
         assert src.outports['token'].endpoints[0].peer_port.owner == filter
         assert src.outports['token'].endpoints[0].peer_port.name == "token"
         assert src.outports['token'].endpoints[0].peer_port == filter.inports['token']
+
+
+class SchedulerTaskQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.patcher = patch('calvin.runtime.north.scheduler.async')
+        self.patcher.start()
+        self.scheduler = scheduler.BaseScheduler(Mock(), Mock())
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def _run_due(self, now=None):
+        while self.scheduler._tasks and self.scheduler._tasks[0][0] <= (now or time.time()):
+            self.scheduler._process_next()
+
+    def test_time_order(self):
+        calls = []
+        self.scheduler.insert_task(lambda: calls.append('late'), 0.02)
+        self.scheduler.insert_task(lambda: calls.append('early'), 0.01)
+        self.scheduler.insert_task(lambda: calls.append('now'), 0)
+        time.sleep(0.03)
+        self._run_due()
+        assert calls == ['now', 'early', 'late']
+
+    def test_coalesce_due_task(self):
+        task = Mock()
+        self.scheduler.insert_task(task, 0)
+        self.scheduler.insert_task(task, 0)
+        assert len(self.scheduler._tasks) == 1
+        # Delayed tasks are never coalesced
+        self.scheduler.insert_task(task, 10)
+        assert len(self.scheduler._tasks) == 2
+        self._run_due()
+        assert task.call_count == 1
+        assert self.scheduler._pending_before(task) is not None
+        assert self.scheduler._pending_before(task, time.time() + 1) is None
+
+    def test_reschedule_on_new_head(self):
+        self.scheduler._schedule_next = Mock()
+        self.scheduler.insert_task(Mock(), 10)
+        self.scheduler.insert_task(Mock(), 20)
+        assert self.scheduler._schedule_next.call_count == 1
+        self.scheduler.insert_task(Mock(), 0)
+        assert self.scheduler._schedule_next.call_count == 2
+
+    @patch('calvin.runtime.north.scheduler.time')
+    def test_authorization_checked_when_due(self, clock):
+        clock.time.return_value = 1000.0
+        actor = Mock(authorization_valid_until=0)
+
+        def authorized():
+            actor.authorization_valid_until = clock.time() + 60
+            return True
+        actor._authorized = Mock(side_effect=authorized)
+        self.scheduler.actor_mgr.enabled_actors = Mock(return_value=[actor])
+        self.scheduler.strategy = Mock()
+        assert self.scheduler._authorized(actor)
+        clock.time.return_value = 1059.0
+        assert self.scheduler._authorized(actor)
+        assert actor._authorized.call_count == 1
+        assert self.scheduler._pending_before(self.scheduler._check_authorizations) is not None
+        self._run_due(now=1059.0)
+        assert actor._authorized.call_count == 1
+        clock.time.return_value = 1060.0
+        self._run_due(now=1060.0)
+        assert actor._authorized.call_count == 2
+
+
+class ReadinessSchedulerStrategy(unittest.TestCase):
+
+    def setUp(self):
+        self.patcher = patch('calvin.runtime.north.scheduler.async')
+        self.patcher.start()
+        self.actors = {a: Mock(id=a) for a in ['a', 'b', 'c']}
+        actor_mgr = Mock(actors=self.actors)
+        actor_mgr.enabled_actors = Mock(return_value=self.actors.values())
+        self.scheduler = scheduler.ReadinessScheduler(Mock(), actor_mgr)
+        self.scheduler._fire_actors = Mock(return_value=set())
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def fired(self):
+        self.scheduler.strategy()
+        return set(a.id for a in self.scheduler._fire_actors.call_args[0][0])
+
+    def test_only_ready_actors_fire(self):
+        # All actors are tried initially
+        assert self.fired() == set(['a', 'b', 'c'])
+        # Nothing changed
+        assert self.fired() == set()
+        self.scheduler.schedule_calvinsys(actor_id='b')
+        assert self.fired() == set(['b'])
+        self.scheduler.tunnel_rx(Mock(port=Mock(owner=self.actors['c'])))
+        assert self.fired() == set(['c'])
+
+    def test_fired_actors_stay_ready(self):
+        self.scheduler._fire_actors.return_value = set(['a'])
+        self.fired()
+        self.scheduler._fire_actors.return_value = set()
+        assert self.fired() == set(['a'])
+        assert self.fired() == set()
+
+    def test_communicate_wakes_both_sides(self):
+        endpoint = Mock(port=Mock(owner=self.actors['a']), peer_port=Mock(owner=self.actors['b']))
+        endpoint.communicate.return_value = True
+        self.fired()
+        self.scheduler.monitor.register_endpoint(endpoint)
+        assert self.fired() == set(['a', 'b'])
+
+    def test_fired_actors_wake_linked_actors(self):
+        self.fired()
+        self.scheduler.link_actors('a', 'b')
+        self.scheduler.link_actors('a', 'b')
+        assert self.fired() == set(['a'])
+        self.scheduler._fire_actors.return_value = set(['a'])
+        self.fired()
+        self.scheduler._fire_actors.return_value = set()
+        assert self.fired() == set(['a', 'b'])
+        self.scheduler.unlink_actors('a', 'b')
+        self.scheduler.schedule_calvinsys(actor_id='a')
+        self.scheduler._fire_actors.return_value = set(['a'])
+        self.fired()
+        self.scheduler._fire_actors.return_value = set()
+        assert self.fired() == set(['a', 'b'])
+        self.scheduler.unlink_actors('a', 'b')
+        assert self.scheduler._links == {}
+
+    def test_disabled_actors_do_not_fire(self):
+        self.fired()
+        self.actors['a'].enabled.return_value = False
+        self.scheduler.schedule_calvinsys(actor_id='a')
+        assert self.fired() == set()
+
+
+class SlidingWindowCounterTest(unittest.TestCase):
+
+    def test_window(self):
+        counter = scheduler.SlidingWindowCounter(window=10.0, resolution=1.0)
+        counter.add(0.5, 2, now=100.0)
+        counter.add(0.25, 1, now=100.5)
+        counter.add(1.0, 4, now=105.0)
+        assert counter.cpu_time == 1.75
+        assert counter.firings == 7
+        counter.update(now=110.2)
+        assert counter.cpu_time == 1.0
+        assert counter.firings == 4
+        counter.update(now=200.0)
+        assert counter.cpu_time == 0.0
+        assert counter.firings == 0
+        assert counter.total_firings == 7
+
+
+class FairShareSchedulerStrategy(unittest.TestCase):
+
+    def setUp(self):
+        self.patcher = patch('calvin.runtime.north.scheduler.async')
+        self.patcher.start()
+        self.actors = {}
+        for actor_id, weight in [('bulk', None), ('sensor', 10)]:
+            actor = Mock(id=actor_id)
+            actor._deployment_requirements = [] if weight is None else [
+                {'op': 'scheduling_weight', 'kwargs': {'weight': weight}, 'type': '+'}]
+            self.actors[actor_id] = actor
+        actor_mgr = Mock(actors=self.actors)
+        actor_mgr.enabled_actors = Mock(side_effect=lambda: self.actors.values())
+        self.scheduler = scheduler.FairShareScheduler(Mock(), actor_mgr)
+        self.fired = []
+
+        def fire_actor(actor, time_slice):
+            self.fired.append((actor.id, time_slice))
+            return False
+        self.scheduler._fire_actor = fire_actor
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def test_weight(self):
+        assert self.scheduler.weight(self.actors['bulk']) == 1.0
+        assert self.scheduler.weight(self.actors['sensor']) == 10.0
+
+    def test_time_slice_and_order(self):
+        # Both have used same CPU time, but sensor has larger weight
+        self.scheduler._actor_fired(self.actors['bulk'], 1, 0.1)
+        self.scheduler._actor_fired(self.actors['sensor'], 1, 0.1)
+        self.scheduler.strategy()
+        assert [a for a, _ in self.fired] == ['sensor', 'bulk']
+        slices = dict(self.fired)
+        assert slices['sensor'] == 10 * slices['bulk']
+
+    def test_statistics(self):
+        self.scheduler._actor_fired(self.actors['bulk'], 3, 0.1)
+        stats = self.scheduler.statistics()
+        assert stats['scheduler'] == 'FairShareScheduler'
+        assert stats['actors']['bulk']['firings'] == 3
+        assert stats['actors']['bulk']['weight'] == 1.0
+        del self.actors['bulk']
+        assert 'bulk' not in self.scheduler.statistics()['actors']
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+import pytest
+from mock import Mock
+
+from calvin.requests import calvinresponse
+from calvin.runtime.north.storage import Storage
+from calvin.runtime.north.plugins.storage.storage_base import StorageBase
+from calvin.tests import DummyNode
+
+pytestmark = pytest.mark.unittest
+
+
+class SyncStorage(StorageBase):
+    """Storage plugin with only single key requests, calling back directly"""
+
+    def __init__(self):
+        super(SyncStorage, self).__init__()
+        self.data = {}
+        self.requests = 0
+
+    def get(self, key, cb=None):
+        self.requests += 1
+        cb(key=key, value=self.data.get(key, calvinresponse.CalvinResponse(calvinresponse.NOT_FOUND)))
+
+    def set(self, key, value, cb=None):
+        self.requests += 1
+        self.data[key] = value
+        cb(key=key, value=calvinresponse.CalvinResponse(True))
+
+    def append(self, key, value, cb=None):
+        self.requests += 1
+        self.data.setdefault(key, set()).update(value)
+        cb(key=key, value=calvinresponse.CalvinResponse(True))
+
+
+def collect(results):
+    def _cb(values):
+        results.append(values)
+    return _cb
+
+
+class StorageManyTester(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = SyncStorage()
+        self.storage = Storage(DummyNode(), override_storage=self.backend)
+        self.storage.started = True
+        self.storage.trigger_flush = Mock()
+
+    def test_default_many(self):
+        values = []
+        self.backend.set_many({'a': 1, 'b': 2}, cb=lambda values: None)
+        self.backend.append_many({'c': [1], 'd': [2]}, cb=lambda values: None)
+        self.backend.get_many(['a', 'c', 'x'], cb=collect(values))
+        self.assertEqual(self.backend.requests, 7)
+        self.assertEqual(values[0]['a'], 1)
+        self.assertEqual(values[0]['c'], set([1]))
+        self.assertTrue(calvinresponse.isfailresponse(values[0]['x']))
+
+    def test_storage_get_many(self):
+        self.backend.data = {'actor-1': {'node_id': "n1"}, 'actor-2': {'node_id': "n2"}}
+        values = []
+        self.storage.get_many("actor-", ["1", "2", "3"], cb=collect(values))
+        self.assertEqual(values[0]['1'], {'node_id': "n1"})
+        self.assertEqual(values[0]['2'], {'node_id': "n2"})
+        self.assertTrue(calvinresponse.isfailresponse(values[0]['3']))
+
+    def test_storage_set_many(self):
+        values = []
+        self.storage.set_many("actor-", {"1": 1, "2": 2}, cb=collect(values))
+        self.assertEqual(self.backend.data, {'actor-1': 1, 'actor-2': 2})
+        self.assertEqual(set(values[0].keys()), set(["1", "2"]))
+        # Confirmed values are not kept locally
+        self.assertFalse(self.storage.localstore)
+
+    def test_flush_uses_many(self):
+        self.backend.set_many = Mock()
+        self.backend.append_many = Mock()
+        self.storage.localstore = {'actor-1': 1, 'actor-2': 2}
+        self.storage.localstore_sets['replica-1'] = {'+': set([1, 2]), '-': set([])}
+        self.storage.localstore_sets['replica-2'] = {'+': set([3]), '-': set([])}
+        self.storage.flush_localdata()
+        self.assertEqual(self.backend.set_many.call_count, 1)
+        self.assertEqual(self.backend.set_many.call_args[1]['items'], {'actor-1': 1, 'actor-2': 2})
+        self.assertEqual(self.backend.append_many.call_count, 1)
+        items = self.backend.append_many.call_args[1]['items']
+        self.assertEqual({k: set(v) for k, v in items.iteritems()}, {'replica-1': set([1, 2]), 'replica-2': set([3])})
+
+    def test_batch(self):
+        self.backend.set_many = Mock()
+        self.backend.delete = Mock()
+        results = []
+        self.storage.begin_batch()
+        self.storage.set("actor-", "1", 1, cb=lambda key, value: results.append(key))
+        self.storage.begin_batch()
+        self.storage.set("port-", "2", 2, cb=None)
+        self.storage.end_batch()
+        self.storage.set("actor-", "3", 3, cb=None)
+        self.storage.set("actor-", "4", 4, cb=None)
+        self.storage.delete("actor-", "4", cb=None)
+        # Visible locally but not sent until the outermost end_batch
+        self.assertEqual(self.storage.localstore['actor-1'], 1)
+        self.assertFalse(self.backend.set_many.called)
+        self.storage.end_batch()
+        self.assertEqual(self.backend.set_many.call_count, 2)
+        items = [kwargs['items'] for args, kwargs in self.backend.set_many.call_args_list]
+        self.assertIn({'actor-1': 1, 'actor-3': 3}, items)
+        self.assertIn({'port-2': 2}, items)
+        cb = [kwargs['cb'] for args, kwargs in self.backend.set_many.call_args_list
+              if 'actor-1' in kwargs['items']][0]
+        cb(values={'actor-1': calvinresponse.CalvinResponse(True), 'actor-3': calvinresponse.CalvinResponse(True)})
+        self.assertEqual(results, ["1"])
@@ -88,12 +88,17 @@ class CalvinConfig(object):
             'global': {
                 'comment': 'User definable section',
                 'actor_paths': ['systemactors'],
+                'actorstore_index_dir': '~/.calvin/actorstore', # namespace index and metadata of the actor paths
                 'framework': 'twistedimpl',
                 'storage_type': 'dht', # supports dht, securedht, sql, local, and proxy
                 'storage_proxy': None,
                 'storage_sql': {},  # For SQL, should have the kwargs to connect + db-name. Defaults to insecure local
+                'storage_cache_size': 0, # max values in the storage read-through cache, 0 disables the cache
+                'storage_cache_ttl': {'default': 1.0, 'node-': 10.0, 'actorreq-': 10.0}, # seconds per key prefix
+                'signature_cache_size': 1000, # max cached signature verifications, 0 disables the cache
+                'certificate_cache_size': 256, # max cached parsed and verified certificates, 0 disables the cache
                 'capabilities_blacklist': [],
-                'remote_coder_negotiator': 'static',
+                'remote_coder_negotiator': 'static', # supports static and adaptive
                 'static_coder': ['json', 'msgpack'],
                 'display_plugin': 'stdout_impl',
                 'stdout_plugin': 'defaultimpl',
@@ -101,6 +106,17 @@ class CalvinConfig(object):
                 'control_proxy': None,
                 'fcm_server_secret': None,
                 'compiled_actors_path': None,
+                'scheduler': 'simple', # supports simple, round_robin, non_preemptive, readiness, and fair_share
+                'placement_balance': 0.0, # weight for spreading actors over nodes in deployment placement, 0 disables
+                'shared_local_queues': True, # inports read directly from the queue of a local outport
+                'token_window': 64, # max unacked tokens per tunneled port in batched transfers, 0 disables batching
+                'live_migration': False, # actors keep running while the destination prepares, only a delta is sent
+                'compact_actor_state': False, # send actor states as msgpack, all runtimes must support it
+                'compact_queue_state': False, # queue states only have the occupied slots, all runtimes must support it
+                'replica_state_delta': False, # replicas are sent as deltas of the previous one, all runtimes must support it
+                'compact_actor_state_compression': True, # zlib compress the compact actor states
+                'checkpoint_interval': 0, # seconds between checkpoints of the actors to disk, 0 disables checkpoints
+                'checkpoint_dir': '~/.calvin/checkpoints', # restored on restart from the same node name and uri
                 "calvinsys_paths": ['calvin/runtime/south/calvinsys', 'calvinextras/calvinsys']
             },
             'testing': {
@@ -19,8 +19,8 @@ This module depends on openssl.
 """
 
 import ConfigParser
+import calendar
 import os
-import subprocess
 import sys
 import tempfile
 import time
@@ -34,6 +34,7 @@ from calvin.utilities import calvinuuid
 from calvin.utilities import calvinconfig
 from calvin.utilities.calvinlogger import get_logger
 from calvin.utilities.utils import get_home
+from calvin.utilities.ttlcache import TTLCache
 
 _log = get_logger(__name__)
 _conf = calvinconfig.get()
@@ -50,6 +51,33 @@ TYPE_ECC = 408  # Internal type name for ECC keys in version3 of PKCS#10.
 TRUSTSTORE_TRANSPORT ="truststore_for_transport"
 TRUSTSTORE_SIGN ="truststore_for_signing"
 
+# Parsed certificates by PEM string, see load_pem_certificate
+_certificate_cache = TTLCache(_conf.get(None, 'certificate_cache_size') or 0)
+# Successfully verified certificates by (truststore, certificate digest), see TrustStore.verify_certificate
+_verified_cache = TTLCache(_conf.get(None, 'certificate_cache_size') or 0)
+
+def cache_statistics():
+    return {'certificates': _certificate_cache.statistics(), 'verified': _verified_cache.statistics()}
+
+def validity_left(cert):
+    """Seconds until the X509 PyOpenSSL object cert expires (notAfter), used as TTL of cached verifications"""
+    not_after = calendar.timegm(time.strptime(cert.get_notAfter(), "%Y%m%d%H%M%SZ"))
+    return not_after - time.time()
+
+def load_pem_certificate(cert_str):
+    """
+    Return the OpenSSL X509 object of the PEM formatted certificate cert_str,
+    parsed certificates are cached and must not be modified.
+    """
+    try:
+        return _certificate_cache[cert_str]
+    except KeyError:
+        pass
+    start = time.time()
+    cert = OpenSSL.crypto.load_certificate(OpenSSL.crypto.FILETYPE_PEM, cert_str)
+    _certificate_cache.put(cert_str, cert, float('inf'), cost=time.time() - start)
+    return cert
+
 def incr(fname):
     """
     Open a file read an integer from the first line.
@@ -82,23 +110,14 @@ def fingerprint(filename):
     Equivalent to:
     openssl x509 -sha256 -in ./runtime.csr -noout -fingerprint
     """
-    log = subprocess.Popen(["openssl", "x509",
-                            "-sha256",
-                            "-in", filename,
-                            "-noout",
-                            "-fingerprint"],
-                           stdout=subprocess.PIPE,
-                           stderr=subprocess.PIPE)
-    stdout, stderr = log.communicate()
-    if log.returncode != 0:
-        raise IOError(stderr)
+    with open(filename, 'r') as cert_fd:
+        cert_str = cert_fd.read()
     try:
-        fingerprint = stdout.split("=")[1].strip()
-    except (IndexError, AttributeError):
+        return fingerprint_from_cert_string(cert_str)
+    except OpenSSL.crypto.Error as err:
         errormsg = "Error fingerprinting " \
-                   "certificate file. {}".format(stderr)
+                   "certificate file. {}".format(err)
         raise IOError(errormsg)
-    return fingerprint
 
 def id_from_cert_string(cert_str):
     fingerprint = fingerprint_from_cert_string(cert_str)
@@ -114,8 +133,7 @@ def fingerprint_from_cert_string(cert_str):
     Equivalent to:
     openssl x509 -sha256 -in ./runtime.csr -noout -fingerprint
     """
-    cert = OpenSSL.crypto.load_certificate(OpenSSL.crypto.FILETYPE_PEM,
-                                                      cert_str)
+    cert = load_pem_certificate(cert_str)
     fingerprint = cert.digest("sha256")
 #    id = fingerprint.replace(":","")[-40:]
 
@@ -132,7 +150,7 @@ def get_cert_data(certstring=None, certpath=None):
             raise IOError(err)
     elif certstring:
         certdata=certstring
-    cert = OpenSSL.crypto.load_certificate(OpenSSL.crypto.FILETYPE_PEM, certdata)
+    cert = load_pem_certificate(certdata)
     return cert
 
 def cert_hash(certstring=None, certpath=None):
@@ -198,7 +216,7 @@ def get_public_key_from_certpath(certpath):
 
 def get_public_key_from_certstr(certstring):
     try:
-        certificate = OpenSSL.crypto.load_certificate(OpenSSL.crypto.FILETYPE_PEM, certstring)
+        certificate = load_pem_certificate(certstring)
     except Exception as err:
         _log.error("Error when trying to open cert string, err={}".format(err))
     return get_public_key(certificate)
@@ -651,7 +669,7 @@ class TrustStore():
         """Verify certificate using the CA certificate"""
     #    _log.debug("verify_certificate: \n\tcertstring={}".format(certstring))
         try:
-            cert = OpenSSL.crypto.load_certificate(OpenSSL.crypto.FILETYPE_PEM, certstring)
+            cert = load_pem_certificate(certstring)
         except Exception as e:
             _log.error("verify_certificate_str::Failed to load certstring: certstring={}, error={}".format(certstring, e))
             raise Exception("verify_certificate_str::Failed to load certstring")
@@ -673,6 +691,13 @@ class TrustStore():
         if serial < 0:
             _log.error("Serial number was negative")
             raise CertificateDeniedMalformed("Serial number was negative.")
+        key = (self.truststore_dir, cert.digest("sha256"))
+        try:
+            _verified_cache[key]
+            return cert
+        except KeyError:
+            pass
+        start = time.time()
         try:
             self._verify_cert_with_policy(cert)
             cert.get_signature_algorithm()  # TODO: Check sig alg strength
@@ -685,6 +710,7 @@ class TrustStore():
         except Exception as e:
             _log.error("Failed to create X509StoreContext: %s" % e)
             raise
+        _verified_cache.put(key, True, validity_left(cert), cost=time.time() - start)
         return cert
 
     def _verify_cert_with_policy(self, cert):
@@ -727,6 +753,7 @@ class TrustStore():
         new_path = os.path.join(self.truststore_dir, name)
         shutil.copy(cert_file, self.truststore_dir)
         self._ce_rehash_file(new_path)
+        _verified_cache.clear()
         return
 
     def _c_rehash_file(self, path):
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compact binary encoding of serialized actor states (see Actor.serialize)
+sent between runtimes.
+
+The managed attributes of a state are encoded as a list of values, with
+the attribute names (the schema) once per encoded group of states for each
+set of names, i.e. once per actor type. The states are packed with msgpack
+and optionally compressed with zlib. Since the messages can be JSON coded
+the result is a base64 string, with a prefix telling the format.
+"""
+
+import base64
+import zlib
+from calvin.runtime.north.plugins.coders.messages import msgpack_coder
+
+_PREFIX = "cstate:"
+_PREFIX_COMPRESSED = "cstatez:"
+
+
+def is_encoded(data):
+    return isinstance(data, basestring) and data.startswith((_PREFIX, _PREFIX_COMPRESSED))
+
+
+def encode(states, compress=False):
+    """Encode the list of states (or other dicts, e.g. deltas, which are kept as is)"""
+    schemas = []
+    schema_index = {}
+    entries = []
+    for state in states:
+        managed = state.get('managed') if isinstance(state, dict) else None
+        if isinstance(managed, dict):
+            names = tuple(sorted(managed))
+            if names not in schema_index:
+                schema_index[names] = len(schemas)
+                schemas.append(list(names))
+            state = dict(state, managed=[schema_index[names], [managed[name] for name in names]])
+        entries.append(state)
+    data = msgpack_coder.get().encode([schemas, entries])
+    if compress:
+        return _PREFIX_COMPRESSED + base64.b64encode(zlib.compress(data))
+    return _PREFIX + base64.b64encode(data)
+
+
+def decode(data):
+    """Return the list of states in data"""
+    if data.startswith(_PREFIX_COMPRESSED):
+        data = zlib.decompress(base64.b64decode(data[len(_PREFIX_COMPRESSED):]))
+    else:
+        data = base64.b64decode(data[len(_PREFIX):])
+    schemas, entries = msgpack_coder.get().decode(data)
+    for state in entries:
+        managed = state.get('managed') if isinstance(state, dict) else None
+        if isinstance(managed, list):
+            schema, values = managed
+            state['managed'] = dict(zip(schemas[schema], values))
+    return entries
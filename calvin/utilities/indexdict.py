@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+class IndexDict(dict):
+    """
+    Dictionary where tuple keys, i.e. multilevel index keys, also are kept
+    in a prefix trie with one level per tuple item. This makes it possible
+    to find all index keys at or below an index level without visiting
+    every key in the dictionary. Other keys are plain dictionary keys.
+    """
+
+    def __init__(self):
+        super(IndexDict, self).__init__()
+        # Trie node: [{level: node}, True if node is a key]
+        self._trie = [{}, False]
+
+    def _insert(self, key):
+        node = self._trie
+        for level in key:
+            children = node[0]
+            if level not in children:
+                children[level] = [{}, False]
+            node = children[level]
+        node[1] = True
+
+    def _remove(self, key):
+        path = [self._trie]
+        for level in key:
+            path.append(path[-1][0][level])
+        path[-1][1] = False
+        # Prune nodes that neither are keys nor have children
+        for i in range(len(key), 0, -1):
+            node = path[i]
+            if node[0] or node[1]:
+                break
+            del path[i - 1][0][key[i - 1]]
+
+    def __setitem__(self, key, value):
+        if isinstance(key, tuple) and key not in self:
+            self._insert(key)
+        super(IndexDict, self).__setitem__(key, value)
+
+    def __delitem__(self, key):
+        super(IndexDict, self).__delitem__(key)
+        if isinstance(key, tuple):
+            self._remove(key)
+
+    def pop(self, key, *default):
+        if key in self:
+            value = self[key]
+            del self[key]
+            return value
+        return super(IndexDict, self).pop(key, *default)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).iteritems():
+            self[key] = value
+
+    def clear(self):
+        super(IndexDict, self).clear()
+        self._trie = [{}, False]
+
+    def popitem(self):
+        key, value = super(IndexDict, self).popitem()
+        if isinstance(key, tuple):
+            self._remove(key)
+        return key, value
+
+    def index_keys(self, index):
+        """All tuple keys starting with the levels in index, including index itself"""
+        node = self._trie
+        for level in index:
+            node = node[0].get(level)
+            if node is None:
+                return []
+        keys = []
+        stack = [(tuple(index), node)]
+        while stack:
+            key, node = stack.pop()
+            if node[1]:
+                keys.append(key)
+            stack.extend((key + (level,), child) for level, child in node[0].iteritems())
+        return keys
+
+    def index_items(self, index):
+        """(key, value) for all tuple keys starting with the levels in index"""
+        return [(key, self[key]) for key in self.index_keys(index)]
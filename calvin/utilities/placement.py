@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Placement of an application's actors on nodes.
+
+Each actor a gets a score for each node n it can be placed on:
+
+    score[a, n] = sum_b W[a, b] * F[b, n] - balance * load[n]
+
+where F is the actor by node feasibility matrix (1 when possible), W the
+actor by actor connectivity matrix (1 on the diagonal, CONNECTED_WEIGHT for
+connected actors) and load[n] the expected share of actors on node n
+relative to the mean, i.e. with balance > 0 less popular nodes are preferred.
+W is sparse and never built, only the connections are used.
+
+The solver uses NumPy when available, otherwise a pure Python version
+with the same result.
+"""
+
+from collections import defaultdict
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Weight between connected actors, i.e. how much they want to be on the same node
+CONNECTED_WEIGHT = 0.5
+
+
+def solve(actor_ids, connections, feasible, node_ids, balance=0.0):
+    """
+    actor_ids: list of actor ids to place
+    connections: iterable of (actor_id, actor_id) pairs for connected actors
+    feasible: dictionary with the possible node ids for each actor
+    node_ids: list of all node ids
+    balance: weight for spreading the actors over the nodes, 0 disables
+
+    Returns a dictionary with a list of the possible node ids for each actor,
+    sorted with the highest score first (ties in node_ids order).
+    """
+    index = {actor_id: i for i, actor_id in enumerate(actor_ids)}
+    pairs = [(index[a], index[b]) for a, b in connections if a in index and b in index and a != b]
+    if numpy is not None and actor_ids and node_ids:
+        return _solve_numpy(actor_ids, pairs, feasible, node_ids, balance)
+    return _solve_python(actor_ids, pairs, feasible, node_ids, balance)
+
+
+def _solve_numpy(actor_ids, pairs, feasible, node_ids, balance):
+    node_index = {node_id: i for i, node_id in enumerate(node_ids)}
+    F = numpy.zeros((len(actor_ids), len(node_ids)))
+    for i, actor_id in enumerate(actor_ids):
+        columns = [node_index[n] for n in feasible.get(actor_id, ()) if n in node_index]
+        F[i, columns] = 1.0
+    # S = W * F, with W = I + CONNECTED_WEIGHT * (symmetric adjacency)
+    S = F.copy()
+    if pairs:
+        src, dst = numpy.array(pairs).T
+        numpy.add.at(S, src, CONNECTED_WEIGHT * F[dst])
+        numpy.add.at(S, dst, CONNECTED_WEIGHT * F[src])
+    counts = F.sum(axis=1)
+    if balance:
+        load = (F / numpy.maximum(counts, 1)[:, None]).sum(axis=0)
+        S -= balance * load / max(load.mean(), 1e-9)
+    S[F == 0] = -numpy.inf
+    order = numpy.argsort(-S, axis=1, kind='mergesort')
+    return {actor_id: [node_ids[j] for j in order[i, :int(counts[i])]] for i, actor_id in enumerate(actor_ids)}
+
+
+def _solve_python(actor_ids, pairs, feasible, node_ids, balance):
+    node_order = {node_id: i for i, node_id in enumerate(node_ids)}
+    nodes = [set(n for n in feasible.get(actor_id, ()) if n in node_order) for actor_id in actor_ids]
+    neighbours = defaultdict(list)
+    for a, b in pairs:
+        neighbours[a].append(b)
+        neighbours[b].append(a)
+    penalty = defaultdict(float)
+    if balance:
+        load = defaultdict(float)
+        for possible in nodes:
+            for n in possible:
+                load[n] += 1.0 / len(possible)
+        mean = max(sum(load.values()) / len(node_ids), 1e-9) if node_ids else 1.0
+        penalty.update({n: balance * l / mean for n, l in load.iteritems()})
+    placement = {}
+    for i, actor_id in enumerate(actor_ids):
+        score = {n: 1.0 for n in nodes[i]}
+        for j in neighbours[i]:
+            for n in nodes[j]:
+                if n in score:
+                    score[n] += CONNECTED_WEIGHT
+        for n in score:
+            score[n] -= penalty[n]
+        placement[actor_id] = sorted(score, key=lambda n: (-score[n], node_order[n]))
+    return placement
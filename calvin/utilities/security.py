@@ -17,6 +17,8 @@
 import os
 import glob
 import json
+import time
+import hashlib
 from datetime import datetime, timedelta
 try:
     import OpenSSL.crypto
@@ -43,6 +45,7 @@ from calvin.utilities.utils import get_home
 from calvin.utilities.runtime_credentials import RuntimeCredentials
 from calvin.utilities.calvin_callback import CalvinCB
 from calvin.utilities.requirement_matching import ReqMatch
+from calvin.utilities.ttlcache import TTLCache
 
 _conf = calvinconfig.get()
 _log = get_logger(__name__)
@@ -50,6 +53,12 @@ _log = get_logger(__name__)
 # Default timeout
 TIMEOUT=5
 
+# Verified signatures, see Security.verify_signature_content
+_signature_cache = TTLCache(_conf.get(None, 'signature_cache_size') or 0)
+
+def signature_cache_statistics():
+    return _signature_cache.statistics()
+
 try:
     _ca_conf = _conf.get("security", "certificate_authority")
     domain = _ca_conf["domain_name"]
@@ -592,12 +601,23 @@ class Security(object):
             return (False, None)
 
         # If any of the signatures is verified correctly, True is returned.
+        content_digest = hashlib.sha256(content['file']).hexdigest()
         for cert_hash, signature in content['sign'].iteritems():
             try:
                 # Check if the certificate is stored in the truststore (name is <cert_hash>.0)
                 #TODO: remove signature_trust_store dependency
                 truststore_path = self.node.runtime_credentials.certificate.get_truststore_path(certificate.TRUSTSTORE_SIGN)
                 trusted_cert_path = os.path.join(truststore_path, cert_hash + ".0")
+                # Same content, signature and trusted certificate as an earlier verification
+                key = (content_digest, hashlib.sha256(signature).hexdigest(), cert_hash,
+                       os.stat(trusted_cert_path).st_mtime)
+                try:
+                    cert = _signature_cache[key]
+                    if not cert.has_expired():
+                        return (True, [cert.get_issuer().CN])
+                except KeyError:
+                    pass
+                start = time.time()
                 with open(trusted_cert_path, 'rt') as f:
                     certstr=f.read()
                     try:
@@ -605,6 +625,7 @@ class Security(object):
                         cert = self.node.runtime_credentials.certificate.truststore_sign.verify_signature(content['file'],
                                                           signature,
                                                           certstr )
+                        _signature_cache.put(key, cert, certificate.validity_left(cert), cost=time.time() - start)
                         signer = [cert.get_issuer().CN]  # The Common Name field for the issuer
                         return (True, signer)
                     except Exception as e:
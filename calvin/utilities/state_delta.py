@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Differences between serialized (JSON-like) states, e.g. the state of an actor
+before and after it has continued to fire.
+
+A delta is {'set': [[path, value], ...], 'del': [path, ...]} where a path is
+the list of dictionary keys down to the changed value. Dictionaries are
+compared key by key, any other changed value (e.g. a list) is replaced whole.
+"""
+
+
+def delta(base, state):
+    """Return the delta that turns base into state"""
+    changes = {'set': [], 'del': []}
+    _diff(base, state, [], changes)
+    return changes
+
+
+def _diff(base, state, path, changes):
+    if isinstance(base, dict) and isinstance(state, dict):
+        for key, value in state.iteritems():
+            if key not in base:
+                changes['set'].append([path + [key], value])
+            else:
+                _diff(base[key], value, path + [key], changes)
+        changes['del'].extend([path + [key] for key in base if key not in state])
+    elif base != state or type(base) != type(state):
+        changes['set'].append([path, state])
+
+
+def apply_delta(base, changes):
+    """Apply the delta to base, which is modified, and return the resulting state"""
+    state = base
+    for path, value in changes['set']:
+        if not path:
+            state = value
+        else:
+            _parent(state, path)[path[-1]] = value
+    for path in changes['del']:
+        _parent(state, path).pop(path[-1], None)
+    return state
+
+
+def _parent(state, path):
+    for key in path[:-1]:
+        state = state[key]
+    return state
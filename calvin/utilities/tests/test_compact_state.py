@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from calvin.utilities import compact_state
+
+pytestmark = pytest.mark.unittest
+
+
+def _state(n):
+    return {'private': {'_id': "actor-%d" % n, 'inports': {'in': {'tokens': [{'type': 'Token', 'data': n}]}}},
+            'managed': {'n': n, 'name': "counter"}, 'security': {}, 'custom': {}}
+
+
+def test_roundtrip():
+    states = [_state(1), _state(2), {'set': [[['managed', 'n'], 3]], 'del': []}]
+    for compress in (False, True):
+        data = compact_state.encode(states, compress=compress)
+        assert compact_state.is_encoded(data)
+        assert compact_state.decode(data) == states
+
+
+def test_schema_once():
+    single = len(compact_state.encode([_state(1)]))
+    double = len(compact_state.encode([_state(1), _state(2)]))
+    # The attribute names are not repeated for the second state
+    assert double - single < single - len(compact_state.encode([]))
+    assert not compact_state.is_encoded(_state(1))
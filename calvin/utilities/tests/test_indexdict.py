@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import pytest
+
+from calvin.utilities.indexdict import IndexDict
+
+pytestmark = pytest.mark.unittest
+
+
+class IndexDictTester(unittest.TestCase):
+
+    def setUp(self):
+        self.d = IndexDict()
+        self.d[('node/attr', 'a', 'b')] = set([1])
+        self.d[('node/attr', 'a', 'b', 'c')] = set([2])
+        self.d[('node/attr', 'a', 'bb')] = set([3])
+        self.d[('node/attr', 'x')] = set([4])
+        self.d['node-key'] = set([5])
+
+    def values(self, index):
+        return set(v for _, value in self.d.index_items(index) for v in value)
+
+    def test_full_levels(self):
+        self.assertEqual(self.values(['node/attr']), set([1, 2, 3, 4]))
+        self.assertEqual(self.values(['node/attr', 'a']), set([1, 2, 3]))
+        self.assertEqual(self.values(['node/attr', 'a', 'b']), set([1, 2]))
+        self.assertEqual(self.values(['node/attr', 'a', 'b', 'c']), set([2]))
+        self.assertEqual(self.values(['node/attr', 'a', 'b', 'c', 'd']), set())
+        self.assertEqual(self.values(['node/attr', 'z']), set())
+        self.assertEqual(self.values(['node']), set())
+
+    def test_remove(self):
+        del self.d[('node/attr', 'a', 'b')]
+        self.assertEqual(self.values(['node/attr', 'a', 'b']), set([2]))
+        self.d.pop(('node/attr', 'a', 'b', 'c'))
+        self.assertEqual(self.values(['node/attr', 'a']), set([3]))
+        self.assertNotIn('b', self.d._trie[0]['node/attr'][0]['a'][0])
+        del self.d['node-key']
+        self.d.clear()
+        self.assertEqual(self.values(['node/attr']), set())
+
+    def test_dict(self):
+        self.d.setdefault(('node/attr', 'y'), set([6]))
+        self.d.update({('node/attr', 'z'): set([7])})
+        self.assertEqual(self.values(['node/attr']), set([1, 2, 3, 4, 6, 7]))
+        self.assertEqual(self.d['node-key'], set([5]))
+        self.assertEqual(len(self.d), 7)
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import random
+import pytest
+
+from calvin.utilities import placement
+
+pytestmark = pytest.mark.unittest
+
+
+class PlacementTester(unittest.TestCase):
+
+    def test_connected_actors_together(self):
+        feasible = {'a': set(['n1']), 'b': set(['n1', 'n2']), 'c': set(['n2', 'n3']), 'd': set(['n3'])}
+        result = placement.solve(['a', 'b', 'c', 'd'], [('a', 'b'), ('c', 'd')], feasible, ['n1', 'n2', 'n3'])
+        self.assertEqual(result['a'], ['n1'])
+        self.assertEqual(result['b'], ['n1', 'n2'])
+        self.assertEqual(result['c'], ['n3', 'n2'])
+        self.assertEqual(result['d'], ['n3'])
+
+    def test_balance(self):
+        feasible = {'a': set(['n1', 'n2']), 'b': set(['n1']), 'c': set(['n1'])}
+        result = placement.solve(['a', 'b', 'c'], [], feasible, ['n1', 'n2'])
+        self.assertEqual(result['a'], ['n1', 'n2'])
+        result = placement.solve(['a', 'b', 'c'], [], feasible, ['n1', 'n2'], balance=1.0)
+        self.assertEqual(result['a'], ['n2', 'n1'])
+
+    def test_unknown_nodes_and_actors(self):
+        feasible = {'a': set(['n1', 'n9'])}
+        result = placement.solve(['a', 'b'], [('a', 'x')], feasible, ['n1'])
+        self.assertEqual(result, {'a': ['n1'], 'b': []})
+
+    @pytest.mark.skipif(placement.numpy is None, reason="NumPy not installed")
+    def test_numpy_same_as_python(self):
+        rnd = random.Random(4711)
+        actor_ids = ["actor%d" % i for i in range(200)]
+        node_ids = ["node%d" % i for i in range(10)]
+        feasible = {a: set(rnd.sample(node_ids, rnd.randint(1, 5))) for a in actor_ids}
+        connections = [(rnd.choice(actor_ids), rnd.choice(actor_ids)) for _ in range(400)]
+        index = {a: i for i, a in enumerate(actor_ids)}
+        pairs = [(index[a], index[b]) for a, b in connections if a != b]
+        for balance in (0.0, 0.5):
+            self.assertEqual(placement._solve_numpy(actor_ids, pairs, feasible, node_ids, balance),
+                             placement._solve_python(actor_ids, pairs, feasible, node_ids, balance))
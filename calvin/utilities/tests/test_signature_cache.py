@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+import time
+import pytest
+from mock import Mock
+
+OpenSSL = pytest.importorskip("OpenSSL")
+
+from calvin.utilities import certificate
+from calvin.utilities import security
+from calvin.utilities.security import Security
+from calvin.utilities.ttlcache import TTLCache
+
+pytestmark = pytest.mark.unittest
+
+
+def self_signed_certificate():
+    key = OpenSSL.crypto.PKey()
+    key.generate_key(OpenSSL.crypto.TYPE_RSA, 2048)
+    cert = OpenSSL.crypto.X509()
+    cert.get_subject().CN = "signer"
+    cert.set_serial_number(1)
+    cert.gmtime_adj_notBefore(0)
+    cert.gmtime_adj_notAfter(3600)
+    cert.set_issuer(cert.get_subject())
+    cert.set_pubkey(key)
+    cert.sign(key, 'sha256')
+    return key, cert
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = time.time()
+
+    def __call__(self):
+        return self.now
+
+
+class TestSignatureCache(object):
+
+    @pytest.fixture(autouse=True)
+    def truststore(self, tmpdir, monkeypatch):
+        monkeypatch.setattr(security, '_signature_cache', TTLCache(10))
+        monkeypatch.setattr(certificate, '_certificate_cache', TTLCache(10))
+        monkeypatch.setattr(certificate, '_verified_cache', TTLCache(10))
+        self.key, cert = self_signed_certificate()
+        self.cert_str = OpenSSL.crypto.dump_certificate(OpenSSL.crypto.FILETYPE_PEM, cert)
+        self.cert_hash = format(cert.subject_name_hash(), 'x')
+        truststore_dir = tmpdir.mkdir("truststore")
+        truststore_dir.join("signer.pem").write(self.cert_str)
+        truststore_dir.join(self.cert_hash + ".0").write(self.cert_str)
+        node = Mock()
+        node.runtime_credentials.certificate.get_truststore_path.return_value = str(truststore_dir)
+        node.runtime_credentials.certificate.truststore_sign = certificate.TrustStore(str(truststore_dir))
+        self.security = Security(node)
+        self.security.sec_conf = {'signature_trust_store': str(truststore_dir)}
+
+    def content(self, data, signed_data=None):
+        signature = OpenSSL.crypto.sign(self.key, signed_data or data, 'sha256')
+        return {'file': data, 'sign': {self.cert_hash: signature}}
+
+    def test_cached(self):
+        content = self.content("actor source")
+        assert self.security.verify_signature_content(content, "actor") == (True, ["signer"])
+        assert self.security.verify_signature_content(content, "actor") == (True, ["signer"])
+        statistics = security.signature_cache_statistics()
+        assert statistics['hits'] == 1
+        assert statistics['saved_ms'] > 0
+
+    def test_changed_content_verified(self):
+        assert self.security.verify_signature_content(self.content("actor source"), "actor")[0]
+        assert not self.security.verify_signature_content(self.content("changed", "actor source"), "actor")[0]
+
+    def test_certificate_cached(self):
+        assert certificate.load_pem_certificate(self.cert_str) is certificate.load_pem_certificate(self.cert_str)
+        store = self.security.node.runtime_credentials.certificate.truststore_sign
+        store.verify_certificate_str(self.cert_str)
+        store.verify_certificate_str(self.cert_str)
+        assert certificate.cache_statistics()['verified']['hits'] == 1
+
+    def test_cache_expires_with_certificate(self, monkeypatch):
+        clock = Clock()
+        monkeypatch.setattr(security, '_signature_cache', TTLCache(10, timer=clock))
+        monkeypatch.setattr(certificate, '_verified_cache', TTLCache(10, timer=clock))
+        store = self.security.node.runtime_credentials.certificate.truststore_sign
+        store.verify_certificate_str(self.cert_str)
+        assert self.security.verify_signature_content(self.content("actor source"), "actor")[0]
+        assert len(certificate._verified_cache) == 1
+        assert len(security._signature_cache) == 1
+        # The certificate is valid for an hour
+        clock.now += 3601
+        store.verify_certificate_str(self.cert_str)
+        assert self.security.verify_signature_content(self.content("actor source"), "actor")[0]
+        assert certificate.cache_statistics()['verified']['expired'] == 1
+        assert security.signature_cache_statistics()['expired'] == 1
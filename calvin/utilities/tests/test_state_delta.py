@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+
+import copy
+import pytest
+
+from calvin.utilities.state_delta import delta, apply_delta
+
+pytestmark = pytest.mark.unittest
+
+
+def test_delta():
+    base = {'private': {'_id': 'a', 'inports': {'in': {'fifo': [1, 2]}}}, 'managed': {'n': 1, 'gone': 2}}
+    state = copy.deepcopy(base)
+    state['private']['inports']['in']['fifo'] = [2, 3]
+    state['managed']['n'] = 2
+    state['managed']['new'] = {'x': 1}
+    del state['managed']['gone']
+    changes = delta(base, state)
+    assert sorted(changes['set']) == [[['managed', 'n'], 2], [['managed', 'new'], {'x': 1}],
+                                      [['private', 'inports', 'in', 'fifo'], [2, 3]]]
+    assert changes['del'] == [['managed', 'gone']]
+    assert apply_delta(copy.deepcopy(base), changes) == state
+
+
+def test_no_changes():
+    base = {'a': {'b': [1]}}
+    assert delta(base, copy.deepcopy(base)) == {'set': [], 'del': []}
+    assert delta(1, 2) == {'set': [[[], 2]], 'del': []}
+    assert apply_delta(1, delta(1, 2)) == 2
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import pytest
+
+from calvin.utilities.ttlcache import TTLCache
+
+pytestmark = pytest.mark.unittest
+
+
+class TTLCacheTester(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.cache = TTLCache(2, timer=lambda: self.now)
+
+    def test_hit_and_miss(self):
+        self.cache.put('a', 1, 1.0)
+        self.assertEqual(self.cache['a'], 1)
+        with self.assertRaises(KeyError):
+            self.cache['b']
+        self.assertEqual(self.cache.statistics()['hits'], 1)
+        self.assertEqual(self.cache.statistics()['misses'], 1)
+
+    def test_saved_time(self):
+        self.cache.put('a', 1, 1.0, cost=0.25)
+        self.cache['a']
+        self.cache['a']
+        with self.assertRaises(KeyError):
+            self.cache['b']
+        statistics = self.cache.statistics()
+        self.assertEqual(statistics['saved_ms'], 500.0)
+        self.assertAlmostEqual(statistics['hit_rate'], 2 / 3.0)
+
+    def test_expiry(self):
+        self.cache.put('a', 1, 1.0)
+        self.now = 1.0
+        self.assertNotIn('a', self.cache)
+        with self.assertRaises(KeyError):
+            self.cache['a']
+        self.assertEqual(self.cache.statistics()['expired'], 1)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_lru_eviction(self):
+        self.cache.put('a', 1, 1.0)
+        self.cache.put('b', 2, 1.0)
+        self.cache['a']
+        self.cache.put('c', 3, 1.0)
+        self.assertIn('a', self.cache)
+        self.assertNotIn('b', self.cache)
+        self.assertIn('c', self.cache)
+        self.assertEqual(self.cache.statistics()['evicted'], 1)
+
+    def test_invalidate(self):
+        self.cache.put('a', 1, 1.0)
+        version = self.cache.version
+        self.cache.invalidate('a')
+        self.assertNotIn('a', self.cache)
+        # Value read before the invalidation is not cached
+        self.cache.put('a', 1, 1.0, version)
+        self.assertNotIn('a', self.cache)
+        self.cache.put('a', 2, 1.0, self.cache.version)
+        self.assertEqual(self.cache['a'], 2)
+
+    def test_disabled(self):
+        self.cache.put('a', 1, 0)
+        self.assertNotIn('a', self.cache)
+        cache = TTLCache(0)
+        cache.put('a', 1, 1.0)
+        self.assertNotIn('a', cache)
+        with self.assertRaises(KeyError):
+            cache['a']
+        self.assertEqual(cache.statistics()['misses'], 0)
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+from collections import OrderedDict
+
+
+class TTLCache(object):
+    """
+    Bounded cache where each entry expires after its own time to live,
+    and the least recently used entry is evicted when the cache is full.
+
+    version is increased on every invalidation, a value fetched while an
+    invalidation happened (i.e. version changed) is not stored by put.
+
+    cost is the time (in seconds) it took to get a value, the total for
+    all hits is reported as saved time in the statistics.
+    """
+
+    def __init__(self, size, timer=time.time):
+        super(TTLCache, self).__init__()
+        self.size = size
+        self.version = 0
+        self._timer = timer
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+        self.saved = 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        entry = self._entries.get(key)
+        return entry is not None and entry[1] > self._timer()
+
+    def __getitem__(self, key):
+        """Get value for key, raises KeyError when missing or expired"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            if self.size > 0:
+                # Only a miss when the cache is enabled
+                self.misses += 1
+            raise KeyError(key)
+        if entry[1] <= self._timer():
+            self.expired += 1
+            self.misses += 1
+            raise KeyError(key)
+        # Most recently used last
+        self._entries[key] = entry
+        self.hits += 1
+        self.saved += entry[2]
+        return entry[0]
+
+    def put(self, key, value, ttl, version=None, cost=0.0):
+        if ttl <= 0 or self.size <= 0:
+            return
+        if version is not None and version != self.version:
+            return
+        self._entries.pop(key, None)
+        self._entries[key] = (value, self._timer() + ttl, cost)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+            self.evicted += 1
+
+    def invalidate(self, key):
+        self.version += 1
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self.version += 1
+        self._entries.clear()
+
+    def statistics(self):
+        lookups = self.hits + self.misses
+        return {'size': self.size, 'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                'expired': self.expired, 'evicted': self.evicted,
+                'hit_rate': float(self.hits) / lookups if lookups else 0.0, 'saved_ms': self.saved * 1000}
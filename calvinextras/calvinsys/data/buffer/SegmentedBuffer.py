@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import json
+import mmap
+import shutil
+import struct
+import zlib
+from calvin.runtime.south.async import async
+from calvin.utilities.calvinlogger import get_logger
+from calvin.runtime.south.calvinsys import base_calvinsys_object
+from calvin.runtime.north.plugins.coders.messages import msgpack_coder
+
+_log = get_logger(__name__)
+
+# Record frame header: payload length and CRC32 of payload
+_HEADER = struct.Struct("<II")
+# Read cursor: segment number and offset in segment
+_CURSOR = struct.Struct("<QQ")
+_SEGMENT_SUFFIX = ".seg"
+
+
+class _JSONCoder(object):
+
+    def encode(self, data):
+        return json.dumps(data)
+
+    def decode(self, data):
+        return json.loads(data)
+
+
+class SegmentedBuffer(base_calvinsys_object.BaseCalvinsysObject):
+    """
+    Persistent queue as an append-only log of fixed size, memory-mapped segment files
+
+    Each write appends one record, framed as [length][crc32][payload], to the last segment
+    and a new segment is started when it is full. A read cursor (segment, offset) is kept
+    in a memory-mapped file next to the segments, and a segment file is deleted as soon as
+    the cursor has moved past it, i.e. the disk usage follows the amount of unread data.
+
+    On init the last segment is scanned and the write position is set after the last
+    record with a valid CRC, so a record torn by a crash is overwritten.
+
+    Writes end up in the OS page cache, i.e. survive a runtime crash but are only flushed
+    to disk by the OS (or on close), like the SQLite version without synchronous commits.
+
+    Use it instead of the SQLite version by configuring e.g.
+        "buffer.persistent": {"module": "data.buffer.SegmentedBuffer", "attributes": {"encoding": "json"}}
+    """
+    init_schema = {
+        "type": "object",
+        "properties": {
+            "buffer_id": {
+                "description": "Buffer identifier, should be unique - will be used as part of directory name",
+                "type": "string",
+                "pattern": "^[a-zA-Z0-9]+"
+
+            },
+            "reporting": {
+                "description": "Log some statistics on buffer at given interval (in seconds)",
+                "type": "number"
+            },
+            "segment_size": {
+                "description": "Size of segment files in bytes",
+                "type": "integer",
+                "minimum": 4096
+            },
+            "encoding": {
+                "description": "Encoding of records",
+                "type": "string",
+                "enum": ["msgpack", "json"]
+            },
+            "max_read": {
+                "description": "Max number of written lists returned by each read",
+                "type": "integer",
+                "minimum": 1
+            }
+        },
+        "required": ["buffer_id"],
+        "description": "Initialize buffer"
+    }
+
+    can_write_schema = {
+        "description": "Returns True if buffer ready for write, otherwise False",
+        "type": "boolean"
+    }
+
+    write_schema = {
+        "description": "Push data to buffer; always a list of serializable items",
+        "type": "array"
+    }
+
+    can_read_schema = {
+        "description": "Returns True if data can be read, otherwise False",
+        "type": "boolean"
+    }
+
+    read_schema = {
+        "description": "Pop data from buffer, always a list",
+        "type": "array"
+    }
+
+    def init(self, buffer_id, reporting=None, segment_size=4*1024*1024, encoding="msgpack", max_read=100,
+             *args, **kwargs):
+        self.buffer_id = buffer_id
+        self.path = os.path.join(os.path.abspath(os.path.curdir), self.buffer_id + ".log")
+        self.segment_size = segment_size
+        self.max_read = max_read
+        self.coder = msgpack_coder.get() if encoding == "msgpack" else _JSONCoder()
+        self._pushed_values = 0
+        self._popped_values = 0
+        self._statlogging = None
+        # Segment being written and read, as (number, mmap)
+        self._write_segment = None
+        self._read_segment = None
+        self._write_offset = 0
+        self._read_offset = 0
+        self._cursor = None
+        self._open()
+
+        if reporting:
+            def log_stats():
+                _log.info("{} : pushed {}, popped {} ({} segments)".format(self.buffer_id, self._pushed_values,
+                                                                            self._popped_values, len(self._segments())))
+                self._statlogging.reset()
+            self._statlogging = async.DelayedCall(reporting, log_stats)
+
+    def _segment_path(self, number):
+        return os.path.join(self.path, "%016d%s" % (number, _SEGMENT_SUFFIX))
+
+    def _segments(self):
+        return sorted(int(name[:-len(_SEGMENT_SUFFIX)]) for name in os.listdir(self.path)
+                      if name.endswith(_SEGMENT_SUFFIX))
+
+    def _map(self, path, size):
+        with open(path, "a+b") as f:
+            if os.fstat(f.fileno()).st_size < size:
+                # Extend with zeros, a zero length marks the end of the records
+                f.truncate(size)
+            return mmap.mmap(f.fileno(), 0)
+
+    def _open(self):
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        self._cursor = self._map(os.path.join(self.path, "cursor"), _CURSOR.size)
+        segments = self._segments() or [0]
+        read_number, self._read_offset = _CURSOR.unpack_from(self._cursor)
+        if read_number not in segments:
+            read_number, self._read_offset = segments[0], 0
+        write_number = segments[-1]
+        self._write_segment = (write_number, self._map(self._segment_path(write_number), self.segment_size))
+        self._write_offset = self._scan(self._write_segment[1])
+        segment = self._write_segment[1]
+        if segment[self._write_offset:self._write_offset + _HEADER.size].strip("\0"):
+            # Clear remains of a torn record
+            segment[self._write_offset:] = "\0" * (len(segment) - self._write_offset)
+        if read_number == write_number:
+            self._read_segment = self._write_segment
+            self._read_offset = min(self._read_offset, self._write_offset)
+        else:
+            self._read_segment = (read_number, self._map(self._segment_path(read_number), self.segment_size))
+        self._save_cursor()
+
+    def _record(self, segment, offset):
+        """Return (payload, next offset) of record at offset, or (None, offset) if there is none"""
+        if offset + _HEADER.size > len(segment):
+            return None, offset
+        length, crc = _HEADER.unpack_from(segment, offset)
+        end = offset + _HEADER.size + length
+        if length == 0 or end > len(segment):
+            return None, offset
+        payload = segment[offset + _HEADER.size:end]
+        if zlib.crc32(payload) & 0xffffffff != crc:
+            _log.warning("{} : corrupt record at offset {}".format(self.buffer_id, offset))
+            return None, offset
+        return payload, end
+
+    def _scan(self, segment):
+        offset = 0
+        while True:
+            payload, next_offset = self._record(segment, offset)
+            if payload is None:
+                return offset
+            offset = next_offset
+
+    def _save_cursor(self):
+        _CURSOR.pack_into(self._cursor, 0, self._read_segment[0], self._read_offset)
+
+    def _next_write_segment(self, size):
+        number = self._write_segment[0] + 1
+        if self._read_segment is not self._write_segment:
+            self._write_segment[1].close()
+        self._write_segment = (number, self._map(self._segment_path(number), max(size, self.segment_size)))
+        self._write_offset = 0
+
+    def _next_read_segment(self):
+        number, segment = self._read_segment
+        segment.close()
+        os.remove(self._segment_path(number))
+        if number + 1 == self._write_segment[0]:
+            self._read_segment = self._write_segment
+        else:
+            self._read_segment = (number + 1, self._map(self._segment_path(number + 1), self.segment_size))
+        self._read_offset = 0
+
+    def can_write(self):
+        return self._write_segment is not None
+
+    def write(self, value):
+        try:
+            payload = self.coder.encode(value)
+        except Exception as e:
+            _log.error("Value could not be encoded: {}".format(e))
+            return
+        size = _HEADER.size + len(payload)
+        if self._write_offset + size > len(self._write_segment[1]):
+            self._next_write_segment(size)
+        segment = self._write_segment[1]
+        _HEADER.pack_into(segment, self._write_offset, len(payload), zlib.crc32(payload) & 0xffffffff)
+        segment[self._write_offset + _HEADER.size:self._write_offset + size] = payload
+        self._write_offset += size
+        self._pushed_values += len(value)
+        self.scheduler_wakeup()
+
+    def can_read(self):
+        return (self._read_segment[0], self._read_offset) != (self._write_segment[0], self._write_offset)
+
+    def read(self):
+        value = []
+        records = 0
+        while records < self.max_read and self.can_read():
+            payload, offset = self._record(self._read_segment[1], self._read_offset)
+            if payload is None:
+                # End of a completed segment (or a corrupt record, skip rest of segment)
+                if self._read_segment is self._write_segment:
+                    self._read_offset = self._write_offset
+                else:
+                    self._next_read_segment()
+                continue
+            self._read_offset = offset
+            records += 1
+            try:
+                value.extend(self.coder.decode(payload))
+            except Exception:
+                _log.error("No value decoded - possibly corrupt file")
+        self._save_cursor()
+        self._popped_values += len(value)
+        return value
+
+    def close(self):
+        if self._statlogging:
+            self._statlogging.cancel()
+        empty = not self.can_read()
+        if self._read_segment is not self._write_segment:
+            self._read_segment[1].close()
+        self._write_segment[1].flush()
+        self._write_segment[1].close()
+        self._cursor.flush()
+        self._cursor.close()
+        self._read_segment = self._write_segment = None
+        if empty:
+            try:
+                shutil.rmtree(self.path)
+            except Exception:
+                _log.warning("Could not remove buffer directory {}".format(self.path))
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import pytest
+from mock import Mock
+
+from calvinextras.calvinsys.data.buffer import SegmentedBuffer as segmented
+
+pytestmark = pytest.mark.unittest
+
+SEGMENT_SIZE = 4096
+
+
+@pytest.fixture(autouse=True)
+def in_tmpdir(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)
+
+
+def _buffer(encoding="json", **kwargs):
+    buf = segmented.SegmentedBuffer(Mock(), "buffer.persistent", Mock())
+    buf.init("buffer", segment_size=SEGMENT_SIZE, encoding=encoding, **kwargs)
+    return buf
+
+
+def _batch(i):
+    return [{"id": "sensor", "value": i, "data": "x" * 100}]
+
+
+def _drain(buf):
+    values = []
+    while buf.can_read():
+        values.extend(buf.read())
+    return values
+
+
+def _last_segment(buf):
+    return buf._segment_path(buf._segments()[-1])
+
+
+@pytest.mark.parametrize("encoding", ["json", "msgpack"])
+def test_roundtrip_across_segments(encoding):
+    buf = _buffer(encoding, max_read=7)
+    for i in range(200):
+        buf.write(_batch(i))
+    assert len(buf._segments()) > 2
+    assert _drain(buf) == sum([_batch(i) for i in range(200)], [])
+    # Segments read past are removed
+    assert len(buf._segments()) == 1
+    buf.write(_batch(200))
+    assert buf.read() == _batch(200)
+    buf.close()
+
+
+def test_reopen_with_unread_data():
+    buf = _buffer()
+    for i in range(100):
+        buf.write(_batch(i))
+    buf.max_read = 30
+    assert buf.read() == sum([_batch(i) for i in range(30)], [])
+    buf.close()
+    assert os.path.isdir(buf.path)
+    buf = _buffer()
+    buf.write(_batch(100))
+    assert _drain(buf) == sum([_batch(i) for i in range(30, 101)], [])
+    buf.close()
+
+
+def test_corrupt_tail_record():
+    buf = _buffer()
+    for i in range(3):
+        buf.write(_batch(i))
+    offset = buf._write_offset
+    path = _last_segment(buf)
+    buf.close()
+    with open(path, "r+b") as f:
+        # Flip a byte in the payload of the last record
+        f.seek(offset - 10)
+        byte = f.read(1)
+        f.seek(offset - 10)
+        f.write(chr(ord(byte) ^ 0xff))
+    buf = _buffer()
+    buf.write(_batch(3))
+    assert _drain(buf) == _batch(0) + _batch(1) + _batch(3)
+    buf.close()
+
+
+def test_truncated_tail_record():
+    buf = _buffer()
+    for i in range(2):
+        buf.write(_batch(i))
+    offset = buf._write_offset
+    path = _last_segment(buf)
+    buf.close()
+    with open(path, "r+b") as f:
+        # Header of a record that was never written
+        f.seek(offset)
+        f.write(segmented._HEADER.pack(1000, 4711) + "torn")
+    buf = _buffer()
+    assert buf._write_offset == offset
+    buf.write(_batch(2))
+    assert _drain(buf) == _batch(0) + _batch(1) + _batch(2)
+    buf.close()
+
+
+def test_record_larger_than_segment():
+    buf = _buffer()
+    buf.write(_batch(0))
+    large = [{"id": "sensor", "data": "x" * (3 * SEGMENT_SIZE)}]
+    buf.write(large)
+    buf.write(_batch(1))
+    assert _drain(buf) == _batch(0) + large + _batch(1)
+    buf.close()
+
+
+def test_close_removes_empty_buffer():
+    buf = _buffer()
+    for i in range(50):
+        buf.write(_batch(i))
+    _drain(buf)
+    buf.close()
+    assert not os.path.exists(buf.path)
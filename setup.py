@@ -34,6 +34,10 @@ setup(name='er-calvin',
           'pytest>=1.4.25',
           'pytest-twisted'
       ],
+      extras_require={
+          # NumPy version of the actor placement solver, see calvin.utilities.placement
+          'placement': ['numpy<1.17']
+      },
       install_requires=[
         'colorlog==2.6.1',
         'rpcudp==1.0',